@@ -0,0 +1,193 @@
+"""Lazily constructed services shared by the API routers.
+
+Nothing here runs at import time: process-wide services are built on first use and
+cached for the life of the process. Repositories are bound per request to a
+:class:`UnitOfWork`, so one request uses one session and connection checkout.
+Routers receive everything through ``Depends`` so tests can swap implementations
+via ``app.dependency_overrides``.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator
+
+from fastapi import Depends
+
+from ..core.config import get_settings
+from ..data_providers.boavizta_provider import BoaviztaProvider
+from ..data_providers.lci_provider_base import LCIProvider
+from ..data_providers.probas_provider import ProBasProvider
+from ..data_providers.soda4lca_provider import Soda4LCAProvider
+from ..db.init_db import init_db
+from ..db.unit_of_work import UnitOfWork
+from ..engines.circularity_engine_pci_vectorized import VectorizedBracquene2020CircularityEngine
+from ..services.bom_rollup import BOMRollupService
+from ..services.circularity_service import CircularityService
+from ..services.decision_writer import DecisionWriter
+from ..services.dependency_index import DependencyIndex
+from ..services.invalidation_service import InvalidationService, RecomputeQueue
+from ..services.mapping_repository import MappingRepository, invalidate_rule_index
+from ..services.mapping_service import MappingService
+from ..services.pcf_service import PCFService, default_pcf_engine
+from ..services.pci_uncertainty import default_workers
+from ..services.portfolio_runner import PortfolioJobs, PortfolioRunner
+from ..services.product_repository import ProductRepository
+from ..services.result_repository import ResultRepository
+from ..services.scenario_repository import ScenarioRepository
+from ..services.scenario_service import ScenarioService
+
+LOGGER = logging.getLogger(__name__)
+
+
+@lru_cache
+def get_lci_providers() -> tuple[LCIProvider, ...]:
+    return (ProBasProvider(), BoaviztaProvider(), Soda4LCAProvider())
+
+
+@lru_cache
+def get_decision_writer() -> DecisionWriter:
+    return DecisionWriter.from_settings()
+
+
+@lru_cache
+def _base_mapping_service() -> MappingService:
+    return MappingService.from_settings(
+        providers=list(get_lci_providers()), repository=MappingRepository(decision_writer=get_decision_writer())
+    )
+
+
+def get_unit_of_work() -> Iterator[UnitOfWork]:
+    # Queued mapping decisions are flushed by the decision reads that need them, not here.
+    with UnitOfWork() as uow:
+        yield uow
+
+
+def get_product_repository(uow: UnitOfWork = Depends(get_unit_of_work)) -> ProductRepository:
+    return ProductRepository(session_factory=uow.session_factory)
+
+
+def get_mapping_repository(uow: UnitOfWork = Depends(get_unit_of_work)) -> MappingRepository:
+    return MappingRepository(session_factory=uow.session_factory, decision_writer=get_decision_writer())
+
+
+def get_scenario_service(uow: UnitOfWork = Depends(get_unit_of_work)) -> ScenarioService:
+    return ScenarioService(ScenarioRepository(session_factory=uow.session_factory))
+
+
+def get_result_repository(uow: UnitOfWork = Depends(get_unit_of_work)) -> ResultRepository:
+    return ResultRepository(session_factory=uow.session_factory)
+
+
+def get_mapping_service(repository: MappingRepository = Depends(get_mapping_repository)) -> MappingService:
+    return _base_mapping_service().with_repository(repository)
+
+
+@lru_cache
+def get_monte_carlo_executor() -> ProcessPoolExecutor | None:
+    """One process pool shared by all PCI/PCF Monte Carlo requests; ``None`` runs them in-process."""
+
+    settings = get_settings()
+    workers = max(
+        settings.pci_monte_carlo_workers or default_workers(), settings.pcf_monte_carlo_workers or default_workers()
+    )
+    if workers <= 1:
+        return None
+    # ``spawn`` avoids forking a process that is running server threads; workers start on first use.
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+@lru_cache
+def get_pcf_service() -> PCFService:
+    return PCFService(engine=default_pcf_engine(), monte_carlo_executor=get_monte_carlo_executor)
+
+
+@lru_cache
+def get_circularity_service() -> CircularityService:
+    return CircularityService(
+        VectorizedBracquene2020CircularityEngine(aggregate=get_settings().pci_aggregate_lines),
+        monte_carlo_executor=get_monte_carlo_executor,
+    )
+
+
+@lru_cache
+def get_bom_rollup_service() -> BOMRollupService:
+    return BOMRollupService(get_pcf_service().engine)
+
+
+def get_portfolio_runner(workers: int | None = None) -> PortfolioRunner:
+    """A runner with its own sessions, for use outside a request (jobs and the CLI)."""
+
+    return PortfolioRunner.from_settings(mapping_service=_base_mapping_service(), workers=workers)
+
+
+@lru_cache
+def get_portfolio_jobs() -> PortfolioJobs:
+    return PortfolioJobs(get_portfolio_runner)
+
+
+@lru_cache
+def get_recompute_queue() -> RecomputeQueue | None:
+    return RecomputeQueue(get_portfolio_jobs()) if get_settings().dependency_recompute else None
+
+
+def get_dependency_index(uow: UnitOfWork = Depends(get_unit_of_work)) -> DependencyIndex:
+    return DependencyIndex(session_factory=uow.session_factory)
+
+
+def get_invalidation_service(
+    index: DependencyIndex = Depends(get_dependency_index),
+    result_repository: ResultRepository = Depends(get_result_repository),
+) -> InvalidationService:
+    return InvalidationService(
+        index,
+        result_repository,
+        get_pcf_service(),
+        get_circularity_service(),
+        recompute_queue=get_recompute_queue(),
+        rollup_service=get_bom_rollup_service(),
+    )
+
+
+def initialize_database() -> None:
+    """Create and seed the database, then refresh the caches and indexes derived from it."""
+
+    applied = init_db()
+    if "mapping_rules" in applied:
+        invalidate_rule_index()
+    # Databases from before the dependency index get their edges once.
+    index = DependencyIndex()
+    if index.is_empty():
+        index.rebuild()
+
+
+def warm_up() -> None:
+    """Build services, the mapping rule index, LCI factorizations and compiled scenarios ahead of traffic."""
+
+    database = getattr(get_pcf_service().engine, "database", None)
+    if database is not None:
+        database.factorization()
+    get_circularity_service()
+    _base_mapping_service().repository.rule_index()
+    with UnitOfWork() as uow:
+        scenario_service = ScenarioService(ScenarioRepository(session_factory=uow.session_factory))
+        for scenario in scenario_service.list_scenarios():
+            scenario_service.get_compiled_scenario(scenario.id)
+    LOGGER.info("Warm-up complete")
+
+
+def shutdown() -> None:
+    """Flush queued decisions and release resources held by lazily created services."""
+
+    if get_decision_writer.cache_info().currsize:
+        get_decision_writer().close()
+    if get_monte_carlo_executor.cache_info().currsize and get_monte_carlo_executor() is not None:
+        get_monte_carlo_executor().shutdown(cancel_futures=True)
+        get_monte_carlo_executor.cache_clear()
+    if get_lci_providers.cache_info().currsize:
+        for provider in get_lci_providers():
+            close = getattr(provider, "close", None)
+            if close:
+                close()
@@ -0,0 +1,61 @@
+"""Helpers for ETag-based conditional GET handling."""
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Iterable
+
+from fastapi import Request, Response
+
+from ..models.method_profile import PCF_METHOD_PROFILES
+
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts: object) -> str:
+    """Return a strong ETag derived from revision counters or other stable parts."""
+
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_for_revisions(kind: str, revisions: Iterable[tuple[str, int]]) -> str:
+    """ETag for a collection, derived from the sorted ``(id, revision)`` pairs."""
+
+    return make_etag(kind, *(f"{item_id}@{revision}" for item_id, revision in sorted(revisions)))
+
+
+@lru_cache(maxsize=1)
+def method_catalog_etag() -> str:
+    """ETag for the static PCF method catalog, derived from the profiles' content."""
+
+    return make_etag(json.dumps([asdict(profile) for profile in PCF_METHOD_PROFILES.values()], sort_keys=True, default=str))
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response | None:
+    """Return a 304 response when the request's If-None-Match matches ``etag``."""
+
+    header = request.headers.get("if-none-match")
+    if header and _matches(header, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
+
+
+def apply_cache_headers(response: Response, etag: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
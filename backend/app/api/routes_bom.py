@@ -1,40 +1,131 @@
 """BOM routes."""
 from __future__ import annotations
 
-from dataclasses import asdict
+from dataclasses import asdict, replace
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from ..models.bom import BOMItem
-from ..schemas.bom_schema import BOMItemSchema, BOMUploadResponse
+from ..models.method_profile import PCFMethodID
+from ..schemas.bom_schema import BOMItemSchema, BOMRevisionSchema, BOMRollupSchema, BOMUploadResponse
+from ..services.bom_rollup import BOMRollupService
+from ..services.mapping_service import MappingService
 from ..services.product_repository import ProductRepository
+from ..services.scenario_service import ScenarioService
+from .dependencies import (
+    get_bom_rollup_service,
+    get_mapping_service,
+    get_product_repository,
+    get_scenario_service,
+)
+from .http_cache import apply_cache_headers, make_etag, not_modified
 
 router = APIRouter(prefix="/bom", tags=["bom"])
-_repository = ProductRepository()
 
 
 @router.post("/upload", response_model=BOMUploadResponse)
-def upload_bom(payload: list[BOMItemSchema]) -> BOMUploadResponse:
+def upload_bom(
+    payload: list[BOMItemSchema], repository: ProductRepository = Depends(get_product_repository)
+) -> BOMUploadResponse:
     if not payload:
         raise HTTPException(status_code=400, detail="BOM payload is empty")
     product_id = payload[0].product_id
-    product = _repository.get_product(product_id)
+    product = repository.get_product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     items = [BOMItem(**item.model_dump()) for item in payload]
     try:
-        _repository.replace_bom(product_id, items)
+        repository.replace_bom(product_id, items)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    return BOMUploadResponse(product_id=product_id, items=payload)
+    revisions = repository.get_revisions(product_id)
+    return BOMUploadResponse(product_id=product_id, items=payload, bom_revision=revisions[1] if revisions else None)
 
 
 @router.get("/{product_id}", response_model=BOMUploadResponse)
-def get_bom(product_id: str) -> BOMUploadResponse:
-    product = _repository.get_product(product_id)
-    if not product:
+def get_bom(
+    product_id: str,
+    request: Request,
+    response: Response,
+    repository: ProductRepository = Depends(get_product_repository),
+) -> BOMUploadResponse:
+    revisions = repository.get_revisions(product_id)
+    if revisions is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    bom_items = _repository.get_bom(product_id)
+    etag = make_etag("bom", product_id, revisions[1])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    bom_items = repository.get_bom(product_id)
     items = [BOMItemSchema(**asdict(item)) for item in bom_items]
-    return BOMUploadResponse(product_id=product_id, items=items)
+    apply_cache_headers(response, etag)
+    return BOMUploadResponse(product_id=product_id, items=items, bom_revision=revisions[1])
+
+
+@router.get("/{product_id}/revisions", response_model=list[BOMRevisionSchema])
+def list_bom_revisions(
+    product_id: str, repository: ProductRepository = Depends(get_product_repository)
+) -> list[BOMRevisionSchema]:
+    if repository.get_revisions(product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return [
+        BOMRevisionSchema(
+            **{**asdict(revision), "created_at": revision.created_at.isoformat() if revision.created_at else None}
+        )
+        for revision in repository.list_bom_revisions(product_id)
+    ]
+
+
+@router.get("/{product_id}/revisions/{revision}", response_model=BOMUploadResponse)
+def get_bom_revision(
+    product_id: str, revision: int, repository: ProductRepository = Depends(get_product_repository)
+) -> BOMUploadResponse:
+    items = repository.get_bom_at_revision(product_id, revision)
+    if items is None:
+        raise HTTPException(status_code=404, detail="BOM revision not found")
+    return BOMUploadResponse(
+        product_id=product_id, items=[BOMItemSchema(**asdict(item)) for item in items], bom_revision=revision
+    )
+
+
+@router.get("/{product_id}/rollup", response_model=BOMRollupSchema)
+def get_bom_rollup(
+    product_id: str,
+    scenario_id: str = "default",
+    pcf_method_id: PCFMethodID | None = None,
+    bom_revision: int | None = None,
+    repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+    mapping_service: MappingService = Depends(get_mapping_service),
+    rollup_service: BOMRollupService = Depends(get_bom_rollup_service),
+) -> BOMRollupSchema:
+    """PCF and PCI of the product and of every subassembly, with quantities propagated down the tree."""
+
+    loaded = repository.get_product_with_bom(product_id)
+    if not loaded:
+        raise HTTPException(status_code=404, detail="Product not found")
+    product, bom = loaded
+    if bom_revision is not None and bom_revision != product.bom_revision:
+        bom = repository.get_bom_at_revision(product_id, bom_revision)
+        if bom is None:
+            raise HTTPException(status_code=404, detail="BOM revision not found")
+        product = replace(product, bom_revision=bom_revision)
+    if not bom:
+        raise HTTPException(status_code=404, detail="BOM not uploaded for product")
+    try:
+        scenario = scenario_service.get_compiled_scenario(scenario_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    method_profile = scenario_service.get_method_profile(pcf_method_id or scenario.scenario.pcf_method_id)
+    try:
+        rollup = rollup_service.rollup(
+            product,
+            bom,
+            scenario,
+            method_profile,
+            lci_model_builder=lambda items: mapping_service.build_lci_model(product, items, scenario.scenario)[0],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return BOMRollupSchema(bom_revision=product.bom_revision, **asdict(rollup))
@@ -1,58 +1,186 @@
 """Circularity endpoints."""
 from __future__ import annotations
 
-from dataclasses import asdict
+from dataclasses import asdict, replace
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ..engines.circularity_engine_pci_bracquene2020 import Bracquene2020CircularityEngine
-from ..schemas.pci_result_schema import PCIResultSchema
+from ..models.pci import pci_result_payload
+from ..schemas.pci_result_schema import (
+    PCIGoalSeekRequest,
+    PCIGoalSeekSchema,
+    PCIResultSchema,
+    PCISensitivityEntrySchema,
+    PCISensitivitySchema,
+    PCISweepRequest,
+    PCIUncertaintyRequest,
+    PCIUncertaintySchema,
+)
 from ..schemas.results_schema import ResultSetSchema
+from ..services.bom_tree import BOMStructureError, propagate_quantities
 from ..services.circularity_service import CircularityService
+from ..services.pci_goal_seek import GoalVariable
+from ..services.pci_sweep import range_values, sweep_axis
+from ..services.pci_uncertainty import ParameterDistribution
 from ..services.product_repository import ProductRepository
 from ..services.scenario_service import ScenarioService
+from .dependencies import get_circularity_service, get_product_repository, get_scenario_service
 
 router = APIRouter(prefix="/circularity", tags=["circularity"])
-_circularity_service = CircularityService(Bracquene2020CircularityEngine())
-_product_repository = ProductRepository()
-_scenario_service = ScenarioService()
 
 
 class CircularityRunRequest(BaseModel):
     product_id: str
     scenario_id: str = "default"
+    bom_revision: int | None = None
 
 
 @router.post("/run", response_model=ResultSetSchema)
-def run_circularity(request: CircularityRunRequest) -> ResultSetSchema:
-    product, bom = _get_product_and_bom(request.product_id)
-    scenario = _get_scenario_or_404(request.scenario_id)
-    result_set = _circularity_service.run(product=product, bom=bom, scenario=scenario)
+def run_circularity(
+    request: CircularityRunRequest,
+    circularity_service: CircularityService = Depends(get_circularity_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> ResultSetSchema:
+    product, bom = _get_product_and_bom(product_repository, request.product_id, request.bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, request.scenario_id)
+    result_set = circularity_service.run(product=product, bom=bom, scenario=scenario)
     return ResultSetSchema(**result_set.__dict__)
 
 
 @router.get("/pci/{product_id}", response_model=PCIResultSchema)
-def get_pci(product_id: str, scenario_id: str = "default") -> PCIResultSchema:
-    product, bom = _get_product_and_bom(product_id)
-    scenario = _get_scenario_or_404(scenario_id)
-    pci_result = _circularity_service.calculate_pci(product, bom, scenario)
-    data = asdict(pci_result)
+def get_pci(
+    product_id: str,
+    scenario_id: str = "default",
+    bom_revision: int | None = None,
+    circularity_service: CircularityService = Depends(get_circularity_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> PCIResultSchema:
+    product, bom = _get_product_and_bom(product_repository, product_id, bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, scenario_id)
+    pci_result = circularity_service.calculate_pci_incremental(product, bom, scenario)
+    data = pci_result_payload(pci_result)
     return PCIResultSchema(**data)
 
 
-def _get_product_and_bom(product_id: str):
-    product = _product_repository.get_product(product_id)
-    if not product:
+@router.get("/sensitivity/{product_id}", response_model=PCISensitivitySchema)
+def get_pci_sensitivity(
+    product_id: str,
+    scenario_id: str = "default",
+    bom_revision: int | None = None,
+    relative_step: float = Query(default=0.1, gt=0),
+    top: int = Query(default=10, ge=1),
+    circularity_service: CircularityService = Depends(get_circularity_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> PCISensitivitySchema:
+    """∂PCI/∂parameter and elasticities for every scenario parameter and BOM share, with a tornado ranking."""
+
+    product, bom = _get_product_and_bom(product_repository, product_id, bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, scenario_id)
+    try:
+        result = circularity_service.sensitivity(bom, scenario, relative_step=relative_step, top=top)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return PCISensitivitySchema(
+        product_id=product.id,
+        scenario_id=scenario_id,
+        pci_product=result.pci_product,
+        relative_step=result.relative_step,
+        sensitivities=[PCISensitivityEntrySchema(label=entry.label, **asdict(entry)) for entry in result.sensitivities],
+        tornado=[asdict(bar) for bar in result.tornado],
+    )
+
+
+@router.post("/sweep", response_class=StreamingResponse)
+def sweep_pci(
+    request: PCISweepRequest,
+    circularity_service: CircularityService = Depends(get_circularity_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> StreamingResponse:
+    """Stream PCI/LFI as CSV for every point of a parameter grid over one product."""
+
+    product, bom = _get_product_and_bom(product_repository, request.product_id, request.bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, request.scenario_id)
+    try:
+        axes = [
+            sweep_axis(entry.parameter, range_values(entry.values, entry.start, entry.stop, entry.steps), entry.material_key)
+            for entry in request.ranges
+        ]
+        sweep = circularity_service.sweep(bom, scenario, axes=axes, points=request.grid)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return StreamingResponse(
+        sweep.iter_csv(),
+        media_type="text/csv",
+        headers={"X-Sweep-Points": str(sweep.size), "X-Product-Id": product.id},
+    )
+
+
+@router.post("/uncertainty", response_model=PCIUncertaintySchema)
+def pci_uncertainty(
+    request: PCIUncertaintyRequest,
+    circularity_service: CircularityService = Depends(get_circularity_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> PCIUncertaintySchema:
+    """Monte Carlo PCI percentiles, mean and standard deviation for one product."""
+
+    product, bom = _get_product_and_bom(product_repository, request.product_id, request.bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, request.scenario_id)
+    try:
+        distributions = [ParameterDistribution(**entry.model_dump()) for entry in request.distributions]
+        result = circularity_service.uncertainty(
+            bom, scenario, distributions, request.samples, seed=request.seed, percentiles=request.percentiles
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return PCIUncertaintySchema(product_id=product.id, scenario_id=request.scenario_id, **asdict(result))
+
+
+@router.post("/goal-seek", response_model=PCIGoalSeekSchema)
+def pci_goal_seek(
+    request: PCIGoalSeekRequest,
+    circularity_service: CircularityService = Depends(get_circularity_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> PCIGoalSeekSchema:
+    """Minimal change of the given shares or scenario parameters that reaches ``target_pci``."""
+
+    product, bom = _get_product_and_bom(product_repository, request.product_id, request.bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, request.scenario_id)
+    try:
+        variables = [GoalVariable(**entry.model_dump()) for entry in request.variables]
+        result = circularity_service.goal_seek(bom, scenario, request.target_pci, variables, tolerance=request.tolerance)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return PCIGoalSeekSchema(product_id=product.id, scenario_id=request.scenario_id, **asdict(result))
+
+
+def _get_product_and_bom(product_repository: ProductRepository, product_id: str, bom_revision: int | None = None):
+    loaded = product_repository.get_product_with_bom(product_id)
+    if not loaded:
         raise HTTPException(status_code=404, detail="Product not found")
-    bom = _product_repository.get_bom(product_id)
+    product, bom = loaded
+    if bom_revision is not None and bom_revision != product.bom_revision:
+        bom = product_repository.get_bom_at_revision(product_id, bom_revision)
+        if bom is None:
+            raise HTTPException(status_code=404, detail="BOM revision not found")
+        product = replace(product, bom_revision=bom_revision)
     if not bom:
         raise HTTPException(status_code=404, detail="BOM not uploaded for product")
-    return product, bom
+    try:
+        return product, propagate_quantities(bom)
+    except BOMStructureError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
-def _get_scenario_or_404(scenario_id: str):
+def _get_scenario_or_404(scenario_service: ScenarioService, scenario_id: str):
     try:
-        return _scenario_service.get_scenario(scenario_id)
+        return scenario_service.get_compiled_scenario(scenario_id)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
@@ -0,0 +1,44 @@
+"""Where-used queries and targeted invalidation over the dependency index."""
+from __future__ import annotations
+
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..schemas.dependency_schema import (
+    DependencyKind,
+    InvalidationReportSchema,
+    InvalidationRequest,
+    WhereUsedSchema,
+)
+from ..services.dependency_index import DependencyIndex
+from ..services.invalidation_service import InvalidationService
+from .dependencies import get_dependency_index, get_invalidation_service
+
+router = APIRouter(prefix="/dependencies", tags=["dependencies"])
+
+
+@router.get("/where-used", response_model=WhereUsedSchema)
+def where_used(
+    kind: DependencyKind = Query(...),
+    key: str = Query(..., min_length=1),
+    index: DependencyIndex = Depends(get_dependency_index),
+) -> WhereUsedSchema:
+    """Products (and their BOM items or result sets) depending on a dataset, mapping rule code or scenario."""
+
+    used = index.where_used(kind, key)
+    return WhereUsedSchema(kind=kind, key=key, product_ids=used.product_ids, subjects=used.subjects)
+
+
+@router.post("/invalidate", response_model=InvalidationReportSchema)
+def invalidate(
+    request: InvalidationRequest, service: InvalidationService = Depends(get_invalidation_service)
+) -> InvalidationReportSchema:
+    """Report a changed dataset, rule or scenario: drop cached state and flag stored results of the affected products."""
+
+    try:
+        report = service.invalidate(request.kind, request.key, recompute=request.recompute)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    queue = service.recompute_queue
+    return InvalidationReportSchema(**asdict(report), recompute_pending=queue.pending if queue is not None else 0)
@@ -3,11 +3,8 @@ from __future__ import annotations
 
 import json
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
-from ..data_providers.boavizta_provider import BoaviztaProvider
-from ..data_providers.probas_provider import ProBasProvider
-from ..data_providers.soda4lca_provider import Soda4LCAProvider
 from ..models.bom import BOMItem
 from ..schemas.mapping_schema import (
     MappingCandidateSchema,
@@ -15,19 +12,22 @@ from ..schemas.mapping_schema import (
     MappingHistorySchema,
     MappingOverrideRequest,
 )
+from ..services.bom_rollup import BOMRollupService
 from ..services.mapping_repository import MappingRepository
 from ..services.mapping_service import MappingDecision, MappingService
 from ..services.product_repository import ProductRepository
+from ..services.result_repository import ResultRepository
 from ..services.scenario_service import ScenarioService
+from .dependencies import (
+    get_bom_rollup_service,
+    get_mapping_repository,
+    get_mapping_service,
+    get_product_repository,
+    get_result_repository,
+    get_scenario_service,
+)
 
 router = APIRouter(prefix="/mapping", tags=["mapping"])
-_repository = MappingRepository()
-_product_repository = ProductRepository()
-_mapping_service = MappingService.from_settings(
-    providers=[ProBasProvider(), BoaviztaProvider(), Soda4LCAProvider()],
-    repository=_repository,
-)
-_scenario_service = ScenarioService()
 
 
 def _candidate_to_schema(candidate) -> MappingCandidateSchema:
@@ -52,15 +52,18 @@ def _decision_to_schema(decision: MappingDecision) -> MappingDecisionSchema:
 
 
 @router.get("/history/{product_id}", response_model=list[MappingHistorySchema])
-def list_history(product_id: str) -> list[MappingHistorySchema]:
-    with _repository.session() as session:
-        entries = _repository.list_history_for_product(session, product_id)
+def list_history(
+    product_id: str, repository: MappingRepository = Depends(get_mapping_repository)
+) -> list[MappingHistorySchema]:
+    with repository.session() as session:
+        entries = repository.list_history_for_product(session, product_id)
         return [
             MappingHistorySchema(
                 id=entry.id,
                 product_id=entry.product_id,
                 bom_item_id=entry.bom_item_id,
                 scenario_id=entry.scenario_id,
+                bom_revision=entry.bom_revision,
                 selected_dataset_id=entry.selected_dataset_id,
                 selected_provider=entry.selected_provider,
                 confidence_score=entry.confidence_score,
@@ -77,32 +80,46 @@ def list_history(product_id: str) -> list[MappingHistorySchema]:
 
 
 @router.get("/review/{product_id}", response_model=list[MappingDecisionSchema])
-def review_mapping(product_id: str, scenario_id: str = "default") -> list[MappingDecisionSchema]:
-    product = _product_repository.get_product(product_id)
-    if not product:
+def review_mapping(
+    product_id: str,
+    scenario_id: str = "default",
+    mapping_service: MappingService = Depends(get_mapping_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> list[MappingDecisionSchema]:
+    loaded = product_repository.get_product_with_bom(product_id)
+    if not loaded:
         raise HTTPException(status_code=404, detail="Product not found")
-    bom = _product_repository.get_bom(product_id)
+    product, bom = loaded
     if not bom:
         raise HTTPException(status_code=404, detail="BOM not uploaded for product")
-    scenario = _get_scenario_or_404(scenario_id)
+    scenario = _get_scenario_or_404(scenario_service, scenario_id)
 
-    decisions = _mapping_service.load_latest_decisions(product_id)
+    decisions = mapping_service.load_latest_decisions(product_id)
     if not decisions:
-        decisions = _mapping_service.map_bom(bom, scenario)
+        decisions = mapping_service.map_bom(bom, scenario, bom_revision=product.bom_revision)
     return [_decision_to_schema(decision) for decision in decisions]
 
 
 @router.post("/override", response_model=MappingDecisionSchema)
-def create_override(payload: MappingOverrideRequest) -> MappingDecisionSchema:
-    bom_items = _product_repository.get_bom(payload.product_id)
+def create_override(
+    payload: MappingOverrideRequest,
+    mapping_service: MappingService = Depends(get_mapping_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+    result_repository: ResultRepository = Depends(get_result_repository),
+    rollup_service: BOMRollupService = Depends(get_bom_rollup_service),
+) -> MappingDecisionSchema:
+    bom_items = product_repository.get_bom(payload.product_id)
     if not bom_items:
         raise HTTPException(status_code=404, detail="BOM not found for product")
     bom_item = _get_bom_item(bom_items, payload.bom_item_id)
     if not bom_item:
         raise HTTPException(status_code=404, detail="BOM item not found")
-    scenario = _get_scenario_or_404(payload.scenario_id) if payload.scenario_id else None
+    scenario = _get_scenario_or_404(scenario_service, payload.scenario_id) if payload.scenario_id else None
+    revisions = product_repository.get_revisions(payload.product_id)
 
-    decision = _mapping_service.record_override(
+    decision = mapping_service.record_override(
         bom_item=bom_item,
         dataset_id=payload.dataset_id,
         provider=payload.provider,
@@ -110,11 +127,29 @@ def create_override(payload: MappingOverrideRequest) -> MappingDecisionSchema:
         comment=payload.comment,
         scenario=scenario,
         life_cycle_stage=payload.life_cycle_stage,
+        bom_revision=revisions[1] if revisions else None,
     )
+    # Stored portfolio results of this product no longer reflect its mapping.
+    result_repository.mark_stale([payload.product_id])
+    # Roll-ups memoized for the subassemblies containing the line were keyed on its old mapping.
+    rollup_service.invalidate(_ancestor_component_codes(bom_items, bom_item))
 
     return _decision_to_schema(decision)
 
 
+def _ancestor_component_codes(bom_items: list[BOMItem], bom_item: BOMItem) -> list[str]:
+    by_id = {item.id: item for item in bom_items}
+    codes: list[str] = []
+    seen: set[str] = set()
+    parent = by_id.get(bom_item.parent_bom_item_id or "")
+    while parent is not None and parent.id not in seen:
+        seen.add(parent.id)
+        if parent.component_code:
+            codes.append(parent.component_code)
+        parent = by_id.get(parent.parent_bom_item_id or "")
+    return codes
+
+
 def _get_bom_item(bom_items: list[BOMItem], bom_item_id: str) -> BOMItem | None:
     for item in bom_items:
         if item.id == bom_item_id:
@@ -122,8 +157,8 @@ def _get_bom_item(bom_items: list[BOMItem], bom_item_id: str) -> BOMItem | None:
     return None
 
 
-def _get_scenario_or_404(scenario_id: str):
+def _get_scenario_or_404(scenario_service: ScenarioService, scenario_id: str):
     try:
-        return _scenario_service.get_scenario(scenario_id)
+        return scenario_service.get_scenario(scenario_id)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
@@ -1,76 +1,150 @@
 """PCF run endpoints."""
 from __future__ import annotations
 
-from dataclasses import asdict
+from dataclasses import asdict, replace
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 
-from ..data_providers.boavizta_provider import BoaviztaProvider
-from ..data_providers.probas_provider import ProBasProvider
-from ..data_providers.soda4lca_provider import Soda4LCAProvider
-from ..engines.pcf_engine_brightway import BrightwayPCFEngine
 from ..models.method_profile import PCFMethodID
 from ..schemas.method_profile_schema import MethodProfileListResponse, MethodProfileSchema
-from ..schemas.results_schema import ResultSetSchema
-from ..services.mapping_repository import MappingRepository
+from ..schemas.results_schema import PCFUncertaintyRequest, PCFUncertaintySchema, PedigreeSchema, ResultSetSchema
+from ..services.bom_tree import BOMStructureError, propagate_quantities
 from ..services.mapping_service import MappingDecision, MappingService
 from ..services.pcf_service import PCFService
+from ..services.pcf_uncertainty import PedigreeScores
 from ..services.product_repository import ProductRepository
 from ..services.scenario_service import ScenarioService
+from .dependencies import get_mapping_service, get_pcf_service, get_product_repository, get_scenario_service
+from .http_cache import STATIC_CACHE_CONTROL, apply_cache_headers, method_catalog_etag, not_modified
 
 router = APIRouter(prefix="/pcf", tags=["pcf"])
-_pcf_service = PCFService(engine=BrightwayPCFEngine())
-_mapping_repository = MappingRepository()
-_mapping_service = MappingService.from_settings(
-    providers=[ProBasProvider(), BoaviztaProvider(), Soda4LCAProvider()],
-    repository=_mapping_repository,
-)
-_product_repository = ProductRepository()
-_scenario_service = ScenarioService()
 
 
 class PCFRunRequest(BaseModel):
     product_id: str
     scenario_id: str = "default"
     pcf_method_id: PCFMethodID | None = None
-
-
-@router.post("/run", response_model=ResultSetSchema)
-def run_pcf(request: PCFRunRequest) -> ResultSetSchema:
-    product = _product_repository.get_product(request.product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    bom = _product_repository.get_bom(request.product_id)
-    if not bom:
-        raise HTTPException(status_code=404, detail="BOM not uploaded for product")
-
-    scenario = _get_scenario_or_404(request.scenario_id)
-    method_id = request.pcf_method_id or scenario.pcf_method_id
-    method_profile = _scenario_service.get_method_profile(method_id)
+    pcf_method_ids: list[PCFMethodID] | None = None
+    bom_revision: int | None = None
+
+
+@router.post("/run", response_model=ResultSetSchema | list[ResultSetSchema])
+def run_pcf(
+    request: PCFRunRequest,
+    pcf_service: PCFService = Depends(get_pcf_service),
+    mapping_service: MappingService = Depends(get_mapping_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> ResultSetSchema | list[ResultSetSchema]:
+    """Run the PCF for one method, or for every method in ``pcf_method_ids`` (one result set each) from one LCI pass."""
+
+    if request.pcf_method_id and request.pcf_method_ids:
+        raise HTTPException(status_code=400, detail="Give either pcf_method_id or pcf_method_ids, not both")
+    if request.pcf_method_ids is not None and not request.pcf_method_ids:
+        raise HTTPException(status_code=400, detail="pcf_method_ids must not be empty")
+    product, bom = _get_product_and_bom(product_repository, request.product_id, request.bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, request.scenario_id)
+    method_ids = list(dict.fromkeys(request.pcf_method_ids or [request.pcf_method_id or scenario.pcf_method_id]))
+    method_profiles = [scenario_service.get_method_profile(method_id) for method_id in method_ids]
 
     try:
-        lci_model, decisions = _mapping_service.build_lci_model(product, bom, scenario)
+        lci_model, decisions = mapping_service.build_lci_model(product, bom, scenario)
+        if len(method_profiles) == 1:
+            # Re-runs after a mapping override only recompute the overridden items.
+            result_sets = [
+                pcf_service.run_incremental(
+                    product=product, bom=bom, scenario=scenario, method_profile=method_profiles[0], lci_model=lci_model
+                )
+            ]
+        else:
+            result_sets = pcf_service.run_methods(
+                product=product, bom=bom, scenario=scenario, method_profiles=method_profiles, lci_model=lci_model
+            )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    result_set = _pcf_service.run(
-        product=product, bom=bom, scenario=scenario, method_profile=method_profile, lci_model=lci_model
+    mapping_log = [_decision_to_payload(decision) for decision in decisions]
+    for result_set in result_sets:
+        result_set.provenance["mapping_log"] = mapping_log
+    schemas = [ResultSetSchema(**result_set.__dict__) for result_set in result_sets]
+    return schemas if request.pcf_method_ids else schemas[0]
+
+
+@router.post("/uncertainty", response_model=PCFUncertaintySchema)
+def pcf_uncertainty(
+    request: PCFUncertaintyRequest,
+    pcf_service: PCFService = Depends(get_pcf_service),
+    mapping_service: MappingService = Depends(get_mapping_service),
+    product_repository: ProductRepository = Depends(get_product_repository),
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> PCFUncertaintySchema:
+    """Monte Carlo PCF percentiles in total, per stage and per item from pedigree/DQR data quality scores."""
+
+    product, bom = _get_product_and_bom(product_repository, request.product_id, request.bom_revision)
+    scenario = _get_scenario_or_404(scenario_service, request.scenario_id)
+    method_profile = scenario_service.get_method_profile(request.pcf_method_id or scenario.pcf_method_id)
+    try:
+        lci_model, _ = mapping_service.build_lci_model(product, bom, scenario)
+        result = pcf_service.uncertainty(
+            method_profile,
+            lci_model,
+            request.samples,
+            seed=request.seed,
+            percentiles=request.percentiles,
+            dataset_pedigree=_pedigree(request.dataset_pedigree),
+            item_pedigree=_pedigree(request.item_pedigree),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return PCFUncertaintySchema(
+        product_id=product.id, scenario_id=scenario.id, pcf_method_id=method_profile.id.value, **asdict(result)
     )
-    result_set.provenance["mapping_log"] = [_decision_to_payload(decision) for decision in decisions]
-
-    return ResultSetSchema(**result_set.__dict__)
 
 
 @router.get("/methods", response_model=MethodProfileListResponse)
-def list_pcf_methods() -> MethodProfileListResponse:
-    methods = [MethodProfileSchema(**method.__dict__) for method in _scenario_service.list_method_profiles()]
+def list_pcf_methods(
+    request: Request,
+    response: Response,
+    scenario_service: ScenarioService = Depends(get_scenario_service),
+) -> MethodProfileListResponse:
+    etag = method_catalog_etag()
+    cached = not_modified(request, etag, STATIC_CACHE_CONTROL)
+    if cached:
+        return cached
+    apply_cache_headers(response, etag, STATIC_CACHE_CONTROL)
+    methods = [MethodProfileSchema(**method.__dict__) for method in scenario_service.list_method_profiles()]
     return MethodProfileListResponse(methods=methods)
 
 
-def _get_scenario_or_404(scenario_id: str):
+def _get_product_and_bom(product_repository: ProductRepository, product_id: str, bom_revision: int | None):
+    loaded = product_repository.get_product_with_bom(product_id)
+    if not loaded:
+        raise HTTPException(status_code=404, detail="Product not found")
+    product, bom = loaded
+    if bom_revision is not None and bom_revision != product.bom_revision:
+        bom = product_repository.get_bom_at_revision(product_id, bom_revision)
+        if bom is None:
+            raise HTTPException(status_code=404, detail="BOM revision not found")
+        product = replace(product, bom_revision=bom_revision)
+    if not bom:
+        raise HTTPException(status_code=404, detail="BOM not uploaded for product")
+    try:
+        return product, propagate_quantities(bom)
+    except BOMStructureError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _pedigree(scores: dict[str, PedigreeSchema]) -> dict[str, PedigreeScores]:
+    return {
+        key: PedigreeScores.from_mapping(entry.model_dump(exclude={"scale"}), scale=entry.scale)
+        for key, entry in scores.items()
+    }
+
+
+def _get_scenario_or_404(scenario_service: ScenarioService, scenario_id: str):
     try:
-        return _scenario_service.get_scenario(scenario_id)
+        return scenario_service.get_scenario(scenario_id)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
@@ -0,0 +1,80 @@
+"""Portfolio batch run endpoints."""
+from __future__ import annotations
+
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..schemas.portfolio_schema import (
+    PortfolioProgressSchema,
+    PortfolioResultSchema,
+    PortfolioResultsResponse,
+    PortfolioRunRequest,
+)
+from ..services.portfolio_runner import PortfolioJobs, PortfolioSelection
+from ..services.result_repository import ResultRepository
+from .dependencies import get_portfolio_jobs, get_result_repository
+
+router = APIRouter(prefix="/portfolio", tags=["portfolio"])
+
+
+@router.post("/runs", response_model=PortfolioProgressSchema, status_code=202)
+def start_portfolio_run(
+    request: PortfolioRunRequest, jobs: PortfolioJobs = Depends(get_portfolio_jobs)
+) -> PortfolioProgressSchema:
+    """Start a background PCF/PCI run over the selected products × scenarios."""
+
+    try:
+        selection = PortfolioSelection(
+            product_ids=tuple(request.product_ids) if request.product_ids is not None else None,
+            product_id_prefix=request.product_id_prefix,
+            scenario_ids=tuple(request.scenario_ids) if request.scenario_ids is not None else None,
+            pcf_method_id=request.pcf_method_id.value if request.pcf_method_id else None,
+            include_pcf=request.include_pcf,
+            include_pci=request.include_pci,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    progress = jobs.start(selection, workers=request.workers)
+    return PortfolioProgressSchema(**progress.report())
+
+
+@router.get("/runs/{job_id}", response_model=PortfolioProgressSchema)
+def get_portfolio_run(job_id: str, jobs: PortfolioJobs = Depends(get_portfolio_jobs)) -> PortfolioProgressSchema:
+    progress = jobs.get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Portfolio run not found")
+    return PortfolioProgressSchema(**progress.report())
+
+
+@router.get("/runs/{job_id}/results", response_model=PortfolioResultsResponse)
+def list_portfolio_results(
+    job_id: str,
+    limit: int = Query(default=100, ge=1, le=10_000),
+    offset: int = Query(default=0, ge=0),
+    details: bool = False,
+    repository: ResultRepository = Depends(get_result_repository),
+) -> PortfolioResultsResponse:
+    """Stored results of a run, including runs from before a restart."""
+
+    rows = repository.list_for_job(job_id, limit=limit, offset=offset, include_payload=details)
+    return PortfolioResultsResponse(
+        job_id=job_id,
+        total=repository.count_for_job(job_id),
+        results=[
+            PortfolioResultSchema(
+                id=row.id,
+                product_id=row.product_id,
+                scenario_id=row.scenario_id,
+                method_profile_id=row.method_profile_id,
+                bom_revision=row.bom_revision,
+                pcf_total_kg_co2e=row.pcf_total_kg_co2e,
+                pci_product=row.pci_product,
+                lfi_product=row.lfi_product,
+                error=row.error,
+                stale=row.stale,
+                details=json.loads(row.payload) if details and row.payload else None,
+            )
+            for row in rows
+        ],
+    )
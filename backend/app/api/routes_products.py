@@ -3,32 +3,55 @@ from __future__ import annotations
 
 from dataclasses import asdict
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from ..models.product import Product
 from ..schemas.product_schema import ProductCreate, ProductResponse
 from ..services.product_repository import ProductRepository
+from .dependencies import get_product_repository
+from .http_cache import apply_cache_headers, etag_for_revisions, make_etag, not_modified
 
 router = APIRouter(prefix="/products", tags=["products"])
-_repository = ProductRepository()
 
 
 @router.get("", response_model=list[ProductResponse])
-def list_products() -> list[ProductResponse]:
-    products = _repository.list_products()
+def list_products(
+    request: Request, response: Response, repository: ProductRepository = Depends(get_product_repository)
+) -> list[ProductResponse]:
+    etag = etag_for_revisions("products", repository.list_product_revisions())
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    products = repository.list_products()
+    apply_cache_headers(response, etag)
     return [ProductResponse(**asdict(product)) for product in products]
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: str) -> ProductResponse:
-    product = _repository.get_product(product_id)
+def get_product(
+    product_id: str,
+    request: Request,
+    response: Response,
+    repository: ProductRepository = Depends(get_product_repository),
+) -> ProductResponse:
+    revisions = repository.get_revisions(product_id)
+    if revisions is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    etag = make_etag("product", product_id, revisions[0], revisions[1])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    product = repository.get_product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    apply_cache_headers(response, etag)
     return ProductResponse(**asdict(product))
 
 
 @router.post("", response_model=ProductResponse)
-def create_product(payload: ProductCreate) -> ProductResponse:
+def create_product(
+    payload: ProductCreate, repository: ProductRepository = Depends(get_product_repository)
+) -> ProductResponse:
     product = Product(
         id=payload.id,
         name=payload.name,
@@ -38,7 +61,7 @@ def create_product(payload: ProductCreate) -> ProductResponse:
         use_profile=payload.use_profile,
     )
     try:
-        stored = _repository.create_product(product)
+        stored = repository.create_product(product)
     except ValueError as exc:  # duplicate id
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     return ProductResponse(**asdict(stored))
@@ -1,21 +1,42 @@
 """Scenario + method profile routes."""
 from __future__ import annotations
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request, Response
 
 from ..schemas.method_profile_schema import MethodProfileSchema
 from ..schemas.scenario_schema import ScenarioSchema
 from ..services.scenario_service import ScenarioService
+from .dependencies import get_scenario_service
+from .http_cache import (
+    STATIC_CACHE_CONTROL,
+    apply_cache_headers,
+    etag_for_revisions,
+    method_catalog_etag,
+    not_modified,
+)
 
 router = APIRouter(prefix="/scenarios", tags=["scenarios"])
-_service = ScenarioService()
 
 
 @router.get("", response_model=list[ScenarioSchema])
-def list_scenarios() -> list[ScenarioSchema]:
-    return [ScenarioSchema(**scenario.__dict__) for scenario in _service.list_scenarios()]
+def list_scenarios(
+    request: Request, response: Response, service: ScenarioService = Depends(get_scenario_service)
+) -> list[ScenarioSchema]:
+    etag = etag_for_revisions("scenarios", service.list_scenario_revisions())
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    apply_cache_headers(response, etag)
+    return [ScenarioSchema(**scenario.__dict__) for scenario in service.list_scenarios()]
 
 
 @router.get("/methods", response_model=list[MethodProfileSchema])
-def list_method_profiles() -> list[MethodProfileSchema]:
-    return [MethodProfileSchema(**profile.__dict__) for profile in _service.list_method_profiles()]
+def list_method_profiles(
+    request: Request, response: Response, service: ScenarioService = Depends(get_scenario_service)
+) -> list[MethodProfileSchema]:
+    etag = method_catalog_etag()
+    cached = not_modified(request, etag, STATIC_CACHE_CONTROL)
+    if cached:
+        return cached
+    apply_cache_headers(response, etag, STATIC_CACHE_CONTROL)
+    return [MethodProfileSchema(**profile.__dict__) for profile in service.list_method_profiles()]
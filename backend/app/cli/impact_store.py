@@ -0,0 +1,51 @@
+"""Build the memory-mapped impact store from an LCI database.
+
+Example::
+
+    python -m backend.app.cli.impact_store --output data/impacts.bin
+    IMPACT_STORE_PATH=data/impacts.bin uvicorn backend.app.main:app
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from ..core.config import get_settings
+from ..engines.impact_store import FORMAT_VERSION, build_impact_store, open_impact_store
+from ..engines.pcf_engine_matrix import load_lci_database
+from ..models.method_profile import PCFMethodID
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", help="LCI database JSON (default: LCI_DATABASE_PATH or the bundled seed)")
+    parser.add_argument("--output", required=True, help="Impact store file to write (replaced atomically)")
+    parser.add_argument(
+        "--method",
+        dest="method_ids",
+        action="append",
+        choices=[method_id.value for method_id in PCFMethodID],
+        help="PCF method to store (repeatable; default every method the database can characterize)",
+    )
+    args = parser.parse_args(argv)
+
+    database = load_lci_database(args.database or get_settings().lci_database_path or None)
+    try:
+        methods = build_impact_store(database, args.output, args.method_ids)
+    except ValueError as exc:
+        parser.error(str(exc))
+    store = open_impact_store(args.output)
+    summary = {
+        "path": store.path,
+        "format_version": FORMAT_VERSION,
+        "database": {"name": store.database_name, "version": store.database_version},
+        "datasets": len(store),
+        "methods": [method_id.value for method_id in methods],
+    }
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Run PCF/PCI for a portfolio of products × scenarios and report throughput.
+
+Example::
+
+    python -m backend.app.cli.portfolio --product-prefix chair- --scenario default --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+
+from ..api.dependencies import get_portfolio_runner, initialize_database, shutdown
+from ..core.logging import configure_logging
+from ..services.portfolio_runner import PortfolioProgress, PortfolioSelection, new_job_id
+
+
+def _format_progress(report: dict) -> str:
+    eta = report["eta_seconds"]
+    return (
+        f"[{report['job_id'][:8]}] {report['completed_units']}/{report['total_units']} units"
+        f" ({report['failed_units']} failed), {report['units_per_second']:.1f} units/s"
+        + (f", ETA {eta:.0f}s" if eta is not None else "")
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--product", dest="product_ids", action="append", help="Product id (repeatable)")
+    parser.add_argument("--product-prefix", help="Select products whose id starts with this prefix")
+    parser.add_argument("--scenario", dest="scenario_ids", action="append", help="Scenario id (repeatable; default all)")
+    parser.add_argument("--pcf-method", dest="pcf_method_id", help="Override each scenario's PCF method")
+    parser.add_argument("--no-pcf", dest="include_pcf", action="store_false")
+    parser.add_argument("--no-pci", dest="include_pci", action="store_false")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: PORTFOLIO_WORKERS or CPU count)")
+    parser.add_argument("--progress-interval", type=float, default=2.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    try:
+        selection = PortfolioSelection(
+            product_ids=tuple(args.product_ids) if args.product_ids else None,
+            product_id_prefix=args.product_prefix,
+            scenario_ids=tuple(args.scenario_ids) if args.scenario_ids else None,
+            pcf_method_id=args.pcf_method_id,
+            include_pcf=args.include_pcf,
+            include_pci=args.include_pci,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    configure_logging()
+    initialize_database()
+    runner = get_portfolio_runner(args.workers)
+    progress = PortfolioProgress(job_id=new_job_id(), workers=runner.workers)
+    thread = threading.Thread(target=runner.run, args=(selection, progress), name="portfolio-cli")
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(args.progress_interval)
+            print(_format_progress(progress.report()), file=sys.stderr)
+    finally:
+        shutdown()
+
+    report = progress.report()
+    print(json.dumps(report, default=str, indent=2))
+    return 0 if report["status"] == "completed" and not report["failed_units"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
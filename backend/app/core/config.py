@@ -16,8 +16,34 @@ class Settings(BaseModel):
     api_port: int = 8000
     log_level: str = "INFO"
     database_url: str = "sqlite:///./procafocia.db"
+    startup_warmup: bool = False
     mapping_min_similarity_for_candidate: float = 0.6
     mapping_min_similarity_for_auto_accept: float = 0.85
+    bom_checkpoint_interval: int = 10
+    mapping_decision_durability: str = "sync"
+    mapping_decision_queue_size: int = 10000
+    mapping_decision_batch_size: int = 500
+    mapping_decision_flush_interval_ms: int = 50
+    pci_sweep_max_points: int = 1_000_000
+    pci_sweep_chunk_elements: int = 250_000
+    pci_incremental_cache_entries: int = 256
+    pci_aggregate_lines: bool = False
+    bom_rollup_memo_entries: int = 4096
+    pci_monte_carlo_max_samples: int = 10_000_000
+    pci_monte_carlo_chunk_elements: int = 250_000
+    pci_monte_carlo_workers: int = 1
+    pci_monte_carlo_histogram_bins: int = 2_000
+    portfolio_workers: int = 0
+    portfolio_chunk_units: int = 200
+    portfolio_product_batch: int = 500
+    lci_database_path: str = ""
+    impact_store_path: str = ""
+    pcf_incremental_cache_entries: int = 256
+    pcf_monte_carlo_max_samples: int = 100_000
+    pcf_monte_carlo_max_values: int = 20_000_000
+    pcf_monte_carlo_chunk_elements: int = 250_000
+    pcf_monte_carlo_workers: int = 1
+    dependency_recompute: bool = False
     soda4lca_base_url: str = ""
     soda4lca_username: str | None = None
     soda4lca_password: str | None = None
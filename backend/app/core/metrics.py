@@ -0,0 +1,62 @@
+"""In-process metrics registry with a Prometheus-style text exporter."""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class _Metric:
+    name: str
+    kind: str
+    description: str
+    value: float = 0.0
+
+
+@dataclass
+class MetricsRegistry:
+    """Holds counters and gauges for the running process.
+
+    Metrics are intentionally simple (no labels, no histograms) so they can be
+    exported without extra dependencies via ``/metrics``.
+    """
+
+    _metrics: dict[str, _Metric] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _get(self, name: str, kind: str, description: str) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics.setdefault(name, _Metric(name=name, kind=kind, description=description))
+        return metric
+
+    def inc(self, name: str, amount: float = 1.0, description: str = "") -> None:
+        with self._lock:
+            self._get(name, "counter", description).value += amount
+
+    def set_gauge(self, name: str, value: float, description: str = "") -> None:
+        with self._lock:
+            self._get(name, "gauge", description).value = value
+
+    def value(self, name: str) -> float:
+        metric = self._metrics.get(name)
+        return metric.value if metric else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {name: metric.value for name, metric in sorted(self._metrics.items())}
+
+    def render_text(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+
+        lines: list[str] = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                if metric.description:
+                    lines.append(f"# HELP {name} {metric.description}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                lines.append(f"{name} {metric.value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
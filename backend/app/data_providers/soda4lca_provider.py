@@ -34,7 +34,19 @@ class Soda4LCAProvider:
         self.username = username or configured_user
         self.password = password or configured_password
         self.token = token or configured_token
-        self._client = client or httpx.Client(timeout=30)
+        self._client = client
+
+    @property
+    def client(self) -> httpx.Client:
+        """HTTP client, created on first request rather than at construction."""
+
+        if self._client is None:
+            self._client = httpx.Client(timeout=30)
+        return self._client
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
 
     # -- LCIProvider implementation --------------------------------------------------
     def find_candidates(self, item) -> list[LCIProcessCandidate]:  # pragma: no cover - placeholder
@@ -79,7 +91,7 @@ class Soda4LCAProvider:
         request_headers = headers
         if self.token and not auth:
             request_headers = {**headers, "Authorization": f"Bearer {self.token}"}
-        response = self._client.get(url, auth=auth, headers=request_headers)
+        response = self.client.get(url, auth=auth, headers=request_headers)
         response.raise_for_status()
         return response.text
 
@@ -1,19 +1,43 @@
 """Database base definitions and session management."""
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from ..core.config import get_settings
 
-settings = get_settings()
-connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
-engine = create_engine(settings.database_url, echo=False, future=True, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
 
+@lru_cache
+def get_engine() -> Engine:
+    """Create the SQLAlchemy engine on first use."""
+
+    settings = get_settings()
+    is_sqlite = settings.database_url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    engine = create_engine(settings.database_url, echo=False, future=True, connect_args=connect_args)
+    if is_sqlite and ":memory:" not in settings.database_url:
+        # WAL lets request snapshots (see ``unit_of_work``) coexist with concurrent writers.
+        event.listen(engine, "connect", _enable_wal)
+    return engine
+
+
+def _enable_wal(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+@lru_cache
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(bind=get_engine(), autoflush=False, autocommit=False, future=True)
+
+
 def get_session():
     """Return a new SQLAlchemy session."""
 
-    return SessionLocal()
+    return get_sessionmaker()()
@@ -1,95 +1,220 @@
 """Database initialization helpers."""
 from __future__ import annotations
 
+import hashlib
 import json
+import threading
 from pathlib import Path
+from typing import Callable
 
 from sqlalchemy import select
 
 from ..data.default_scenarios import default_scenarios
-from .base import Base, engine, get_session
-from .models import MappingRuleModel, ScenarioModel
+from .base import Base, get_engine
+from .models import MappingRuleModel, ScenarioModel, SeedMetadataModel, utcnow
 
 
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+SEED_BATCH_SIZE = 500
+_SEED_LOCK = threading.Lock()
 
 
-def init_db() -> None:
-    """Create tables and seed canonical data if needed."""
+def init_db() -> list[str]:
+    """Create tables and seed canonical data if needed; returns the seed sources that were applied.
 
-    Base.metadata.create_all(bind=engine)
+    Callers holding caches derived from seeded tables invalidate them for the returned sources.
+    """
+
+    Base.metadata.create_all(bind=get_engine())
     ensure_schema_upgrades()
-    seed_mapping_rules()
-    seed_scenarios()
+    applied = []
+    if seed_mapping_rules():
+        applied.append("mapping_rules")
+    if seed_scenarios():
+        applied.append("scenarios")
+    return applied
+
+
+def seed_mapping_rules() -> bool:
+    """Upsert mapping rules from the seed file; returns ``True`` when data was applied.
 
+    Rules are only maintained through the seed file, so seeded columns follow it.
+    """
 
-def seed_mapping_rules() -> None:
     rules_path = DATA_DIR / "mapping_rules_seed.json"
     if not rules_path.exists():
-        return
-    payload = json.loads(rules_path.read_text())
-    with get_session() as session:
-        for entry in payload:
-            stmt = select(MappingRuleModel).where(
-                (MappingRuleModel.rule_code == entry["rule_code"])
-                & (MappingRuleModel.dataset_id == entry["dataset_id"])
-                & (MappingRuleModel.material_code == entry.get("material_code"))
-                & (MappingRuleModel.material_family == entry.get("material_family"))
-            )
-            exists = session.scalars(stmt).first()
-            if exists:
-                continue
-            rule = MappingRuleModel(
-                name=entry["name"],
-                rule_code=entry["rule_code"],
-                priority=entry.get("priority", 0),
-                material_code=entry.get("material_code"),
-                material_family=entry.get("material_family"),
-                classification_unspsc_prefix=entry.get("classification_unspsc_prefix"),
-                supplier_id=entry.get("supplier_id"),
-                dataset_id=entry["dataset_id"],
-                provider=entry["provider"],
-                description=entry.get("description"),
-            )
-            session.add(rule)
-        session.commit()
+        return False
+    raw = rules_path.read_bytes()
+
+    def rows() -> list[dict]:
+        now = utcnow()
+        return [
+            {
+                "name": entry["name"],
+                "rule_code": entry["rule_code"],
+                "priority": entry.get("priority", 0),
+                "material_code": entry.get("material_code"),
+                "material_family": entry.get("material_family"),
+                "classification_unspsc_prefix": entry.get("classification_unspsc_prefix"),
+                "supplier_id": entry.get("supplier_id"),
+                "dataset_id": entry["dataset_id"],
+                "provider": entry["provider"],
+                "description": entry.get("description"),
+                "seed_key": rule_seed_key(
+                    entry["rule_code"], entry["dataset_id"], entry.get("material_code"), entry.get("material_family")
+                ),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for entry in json.loads(raw)
+        ]
+
+    return _apply_seed("mapping_rules", _checksum(raw), MappingRuleModel, rows, ["seed_key"], ["created_at"])
+
 
+def seed_scenarios() -> bool:
+    """Insert missing default scenarios; returns ``True`` when the seed was applied.
+
+    Scenarios are edited through ``save_scenario``, so rows that already exist are
+    left as they are even when the seed changes.
+    """
 
-def seed_scenarios() -> None:
     payload = default_scenarios()
-    with get_session() as session:
-        for entry in payload:
-            existing = session.get(ScenarioModel, entry["id"])
-            if existing:
-                continue
-            scenario = ScenarioModel(
-                id=entry["id"],
-                name=entry["name"],
-                goal_scope=entry["goal_scope"],
-                system_boundary=entry["system_boundary"],
-                geography=entry["geography"],
-                method_profile_id=entry["method_profile_id"],
-                energy_mix_profile=entry["energy_mix_profile"],
-                end_of_life_model=entry["end_of_life_model"],
-                collection_fraction_for_reuse=entry.get("collection_fraction_for_reuse", 0.0),
-                collection_fraction_for_recycling=entry.get("collection_fraction_for_recycling", 0.0),
-                utility_factor=entry.get("utility_factor"),
-                design_lifetime_functional_units=entry.get("design_lifetime_functional_units"),
-                actual_used_functional_units=entry.get("actual_used_functional_units"),
-                material_parameters=json.dumps(entry.get("material_parameters", {})),
-            )
-            session.add(scenario)
-        session.commit()
+
+    def rows() -> list[dict]:
+        now = utcnow()
+        return [
+            {
+                "id": entry["id"],
+                "name": entry["name"],
+                "goal_scope": entry["goal_scope"],
+                "system_boundary": entry["system_boundary"],
+                "geography": entry["geography"],
+                "method_profile_id": entry["method_profile_id"],
+                "pcf_method_id": entry.get("pcf_method_id", "PACT_V3"),
+                "energy_mix_profile": entry["energy_mix_profile"],
+                "end_of_life_model": entry["end_of_life_model"],
+                "collection_fraction_for_reuse": entry.get("collection_fraction_for_reuse", 0.0),
+                "collection_fraction_for_recycling": entry.get("collection_fraction_for_recycling", 0.0),
+                "utility_factor": entry.get("utility_factor"),
+                "design_lifetime_functional_units": entry.get("design_lifetime_functional_units"),
+                "actual_used_functional_units": entry.get("actual_used_functional_units"),
+                "material_parameters": json.dumps(entry.get("material_parameters", {})),
+                "revision": 1,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for entry in payload
+        ]
+
+    checksum = _checksum(json.dumps(payload, sort_keys=True).encode("utf-8"))
+    return _apply_seed("scenarios", checksum, ScenarioModel, rows, ["id"], None)
+
+
+def rule_seed_key(rule_code: str, dataset_id: str, material_code: str | None, material_family: str | None) -> str:
+    """Natural key used to upsert seeded mapping rules."""
+
+    return "|".join([rule_code, dataset_id, material_code or "", material_family or ""])
+
+
+def _checksum(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _apply_seed(
+    source: str,
+    checksum: str,
+    model,
+    rows: Callable[[], list[dict]],
+    conflict_columns: list[str],
+    preserve_columns: list[str] | None,
+) -> bool:
+    """Apply a seed source once per checksum.
+
+    The common path is a single primary-key lookup on ``seed_metadata``. When the
+    checksum differs, the rows are bulk upserted inside an exclusive transaction and
+    the checksum is re-checked under that lock so concurrent workers seed only once.
+    ``preserve_columns=None`` only inserts missing rows and leaves existing ones alone.
+    """
+
+    with _SEED_LOCK:
+        with get_engine().connect() as conn:
+            if _stored_checksum(conn, source) == checksum:
+                return False
+        with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            _begin_exclusive(conn)
+            try:
+                if _stored_checksum(conn, source) == checksum:
+                    conn.exec_driver_sql("ROLLBACK")
+                    return False
+                _bulk_upsert(conn, model, rows(), conflict_columns, preserve_columns)
+                _bulk_upsert(
+                    conn,
+                    SeedMetadataModel,
+                    [{"source": source, "checksum": checksum, "applied_at": utcnow()}],
+                    ["source"],
+                    [],
+                )
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+    return True
+
+
+def _stored_checksum(conn, source: str) -> str | None:
+    return conn.execute(select(SeedMetadataModel.checksum).where(SeedMetadataModel.source == source)).scalar()
+
+
+def _begin_exclusive(conn) -> None:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        # Takes the database write lock up front; other workers wait (busy timeout).
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif dialect == "postgresql":
+        conn.exec_driver_sql("BEGIN")
+        conn.exec_driver_sql("SELECT pg_advisory_xact_lock(hashtext('procafocia_seed'))")
+    else:
+        conn.exec_driver_sql("BEGIN")
+
+
+def _bulk_upsert(
+    conn,
+    model,
+    rows: list[dict],
+    conflict_columns: list[str],
+    preserve_columns: list[str] | None,
+) -> None:
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    table = model.__table__
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        stmt = dialect_insert(table).values(rows[start : start + SEED_BATCH_SIZE])
+        if preserve_columns is None:
+            conn.execute(stmt.on_conflict_do_nothing(index_elements=conflict_columns))
+            continue
+        update_columns = {
+            name: stmt.excluded[name]
+            for name in rows[0]
+            if name not in conflict_columns and name not in preserve_columns
+        }
+        conn.execute(stmt.on_conflict_do_update(index_elements=conflict_columns, set_=update_columns))
 
 
 def ensure_schema_upgrades() -> None:
     """Apply lightweight schema tweaks for SQLite deployments."""
 
-    with engine.connect() as conn:
+    with get_engine().connect() as conn:
         # Scenario table adjustments
         scenario_cols = {row["name"] for row in conn.exec_driver_sql("PRAGMA table_info(scenarios)").mappings()}
         if "pcf_method_id" not in scenario_cols:
             conn.exec_driver_sql("ALTER TABLE scenarios ADD COLUMN pcf_method_id TEXT DEFAULT 'PACT_V3'")
+        if "revision" not in scenario_cols:
+            conn.exec_driver_sql("ALTER TABLE scenarios ADD COLUMN revision INTEGER NOT NULL DEFAULT 1")
 
         # Product table adjustments
         product_cols = {row["name"] for row in conn.exec_driver_sql("PRAGMA table_info(products)").mappings()}
@@ -97,3 +222,36 @@ def ensure_schema_upgrades() -> None:
             conn.exec_driver_sql("ALTER TABLE products ADD COLUMN lifetime_years FLOAT")
         if "use_profile" not in product_cols:
             conn.exec_driver_sql("ALTER TABLE products ADD COLUMN use_profile TEXT")
+        if "revision" not in product_cols:
+            conn.exec_driver_sql("ALTER TABLE products ADD COLUMN revision INTEGER NOT NULL DEFAULT 1")
+        if "bom_revision" not in product_cols:
+            conn.exec_driver_sql("ALTER TABLE products ADD COLUMN bom_revision INTEGER NOT NULL DEFAULT 0")
+
+        # Mapping rule adjustments
+        rule_cols = {row["name"] for row in conn.exec_driver_sql("PRAGMA table_info(mapping_rules)").mappings()}
+        if "seed_key" not in rule_cols:
+            conn.exec_driver_sql("ALTER TABLE mapping_rules ADD COLUMN seed_key TEXT")
+            conn.exec_driver_sql(
+                "UPDATE mapping_rules SET seed_key = rule_code || '|' || dataset_id || '|' || "
+                "COALESCE(material_code, '') || '|' || COALESCE(material_family, '')"
+            )
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_mapping_rules_seed_key ON mapping_rules (seed_key)"
+        )
+
+        # Mapping decision adjustments
+        decision_cols = {row["name"] for row in conn.exec_driver_sql("PRAGMA table_info(mapping_decisions)").mappings()}
+        if "bom_revision" not in decision_cols:
+            conn.exec_driver_sql("ALTER TABLE mapping_decisions ADD COLUMN bom_revision INTEGER")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_mapping_decisions_product_created ON mapping_decisions (product_id, created_at)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_mapping_decisions_item_created ON mapping_decisions (bom_item_id, created_at)"
+        )
+
+        # Result set adjustments
+        result_cols = {row["name"] for row in conn.exec_driver_sql("PRAGMA table_info(result_sets)").mappings()}
+        if "stale" not in result_cols:
+            conn.exec_driver_sql("ALTER TABLE result_sets ADD COLUMN stale BOOLEAN NOT NULL DEFAULT 0")
+        conn.commit()
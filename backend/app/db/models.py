@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -21,6 +21,8 @@ class ProductModel(Base):
     functional_unit: Mapped[str] = mapped_column(String, nullable=False)
     lifetime_years: Mapped[float | None] = mapped_column(Float, nullable=True)
     use_profile: Mapped[str | None] = mapped_column(String, nullable=True)
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    bom_revision: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
@@ -55,6 +57,22 @@ class BOMItemModel(Base):
     product: Mapped[ProductModel] = relationship(ProductModel, back_populates="bom_items")
 
 
+class BOMRevisionModel(Base):
+    __tablename__ = "bom_revisions"
+    __table_args__ = (UniqueConstraint("product_id", "revision", name="uq_bom_revisions_product_revision"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    product_id: Mapped[str] = mapped_column(String, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    revision: Mapped[int] = mapped_column(Integer, nullable=False)
+    is_checkpoint: Mapped[bool] = mapped_column(Boolean, default=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    item_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    added_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    removed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
 class ScenarioModel(Base):
     __tablename__ = "scenarios"
 
@@ -73,12 +91,14 @@ class ScenarioModel(Base):
     design_lifetime_functional_units: Mapped[float | None] = mapped_column(Float, nullable=True)
     actual_used_functional_units: Mapped[float | None] = mapped_column(Float, nullable=True)
     material_parameters: Mapped[str | None] = mapped_column(Text, nullable=True)
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
 
 class MappingRuleModel(Base):
     __tablename__ = "mapping_rules"
+    __table_args__ = (Index("ix_mapping_rules_seed_key", "seed_key", unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -91,17 +111,31 @@ class MappingRuleModel(Base):
     dataset_id: Mapped[str] = mapped_column(String, nullable=False)
     provider: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    seed_key: Mapped[str | None] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
 
+class SeedMetadataModel(Base):
+    __tablename__ = "seed_metadata"
+
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    checksum: Mapped[str] = mapped_column(String, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
 class MappingDecisionModel(Base):
     __tablename__ = "mapping_decisions"
+    __table_args__ = (
+        Index("ix_mapping_decisions_product_created", "product_id", "created_at"),
+        Index("ix_mapping_decisions_item_created", "bom_item_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     product_id: Mapped[str] = mapped_column(String, nullable=False)
     bom_item_id: Mapped[str] = mapped_column(String, nullable=False)
     scenario_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    bom_revision: Mapped[int | None] = mapped_column(Integer, nullable=True)
     selected_dataset_id: Mapped[str | None] = mapped_column(String, nullable=True)
     selected_provider: Mapped[str | None] = mapped_column(String, nullable=True)
     confidence_score: Mapped[float | None] = mapped_column(Float, nullable=True)
@@ -113,3 +147,43 @@ class MappingDecisionModel(Base):
     is_override: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+
+class ResultSetModel(Base):
+    __tablename__ = "result_sets"
+    __table_args__ = (Index("ix_result_sets_product_scenario", "product_id", "scenario_id"),)
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    job_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    product_id: Mapped[str] = mapped_column(String, nullable=False)
+    scenario_id: Mapped[str] = mapped_column(String, nullable=False)
+    method_profile_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    bom_revision: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    pcf_total_kg_co2e: Mapped[float | None] = mapped_column(Float, nullable=True)
+    pci_product: Mapped[float | None] = mapped_column(Float, nullable=True)
+    lfi_product: Mapped[float | None] = mapped_column(Float, nullable=True)
+    payload: Mapped[str | None] = mapped_column(Text, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    stale: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
+class DependencyEdgeModel(Base):
+    """Reverse-index row: ``subject_id`` of ``product_id`` depends on ``key`` of ``kind``.
+
+    Subjects are BOM item ids for ``dataset`` and ``rule`` edges and result set ids
+    for ``scenario`` edges; each subject depends on one key per kind.
+    """
+
+    __tablename__ = "dependency_edges"
+    __table_args__ = (
+        UniqueConstraint("kind", "product_id", "subject_id", name="uq_dependency_edges_subject"),
+        Index("ix_dependency_edges_kind_key", "kind", "key"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    key: Mapped[str] = mapped_column(String, nullable=False)
+    product_id: Mapped[str] = mapped_column(String, nullable=False)
+    subject_id: Mapped[str] = mapped_column(String, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
@@ -0,0 +1,114 @@
+"""Request-scoped unit of work sharing one session across repositories."""
+from __future__ import annotations
+
+from contextlib import nullcontext
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+
+from .base import get_engine, get_sessionmaker
+
+# ``session.info`` keys: whether the open SQLite transaction has only read so far,
+# and whether the next one should start as a write transaction.
+_READ_ONLY = "uow_read_only"
+_WRITE_PENDING = "uow_write_pending"
+
+
+def _begin_snapshot(session: Session, transaction: SessionTransaction, connection: Connection) -> None:
+    """Start each transaction so that all of its reads see one snapshot."""
+
+    if connection.dialect.name == "sqlite":
+        # pysqlite only emits BEGIN before DML, so plain SELECTs would each see the
+        # latest commit; an explicit deferred BEGIN pins the snapshot at the first read.
+        if not connection.connection.dbapi_connection.in_transaction:
+            write = session.info.pop(_WRITE_PENDING, False)
+            connection.exec_driver_sql("BEGIN IMMEDIATE" if write else "BEGIN")
+            session.info[_READ_ONLY] = not write
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+
+def _begin_write(session: Session) -> None:
+    """Turn a read-only SQLite snapshot into a write transaction before the first write.
+
+    A deferred transaction whose snapshot predates another connection's commit can
+    never take the write lock (``SQLITE_BUSY_SNAPSHOT``), so the snapshot is ended
+    and writes run under ``BEGIN IMMEDIATE``, which waits for the lock instead.
+    """
+
+    read_only = session.info.get(_READ_ONLY)
+    if read_only is None:
+        session.info[_WRITE_PENDING] = True
+    elif read_only:
+        connection = session.connection()
+        connection.exec_driver_sql("COMMIT")
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        session.info[_READ_ONLY] = False
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    _begin_write(session)
+
+
+def _before_execute(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        _begin_write(state.session)
+
+
+def _end_transaction(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_READ_ONLY, None)
+        session.info.pop(_WRITE_PENDING, None)
+
+
+class UnitOfWork:
+    """Owns one session and one connection checkout for the lifetime of a request.
+
+    Repositories receive :meth:`session_factory` in place of ``get_session``; it hands
+    out the shared session without closing it, so every repository call in the request
+    runs on the same connection and, with ``snapshot`` enabled, the same read
+    snapshot. The session is bound to a connection held until :meth:`close`, so
+    repository commits do not return it to the pool; the statement after a commit
+    starts a new snapshot. On SQLite the first write of a transaction ends its read
+    snapshot and takes the write lock, so read-then-write requests do not fail when
+    another connection committed in between.
+    """
+
+    def __init__(self, engine_factory: Callable[[], Engine] = get_engine, snapshot: bool = True):
+        self._engine_factory = engine_factory
+        self._snapshot = snapshot
+        self._connection: Connection | None = None
+        self._session: Session | None = None
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._connection = self._engine_factory().connect()
+            self._session = get_sessionmaker()(bind=self._connection)
+            if self._snapshot:
+                event.listen(self._session, "after_begin", _begin_snapshot)
+                event.listen(self._session, "before_flush", _before_flush)
+                event.listen(self._session, "do_orm_execute", _before_execute)
+                event.listen(self._session, "after_transaction_end", _end_transaction)
+        return self._session
+
+    def session_factory(self) -> nullcontext:
+        return nullcontext(self.session)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and self._session is not None:
+            self._session.rollback()
+        self.close()
@@ -6,11 +6,13 @@ from typing import Protocol
 from ..models.bom import BOMItem
 from ..models.pci import PCIResult
 from ..models.product import Product
-from ..models.scenario import Scenario
+from ..models.scenario import CompiledScenario, Scenario
 
 
 class CircularityEngine(Protocol):
     """Defines the interface for circularity (PCI) engines."""
 
-    def calculate_pci(self, product: Product, bom: list[BOMItem], scenario: Scenario) -> PCIResult:
+    def calculate_pci(
+        self, product: Product, bom: list[BOMItem], scenario: Scenario | CompiledScenario
+    ) -> PCIResult:
         raise NotImplementedError
@@ -7,7 +7,7 @@ from typing import Dict, List
 from ..models.bom import BOMItem
 from ..models.pci import PCIMaterialFlows, PCIMaterialInputs, PCIResult
 from ..models.product import Product
-from ..models.scenario import Scenario
+from ..models.scenario import CompiledScenario, Scenario, compile_scenario
 from .circularity_engine_base import CircularityEngine
 
 EPS = 1e-9
@@ -17,41 +17,39 @@ def _clamp(value: float, lower: float = 0.0, upper: float = 1.0) -> float:
     return max(lower, min(upper, value))
 
 
+def product_indicators(
+    aggregated: Dict[str, float], total_mass: float, weighted_pci: float, utility_factor: float
+) -> tuple[float, float]:
+    """Product ``(lfi, pci)`` from summed line flows (keys as in ``calculate_pci``)."""
+
+    lfi_denom = max(aggregated["V_linear"] + aggregated["W_linear"], EPS)
+    lfi_product = (aggregated["V"] + aggregated["W"] + abs(aggregated["R_net"]) + abs(aggregated["C_net"])) / lfi_denom
+    pci_product = 0.0
+    if total_mass > 0:
+        # Align aggregated PCI with per-material weighting to avoid rounding discrepancies
+        pci_product = min(1.0, max(0.0, weighted_pci / total_mass))
+    return lfi_product, pci_product
+
+
 class Bracquene2020CircularityEngine(CircularityEngine):
     """Implements the PCI and LFI formulation from Bracquené et al. (2020)."""
 
-    def calculate_pci(self, product: Product, bom: list[BOMItem], scenario: Scenario) -> PCIResult:
-        utility_factor = scenario.compute_utility_factor()
+    def calculate_pci(self, product: Product, bom: list[BOMItem], scenario: Scenario | CompiledScenario) -> PCIResult:
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        utility_factor = compiled.utility_factor
         per_material: List[PCIMaterialFlows] = []
         total_mass = 0.0
         aggregated = {"V": 0.0, "W": 0.0, "R_net": 0.0, "C_net": 0.0, "V_linear": 0.0, "W_linear": 0.0}
         weighted_pci = 0.0
 
         for item in bom:
-            mass = (item.mass_kg or 0) * (item.quantity or 0)
-            if mass <= 0:
+            inputs = self._material_inputs(item, compiled)
+            if inputs is None:
                 continue
-            params = self._resolve_material_parameters(item, scenario)
-            if not params:
-                raise ValueError(f"Missing material parameters for {item.material_code or item.material_family}")
-            inputs = PCIMaterialInputs(
-                material_key=item.material_code or item.material_family or item.id,
-                mass=mass,
-                reused_share=_clamp(item.reused_share or 0.0),
-                recycled_content_share=_clamp(item.recycled_content_share or 0.0),
-                efficiency_feedstock_production=_clamp(params.efficiency_feedstock_production),
-                efficiency_component_production=_clamp(params.efficiency_component_production),
-                recovered_fraction_feedstock_losses=_clamp(params.recovered_fraction_feedstock_losses),
-                recovered_fraction_component_losses=_clamp(params.recovered_fraction_component_losses),
-                efficiency_material_separation_eol=_clamp(params.efficiency_material_separation_eol),
-                efficiency_recycled_feedstock_production=_clamp(params.efficiency_recycled_feedstock_production),
-                collection_fraction_for_reuse=_clamp(scenario.collection_fraction_for_reuse),
-                collection_fraction_for_recycling=_clamp(scenario.collection_fraction_for_recycling),
-            )
             flows = self._compute_material_flows(inputs, utility_factor)
             per_material.append(flows)
-            total_mass += mass
-            weighted_pci += flows.PCI_material * mass
+            total_mass += inputs.mass
+            weighted_pci += flows.PCI_material * inputs.mass
             aggregated["V"] += flows.V
             aggregated["W"] += flows.W_total
             aggregated["R_net"] += flows.R_net
@@ -59,17 +57,7 @@ class Bracquene2020CircularityEngine(CircularityEngine):
             aggregated["V_linear"] += flows.V_linear
             aggregated["W_linear"] += flows.W_linear
 
-        lfi_denom = max(aggregated["V_linear"] + aggregated["W_linear"], EPS)
-        lfi_product = (aggregated["V"] + aggregated["W"] + abs(aggregated["R_net"]) + abs(aggregated["C_net"])) / lfi_denom
-        pci_product = 0.0
-        if total_mass > 0:
-            pci_product = max(0.0, 1.0 - (lfi_product / max(utility_factor, EPS)))
-            pci_product = min(1.0, pci_product)
-
-        if total_mass > 0 and per_material:
-            pci_mass_weighted = weighted_pci / total_mass
-            # Align aggregated PCI with per-material weighting to avoid rounding discrepancies
-            pci_product = min(1.0, max(0.0, pci_mass_weighted))
+        lfi_product, pci_product = product_indicators(aggregated, total_mass, weighted_pci, utility_factor)
 
         notes = [
             "PCI derived from Bracquené et al. (2020) mass flow equations",
@@ -86,15 +74,33 @@ class Bracquene2020CircularityEngine(CircularityEngine):
         )
 
     # --- helpers ---
-    def _resolve_material_parameters(self, item: BOMItem, scenario: Scenario):
-        key_candidates = [item.material_code, item.material_family]
-        for key in key_candidates:
-            if key and key in scenario.material_parameters:
-                return scenario.material_parameters[key]
-        if scenario.material_parameters:
-            default_key = next(iter(scenario.material_parameters))
-            return scenario.material_parameters[default_key]
-        return None
+    def _material_inputs(self, item: BOMItem, compiled: CompiledScenario) -> PCIMaterialInputs | None:
+        """Engine inputs for one BOM line, or ``None`` for lines without positive mass."""
+
+        mass = (item.mass_kg or 0) * (item.quantity or 0)
+        if mass <= 0:
+            return None
+        params = self._resolve_material_parameters(item, compiled)
+        if not params:
+            raise ValueError(f"Missing material parameters for {item.material_code or item.material_family}")
+        # Parameters and collection fractions are already clamped by compile_scenario.
+        return PCIMaterialInputs(
+            material_key=item.material_code or item.material_family or item.id,
+            mass=mass,
+            reused_share=_clamp(item.reused_share or 0.0),
+            recycled_content_share=_clamp(item.recycled_content_share or 0.0),
+            efficiency_feedstock_production=params.efficiency_feedstock_production,
+            efficiency_component_production=params.efficiency_component_production,
+            recovered_fraction_feedstock_losses=params.recovered_fraction_feedstock_losses,
+            recovered_fraction_component_losses=params.recovered_fraction_component_losses,
+            efficiency_material_separation_eol=params.efficiency_material_separation_eol,
+            efficiency_recycled_feedstock_production=params.efficiency_recycled_feedstock_production,
+            collection_fraction_for_reuse=compiled.collection_fraction_for_reuse,
+            collection_fraction_for_recycling=compiled.collection_fraction_for_recycling,
+        )
+
+    def _resolve_material_parameters(self, item: BOMItem, scenario: CompiledScenario):
+        return scenario.resolve(item.material_code, item.material_family)
 
     def _compute_material_flows(self, inputs: PCIMaterialInputs, utility_factor: float) -> PCIMaterialFlows:
         actual = self._flow_terms(inputs)
@@ -0,0 +1,111 @@
+"""Closed-form derivatives of the Bracquené et al. (2020) PCI.
+
+Every flow term of ``flow_terms_arrays`` is linear in the line mass and piecewise
+polynomial in the parameters (and in ``1/E_cp``, ``1/E_fp``), so ∂PCI/∂parameter
+has a closed form. With ``n = m(1 − Fu)``, ``k = 1/(E_cp·E_fp)``,
+``P = k − 1/E_cp`` and ``Q = 1/E_cp − 1``, the LFI numerator and denominator of a
+line are
+
+    N = n·[k(1 − Fr + s_R·Fr) + P(1 − C_fp − s_R·C_fp) + Q(1 − C_cp − s_R·C_cp)]
+        + m·[max(1 − C_u − C_r, 0) + C_r(1 − E_ms·E_rfp(1 + s_R))] + s_C·m(Fu − C_u)
+    D = m·[k + P(1 − C_fp) + Q(1 − C_cp) + 1]
+
+where ``s_R`` and ``s_C`` are the signs of ``R_net`` and ``C_net``. Derivatives are
+taken at the (already clamped) inputs, so at the edge of a parameter's range they
+are one-sided, and they are zero wherever a clip on PCI_material or the product
+PCI is active. One call costs about one PCI evaluation.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .circularity_engine_pci_bracquene2020 import EPS
+from .circularity_engine_pci_vectorized import MATERIAL_PARAMETER_FIELDS, PCIArrays, pci_indicators
+
+
+@dataclass
+class PCIGradient:
+    """∂PCI_product with respect to scenario parameters and to each line's inputs.
+
+    ``line`` maps each name in ``LINE_PARAMETERS`` to an array with the derivative
+    for every BOM line's own value of that parameter.
+    """
+
+    pci_product: float
+    scenario: dict[str, float]
+    line: dict[str, np.ndarray]
+
+
+def pci_gradient(arrays: PCIArrays) -> PCIGradient:
+    """Analytic gradient of the product PCI for one packed BOM."""
+
+    m = arrays.mass
+    Fu, Fr = arrays.reused_share, arrays.recycled_content_share
+    E_fp, E_cp, C_fp, C_cp, E_ms, E_rfp = (arrays.parameters[:, column] for column in range(len(MATERIAL_PARAMETER_FIELDS)))
+    E_fp, E_cp = np.maximum(E_fp, EPS), np.maximum(E_cp, EPS)
+    C_u, C_r, u = arrays.collection_fraction_for_reuse, arrays.collection_fraction_for_recycling, arrays.utility_factor
+
+    actual = arrays.flow_terms()
+    linear = arrays.flow_terms(linear=True)
+    indicators = pci_indicators(actual, linear, m, u)
+    pci_product = float(indicators["pci_product"])
+
+    s_R = np.sign(actual["R_net"])
+    s_C = np.sign(actual["C_net"])
+    n = m * (1.0 - Fu)
+    k = 1.0 / (E_cp * E_fp)
+    P = k - 1.0 / E_cp
+    Q = 1.0 / E_cp - 1.0
+    a_k = 1.0 - Fr + s_R * Fr
+    a_P = 1.0 - C_fp - s_R * C_fp
+    a_Q = 1.0 - C_cp - s_R * C_cp
+    A = k * a_k + P * a_P + Q * a_Q
+    undiverted = 1.0 if 1.0 - C_u - C_r > 0 else 0.0
+    dk_dE_cp, dk_dE_fp = -k / E_cp, -k / E_fp
+    dP_dE_cp = dk_dE_cp + 1.0 / E_cp**2
+    dQ_dE_cp = -1.0 / E_cp**2
+
+    dN = {
+        "reused_share": -m * A + s_C * m,
+        "recycled_content_share": n * k * (s_R - 1.0),
+        "efficiency_feedstock_production": n * (a_k + a_P) * dk_dE_fp,
+        "efficiency_component_production": n * (a_k * dk_dE_cp + a_P * dP_dE_cp + a_Q * dQ_dE_cp),
+        "recovered_fraction_feedstock_losses": -n * P * (1.0 + s_R),
+        "recovered_fraction_component_losses": -n * Q * (1.0 + s_R),
+        "efficiency_material_separation_eol": -m * C_r * E_rfp * (1.0 + s_R),
+        "efficiency_recycled_feedstock_production": -m * C_r * E_ms * (1.0 + s_R),
+        "collection_fraction_for_reuse": -m * (undiverted + s_C),
+        "collection_fraction_for_recycling": m * (1.0 - undiverted - E_ms * E_rfp * (1.0 + s_R)),
+    }
+    dD = {
+        "efficiency_feedstock_production": m * (2.0 - C_fp) * dk_dE_fp,
+        "efficiency_component_production": m * (dk_dE_cp + (1.0 - C_fp) * dP_dE_cp + (1.0 - C_cp) * dQ_dE_cp),
+        "recovered_fraction_feedstock_losses": -m * P,
+        "recovered_fraction_component_losses": -m * Q,
+    }
+
+    D = np.maximum(linear["V"] + linear["W_total"], EPS)
+    lfi = indicators["lfi"]
+    u_eff = max(u, EPS)
+    raw_pci = 1.0 - lfi / u_eff
+    # PCI_material = clip(1 - lfi/u); the clip flattens it outside (0, 1).
+    active = (raw_pci > 0.0) & (raw_pci < 1.0)
+    total_mass = float(indicators["mass_total"])
+    weighted = float(m @ indicators["pci_material"]) / total_mass if total_mass > 0 else 0.0
+    product_active = total_mass > 0 and 0.0 < weighted < 1.0
+    # d PCI_product / d PCI_material of each line.
+    weight = np.where(active, m / total_mass, 0.0) if product_active else np.zeros_like(m)
+
+    def dpci_material(name: str) -> np.ndarray:
+        dlfi = (dN[name] - lfi * dD.get(name, 0.0)) / D
+        return -dlfi / u_eff
+
+    line = {name: weight * dpci_material(name) for name in ("reused_share", "recycled_content_share", *MATERIAL_PARAMETER_FIELDS)}
+    scenario = {
+        name: float(np.sum(weight * dpci_material(name)))
+        for name in ("collection_fraction_for_reuse", "collection_fraction_for_recycling")
+    }
+    scenario["utility_factor"] = float(np.sum(weight * lfi / u_eff**2)) if u > EPS else 0.0
+    return PCIGradient(pci_product=pci_product, scenario=scenario, line=line)
@@ -0,0 +1,461 @@
+"""NumPy-vectorized variant of the Bracquené et al. (2020) PCI engine."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from operator import attrgetter
+
+import numpy as np
+
+from ..models.bom import BOMItem
+from ..models.pci import MaterialCircularityParameters, PCIMaterialFlowColumns, PCIResult
+from ..models.product import Product
+from ..models.scenario import CompiledScenario, Scenario, compile_scenario
+from .circularity_engine_pci_bracquene2020 import EPS, Bracquene2020CircularityEngine
+
+MATERIAL_PARAMETER_FIELDS = (
+    "efficiency_feedstock_production",
+    "efficiency_component_production",
+    "recovered_fraction_feedstock_losses",
+    "recovered_fraction_component_losses",
+    "efficiency_material_separation_eol",
+    "efficiency_recycled_feedstock_production",
+)
+
+SCENARIO_PARAMETERS = ("collection_fraction_for_reuse", "collection_fraction_for_recycling", "utility_factor")
+LINE_PARAMETERS = ("reused_share", "recycled_content_share", *MATERIAL_PARAMETER_FIELDS)
+
+_GROUP_PROJECTION = np.random.default_rng(0x9C1).uniform(1.0, 2.0, size=3 + len(MATERIAL_PARAMETER_FIELDS))
+
+_ITEM_COLUMNS = attrgetter(
+    "mass_kg", "quantity", "material_code", "material_family", "reused_share", "recycled_content_share", "id"
+)
+
+
+def flow_terms_arrays(
+    mass,
+    Fu,
+    Fr,
+    E_fp,
+    E_cp,
+    C_fp,
+    C_cp,
+    E_ms,
+    E_rfp,
+    C_u,
+    C_r,
+) -> dict[str, np.ndarray]:
+    """Array form of ``Bracquene2020CircularityEngine._flow_terms``.
+
+    Arguments are scalars or arrays that broadcast against each other; every returned
+    term has the broadcast shape. The operations mirror the scalar implementation step
+    for step so results agree to floating-point rounding.
+    """
+
+    mass = np.maximum(np.asarray(mass, dtype=float), 0.0)
+    Fu = np.clip(Fu, 0.0, 1.0)
+    Fr = np.clip(Fr, 0.0, 1.0)
+    E_cp = np.maximum(np.clip(E_cp, 0.0, 1.0), EPS)
+    E_fp = np.maximum(np.clip(E_fp, 0.0, 1.0), EPS)
+    C_cp = np.clip(C_cp, 0.0, 1.0)
+    C_fp = np.clip(C_fp, 0.0, 1.0)
+    E_ms = np.clip(E_ms, 0.0, 1.0)
+    E_rfp = np.clip(E_rfp, 0.0, 1.0)
+    C_u = np.clip(C_u, 0.0, 1.0)
+    C_r = np.clip(C_r, 0.0, 1.0)
+
+    net_new_mass = mass * np.maximum(1.0 - Fu, 0.0)
+    component_input = np.where(net_new_mass > 0, net_new_mass / E_cp, 0.0)
+    feedstock_input = np.where(component_input > 0, component_input / E_fp, 0.0)
+    R_in = Fr * feedstock_input
+    V = np.maximum(feedstock_input - R_in, 0.0)
+
+    component_waste_total = np.maximum(component_input - net_new_mass, 0.0)
+    feedstock_waste_total = np.maximum(feedstock_input - component_input, 0.0)
+    W_cp = component_waste_total * (1 - C_cp)
+    R_cp = component_waste_total * C_cp
+    W_fp = feedstock_waste_total * (1 - C_fp)
+    R_fp = feedstock_waste_total * C_fp
+
+    W_u = mass * np.maximum(1.0 - C_u - C_r, 0.0)
+    mass_rec = mass * C_r
+    mass_after_sep = mass_rec * E_ms
+    W_ms = mass_rec * (1 - E_ms)
+    mass_after_rfp = mass_after_sep * E_rfp
+    W_rfp = mass_after_sep * (1 - E_rfp)
+    R_EoL = mass_after_rfp
+
+    W_total = W_fp + W_cp + W_u + W_ms + W_rfp
+    R_out = R_fp + R_cp + R_EoL
+    R_net = R_in - R_out
+    C_net = mass * (Fu - C_u)
+
+    shape = np.broadcast_shapes(*(np.shape(a) for a in (mass, Fu, Fr, E_fp, E_cp, C_fp, C_cp, E_ms, E_rfp, C_u, C_r)))
+    terms = {
+        "V": V,
+        "W_fp": W_fp,
+        "W_cp": W_cp,
+        "W_u": W_u,
+        "W_ms": W_ms,
+        "W_rfp": W_rfp,
+        "W_total": W_total,
+        "R_in": R_in,
+        "R_fp": R_fp,
+        "R_cp": R_cp,
+        "R_EoL": R_EoL,
+        "R_out": R_out,
+        "R_net": R_net,
+        "C_net": C_net,
+    }
+    return {name: np.broadcast_to(value, shape) for name, value in terms.items()}
+
+
+def pci_indicators(actual: dict[str, np.ndarray], linear: dict[str, np.ndarray], mass: np.ndarray, utility_factor):
+    """Per-line LFI/PCI and product LFI/PCI, reducing over the last (BOM line) axis.
+
+    ``utility_factor`` is a scalar or an array broadcastable against the flow terms,
+    e.g. shape ``(k, 1)`` for ``k`` grid points.
+    """
+
+    denom = np.maximum(linear["V"] + linear["W_total"], EPS)
+    lfi = (actual["V"] + actual["W_total"] + np.abs(actual["R_net"]) + np.abs(actual["C_net"])) / denom
+    pci_material = np.minimum(1.0, np.maximum(0.0, 1.0 - (lfi / np.maximum(utility_factor, EPS))))
+
+    total_mass = mass.sum()
+    lfi_denom = np.maximum(linear["V"].sum(axis=-1) + linear["W_total"].sum(axis=-1), EPS)
+    lfi_product = (
+        actual["V"].sum(axis=-1)
+        + actual["W_total"].sum(axis=-1)
+        + np.abs(actual["R_net"].sum(axis=-1))
+        + np.abs(actual["C_net"].sum(axis=-1))
+    ) / lfi_denom
+    if total_mass > 0:
+        # Same mass-weighted alignment as the scalar engine.
+        pci_product = np.minimum(1.0, np.maximum(0.0, (pci_material @ mass) / total_mass))
+    else:
+        pci_product = np.zeros_like(lfi_product)
+    return {
+        "lfi": lfi,
+        "pci_material": pci_material,
+        "lfi_product": lfi_product,
+        "pci_product": pci_product,
+        "mass_total": total_mass,
+    }
+
+
+@dataclass
+class PCIArrays:
+    """Column-oriented PCI inputs for the BOM lines with positive mass."""
+
+    material_keys: list[str]
+    item_ids: list[str]
+    mass: np.ndarray
+    reused_share: np.ndarray
+    recycled_content_share: np.ndarray
+    parameters: np.ndarray  # shape (n, 6), columns ordered as ``MATERIAL_PARAMETER_FIELDS``
+    parameter_index: np.ndarray  # row of the resolved parameter set for each line
+    parameter_keys: list[str]  # ``material_key`` of each resolved parameter set
+    collection_fraction_for_reuse: float
+    collection_fraction_for_recycling: float
+    utility_factor: float
+
+    def __len__(self) -> int:
+        return len(self.material_keys)
+
+    def material_mask(self, material_key: str) -> np.ndarray:
+        """Lines whose parameters resolved to the set named ``material_key``."""
+
+        rows = [row for row, key in enumerate(self.parameter_keys) if key == material_key]
+        return np.isin(self.parameter_index, rows)
+
+    def item_mask(self, item_id: str) -> np.ndarray:
+        """The line belonging to BOM item ``item_id``."""
+
+        return np.array([line_id == item_id for line_id in self.item_ids], dtype=bool)
+
+    def aggregate(self) -> "PCIGroups":
+        """Merge lines with the same material key, shares and parameters into one line each.
+
+        Every flow term is linear in mass for fixed inputs, and LFI/PCI per line do
+        not depend on mass at all, so evaluating each group once with the summed mass
+        gives the same product indicators as evaluating every line.
+        """
+
+        codes: dict[str, int] = {}
+        key_codes = np.fromiter((codes.setdefault(key, len(codes)) for key in self.material_keys), dtype=float, count=len(self))
+        inputs = np.column_stack((key_codes, self.reused_share, self.recycled_content_share, self.parameters))
+        # A fixed random projection turns each input row into one float, which sorts
+        # far faster than rows; a collision would merge different rows, so check and
+        # fall back to the exact row-wise unique if that ever happens.
+        _, first, inverse = np.unique(inputs @ _GROUP_PROJECTION[: inputs.shape[1]], return_index=True, return_inverse=True)
+        if not np.array_equal(inputs[first][inverse], inputs):
+            _, first, inverse = np.unique(inputs, axis=0, return_index=True, return_inverse=True)
+        rows = inputs[first]
+        key_names = np.array(list(codes), dtype=object)
+        inverse = inverse.reshape(-1)
+        grouped = PCIArrays(
+            material_keys=key_names[rows[:, 0].astype(np.intp)].tolist(),
+            item_ids=[self.item_ids[line] for line in first],
+            mass=np.bincount(inverse, weights=self.mass, minlength=len(rows)),
+            reused_share=rows[:, 1].copy(),
+            recycled_content_share=rows[:, 2].copy(),
+            parameters=rows[:, 3:].copy(),
+            parameter_index=self.parameter_index[first],
+            parameter_keys=self.parameter_keys,
+            collection_fraction_for_reuse=self.collection_fraction_for_reuse,
+            collection_fraction_for_recycling=self.collection_fraction_for_recycling,
+            utility_factor=self.utility_factor,
+        )
+        return PCIGroups(arrays=grouped, lines=self, inverse=inverse)
+
+    def flow_terms(self, linear: bool = False) -> dict[str, np.ndarray]:
+        """Flow terms for the actual design, or for the linear reference when ``linear``."""
+
+        E_fp, E_cp, C_fp, C_cp, E_ms, E_rfp = self.parameters.T
+        zero = 0.0
+        return flow_terms_arrays(
+            self.mass,
+            zero if linear else self.reused_share,
+            zero if linear else self.recycled_content_share,
+            E_fp,
+            E_cp,
+            C_fp,
+            C_cp,
+            E_ms,
+            E_rfp,
+            zero if linear else self.collection_fraction_for_reuse,
+            zero if linear else self.collection_fraction_for_recycling,
+        )
+
+
+@dataclass
+class PCIGroups:
+    """BOM lines grouped by identical PCI inputs; ``arrays`` has one line per group carrying the group mass."""
+
+    arrays: PCIArrays
+    lines: PCIArrays
+    inverse: np.ndarray  # group of each original line
+
+    def __len__(self) -> int:
+        return len(self.arrays)
+
+    def expand_terms(self, terms: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """Per-group flow terms split back onto the original lines in proportion to mass."""
+
+        share = self.lines.mass / self.arrays.mass[self.inverse]
+        return {name: value[self.inverse] * share for name, value in terms.items()}
+
+
+class PCIBatch:
+    """Evaluates ``size`` variants of one packed BOM in a single broadcast computation.
+
+    Every input starts at the packed value; :meth:`set` replaces a parameter with one
+    value per variant, either for all lines or only for the lines selected by
+    ``mask``. Scenario-level parameters become ``(size, 1)`` columns and line-level
+    parameters ``(size, n)`` matrices, so memory grows with ``size × n``.
+    """
+
+    def __init__(self, arrays: PCIArrays, size: int):
+        self.arrays = arrays
+        self.size = size
+        self.values: dict[str, object] = {
+            "reused_share": arrays.reused_share,
+            "recycled_content_share": arrays.recycled_content_share,
+            "collection_fraction_for_reuse": arrays.collection_fraction_for_reuse,
+            "collection_fraction_for_recycling": arrays.collection_fraction_for_recycling,
+            "utility_factor": arrays.utility_factor,
+        }
+        for column, name in enumerate(MATERIAL_PARAMETER_FIELDS):
+            self.values[name] = arrays.parameters[:, column]
+
+    def set(self, parameter: str, values, mask: np.ndarray | None = None) -> None:
+        """Set ``parameter`` to one value per variant, or for line parameters to a ``(size, n)`` matrix."""
+
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 2 and parameter in LINE_PARAMETERS:
+            self.values[parameter] = values if mask is None else np.where(mask, values, self.values[parameter])
+            return
+        column = values.reshape(self.size, 1)
+        if parameter in SCENARIO_PARAMETERS:
+            if mask is not None:
+                raise ValueError(f"'{parameter}' is a scenario-level parameter and cannot be masked")
+            self.values[parameter] = column
+        elif parameter not in LINE_PARAMETERS:
+            raise ValueError(f"Unknown PCI parameter '{parameter}'")
+        elif mask is None:
+            self.values[parameter] = np.broadcast_to(column, (self.size, len(self.arrays)))
+        else:
+            self.values[parameter] = np.where(mask, column, self.values[parameter])
+
+    def evaluate(self) -> dict[str, np.ndarray]:
+        """:func:`pci_indicators` with product-level results shaped ``(size,)``."""
+
+        values, mass = self.values, self.arrays.mass
+        material = [values[name] for name in MATERIAL_PARAMETER_FIELDS]
+        actual = flow_terms_arrays(
+            mass,
+            values["reused_share"],
+            values["recycled_content_share"],
+            *material,
+            values["collection_fraction_for_reuse"],
+            values["collection_fraction_for_recycling"],
+        )
+        linear = flow_terms_arrays(mass, 0.0, 0.0, *material, 0.0, 0.0)
+        indicators = pci_indicators(actual, linear, mass, values["utility_factor"])
+        indicators["pci_material"] = np.broadcast_to(indicators["pci_material"], (self.size, len(self.arrays)))
+        indicators["pci_product"] = np.broadcast_to(indicators["pci_product"], (self.size,))
+        indicators["lfi_product"] = np.broadcast_to(indicators["lfi_product"], (self.size,))
+        return indicators
+
+
+def pack_bom(bom: list[BOMItem], scenario: CompiledScenario) -> PCIArrays:
+    """Extract masses, shares and resolved material parameters into arrays.
+
+    Lines without positive mass are dropped, matching the scalar engine. Parameter
+    resolution is memoized per ``(material_code, material_family)`` pair.
+    """
+
+    keys: list[str] = []
+    item_ids: list[str] = []
+    masses: list[float] = []
+    reused: list[float] = []
+    recycled: list[float] = []
+    rows: list[int] = []
+    resolved: dict[tuple[str | None, str | None], int] = {}
+    parameter_rows: list[tuple[float, ...]] = []
+    parameter_keys: list[str] = []
+
+    for mass_kg, quantity, code, family, reused_share, recycled_share, item_id in map(_ITEM_COLUMNS, bom):
+        mass = (mass_kg or 0) * (quantity or 0)
+        if mass <= 0:
+            continue
+        row = resolved.get((code, family))
+        if row is None:
+            params = scenario.resolve(code, family)
+            if not params:
+                raise ValueError(f"Missing material parameters for {code or family}")
+            row = resolved[(code, family)] = len(parameter_rows)
+            parameter_rows.append(_parameter_row(params))
+            parameter_keys.append(params.material_key)
+        keys.append(code or family or item_id)
+        item_ids.append(item_id)
+        masses.append(mass)
+        reused.append(reused_share or 0.0)
+        recycled.append(recycled_share or 0.0)
+        rows.append(row)
+
+    table = np.array(parameter_rows, dtype=float).reshape(-1, len(MATERIAL_PARAMETER_FIELDS))
+    index = np.array(rows, dtype=np.intp)
+    return PCIArrays(
+        material_keys=keys,
+        item_ids=item_ids,
+        mass=np.array(masses, dtype=float),
+        reused_share=np.clip(np.array(reused, dtype=float), 0.0, 1.0),
+        recycled_content_share=np.clip(np.array(recycled, dtype=float), 0.0, 1.0),
+        parameters=table[index],
+        parameter_index=index,
+        parameter_keys=parameter_keys,
+        collection_fraction_for_reuse=scenario.collection_fraction_for_reuse,
+        collection_fraction_for_recycling=scenario.collection_fraction_for_recycling,
+        utility_factor=scenario.utility_factor,
+    )
+
+
+def _parameter_row(params: MaterialCircularityParameters) -> tuple[float, ...]:
+    return tuple(getattr(params, name) for name in MATERIAL_PARAMETER_FIELDS)
+
+
+class VectorizedBracquene2020CircularityEngine(Bracquene2020CircularityEngine):
+    """Evaluates the Bracquené 2020 flow equations for the whole BOM with NumPy.
+
+    Produces the same :class:`PCIResult` as the scalar engine (to floating-point
+    rounding of the reductions) but computes the actual and linear flow terms for
+    all lines as array expressions. Per-line flows come back as a
+    :class:`PCIMaterialFlowColumns` over the computed arrays, so a line's
+    :class:`PCIMaterialFlows` is only built when it is read; batch callers that only
+    need the product indicators can still pass ``include_material_flows=False``.
+
+    With ``aggregate=True`` lines sharing material key, shares and parameters are
+    evaluated once per group (see :meth:`PCIArrays.aggregate`), so the flow
+    computation scales with the number of distinct inputs rather than BOM length.
+    Material flows are then split back onto the BOM lines, or reported once per
+    group with ``expand_items=False``.
+    """
+
+    def __init__(self, include_material_flows: bool = True, aggregate: bool = False, expand_items: bool = True) -> None:
+        self.include_material_flows = include_material_flows
+        self.aggregate = aggregate
+        self.expand_items = expand_items
+
+    def calculate_pci(self, product: Product, bom: list[BOMItem], scenario: Scenario | CompiledScenario) -> PCIResult:
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        return self.calculate_pci_arrays(pack_bom(bom, compiled))
+
+    def calculate_pci_arrays(self, arrays: PCIArrays) -> PCIResult:
+        utility_factor = arrays.utility_factor
+        groups = arrays.aggregate() if self.aggregate and len(arrays) else None
+        evaluated = groups.arrays if groups is not None else arrays
+        actual = evaluated.flow_terms()
+        linear = evaluated.flow_terms(linear=True)
+        indicators = pci_indicators(actual, linear, evaluated.mass, utility_factor)
+        lfi, pci_material = indicators["lfi"], indicators["pci_material"]
+        total_mass = float(indicators["mass_total"])
+        lfi_product = float(indicators["lfi_product"])
+        pci_product = float(indicators["pci_product"])
+        if self.include_material_flows and groups is not None and self.expand_items:
+            actual, linear = groups.expand_terms(actual), groups.expand_terms(linear)
+            lfi, pci_material = lfi[groups.inverse], pci_material[groups.inverse]
+            evaluated = arrays
+
+        return PCIResult(
+            pci_product=pci_product,
+            utility_factor=utility_factor,
+            lfi_product=lfi_product,
+            mass_total=total_mass,
+            per_material_flows=(
+                self._material_flows(evaluated, actual, linear, lfi, pci_material) if self.include_material_flows else []
+            ),
+            notes=[
+                "PCI derived from Bracquené et al. (2020) mass flow equations",
+                "Utility factor defaults to 1 if not provided",
+            ],
+        )
+
+    def _material_flows(
+        self,
+        arrays: PCIArrays,
+        actual: dict[str, np.ndarray],
+        linear: dict[str, np.ndarray],
+        lfi: np.ndarray,
+        pci_material: np.ndarray,
+    ) -> PCIMaterialFlowColumns:
+        return PCIMaterialFlowColumns(
+            {
+                "material_key": arrays.material_keys,
+                "mass": arrays.mass,
+                "reused_share": arrays.reused_share,
+                "recycled_content_share": arrays.recycled_content_share,
+                **{name: actual[name] for name in _FLOW_COLUMNS},
+                "V_linear": linear["V"],
+                "W_linear": linear["W_total"],
+                "LFI_material": lfi,
+                "PCI_material": pci_material,
+            }
+        )
+
+
+_FLOW_COLUMNS = (
+    "V",
+    "W_fp",
+    "W_cp",
+    "W_u",
+    "W_ms",
+    "W_rfp",
+    "W_total",
+    "R_in",
+    "R_fp",
+    "R_cp",
+    "R_EoL",
+    "R_out",
+    "R_net",
+    "C_net",
+)
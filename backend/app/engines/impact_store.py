@@ -0,0 +1,312 @@
+"""Memory-mapped store of precomputed per-dataset unit impacts.
+
+The footprint of one reference unit of every dataset (the adjoint ``λ`` of
+:mod:`.pcf_engine_matrix`) only changes when the LCI database does, so it can be
+computed once and written to a binary file that every worker maps read-only:
+the page cache holds one copy shared by all uvicorn and portfolio processes,
+and opening the file parses nothing but a small JSON header.
+
+Layout (little-endian, sections 8-byte aligned, offsets relative to the file start)::
+
+    header    magic, format version, row/method/slot counts, section offsets
+    metadata  JSON: database name/version, method ids (column order), unit names
+    slots     open-addressing table: uint64 key hash and int64 row (-1 = empty)
+    keys      uint64 offsets (rows + 1) into UTF-8 dataset-id bytes
+    units     uint32 index into the metadata unit names, one per row
+    impacts   float64 (methods × rows), one contiguous column per PCFMethodID
+
+Dataset ids are found by linear probing from ``hash & (slots - 1)``; the table is
+kept at most half full, so a lookup touches one or two slots.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+
+from ..models.bom import BOMItem
+from ..models.method_profile import PCF_METHOD_PROFILES, MethodProfile, PCFMethodID
+from ..models.product import Product
+from ..models.scenario import Scenario
+from .pcf_contributions import DEFAULT_TOP_CONTRIBUTIONS, analyse_contributions, result_from_analysis
+from .pcf_engine_base import LCIEntry, LCIModel, PCFEngine, PCFResult
+from .pcf_engine_matrix import (
+    DEFAULT_GHG_METHOD,
+    FALLBACK_KG_CO2E_PER_KG,
+    LCIDatabase,
+    MatrixLCAEngine,
+    note_method_boundary,
+    reference_amounts,
+)
+
+MAGIC = b"PCFIMPST"
+FORMAT_VERSION = 1
+# magic, format version, methods, rows, slots, then (offset, length) of metadata and offsets of the other sections.
+_HEADER = struct.Struct("<8sIIQQQQQQQQ")
+_EMPTY = -1
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def build_impact_store(
+    database: LCIDatabase, path: str | Path, method_ids: Iterable[PCFMethodID] | None = None
+) -> list[PCFMethodID]:
+    """Write the unit impacts of ``database`` for ``method_ids`` (default: every method it can characterize).
+
+    The file is written next to ``path`` and renamed over it, so processes that
+    still map the previous store keep reading a consistent copy. Returns the
+    methods stored, in column order.
+    """
+
+    methods: list[PCFMethodID] = []
+    columns: list[np.ndarray] = []
+    for method_id in method_ids or list(PCFMethodID):
+        method_id = PCFMethodID(method_id)
+        method = PCF_METHOD_PROFILES[method_id].ghg_aggregation_method or DEFAULT_GHG_METHOD
+        if method not in database.characterization:
+            if method_ids is not None:
+                raise ValueError(f"LCI database '{database.name}' has no characterization factors for '{method}'")
+            continue
+        methods.append(method_id)
+        columns.append(database.unit_impacts(method))
+
+    rows = len(database)
+    keys = [process_id.encode("utf-8") for process_id in database.process_ids]
+    slots = 8
+    while slots < 2 * rows:
+        slots *= 2
+    slot_hashes = np.zeros(slots, dtype="<u8")
+    slot_rows = np.full(slots, _EMPTY, dtype="<i8")
+    for row, key in enumerate(keys):
+        hashed = _key_hash(key)
+        slot = hashed & (slots - 1)
+        while slot_rows[slot] != _EMPTY:
+            slot = (slot + 1) & (slots - 1)
+        slot_hashes[slot], slot_rows[slot] = hashed, row
+    key_offsets = np.zeros(rows + 1, dtype="<u8")
+    key_offsets[1:] = np.cumsum([len(key) for key in keys])
+    unit_names = sorted(set(database.process_units))
+    unit_codes = np.array([unit_names.index(unit) for unit in database.process_units], dtype="<u4")
+    impacts = np.array(columns, dtype="<f8").reshape(len(methods), rows)
+    metadata = json.dumps(
+        {
+            "database": {"name": database.name, "version": database.version, "fingerprint": database.fingerprint},
+            "methods": [method_id.value for method_id in methods],
+            "units": unit_names,
+            "pedigree": database.pedigree,
+        }
+    ).encode("utf-8")
+
+    sections = [metadata, slot_hashes.tobytes() + slot_rows.tobytes(), key_offsets.tobytes() + b"".join(keys)]
+    sections += [unit_codes.tobytes(), impacts.tobytes()]
+    offsets, position = [], _align(_HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _align(position + len(section))
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(methods), rows, slots, offsets[0], len(metadata), offsets[1], offsets[2], offsets[3], offsets[4]
+    )
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as handle:
+        handle.write(header)
+        for offset, section in zip(offsets, sections):
+            handle.write(b"\0" * (offset - handle.tell()))
+            handle.write(section)
+    os.replace(temporary, path)
+    return methods
+
+
+class ImpactStore:
+    """Read-only view of a file written by :func:`build_impact_store`."""
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        with open(self.path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if len(buffer) < _HEADER.size:
+            raise ValueError(f"{self.path} is not an impact store")
+        magic, version, methods, rows, slots, metadata_at, metadata_length, slots_at, keys_at, units_at, impacts_at = (
+            _HEADER.unpack_from(buffer)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an impact store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has impact store format {version}; expected {FORMAT_VERSION}, rebuild it")
+        metadata = json.loads(bytes(buffer[metadata_at : metadata_at + metadata_length]))
+        self.database_name: str = metadata["database"]["name"]
+        self.database_version: str = metadata["database"]["version"]
+        self.method_ids = [PCFMethodID(value) for value in metadata["methods"]]
+        self._columns = {method_id: column for column, method_id in enumerate(self.method_ids)}
+        self._unit_names: list[str] = metadata["units"]
+        self.pedigree: dict[str, dict[str, int]] = metadata.get("pedigree", {})
+        self._rows, self._mask = rows, slots - 1
+        # memoryview indexing yields plain ints, which keeps the probe loop cheap.
+        self._slot_hashes = buffer[slots_at : slots_at + 8 * slots].cast("Q")
+        self._slot_rows = buffer[slots_at + 8 * slots : slots_at + 16 * slots].cast("q")
+        self._key_offsets = buffer[keys_at : keys_at + 8 * (rows + 1)].cast("Q")
+        self._keys_at = keys_at + 8 * (rows + 1)
+        self._buffer = buffer
+        self._unit_codes = buffer[units_at : units_at + 4 * rows].cast("I")
+        self._impacts = np.frombuffer(self._mmap, dtype="<f8", count=methods * rows, offset=impacts_at).reshape(methods, rows)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __contains__(self, dataset_id: object) -> bool:
+        return isinstance(dataset_id, str) and self.row(dataset_id) >= 0
+
+    def row(self, dataset_id: str) -> int:
+        """Row of ``dataset_id``, or ``-1`` if the store does not contain it."""
+
+        key = dataset_id.encode("utf-8")
+        hashed = _key_hash(key)
+        slot = hashed & self._mask
+        while True:
+            row = self._slot_rows[slot]
+            if row == _EMPTY:
+                return -1
+            if self._slot_hashes[slot] == hashed and self._key(row) == key:
+                return row
+            slot = (slot + 1) & self._mask
+
+    def rows(self, dataset_ids: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.row(dataset_id) for dataset_id in dataset_ids), dtype=np.intp, count=len(dataset_ids))
+
+    def dataset_id(self, row: int) -> str:
+        return self._key(row).decode("utf-8")
+
+    def _key(self, row: int) -> bytes:
+        start, end = self._key_offsets[row], self._key_offsets[row + 1]
+        return bytes(self._buffer[self._keys_at + start : self._keys_at + end])
+
+    def unit(self, row: int) -> str:
+        return self._unit_names[self._unit_codes[row]]
+
+    def impacts(self, method_id: PCFMethodID) -> np.ndarray:
+        """Read-only kg CO2e per reference unit of every row under ``method_id``."""
+
+        column = self._columns.get(PCFMethodID(method_id))
+        if column is None:
+            raise ValueError(f"Impact store {self.path} has no impacts for method '{PCFMethodID(method_id).value}'")
+        return self._impacts[column]
+
+    def close(self) -> None:
+        """Unmap the file; arrays returned by :meth:`impacts` must no longer be used."""
+
+        self._impacts = None
+        for view in (self._slot_hashes, self._slot_rows, self._key_offsets, self._unit_codes, self._buffer):
+            view.release()
+        self._mmap.close()
+
+
+@lru_cache(maxsize=4)
+def _open_store(path: str) -> ImpactStore:
+    return ImpactStore(path)
+
+
+def open_impact_store(path: str | Path) -> ImpactStore:
+    """The store at ``path``, mapped once per process."""
+
+    return _open_store(str(Path(path).resolve()))
+
+
+class StoredImpactPCFEngine(PCFEngine):
+    """Computes PCFs as ``Σ amount × λ[dataset]`` from an :class:`ImpactStore`, without loading the database.
+
+    Results equal those of :class:`.MatrixLCAEngine` on the database the store
+    was built from, except that the elementary-flow inventory is not reported.
+    """
+
+    # Same dataset-id convention as the matrix engine.
+    map_bom_to_lci = MatrixLCAEngine.map_bom_to_lci
+
+    def __init__(
+        self,
+        store: ImpactStore,
+        fallback_factor: float = FALLBACK_KG_CO2E_PER_KG,
+        top_contributions: int = DEFAULT_TOP_CONTRIBUTIONS,
+    ) -> None:
+        self.store = store
+        self.fallback_factor = fallback_factor
+        self.top_contributions = top_contributions
+
+    @property
+    def pedigree(self) -> Mapping[str, Mapping[str, int]]:
+        return self.store.pedigree
+
+    def entry_impacts(self, entries: Sequence[LCIEntry], method_profile: MethodProfile) -> tuple[np.ndarray, np.ndarray]:
+        """kg CO2e of every entry, whatever its stage, and which entries the store contains."""
+
+        unit_impacts = self.store.impacts(method_profile.id)
+        rows = self.store.rows([entry.dataset_id for entry in entries])
+        known = rows >= 0
+        amounts = reference_amounts(entries, rows, self.store.unit)
+        return np.where(known, amounts * unit_impacts[np.where(known, rows, 0)], amounts * self.fallback_factor), known
+
+    def calculate_pcf(
+        self,
+        product: Product,
+        bom_items: list[BOMItem],
+        scenario: Scenario,
+        method_profile: MethodProfile,
+        lci_model: LCIModel | None = None,
+    ) -> PCFResult:
+        return self.calculate_pcf_methods(product, bom_items, scenario, [method_profile], lci_model)[0]
+
+    def calculate_pcf_methods(
+        self,
+        product: Product,
+        bom_items: list[BOMItem],
+        scenario: Scenario,
+        method_profiles: Sequence[MethodProfile],
+        lci_model: LCIModel | None = None,
+    ) -> list[PCFResult]:
+        """One PCF per method profile; dataset lookups and unit conversion are shared."""
+
+        store = self.store
+        lci_model = lci_model or self.map_bom_to_lci(bom_items, scenario)
+        columns = [store.impacts(profile.id) for profile in method_profiles]
+        entries = lci_model.entries
+        rows = store.rows([entry.dataset_id for entry in entries])
+        known = rows >= 0
+        amounts = reference_amounts(entries, rows, store.unit)
+        fallback = amounts * self.fallback_factor
+        unmatched = sorted({entry.dataset_id for entry, matched in zip(entries, known.tolist()) if not matched})
+        matched = len({entry.dataset_id for entry, matched in zip(entries, known.tolist()) if matched})
+        results = []
+        for method_profile, unit_impacts in zip(method_profiles, columns):
+            impacts = np.where(known, amounts * unit_impacts[np.where(known, rows, 0)], fallback)
+            analysis = analyse_contributions(entries, impacts, method_profile.life_cycle_stages_included, self.top_contributions)
+            provenance = {
+                "pcf_method_id": method_profile.id.value,
+                "pcf_method_name": method_profile.name,
+                "system_boundary": method_profile.system_boundary,
+                "ghg_aggregation_method": method_profile.ghg_aggregation_method or DEFAULT_GHG_METHOD,
+                "lci_database": {"name": store.database_name, "version": store.database_version, "processes": len(store)},
+                "impact_store": store.path,
+                "datasets_matched": matched,
+                "notes": "Precomputed unit impacts from the memory-mapped impact store.",
+            }
+            note_method_boundary(provenance, analysis, method_profile)
+            if unmatched:
+                provenance["unmatched_datasets"] = unmatched
+                provenance["fallback_kg_co2e_per_kg"] = self.fallback_factor
+            results.append(result_from_analysis(analysis, provenance))
+        return results
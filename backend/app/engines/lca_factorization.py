@@ -0,0 +1,114 @@
+"""Process-wide cache of sparse LU factorizations of technosphere matrices.
+
+The technosphere matrix of a background database does not change between
+products or scenarios; only the demand vector does. Factorizing it once
+(``A = LU``) turns every later solve into two triangular back-substitutions,
+and the same factors solve the transposed (adjoint) system. Factorizations are
+keyed by database version and a fingerprint of the matrix, and the least recently
+used ones are evicted once ``max_entries`` are held.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..core.metrics import metrics
+
+if TYPE_CHECKING:  # scipy is imported on first use, keeping it out of application startup.
+    from scipy import sparse
+
+# Minimum-degree ordering on A + Aᵀ keeps fill-in low for LCI matrices (hub
+# processes such as electricity and transport are consumed by almost every
+# column); prefer the diagonal (reference output) as pivot unless it is tiny.
+PERMUTATION_SPEC = "MMD_AT_PLUS_A"
+DIAGONAL_PIVOT_THRESHOLD = 0.1
+DEFAULT_CACHE_ENTRIES = 4
+
+
+def matrix_fingerprint(matrix: sparse.spmatrix) -> str:
+    """Content hash of a sparse matrix's structure and values."""
+
+    from scipy import sparse
+
+    matrix = sparse.csc_matrix(matrix)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(matrix.shape, dtype=np.int64).tobytes())
+    for array in (matrix.indptr, matrix.indices, matrix.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+class TechnosphereFactorization:
+    """LU factors of one square technosphere matrix."""
+
+    def __init__(self, matrix: sparse.spmatrix):
+        from scipy import sparse
+        from scipy.sparse.linalg import splu
+
+        started = time.perf_counter()
+        try:
+            self._lu = splu(
+                sparse.csc_matrix(matrix), permc_spec=PERMUTATION_SPEC, diag_pivot_thresh=DIAGONAL_PIVOT_THRESHOLD
+            )
+        except RuntimeError as exc:  # SuperLU reports exact singularity this way.
+            raise ValueError(f"Technosphere matrix cannot be factorized: {exc}") from exc
+        self.size = matrix.shape[0]
+        self.seconds = time.perf_counter() - started
+
+    @property
+    def nnz(self) -> int:
+        return int(self._lu.nnz)
+
+    def solve(self, rhs: np.ndarray, transpose: bool = False) -> np.ndarray:
+        """Solve ``A·x = rhs`` (or ``Aᵀ·x = rhs``) for one vector or a ``(n, k)`` block of right-hand sides."""
+
+        rhs = np.asarray(rhs, dtype=float)
+        return self._lu.solve(np.ascontiguousarray(rhs), trans="T" if transpose else "N")
+
+
+class FactorizationCache:
+    """LRU map from ``(version, fingerprint)`` to :class:`TechnosphereFactorization`.
+
+    Factorizing holds the cache lock, so concurrent requests for the same database
+    wait for one factorization instead of each computing their own.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], TechnosphereFactorization] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, version: str, fingerprint: str, matrix: sparse.spmatrix) -> TechnosphereFactorization:
+        key = (version, fingerprint)
+        with self._lock:
+            factorization = self._entries.get(key)
+            if factorization is not None:
+                self._entries.move_to_end(key)
+                metrics.inc("lca_factorization_cache_hits_total", description="Technosphere factorizations reused")
+                return factorization
+            factorization = TechnosphereFactorization(matrix)
+            metrics.inc("lca_factorizations_total", description="Technosphere matrices factorized")
+            metrics.inc(
+                "lca_factorization_seconds_total",
+                factorization.seconds,
+                description="Time spent factorizing technosphere matrices",
+            )
+            self._entries[key] = factorization
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return factorization
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+factorization_cache = FactorizationCache()
@@ -0,0 +1,115 @@
+"""Contribution analysis of per-entry PCF impacts.
+
+Engines compute one impact per LCI entry (amount × per-dataset unit impact);
+everything reported here is a grouped sum over that vector: one key pass and
+one ``bincount`` per dimension, plus an ``argpartition`` for the top-N ranking.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import compress
+from operator import attrgetter
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from .pcf_engine_base import LCIEntry, PCFResult
+
+DEFAULT_TOP_CONTRIBUTIONS = 10
+# Entries without a stage count as raw materials, as the mapping service assumes.
+DEFAULT_STAGE = "raw_materials"
+
+# Breakdown dimension -> LCIEntry attribute it groups by.
+_DIMENSIONS = {"stage": "life_cycle_stage", "provider": "provider", "dataset": "dataset_id", "item": "bom_item_id"}
+
+
+@dataclass
+class ContributionAnalysis:
+    """Breakdowns of the included impacts per dimension, with the largest contributors of each."""
+
+    total_kg_co2e: float
+    by_stage: dict[str, float] = field(default_factory=dict)
+    by_provider: dict[str, float] = field(default_factory=dict)
+    by_dataset: dict[str, float] = field(default_factory=dict)
+    by_item: dict[str, float] = field(default_factory=dict)
+    excluded_by_stage: dict[str, float] = field(default_factory=dict)
+    top: dict[str, list[dict]] = field(default_factory=dict)
+
+
+def stage_mask(entries: Sequence[LCIEntry], stages_included: Iterable[str] | None) -> np.ndarray:
+    """Entries whose life-cycle stage is inside the method's boundary (all of them if ``stages_included`` is None)."""
+
+    if stages_included is None:
+        return np.ones(len(entries), dtype=bool)
+    stages = set(stages_included)
+    return np.fromiter(((entry.life_cycle_stage or DEFAULT_STAGE) in stages for entry in entries), dtype=bool, count=len(entries))
+
+
+def analyse_contributions(
+    entries: Sequence[LCIEntry],
+    impacts: np.ndarray,
+    stages_included: Iterable[str] | None = None,
+    top: int = DEFAULT_TOP_CONTRIBUTIONS,
+) -> ContributionAnalysis:
+    """Group ``impacts`` (one per entry) by stage, provider, dataset and BOM item.
+
+    Entries outside ``stages_included`` are left out of every breakdown and
+    reported per stage in ``excluded_by_stage``. ``top`` keeps the largest
+    contributors per dimension with their share of the included total.
+    """
+
+    impacts = np.asarray(impacts, dtype=float)
+    included = stage_mask(entries, stages_included)
+    total = float(impacts[included].sum())
+    analysis = ContributionAnalysis(total_kg_co2e=total)
+    for dimension, attribute in _DIMENSIONS.items():
+        keys, sums = _grouped(_keys(entries, attribute), included, impacts)
+        setattr(analysis, f"by_{dimension}", dict(zip(keys, sums.tolist())))
+        analysis.top[dimension] = [
+            {"key": keys[index], "kg_co2e": float(sums[index]), "share": float(sums[index] / total) if total else 0.0}
+            for index in _largest(sums, top).tolist()
+        ]
+    if not included.all():
+        keys, sums = _grouped(_keys(entries, "life_cycle_stage"), ~included, impacts)
+        analysis.excluded_by_stage = dict(zip(keys, sums.tolist()))
+    return analysis
+
+
+def result_from_analysis(analysis: ContributionAnalysis, provenance: dict, total_kg_co2e: float | None = None) -> PCFResult:
+    """A :class:`PCFResult` carrying every breakdown of ``analysis``; the total defaults to the analysed one."""
+
+    return PCFResult(
+        total_kg_co2e=analysis.total_kg_co2e if total_kg_co2e is None else total_kg_co2e,
+        breakdown_by_item=analysis.by_item,
+        breakdown_by_stage=analysis.by_stage,
+        provenance=provenance,
+        breakdown_by_provider=analysis.by_provider,
+        breakdown_by_dataset=analysis.by_dataset,
+        top_contributions=analysis.top,
+    )
+
+
+def _largest(sums: np.ndarray, top: int) -> np.ndarray:
+    """Indices of the ``top`` largest-magnitude sums, largest first; argpartition keeps this O(len) for small ``top``."""
+
+    if top <= 0:
+        return np.zeros(0, dtype=np.intp)
+    magnitude = -np.abs(sums)
+    candidates = np.sort(np.argpartition(magnitude, top - 1)[:top]) if top < len(sums) else np.arange(len(sums))
+    return candidates[np.argsort(magnitude[candidates], kind="stable")]
+
+
+def _keys(entries: Sequence[LCIEntry], attribute: str) -> list[str]:
+    keys = list(map(attrgetter(attribute), entries))
+    if attribute == "life_cycle_stage":
+        keys = [stage or DEFAULT_STAGE for stage in keys]
+    return keys
+
+
+def _grouped(keys: list[str], mask: np.ndarray, values: np.ndarray) -> tuple[list[str], np.ndarray]:
+    """Distinct keys of the masked entries in first-seen order and the sum of their values."""
+
+    selected = list(compress(keys, mask.tolist()))
+    codes = {key: code for code, key in enumerate(dict.fromkeys(selected))}
+    groups = np.fromiter(map(codes.__getitem__, selected), dtype=np.intp, count=len(selected))
+    return list(codes), np.bincount(groups, weights=values[mask], minlength=len(codes))
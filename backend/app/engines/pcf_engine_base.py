@@ -41,6 +41,20 @@ class PCFResult:
     breakdown_by_item: dict[str, float]
     breakdown_by_stage: dict[str, float]
     provenance: dict = field(default_factory=dict)
+    breakdown_by_provider: dict[str, float] = field(default_factory=dict)
+    breakdown_by_dataset: dict[str, float] = field(default_factory=dict)
+    top_contributions: dict[str, list[dict]] = field(default_factory=dict)
+
+
+@dataclass
+class PCFRequest:
+    """Arguments of one :meth:`PCFEngine.calculate_pcf` call, for engines that batch."""
+
+    product: Product
+    bom_items: list[BOMItem]
+    scenario: Scenario
+    method_profile: MethodProfile
+    lci_model: LCIModel | None = None
 
 
 class PCFEngine(Protocol):
@@ -1,10 +1,13 @@
 """Brightway2-based PCF engine stubs."""
 from __future__ import annotations
 
+import numpy as np
+
 from ..models.bom import BOMItem
 from ..models.method_profile import MethodProfile
 from ..models.product import Product
 from ..models.scenario import Scenario
+from .pcf_contributions import analyse_contributions, result_from_analysis
 from .pcf_engine_base import LCIEntry, LCIModel, PCFEngine, PCFResult
 
 
@@ -63,15 +66,8 @@ class BrightwayPCFEngine(PCFEngine):
             lci_model = self.map_bom_to_lci(bom_items, scenario)
         # TODO: Build Brightway demand vector using `lci_model` data.
         # TODO: Execute LCI + LCIA steps with the selected method profile.
-        total = sum(entry.mass_kg * 1.5 for entry in lci_model.entries)  # placeholder factor
-        breakdown_by_item = {}
-        for entry in lci_model.entries:
-            breakdown_by_item[entry.bom_item_id] = breakdown_by_item.get(entry.bom_item_id, 0.0) + entry.mass_kg * 1.5
-        breakdown_by_stage = {
-            "materials": total * 0.6,
-            "manufacturing": total * 0.3,
-            "distribution": total * 0.1,
-        }
+        impacts = np.array([entry.mass_kg * 1.5 for entry in lci_model.entries], dtype=float)  # placeholder factor
+        analysis = analyse_contributions(lci_model.entries, impacts, method_profile.life_cycle_stages_included)
         provenance = {
             "pcf_method_id": method_profile.id.value,
             "pcf_method_name": method_profile.name,
@@ -80,9 +76,4 @@ class BrightwayPCFEngine(PCFEngine):
         }
         if method_profile.system_boundary == "cradle_to_grave":
             provenance["todo"] = "Model use phase and end-of-life flows for cradle-to-grave methods."
-        return PCFResult(
-            total_kg_co2e=total,
-            breakdown_by_item=breakdown_by_item,
-            breakdown_by_stage=breakdown_by_stage,
-            provenance=provenance,
-        )
+        return result_from_analysis(analysis, provenance)
@@ -0,0 +1,545 @@
+"""Matrix-based PCF engine over a local LCI database.
+
+A local stand-in for a Brightway LCA: processes and their exchanges are read from
+a JSON database into a sparse technosphere matrix ``A`` (processes × processes,
+reference outputs on the diagonal, inputs negative) and a biosphere matrix ``B``
+(elementary flows × processes). For a demand vector ``f`` the supply is
+``s = A⁻¹f``, the inventory ``g = B·s`` and the footprint ``c·g`` with ``c`` the
+characterization factors of the method profile's ``ghg_aggregation_method``.
+
+``A`` is factorized once per database version and the factors are kept in the
+process-wide :data:`~.lca_factorization.factorization_cache`, so each further
+solve is a back-substitution; :meth:`MatrixLCAEngine.calculate_pcf_many` solves
+the demand vectors of many products as one block of right-hand sides.
+
+Per-item results use the adjoint: ``λ = A⁻ᵀBᵀc`` is the footprint of one unit of
+every process, so an item contributes ``amount × λ[dataset]``. ``λ`` depends only
+on the database and the method and is computed once per pair.
+
+A database read from a file can be reloaded after its datasets change; the new
+instance starts without unit impacts, and the factorization is reused only if
+the technosphere matrix is unchanged (the cache key includes its fingerprint).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Sequence
+
+import numpy as np
+
+from ..models.bom import BOMItem
+from ..models.method_profile import MethodProfile
+from ..models.product import Product
+from ..models.scenario import Scenario
+from .lca_factorization import TechnosphereFactorization, factorization_cache, matrix_fingerprint
+from .pcf_contributions import (
+    DEFAULT_STAGE,
+    DEFAULT_TOP_CONTRIBUTIONS,
+    ContributionAnalysis,
+    analyse_contributions,
+    result_from_analysis,
+    stage_mask,
+)
+from .pcf_engine_base import LCIEntry, LCIModel, PCFEngine, PCFRequest, PCFResult
+from .units import MASS_UNIT, to_reference_amounts
+
+if TYPE_CHECKING:  # scipy is imported on first use, keeping it out of application startup.
+    from scipy import sparse
+
+SEED_LCI_DATABASE = Path(__file__).resolve().parents[1] / "data" / "lci_seed.json"
+DEFAULT_GHG_METHOD = "IPCC_AR6_GWP100"
+# Datasets missing from the database are costed per kg, like the former placeholder engine.
+FALLBACK_KG_CO2E_PER_KG = 1.5
+
+
+class LCIDatabase:
+    """Sparse technosphere/biosphere matrices and characterization factors of one LCI database."""
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        process_ids: list[str],
+        process_units: list[str],
+        flow_ids: list[str],
+        technosphere: sparse.csc_matrix,
+        biosphere: sparse.csr_matrix,
+        characterization: Mapping[str, np.ndarray],
+        pedigree: Mapping[str, Mapping[str, int]] | None = None,
+    ):
+        self.name = name
+        self.version = version
+        self.process_ids = process_ids
+        self.process_units = process_units
+        self.flow_ids = flow_ids
+        self.index = {process_id: row for row, process_id in enumerate(process_ids)}
+        self.technosphere = technosphere
+        self.biosphere = biosphere
+        self.characterization = dict(characterization)
+        # Process id -> pedigree-matrix scores of its data, where the database provides them.
+        self.pedigree = dict(pedigree or {})
+        self.fingerprint = matrix_fingerprint(technosphere)
+        # The file the database was read from, if any; see :meth:`MatrixLCAEngine.reload`.
+        self.path: Path | None = None
+        self._unit_impacts: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.process_ids)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "LCIDatabase":
+        """Build the matrices from the JSON layout of ``data/lci_seed.json``.
+
+        Each process has a reference ``amount`` (default 1) of its ``unit`` and maps
+        input process ids to amounts (``technosphere``) and flow ids to emitted
+        amounts (``biosphere``), all per reference amount. An optional ``pedigree``
+        holds the data-quality scores of the process.
+        """
+
+        from scipy import sparse
+
+        processes = data.get("processes") or []
+        flow_ids = list(data.get("biosphere") or {})
+        process_ids = [process["id"] for process in processes]
+        index = {process_id: column for column, process_id in enumerate(process_ids)}
+        if len(index) != len(process_ids):
+            raise ValueError("LCI database contains duplicate process ids")
+        flow_index = {flow_id: row for row, flow_id in enumerate(flow_ids)}
+
+        a_rows, a_cols, a_values = [], [], []
+        b_rows, b_cols, b_values = [], [], []
+        for column, process in enumerate(processes):
+            a_rows.append(column)
+            a_cols.append(column)
+            a_values.append(float(process.get("amount", 1.0)))
+            for supplier, amount in (process.get("technosphere") or {}).items():
+                if supplier not in index:
+                    raise ValueError(f"Process '{process['id']}' consumes unknown process '{supplier}'")
+                a_rows.append(index[supplier])
+                a_cols.append(column)
+                a_values.append(-float(amount))
+            for flow, amount in (process.get("biosphere") or {}).items():
+                if flow not in flow_index:
+                    raise ValueError(f"Process '{process['id']}' emits unknown flow '{flow}'")
+                b_rows.append(flow_index[flow])
+                b_cols.append(column)
+                b_values.append(float(amount))
+
+        size = len(process_ids)
+        # Duplicate coordinates are summed, so a process consuming its own product nets off the diagonal.
+        technosphere = sparse.csc_matrix((a_values, (a_rows, a_cols)), shape=(size, size))
+        biosphere = sparse.csr_matrix((b_values, (b_rows, b_cols)), shape=(len(flow_ids), size))
+        characterization = {
+            method: np.array([float(factors.get(flow, 0.0)) for flow in flow_ids])
+            for method, factors in (data.get("characterization") or {}).items()
+        }
+        version = data.get("version") or hashlib.blake2b(
+            json.dumps(data, sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
+        return cls(
+            name=data.get("name", "local"),
+            version=str(version),
+            process_ids=process_ids,
+            process_units=[process.get("unit", MASS_UNIT) for process in processes],
+            flow_ids=flow_ids,
+            technosphere=technosphere,
+            biosphere=biosphere,
+            characterization=characterization,
+            pedigree={process["id"]: process["pedigree"] for process in processes if process.get("pedigree")},
+        )
+
+    @classmethod
+    def from_json(cls, path: str | Path) -> "LCIDatabase":
+        with open(path, encoding="utf-8") as handle:
+            database = cls.from_dict(json.load(handle))
+        database.path = Path(path)
+        return database
+
+    def characterization_factors(self, method: str) -> np.ndarray:
+        factors = self.characterization.get(method)
+        if factors is None:
+            raise ValueError(f"LCI database '{self.name}' has no characterization factors for '{method}'")
+        return factors
+
+    def factorization(self) -> TechnosphereFactorization:
+        return factorization_cache.get(self.version, self.fingerprint, self.technosphere)
+
+    def supply(self, demand: np.ndarray) -> np.ndarray:
+        """Process activities ``s`` with ``A·s = demand``; ``demand`` may be ``(n, k)`` for ``k`` products."""
+
+        return self.factorization().solve(demand)
+
+    def inventory(self, demand: np.ndarray) -> np.ndarray:
+        """Elementary flows ``B·A⁻¹·demand``."""
+
+        return self.biosphere @ self.supply(demand)
+
+    def unit_impacts(self, method: str) -> np.ndarray:
+        """Footprint of one reference unit of every process under ``method`` (the adjoint solve)."""
+
+        impacts = self._unit_impacts.get(method)
+        if impacts is None:
+            factors = self.characterization_factors(method)
+            with self._lock:
+                impacts = self._unit_impacts.get(method)
+                if impacts is None:
+                    impacts = self.factorization().solve(self.biosphere.T @ factors, transpose=True)
+                    self._unit_impacts[method] = impacts
+        return impacts
+
+
+@lru_cache(maxsize=8)
+def _load_database(path: str) -> LCIDatabase:
+    return LCIDatabase.from_json(path)
+
+
+def load_lci_database(path: str | Path | None = None) -> LCIDatabase:
+    """The database at ``path`` (default: the bundled seed), parsed once per process."""
+
+    return _load_database(str(Path(path or SEED_LCI_DATABASE).resolve()))
+
+
+def reload_lci_database(path: str | Path | None = None) -> LCIDatabase:
+    """Re-read the database at ``path``; later :func:`load_lci_database` calls return the new instance."""
+
+    _load_database.cache_clear()
+    return load_lci_database(path)
+
+
+class MatrixLCAEngine(PCFEngine):
+    """Computes PCFs by solving the technosphere system of a local :class:`LCIDatabase`.
+
+    LCI entries referencing the same dataset are consolidated into one demand
+    value before the solve; entries whose life-cycle stage the method profile
+    excludes are left out. Datasets the database does not contain fall back to
+    ``fallback_factor`` kg CO2e per kg and are listed in the provenance.
+    Breakdowns and the ``top_contributions`` largest contributors per stage,
+    provider, dataset and item come from the per-dataset unit impacts.
+    """
+
+    def __init__(
+        self,
+        database: LCIDatabase | None = None,
+        fallback_factor: float = FALLBACK_KG_CO2E_PER_KG,
+        top_contributions: int = DEFAULT_TOP_CONTRIBUTIONS,
+    ) -> None:
+        self.database = database or load_lci_database()
+        self.fallback_factor = fallback_factor
+        self.top_contributions = top_contributions
+
+    @property
+    def reloadable(self) -> bool:
+        return self.database.path is not None
+
+    def reload(self) -> None:
+        """Switch to a fresh copy of the database file, e.g. after its datasets were updated.
+
+        Calculations already running finish on the previous instance.
+        """
+
+        if self.database.path is None:
+            raise ValueError(f"LCI database '{self.database.name}' was not read from a file and cannot be reloaded")
+        self.database = reload_lci_database(self.database.path)
+
+    def map_bom_to_lci(self, bom: list[BOMItem], scenario: Scenario) -> LCIModel:
+        """Reference each item's material code as a dataset id; mapping decisions normally supply real ids."""
+
+        entries = [
+            LCIEntry(
+                bom_item_id=item.id,
+                dataset_id=item.material_code or item.classification_unspsc or item.id,
+                provider="local",
+                quantity=item.quantity,
+                unit=item.unit or "ea",
+                mass_kg=item.mass_kg,
+                life_cycle_stage="raw_materials",
+                brightway_reference=None,
+            )
+            for item in bom
+        ]
+        return LCIModel(bom_items=bom, entries=entries)
+
+    def calculate_pcf(
+        self,
+        product: Product,
+        bom_items: list[BOMItem],
+        scenario: Scenario,
+        method_profile: MethodProfile,
+        lci_model: LCIModel | None = None,
+    ) -> PCFResult:
+        [result] = self.calculate_pcf_many([PCFRequest(product, bom_items, scenario, method_profile, lci_model)])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def calculate_pcf_many(self, requests: Sequence[PCFRequest]) -> list[PCFResult | ValueError]:
+        """PCFs for many requests with one block solve against the cached factorization.
+
+        A request that cannot be computed (unknown method, unit mismatch) yields its
+        ``ValueError`` in place of a result instead of failing the batch.
+        """
+
+        prepared: list[_Demand | ValueError] = []
+        for request in requests:
+            try:
+                prepared.append(self._prepare(request))
+            except ValueError as exc:
+                prepared.append(exc)
+        solved = [demand for demand in prepared if isinstance(demand, _Demand) and demand.vector.any()]
+        if solved:
+            inventory = self.database.inventory(np.column_stack([demand.vector for demand in solved]))
+            for column, demand in enumerate(solved):
+                demand.inventory = inventory[:, column]
+        return [demand if isinstance(demand, ValueError) else self._result(demand) for demand in prepared]
+
+    def calculate_pcf_methods(
+        self,
+        product: Product,
+        bom_items: list[BOMItem],
+        scenario: Scenario,
+        method_profiles: Sequence[MethodProfile],
+        lci_model: LCIModel | None = None,
+    ) -> list[PCFResult]:
+        """One PCF per method profile from a single LCI pass.
+
+        The inventory is linear in the demand, so the demand is split by
+        life-cycle stage and solved once as one right-hand side per stage; each
+        method then sums the stage inventories inside its boundary and applies
+        its own characterization factors.
+        """
+
+        database = self.database
+        lci_model = lci_model or self.map_bom_to_lci(bom_items, scenario)
+        methods = [profile.ghg_aggregation_method or DEFAULT_GHG_METHOD for profile in method_profiles]
+        for method in methods:
+            database.characterization_factors(method)
+        entries = lci_model.entries
+        rows, known, amounts = self._locate(entries)
+        stage_codes: dict[str, int] = {}
+        stage_of_entry = np.fromiter(
+            (stage_codes.setdefault(entry.life_cycle_stage or DEFAULT_STAGE, len(stage_codes)) for entry in entries),
+            dtype=np.intp,
+            count=len(entries),
+        )
+        demand_by_stage = np.zeros((len(database), len(stage_codes)))
+        np.add.at(demand_by_stage, (rows[known], stage_of_entry[known]), amounts[known])
+        solved = demand_by_stage.any(axis=0)
+        inventory_by_stage = np.zeros((len(database.flow_ids), len(stage_codes)))
+        if solved.any():
+            inventory_by_stage[:, solved] = database.inventory(demand_by_stage[:, solved])
+
+        results = []
+        for profile, method in zip(method_profiles, methods):
+            included = set(profile.life_cycle_stages_included)
+            columns = [code for stage, code in stage_codes.items() if stage in included]
+            demand = _Demand(
+                profile,
+                method,
+                entries,
+                rows,
+                known,
+                amounts,
+                demand_by_stage[:, columns].sum(axis=1),
+                inventory_by_stage[:, columns].sum(axis=1),
+            )
+            results.append(self._result(demand))
+        return results
+
+    def calculate_pcf_incremental(self, state: "IncrementalPCF", lci_model: LCIModel) -> PCFResult:
+        """PCF of ``lci_model`` reusing ``state`` from the previous result for the same product and method.
+
+        Entries are matched to the cached ones by BOM item id. Only entries whose
+        dataset, quantity, unit, mass or stage changed are looked up again. The
+        inventory moves by ``B·A⁻¹·Δf``, where ``Δf`` is the demand delta of those
+        entries, so each update costs one back-substitution with the cached
+        factors. The inventory is re-solved in full once the number of updates
+        exceeds the number of entries, so accumulated rounding stays bounded.
+        """
+
+        database, method_profile = self.database, state.method_profile
+        entries = lci_model.entries
+        cached = state.entries
+        present = {entry.bom_item_id for entry in entries}
+        if len(present) != len(entries):
+            raise ValueError("Incremental PCF needs one LCI entry per BOM item")
+        changed = [entry for entry in entries if (cached.get(entry.bom_item_id) or (None,))[0] != _signature(entry)]
+        removed = [item_id for item_id in cached if item_id not in present]
+        # Resolve changed entries before touching the state, so a unit error leaves it intact.
+        rows, _, amounts = self._locate(changed)
+        solved = (rows >= 0) & stage_mask(changed, method_profile.life_cycle_stages_included)
+
+        delta = np.zeros(len(database))
+        for item_id in removed:
+            _, row, amount, was_solved = cached.pop(item_id)
+            if was_solved:
+                delta[row] -= amount
+        for entry, row, amount, is_solved in zip(changed, rows.tolist(), amounts.tolist(), solved.tolist()):
+            previous = cached.get(entry.bom_item_id)
+            if previous is not None and previous[3]:
+                delta[previous[1]] -= previous[2]
+            if is_solved:
+                delta[row] += amount
+            cached[entry.bom_item_id] = (_signature(entry), row, amount, is_solved)
+
+        state.updates += len(changed) + len(removed)
+        if state.vector is None or state.updates > len(entries):
+            state.vector = np.zeros(len(database))
+            for _, row, amount, is_solved in cached.values():
+                if is_solved:
+                    state.vector[row] += amount
+            state.inventory = database.inventory(state.vector) if state.vector.any() else np.zeros(len(database.flow_ids))
+            state.updates = 0
+        elif delta.any():
+            state.vector += delta
+            state.inventory = state.inventory + database.inventory(delta)
+
+        layout = [cached[entry.bom_item_id] for entry in entries]
+        all_rows = np.fromiter((line[1] for line in layout), dtype=np.intp, count=len(layout))
+        all_amounts = np.fromiter((line[2] for line in layout), dtype=float, count=len(layout))
+        demand = _Demand(
+            method_profile,
+            state.method,
+            entries,
+            all_rows,
+            all_rows >= 0,
+            all_amounts,
+            # Deltas can leave round-off where a dataset's demand cancelled out.
+            np.where(np.abs(state.vector) > 1e-12 * np.abs(state.vector).max(initial=0.0), state.vector, 0.0),
+            state.inventory,
+        )
+        result = self._result(demand)
+        result.provenance["incremental"] = {"items_recomputed": len(changed), "items_removed": len(removed)}
+        return result
+
+    @property
+    def pedigree(self) -> Mapping[str, Mapping[str, int]]:
+        return self.database.pedigree
+
+    def entry_impacts(self, entries: Sequence[LCIEntry], method_profile: MethodProfile) -> tuple[np.ndarray, np.ndarray]:
+        """kg CO2e of every entry, whatever its stage, and which entries were found in the database.
+
+        Uses the adjoint unit impacts, so after the first call per method this
+        needs no solve at all.
+        """
+
+        method = method_profile.ghg_aggregation_method or DEFAULT_GHG_METHOD
+        self.database.characterization_factors(method)
+        rows, known, amounts = self._locate(entries)
+        return self._entry_impacts(rows, known, amounts, method), known
+
+    def _entry_impacts(self, rows: np.ndarray, known: np.ndarray, amounts: np.ndarray, method: str) -> np.ndarray:
+        unit_impacts = self.database.unit_impacts(method)
+        return np.where(known, amounts * unit_impacts[np.where(known, rows, 0)], amounts * self.fallback_factor)
+
+    def _locate(self, entries: Sequence[LCIEntry]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Database row (``-1`` if unknown), known mask and reference-unit amount of every entry."""
+
+        database = self.database
+        rows = np.fromiter((database.index.get(entry.dataset_id, -1) for entry in entries), dtype=np.intp, count=len(entries))
+        return rows, rows >= 0, reference_amounts(entries, rows, database.process_units.__getitem__)
+
+    def _prepare(self, request: PCFRequest) -> "_Demand":
+        database = self.database
+        lci_model = request.lci_model or self.map_bom_to_lci(request.bom_items, request.scenario)
+        method = request.method_profile.ghg_aggregation_method or DEFAULT_GHG_METHOD
+        database.characterization_factors(method)
+        entries = lci_model.entries
+        rows, known, amounts = self._locate(entries)
+        # One demand value per referenced dataset, however many BOM lines use it; stages outside
+        # the method's boundary are not solved for.
+        solved = known & stage_mask(entries, request.method_profile.life_cycle_stages_included)
+        vector = np.bincount(rows[solved], weights=amounts[solved], minlength=len(database))
+        return _Demand(request.method_profile, method, entries, rows, known, amounts, vector, np.zeros(len(database.flow_ids)))
+
+    def _result(self, demand: "_Demand") -> PCFResult:
+        database = self.database
+        method_profile, method = demand.method_profile, demand.method
+        entries, rows, known, amounts = demand.entries, demand.rows, demand.known, demand.amounts
+        matched_total = float(database.characterization_factors(method) @ demand.inventory)
+
+        impacts = self._entry_impacts(rows, known, amounts, method)
+        analysis = analyse_contributions(entries, impacts, method_profile.life_cycle_stages_included, self.top_contributions)
+        fallback_total = float(impacts[~known & stage_mask(entries, method_profile.life_cycle_stages_included)].sum())
+
+        unmatched = sorted({entry.dataset_id for entry, matched in zip(entries, known.tolist()) if not matched})
+        provenance = {
+            "pcf_method_id": method_profile.id.value,
+            "pcf_method_name": method_profile.name,
+            "system_boundary": method_profile.system_boundary,
+            "ghg_aggregation_method": method,
+            "lci_database": {"name": database.name, "version": database.version, "processes": len(database)},
+            "datasets_solved": int(np.count_nonzero(demand.vector)),
+            "inventory": {flow: float(amount) for flow, amount in zip(database.flow_ids, demand.inventory.tolist()) if amount},
+            "notes": "Matrix LCA over the local LCI database.",
+        }
+        note_method_boundary(provenance, analysis, method_profile)
+        if unmatched:
+            provenance["unmatched_datasets"] = unmatched
+            provenance["fallback_kg_co2e_per_kg"] = self.fallback_factor
+        return result_from_analysis(analysis, provenance, total_kg_co2e=matched_total + fallback_total)
+
+
+@dataclass
+class IncrementalPCF:
+    """Cached per-entry demand and the running inventory of one product under one method profile."""
+
+    method_profile: MethodProfile
+    # BOM item id -> (entry signature, database row or -1, amount in reference unit, inside the stage boundary).
+    entries: dict[str, tuple[tuple, int, float, bool]] = field(default_factory=dict)
+    vector: np.ndarray | None = None
+    inventory: np.ndarray | None = None
+    updates: int = 0
+
+    @property
+    def method(self) -> str:
+        return self.method_profile.ghg_aggregation_method or DEFAULT_GHG_METHOD
+
+
+@dataclass
+class _Demand:
+    """One request's consolidated demand and per-entry bookkeeping, before and after the solve."""
+
+    method_profile: MethodProfile
+    method: str
+    entries: list[LCIEntry]
+    rows: np.ndarray  # database row of each entry's dataset, -1 if unknown
+    known: np.ndarray
+    amounts: np.ndarray  # in the dataset's reference unit (kg for unknown datasets)
+    vector: np.ndarray
+    inventory: np.ndarray
+
+
+def reference_amounts(entries: Sequence[LCIEntry], rows: np.ndarray, unit_of_row: Callable[[int], str]) -> np.ndarray:
+    """Each entry's demand in the reference unit of its dataset; entries with row ``-1`` (unknown) in kg.
+
+    Unknown datasets are costed per kg, so their entries without a usable mass
+    count as zero instead of failing the calculation.
+    """
+
+    known = rows >= 0
+    return to_reference_amounts(
+        np.fromiter((entry.quantity or 0.0 for entry in entries), dtype=float, count=len(entries)),
+        np.fromiter((np.nan if entry.mass_kg is None else entry.mass_kg for entry in entries), dtype=float, count=len(entries)),
+        [entry.unit for entry in entries],
+        [unit_of_row(row) if is_known else MASS_UNIT for row, is_known in zip(rows.tolist(), known.tolist())],
+        strict=known,
+        describe=lambda index: f"BOM item {entries[index].bom_item_id} (dataset '{entries[index].dataset_id}')",
+    )
+
+
+def note_method_boundary(provenance: dict, analysis: ContributionAnalysis, method_profile: MethodProfile) -> None:
+    """Record the method's stage boundary and what it excluded."""
+
+    provenance["life_cycle_stages_included"] = list(method_profile.life_cycle_stages_included)
+    if analysis.excluded_by_stage:
+        provenance["excluded_by_stage"] = analysis.excluded_by_stage
+
+
+def _signature(entry: LCIEntry) -> tuple:
+    return (entry.dataset_id, entry.quantity, entry.unit, entry.mass_kg, entry.life_cycle_stage or DEFAULT_STAGE)
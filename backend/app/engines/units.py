@@ -0,0 +1,199 @@
+"""Conversion of BOM quantities into the reference units of LCI datasets.
+
+Every known unit belongs to one dimension (mass, area, volume, energy, length,
+transport, count) and has a factor to that dimension's base unit. The factors
+are compiled once into a square table over all units, ``NaN`` where the
+dimensions differ, so a whole BOM converts with one fancy-indexing pass.
+
+Datasets per unit of mass are fed the item's ``mass_kg`` when it is known
+(a part counted in pieces still weighs something); everything else converts
+its quantity. Unit strings outside the table only convert to themselves.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Callable, Sequence
+
+import numpy as np
+
+MASS_UNIT = "kg"
+
+# Canonical unit -> (dimension, factor to the dimension's base unit).
+_UNITS: dict[str, tuple[str, float]] = {
+    "kg": ("mass", 1.0),
+    "g": ("mass", 1e-3),
+    "mg": ("mass", 1e-6),
+    "t": ("mass", 1e3),
+    "lb": ("mass", 0.45359237),
+    "oz": ("mass", 0.028349523125),
+    "m2": ("area", 1.0),
+    "dm2": ("area", 1e-2),
+    "cm2": ("area", 1e-4),
+    "mm2": ("area", 1e-6),
+    "ft2": ("area", 0.09290304),
+    "ha": ("area", 1e4),
+    "m3": ("volume", 1.0),
+    "dm3": ("volume", 1e-3),
+    "l": ("volume", 1e-3),
+    "cm3": ("volume", 1e-6),
+    "ml": ("volume", 1e-6),
+    "MJ": ("energy", 1.0),
+    "J": ("energy", 1e-6),
+    "kJ": ("energy", 1e-3),
+    "GJ": ("energy", 1e3),
+    "Wh": ("energy", 3.6e-3),
+    "kWh": ("energy", 3.6),
+    "MWh": ("energy", 3.6e3),
+    "m": ("length", 1.0),
+    "mm": ("length", 1e-3),
+    "cm": ("length", 1e-2),
+    "km": ("length", 1e3),
+    "tkm": ("transport", 1.0),
+    "kgkm": ("transport", 1e-3),
+    "ea": ("count", 1.0),
+}
+_ALIASES = {
+    "kilogram": "kg",
+    "kilograms": "kg",
+    "gram": "g",
+    "grams": "g",
+    "Mg": "t",
+    "tonne": "t",
+    "tonnes": "t",
+    "ton": "t",
+    "lbs": "lb",
+    "sqm": "m2",
+    "litre": "l",
+    "liter": "l",
+    "litres": "l",
+    "liters": "l",
+    "t*km": "tkm",
+    "kg*km": "kgkm",
+    "pc": "ea",
+    "pcs": "ea",
+    "piece": "ea",
+    "pieces": "ea",
+    "p": "ea",
+    "each": "ea",
+    "item": "ea",
+    "items": "ea",
+    "unit": "ea",
+    "units": "ea",
+}
+_CANONICAL = list(_UNITS)
+_EXACT = {name: name for name in _CANONICAL} | _ALIASES
+_UNKNOWN = -1
+
+
+def _folded() -> dict[str, str]:
+    """Case-insensitive lookup, minus spellings told apart only by case (``mg``/``Mg``)."""
+
+    folded: dict[str, set[str]] = {}
+    for name, canonical in _EXACT.items():
+        folded.setdefault(name.casefold(), set()).add(canonical)
+    return {name: canonical.pop() for name, canonical in folded.items() if len(canonical) == 1}
+
+
+_FOLDED = _folded()
+
+
+class UnitConversionError(ValueError):
+    """Raised when a quantity cannot be expressed in the requested unit."""
+
+
+def _compile() -> np.ndarray:
+    """``table[i, j]`` converts one ``_CANONICAL[i]`` into ``_CANONICAL[j]``; the extra last row and column are NaN."""
+
+    dimensions = np.array([_UNITS[name][0] for name in _CANONICAL])
+    factors = np.array([_UNITS[name][1] for name in _CANONICAL])
+    table = np.full((len(_CANONICAL) + 1, len(_CANONICAL) + 1), np.nan)
+    compatible = dimensions[:, None] == dimensions[None, :]
+    table[:-1, :-1] = np.where(compatible, factors[:, None] / factors[None, :], np.nan)
+    return table
+
+
+_TABLE = _compile()
+
+
+def normalize_unit(unit: str | None) -> str | None:
+    """Canonical spelling of ``unit`` (``m²`` → ``m2``, ``pcs`` → ``ea``), or ``None`` if it is unknown."""
+
+    if not unit:
+        return None
+    key = unit.strip().replace("²", "2").replace("³", "3").replace("^", "").replace(" ", "")
+    return _EXACT.get(key) or _FOLDED.get(key.casefold())
+
+
+@lru_cache(maxsize=1024)
+def unit_code(unit: str | None) -> int:
+    """Row of ``unit`` in the conversion table, ``-1`` if unknown."""
+
+    canonical = normalize_unit(unit)
+    return _CANONICAL.index(canonical) if canonical is not None else _UNKNOWN
+
+
+def dimension(unit: str | None) -> str | None:
+    code = unit_code(unit)
+    return _UNITS[_CANONICAL[code]][0] if code != _UNKNOWN else None
+
+
+@lru_cache(maxsize=4096)
+def conversion_factor(from_unit: str, to_unit: str) -> float:
+    """Multiplier taking an amount in ``from_unit`` to ``to_unit``."""
+
+    if from_unit == to_unit:
+        return 1.0
+    factor = _TABLE[unit_code(from_unit), unit_code(to_unit)]
+    if np.isnan(factor):
+        raise UnitConversionError(_incompatible(from_unit, to_unit))
+    return float(factor)
+
+
+def unit_codes(units: Sequence[str | None]) -> np.ndarray:
+    """Table rows of ``units``, looking up each distinct string once."""
+
+    codes = {unit: unit_code(unit) for unit in set(units)}
+    return np.fromiter(map(codes.__getitem__, units), dtype=np.intp, count=len(units))
+
+
+def to_reference_amounts(
+    quantities: np.ndarray,
+    masses_kg: np.ndarray,
+    units: Sequence[str | None],
+    reference_units: Sequence[str],
+    strict: np.ndarray | None = None,
+    describe: Callable[[int], str] | None = None,
+) -> np.ndarray:
+    """Amount of each line in its reference unit.
+
+    ``masses_kg`` is the mass of one line unit (``NaN`` if unknown). Lines that
+    cannot be converted raise :class:`UnitConversionError` naming ``describe(i)``,
+    unless ``strict[i]`` is false, in which case they count as zero.
+    """
+
+    quantities = np.asarray(quantities, dtype=float)
+    masses_kg = np.asarray(masses_kg, dtype=float)
+    source, target = unit_codes(units), unit_codes(reference_units)
+    by_quantity = quantities * _TABLE[source, target]
+    by_mass = masses_kg * quantities * _TABLE[unit_code(MASS_UNIT), target]
+    amounts = np.where(np.isnan(by_mass), by_quantity, by_mass)
+    unconverted = np.flatnonzero(np.isnan(amounts))
+    for index in unconverted.tolist():
+        if units[index] == reference_units[index]:
+            amounts[index] = quantities[index]
+        elif strict is None or strict[index]:
+            raise UnitConversionError(
+                f"{describe(index) if describe else f'Line {index}'}: {_incompatible(units[index], reference_units[index])}"
+            )
+        else:
+            amounts[index] = 0.0
+    return amounts
+
+
+def _incompatible(from_unit: str | None, to_unit: str | None) -> str:
+    if unit_code(from_unit) == _UNKNOWN or unit_code(to_unit) == _UNKNOWN:
+        unknown = from_unit if unit_code(from_unit) == _UNKNOWN else to_unit
+        return f"unit '{unknown}' is unknown, so '{from_unit}' cannot be converted to '{to_unit}'"
+    if dimension(to_unit) == "mass":
+        return f"'{from_unit}' ({dimension(from_unit)}) needs a mass per unit to be converted to '{to_unit}'"
+    return f"'{from_unit}' ({dimension(from_unit)}) cannot be converted to '{to_unit}' ({dimension(to_unit)})"
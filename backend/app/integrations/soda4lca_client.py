@@ -34,8 +34,19 @@ class Soda4LCAClient:
         self.username = username or settings.soda4lca_username
         self.password = password or settings.soda4lca_password
         self.cache_dir = Path(cache_dir or settings.soda4lca_cache_dir).resolve()
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self._client = httpx.Client(timeout=30)
+        self._client: httpx.Client | None = None
+
+    @property
+    def client(self) -> httpx.Client:
+        """HTTP client, created on first download rather than at construction."""
+
+        if self._client is None:
+            self._client = httpx.Client(timeout=30)
+        return self._client
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
 
     def ensure_dataset_cached(self, provider: str, dataset_id: str) -> Path:
         """Return path to cached dataset, downloading it if necessary."""
@@ -72,7 +83,7 @@ class Soda4LCAClient:
         if self.username and self.password:
             auth = (self.username, self.password)
         try:
-            response = self._client.get(url, headers=headers, auth=auth)
+            response = self.client.get(url, headers=headers, auth=auth)
             response.raise_for_status()
         except Exception as exc:  # broad to wrap httpx errors
             raise Soda4LCAError(f"Failed to download dataset {dataset_id} from soda4LCA: {exc}") from exc
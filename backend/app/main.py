@@ -1,18 +1,54 @@
-"""FastAPI entrypoint."""
+"""FastAPI entrypoint.
+
+Importing this module only builds the app and registers routers; database setup,
+seeding, and service construction happen in the lifespan handler or lazily on first
+use (see ``api/dependencies.py``).
+"""
 from __future__ import annotations
 
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from .api import routes_bom, routes_circularity, routes_mapping, routes_pcf, routes_products, routes_scenarios
+from .api import (
+    dependencies,
+    routes_bom,
+    routes_circularity,
+    routes_dependencies,
+    routes_mapping,
+    routes_pcf,
+    routes_portfolio,
+    routes_products,
+    routes_scenarios,
+)
 from .core.config import get_settings
 from .core.logging import configure_logging
-from .db.init_db import init_db
+from .core.metrics import metrics
+
+LOGGER = logging.getLogger(__name__)
+
 
-configure_logging()
-settings = get_settings()
-init_db()
-app = FastAPI(title="procafocia", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    configure_logging()
+    dependencies.initialize_database()
+    if get_settings().startup_warmup:
+        threading.Thread(target=dependencies.warm_up, name="procafocia-warmup", daemon=True).start()
+    metrics.set_gauge("startup_seconds", time.perf_counter() - started, "Lifespan startup duration")
+    LOGGER.info("Startup finished in %.3fs", time.perf_counter() - started)
+    try:
+        yield
+    finally:
+        dependencies.shutdown()
+
+
+app = FastAPI(title="procafocia", version="0.1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,8 +62,15 @@ app.include_router(routes_scenarios.router)
 app.include_router(routes_pcf.router)
 app.include_router(routes_circularity.router)
 app.include_router(routes_mapping.router)
+app.include_router(routes_portfolio.router)
+app.include_router(routes_dependencies.router)
 
 
 @app.get("/health")
 def healthcheck() -> dict[str, str]:
-    return {"status": "ok", "environment": settings.app_env}
+    return {"status": "ok", "environment": get_settings().app_env}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def export_metrics() -> str:
+    return metrics.render_text()
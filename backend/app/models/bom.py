@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
 
@@ -30,3 +31,17 @@ class BOMItem:
     country_of_origin: Optional[str] = None
     manufacturing_location: Optional[str] = None
     lci_dataset_id: Optional[str] = None
+
+
+@dataclass
+class BOMRevision:
+    """Summary of one stored BOM revision."""
+
+    product_id: str
+    revision: int
+    is_checkpoint: bool
+    item_count: int
+    added_count: int
+    updated_count: int
+    removed_count: int
+    created_at: Optional[datetime] = None
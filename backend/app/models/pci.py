@@ -1,8 +1,8 @@
 """PCI-specific domain models and dataclasses."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import List
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Iterator, Mapping, Sequence, overload
 
 
 @dataclass
@@ -65,13 +65,83 @@ class PCIMaterialFlows:
     PCI_material: float
 
 
+_FLOW_FIELDS = tuple(f.name for f in fields(PCIMaterialFlows))
+
+
+class PCIMaterialFlowColumns(Sequence[PCIMaterialFlows]):
+    """Per-line :class:`PCIMaterialFlows` stored column-wise; rows are built on access.
+
+    ``columns`` maps every ``PCIMaterialFlows`` field name to a sequence (list or
+    NumPy array) with one value per line.
+    """
+
+    def __init__(self, columns: Mapping[str, Sequence]):
+        missing = set(_FLOW_FIELDS) - set(columns)
+        if missing:
+            raise ValueError(f"Missing material flow column(s): {', '.join(sorted(missing))}")
+        self.columns = {name: columns[name] for name in _FLOW_FIELDS}
+        self._length = len(self.columns[_FLOW_FIELDS[0]])
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> PCIMaterialFlows: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[PCIMaterialFlows]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._length))]
+        if not -self._length <= index < self._length:
+            raise IndexError("material flow index out of range")
+        return PCIMaterialFlows(*(_scalar(self.columns[name][index]) for name in _FLOW_FIELDS))
+
+    def __iter__(self) -> Iterator[PCIMaterialFlows]:
+        for row in zip(*self._lists()):
+            yield PCIMaterialFlows(*row)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(left == right for left, right in zip(self, other))
+
+    def to_dicts(self) -> list[dict]:
+        """What ``asdict`` gives for each line, without building the dataclasses."""
+
+        return [dict(zip(_FLOW_FIELDS, row)) for row in zip(*self._lists())]
+
+    def _lists(self) -> list[list]:
+        return [column.tolist() if hasattr(column, "tolist") else list(column) for column in self.columns.values()]
+
+
+def _scalar(value):
+    return value.item() if hasattr(value, "item") else value
+
+
 @dataclass
 class PCIResult:
-    """Aggregate PCI result for a product."""
+    """Aggregate PCI result for a product.
+
+    ``per_material_flows`` is a list or, from the vectorized engine, a
+    :class:`PCIMaterialFlowColumns`; serialize with :func:`pci_result_payload`.
+    """
 
     pci_product: float
     utility_factor: float
     lfi_product: float
     mass_total: float
-    per_material_flows: List[PCIMaterialFlows] = field(default_factory=list)
+    per_material_flows: Sequence[PCIMaterialFlows] = field(default_factory=list)
     notes: list[str] = field(default_factory=list)
+
+
+def pci_result_payload(result: PCIResult) -> dict:
+    """``asdict(result)`` that converts column-stored flows in one pass per column."""
+
+    flows = result.per_material_flows
+    payload = asdict(replace(result, per_material_flows=[]))
+    payload["per_material_flows"] = (
+        flows.to_dicts() if isinstance(flows, PCIMaterialFlowColumns) else [asdict(flow) for flow in flows]
+    )
+    return payload
@@ -15,4 +15,6 @@ class Product:
     functional_unit: str
     lifetime_years: Optional[float] = None
     use_profile: Optional[str] = None
+    revision: int = 1
+    bom_revision: int = 0
     metadata: dict[str, str] = field(default_factory=dict)
@@ -17,3 +17,4 @@ class ResultSet:
     pcf_breakdown: dict[str, Any] = field(default_factory=dict)
     circularity_indicators: dict[str, Any] = field(default_factory=dict)
     provenance: dict[str, Any] = field(default_factory=dict)
+    bom_revision: int | None = None
@@ -1,12 +1,19 @@
 """Scenario domain models."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping
 
 from .pci import MaterialCircularityParameters
 from .method_profile import PCFMethodID
 
 
+def _clamp_unit(value: float | None) -> float:
+    return max(0.0, min(1.0, value or 0.0))
+
+
 @dataclass
 class Scenario:
     """Represents a calculation scenario for PCF/PCI runs."""
@@ -26,6 +33,7 @@ class Scenario:
     design_lifetime_functional_units: float | None = None
     actual_used_functional_units: float | None = None
     material_parameters: dict[str, MaterialCircularityParameters] = field(default_factory=dict)
+    revision: int = 1
 
     def compute_utility_factor(self) -> float:
         """Return utility factor using provided values or computed functional units."""
@@ -39,3 +47,65 @@ class Scenario:
         ):
             return max(self.actual_used_functional_units / self.design_lifetime_functional_units, 1e-6)
         return 1.0
+
+
+@dataclass(frozen=True)
+class CompiledScenario:
+    """Immutable, pre-processed view of a scenario for repeated PCI runs.
+
+    Utility factor, collection fractions, and material parameters are resolved and
+    clamped once so engines can look up parameters without re-validating them per item.
+    """
+
+    scenario: Scenario
+    updated_at: datetime | None
+    utility_factor: float
+    collection_fraction_for_reuse: float
+    collection_fraction_for_recycling: float
+    material_parameters: Mapping[str, MaterialCircularityParameters]
+    default_parameters: MaterialCircularityParameters | None
+
+    @property
+    def id(self) -> str:
+        return self.scenario.id
+
+    @property
+    def cache_key(self) -> tuple[str, datetime | None]:
+        return (self.scenario.id, self.updated_at)
+
+    def resolve(self, material_code: str | None, material_family: str | None) -> MaterialCircularityParameters | None:
+        """Return parameters for a material code/family, falling back to the scenario default."""
+
+        lookup = self.material_parameters
+        if material_code and material_code in lookup:
+            return lookup[material_code]
+        if material_family and material_family in lookup:
+            return lookup[material_family]
+        return self.default_parameters
+
+
+def compile_scenario(scenario: Scenario, updated_at: datetime | None = None) -> CompiledScenario:
+    """Build a :class:`CompiledScenario` from a domain scenario."""
+
+    clamped = {
+        key: replace(
+            params,
+            efficiency_feedstock_production=_clamp_unit(params.efficiency_feedstock_production),
+            efficiency_component_production=_clamp_unit(params.efficiency_component_production),
+            recovered_fraction_feedstock_losses=_clamp_unit(params.recovered_fraction_feedstock_losses),
+            recovered_fraction_component_losses=_clamp_unit(params.recovered_fraction_component_losses),
+            efficiency_material_separation_eol=_clamp_unit(params.efficiency_material_separation_eol),
+            efficiency_recycled_feedstock_production=_clamp_unit(params.efficiency_recycled_feedstock_production),
+        )
+        for key, params in scenario.material_parameters.items()
+    }
+    default = next(iter(clamped.values())) if clamped else None
+    return CompiledScenario(
+        scenario=scenario,
+        updated_at=updated_at,
+        utility_factor=scenario.compute_utility_factor(),
+        collection_fraction_for_reuse=_clamp_unit(scenario.collection_fraction_for_reuse),
+        collection_fraction_for_recycling=_clamp_unit(scenario.collection_fraction_for_recycling),
+        material_parameters=MappingProxyType(clamped),
+        default_parameters=default,
+    )
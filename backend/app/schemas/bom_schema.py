@@ -31,3 +31,44 @@ class BOMItemSchema(BaseModel):
 class BOMUploadResponse(BaseModel):
     product_id: str
     items: list[BOMItemSchema]
+    bom_revision: int | None = None
+
+
+class BOMRevisionSchema(BaseModel):
+    product_id: str
+    revision: int
+    is_checkpoint: bool
+    item_count: int
+    added_count: int
+    updated_count: int
+    removed_count: int
+    created_at: str | None = None
+
+
+class SubassemblyRollupSchema(BaseModel):
+    item_id: str
+    parent_bom_item_id: str | None = None
+    component_code: str | None = None
+    description: str
+    depth: int
+    quantity: float
+    line_count: int
+    pcf_kg_co2e: float
+    mass_kg: float
+    pci: float
+    lfi: float
+    memoized: bool = False
+
+
+class BOMRollupSchema(BaseModel):
+    product_id: str
+    scenario_id: str
+    method_profile_id: str
+    bom_revision: int | None = None
+    pcf_kg_co2e: float
+    mass_kg: float
+    pci: float
+    lfi: float
+    lines_evaluated: int
+    memo_hits: int
+    subassemblies: list[SubassemblyRollupSchema]
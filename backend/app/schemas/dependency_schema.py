@@ -0,0 +1,32 @@
+"""Schemas for where-used queries and dependency invalidation."""
+from __future__ import annotations
+
+from typing import Literal
+
+from pydantic import BaseModel
+
+DependencyKind = Literal["dataset", "rule", "scenario"]
+
+
+class WhereUsedSchema(BaseModel):
+    kind: DependencyKind
+    key: str
+    product_ids: list[str]
+    subjects: dict[str, list[str]]
+
+
+class InvalidationRequest(BaseModel):
+    kind: DependencyKind
+    key: str
+    recompute: bool | None = None
+
+
+class InvalidationReportSchema(BaseModel):
+    kind: DependencyKind
+    key: str
+    product_ids: list[str]
+    cached_entries_dropped: int
+    results_marked_stale: int
+    recompute_queued: bool
+    datasets_reloaded: bool = False
+    recompute_pending: int = 0
@@ -34,6 +34,7 @@ class MappingHistorySchema(BaseModel):
     product_id: str
     bom_item_id: str
     scenario_id: str | None
+    bom_revision: int | None = None
     selected_dataset_id: str | None
     selected_provider: str | None
     confidence_score: float | None
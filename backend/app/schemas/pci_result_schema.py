@@ -36,3 +36,127 @@ class PCIResultSchema(BaseModel):
     mass_total: float
     per_material_flows: list[PCIMaterialFlowsSchema] = Field(default_factory=list)
     notes: list[str] = Field(default_factory=list)
+
+
+class PCISweepRangeSchema(BaseModel):
+    """One swept parameter: explicit ``values`` or ``steps`` points from ``start`` to ``stop``."""
+
+    parameter: str
+    material_key: str | None = None
+    values: list[float] | None = None
+    start: float | None = None
+    stop: float | None = None
+    steps: int | None = Field(default=None, ge=1)
+
+
+class PCISweepRequest(BaseModel):
+    product_id: str
+    scenario_id: str = "default"
+    bom_revision: int | None = None
+    ranges: list[PCISweepRangeSchema] = Field(default_factory=list)
+    grid: list[dict[str, float]] | None = None
+
+
+class PCIDistributionSchema(BaseModel):
+    """Distribution of one PCI input; ``scope`` is a parameter set key or, for shares, a BOM item id."""
+
+    parameter: str
+    kind: str
+    scope: str | None = None
+    low: float | None = None
+    high: float | None = None
+    mode: float | None = None
+    mean: float | None = None
+    std: float | None = None
+    median: float | None = None
+    gsd: float | None = None
+
+
+class PCIUncertaintyRequest(BaseModel):
+    product_id: str
+    scenario_id: str = "default"
+    bom_revision: int | None = None
+    distributions: list[PCIDistributionSchema]
+    samples: int = Field(default=10_000, ge=1)
+    seed: int = Field(default=0, ge=0)
+    percentiles: list[float] = Field(default_factory=lambda: [5.0, 25.0, 50.0, 75.0, 95.0])
+
+
+class PCIStatisticsSchema(BaseModel):
+    mean: float
+    std: float
+    minimum: float
+    maximum: float
+    percentiles: dict[str, float]
+
+
+class PCIUncertaintySchema(BaseModel):
+    product_id: str
+    scenario_id: str
+    samples: int
+    seed: int
+    product: PCIStatisticsSchema
+    per_material: dict[str, PCIStatisticsSchema]
+
+
+class PCISensitivityEntrySchema(BaseModel):
+    parameter: str
+    scope: str | None = None
+    label: str
+    value: float
+    derivative: float
+    elasticity: float
+
+
+class PCITornadoBarSchema(BaseModel):
+    label: str
+    elasticity: float
+    pci_low: float
+    pci_high: float
+    swing: float
+
+
+class PCISensitivitySchema(BaseModel):
+    product_id: str
+    scenario_id: str
+    pci_product: float
+    relative_step: float
+    sensitivities: list[PCISensitivityEntrySchema]
+    tornado: list[PCITornadoBarSchema]
+
+
+class PCIGoalVariableSchema(BaseModel):
+    """Adjustable input; ``scope`` is a parameter set key or, for shares, a BOM item id."""
+
+    parameter: str
+    scope: str | None = None
+    lower: float = 0.0
+    upper: float = 1.0
+
+
+class PCIGoalSeekRequest(BaseModel):
+    product_id: str
+    scenario_id: str = "default"
+    bom_revision: int | None = None
+    target_pci: float = Field(ge=0.0, le=1.0)
+    variables: list[PCIGoalVariableSchema] = Field(min_length=1)
+    tolerance: float = Field(default=1e-6, gt=0.0)
+
+
+class PCIGoalVariableResultSchema(BaseModel):
+    label: str
+    initial: float
+    solution: float
+    change: float
+
+
+class PCIGoalSeekSchema(BaseModel):
+    product_id: str
+    scenario_id: str
+    target_pci: float
+    achieved: bool
+    pci_initial: float
+    pci: float
+    iterations: int
+    evaluations: int
+    variables: list[PCIGoalVariableResultSchema]
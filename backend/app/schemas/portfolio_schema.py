@@ -0,0 +1,58 @@
+"""Portfolio batch run schemas."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from ..models.method_profile import PCFMethodID
+
+
+class PortfolioRunRequest(BaseModel):
+    """Products by explicit ids or id prefix (default: all); scenarios by id (default: all)."""
+
+    product_ids: list[str] | None = None
+    product_id_prefix: str | None = None
+    scenario_ids: list[str] | None = None
+    pcf_method_id: PCFMethodID | None = None
+    include_pcf: bool = True
+    include_pci: bool = True
+    workers: int | None = Field(default=None, ge=1)
+
+
+class PortfolioProgressSchema(BaseModel):
+    job_id: str
+    status: str
+    workers: int
+    products: int
+    scenarios: int
+    total_units: int
+    completed_units: int
+    failed_units: int
+    chunks_completed: int
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    elapsed_seconds: float
+    units_per_second: float
+    eta_seconds: float | None = None
+    error: str | None = None
+
+
+class PortfolioResultSchema(BaseModel):
+    id: str
+    product_id: str
+    scenario_id: str
+    method_profile_id: str | None = None
+    bom_revision: int | None = None
+    pcf_total_kg_co2e: float | None = None
+    pci_product: float | None = None
+    lfi_product: float | None = None
+    error: str | None = None
+    stale: bool = False
+    details: dict | None = None
+
+
+class PortfolioResultsResponse(BaseModel):
+    job_id: str
+    total: int
+    results: list[PortfolioResultSchema]
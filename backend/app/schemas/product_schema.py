@@ -17,3 +17,5 @@ class ProductResponse(ProductCreate):
     """Response schema extending creation fields."""
 
     metadata: dict[str, str] = Field(default_factory=dict)
+    revision: int = 1
+    bom_revision: int = 0
@@ -1,8 +1,12 @@
 """Result schemas."""
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+from ..models.method_profile import PCFMethodID
+
 
 class ResultSetSchema(BaseModel):
     id: str
@@ -13,3 +17,48 @@ class ResultSetSchema(BaseModel):
     pcf_breakdown: dict = Field(default_factory=dict)
     circularity_indicators: dict = Field(default_factory=dict)
     provenance: dict = Field(default_factory=dict)
+    bom_revision: int | None = None
+
+
+class PedigreeSchema(BaseModel):
+    """Data quality scores, 1..5 on the pedigree scale or 1..3 as PACT DQR ratings."""
+
+    reliability: int
+    completeness: int
+    temporal: int
+    geographical: int
+    technological: int
+    scale: Literal["pedigree", "dqr"] = "pedigree"
+
+
+class PCFUncertaintyRequest(BaseModel):
+    product_id: str
+    scenario_id: str = "default"
+    pcf_method_id: PCFMethodID | None = None
+    bom_revision: int | None = None
+    samples: int = Field(default=10_000, ge=1)
+    seed: int = Field(default=0, ge=0)
+    percentiles: list[float] = Field(default_factory=lambda: [5.0, 25.0, 50.0, 75.0, 95.0])
+    dataset_pedigree: dict[str, PedigreeSchema] = Field(default_factory=dict)
+    item_pedigree: dict[str, PedigreeSchema] = Field(default_factory=dict)
+
+
+class PCFStatisticsSchema(BaseModel):
+    deterministic: float
+    mean: float
+    std: float
+    minimum: float
+    maximum: float
+    percentiles: dict[str, float]
+
+
+class PCFUncertaintySchema(BaseModel):
+    product_id: str
+    scenario_id: str
+    pcf_method_id: str
+    samples: int
+    seed: int
+    total: PCFStatisticsSchema
+    per_stage: dict[str, PCFStatisticsSchema]
+    per_item: dict[str, PCFStatisticsSchema]
+    unscored_datasets: list[str]
@@ -33,3 +33,4 @@ class ScenarioSchema(BaseModel):
     design_lifetime_functional_units: float | None = None
     actual_used_functional_units: float | None = None
     material_parameters: dict[str, MaterialCircularityParametersSchema] = Field(default_factory=dict)
+    revision: int = 1
@@ -0,0 +1,137 @@
+"""Delta encoding for BOM revisions.
+
+A revision is stored either as a full checkpoint (all items) or as a delta against
+the previous revision. Deltas only carry added items, changed fields of updated
+items, removed item ids and, when the upload order changed, the items that moved,
+so storage grows with the amount of change rather than with the BOM.
+
+Replaying a delta keeps the previous order, drops removed items and appends added
+ones; each move then puts one item back at its index in the uploaded order. Only
+items outside a longest run already in upload order are stored as moves.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field, fields
+from typing import Iterable
+
+from ..models.bom import BOMItem
+
+_BOM_FIELDS = [f.name for f in fields(BOMItem)]
+
+
+@dataclass
+class BOMDelta:
+    """Difference between two BOM revisions."""
+
+    added: list[dict] = field(default_factory=list)
+    updated: list[dict] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # ``(item id, index in the upload order)``, by ascending index.
+    moves: list[tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.updated or self.removed or self.moves)
+
+    def to_payload(self) -> dict:
+        payload = {"added": self.added, "updated": self.updated, "removed": self.removed}
+        if self.moves:
+            payload["moves"] = [list(move) for move in self.moves]
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "BOMDelta":
+        return cls(
+            added=list(payload.get("added", [])),
+            updated=list(payload.get("updated", [])),
+            removed=list(payload.get("removed", [])),
+            moves=[(item_id, index) for item_id, index in payload.get("moves", [])],
+        )
+
+
+def diff_bom(previous: Iterable[BOMItem], current: Iterable[BOMItem]) -> BOMDelta:
+    """Compute the delta that turns ``previous`` into ``current``."""
+
+    old = {item.id: asdict(item) for item in previous}
+    delta = BOMDelta()
+    order: list[str] = []
+    for item in current:
+        order.append(item.id)
+        data = asdict(item)
+        before = old.get(item.id)
+        if before is None:
+            delta.added.append(data)
+            continue
+        changes = {name: data[name] for name in _BOM_FIELDS if data[name] != before[name]}
+        if changes:
+            changes["id"] = item.id
+            delta.updated.append(changes)
+    seen = set(order)
+    delta.removed = [item_id for item_id in old if item_id not in seen]
+    replayed = [item_id for item_id in old if item_id in seen] + [data["id"] for data in delta.added]
+    delta.moves = _moves(replayed, order)
+    return delta
+
+
+def _moves(replayed: list[str], order: list[str]) -> list[tuple[str, int]]:
+    """Moves turning ``replayed`` into ``order`` (same ids): everything off one longest increasing run."""
+
+    position = {item_id: index for index, item_id in enumerate(replayed)}
+    ranks = [position[item_id] for item_id in order]
+    # Patience sorting: ``tails[k]`` ends the best run of length k + 1 found so far.
+    tails: list[int] = []
+    tail_index: list[int] = []
+    previous = [-1] * len(ranks)
+    for index, rank in enumerate(ranks):
+        length = bisect_left(tails, rank)
+        if length == len(tails):
+            tails.append(rank)
+            tail_index.append(index)
+        else:
+            tails[length] = rank
+            tail_index[length] = index
+        previous[index] = tail_index[length - 1] if length else -1
+    kept: set[int] = set()
+    index = tail_index[-1] if tail_index else -1
+    while index >= 0:
+        kept.add(index)
+        index = previous[index]
+    return [(item_id, index) for index, item_id in enumerate(order) if index not in kept]
+
+
+def apply_delta(items: list[BOMItem], delta: BOMDelta) -> list[BOMItem]:
+    """Apply ``delta`` to ``items``.
+
+    Removed items are dropped, updated items stay in place, added items are
+    appended, and ``delta.moves`` restore the upload order.
+    """
+
+    removed = set(delta.removed)
+    updates = {change["id"]: change for change in delta.updated}
+    result: list[BOMItem] = []
+    for item in items:
+        if item.id in removed:
+            continue
+        change = updates.get(item.id)
+        if change:
+            data = asdict(item)
+            data.update(change)
+            item = BOMItem(**data)
+        result.append(item)
+    result.extend(BOMItem(**data) for data in delta.added)
+    if delta.moves:
+        moved = {item_id for item_id, _ in delta.moves}
+        by_id = {item.id: item for item in result}
+        result = [item for item in result if item.id not in moved]
+        for item_id, index in delta.moves:
+            result.insert(index, by_id[item_id])
+    return result
+
+
+def snapshot_payload(items: Iterable[BOMItem]) -> dict:
+    return {"items": [asdict(item) for item in items]}
+
+
+def items_from_snapshot(payload: dict) -> list[BOMItem]:
+    return [BOMItem(**data) for data in payload.get("items", [])]
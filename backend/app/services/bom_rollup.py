@@ -0,0 +1,305 @@
+"""PCF and PCI roll-ups over the subassemblies of a hierarchical BOM.
+
+Every quantity is computed per unit first: a line's own contribution at quantity 1,
+and a subassembly's totals as its own line plus each child's per-unit totals times
+the child's quantity. PCF and all PCI mass flows are linear in mass, so totals in
+the product are the per-unit totals times the propagated quantity, and PCI/LFI
+(ratios of those sums) are the same per unit and in total.
+
+Per-unit totals of subassemblies that carry a ``component_code`` are memoized
+across products under the code, the subtree's content signature, the subtree's
+mapped LCI entries (dataset, provider, unit and stage per line), the scenario
+version and the PCF method. A product containing a known subassembly skips the
+subtree's PCF and PCI evaluation; a mapping override changes the key, so the
+subtree is evaluated again.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Callable, Collection, Iterator
+
+from ..core.config import get_settings
+from ..core.metrics import metrics
+from ..engines.circularity_engine_pci_bracquene2020 import product_indicators
+from ..engines.circularity_engine_pci_vectorized import VectorizedBracquene2020CircularityEngine, pack_bom
+from ..engines.pcf_engine_base import LCIEntry, LCIModel, PCFEngine
+from ..models.bom import BOMItem
+from ..models.method_profile import MethodProfile
+from ..models.product import Product
+from ..models.scenario import CompiledScenario
+from .bom_tree import BOMNode, BOMTree
+
+_AGGREGATES = ("V", "W", "R_net", "C_net", "V_linear", "W_linear")
+_FLOW_ATTRIBUTES = ("V", "W_total", "R_net", "C_net", "V_linear", "W_linear")
+_NO_FLOWS = (0.0,) * len(_AGGREGATES)
+
+
+@dataclass(frozen=True)
+class RollupTotals:
+    """Additive PCF/PCI sums for one unit of a line or subassembly."""
+
+    pcf_kg_co2e: float = 0.0
+    mass_kg: float = 0.0
+    weighted_pci: float = 0.0
+    aggregated: tuple[float, ...] = _NO_FLOWS
+    line_count: int = 0
+
+    def plus(self, other: "RollupTotals", quantity: float = 1.0) -> "RollupTotals":
+        return RollupTotals(
+            pcf_kg_co2e=self.pcf_kg_co2e + quantity * other.pcf_kg_co2e,
+            mass_kg=self.mass_kg + quantity * other.mass_kg,
+            weighted_pci=self.weighted_pci + quantity * other.weighted_pci,
+            aggregated=tuple(a + quantity * b for a, b in zip(self.aggregated, other.aggregated)),
+            line_count=self.line_count + other.line_count,
+        )
+
+    def indicators(self, utility_factor: float) -> tuple[float, float]:
+        """``(lfi, pci)`` of these sums."""
+
+        return product_indicators(dict(zip(_AGGREGATES, self.aggregated)), self.mass_kg, self.weighted_pci, utility_factor)
+
+
+@dataclass
+class SubassemblyRollup:
+    """Totals of one subassembly in the product (per-unit totals × propagated quantity)."""
+
+    item_id: str
+    parent_bom_item_id: str | None
+    component_code: str | None
+    description: str
+    depth: int
+    quantity: float
+    line_count: int
+    pcf_kg_co2e: float
+    mass_kg: float
+    pci: float
+    lfi: float
+    memoized: bool = False
+
+
+@dataclass
+class BOMRollup:
+    product_id: str
+    scenario_id: str
+    method_profile_id: str
+    pcf_kg_co2e: float
+    mass_kg: float
+    pci: float
+    lfi: float
+    lines_evaluated: int
+    memo_hits: int
+    subassemblies: list[SubassemblyRollup] = field(default_factory=list)
+
+
+class BOMRollupService:
+    """Builds the BOM tree and rolls PCF and PCI up through it, reusing shared subassemblies."""
+
+    def __init__(
+        self,
+        pcf_engine: PCFEngine,
+        circularity_engine: VectorizedBracquene2020CircularityEngine | None = None,
+        memo_entries: int | None = None,
+    ):
+        self.pcf_engine = pcf_engine
+        self.circularity_engine = circularity_engine or VectorizedBracquene2020CircularityEngine()
+        self.memo_entries = memo_entries or get_settings().bom_rollup_memo_entries
+        self._memo: OrderedDict[tuple, tuple[RollupTotals, ...]] = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def rollup(
+        self,
+        product: Product,
+        bom: list[BOMItem],
+        scenario: CompiledScenario,
+        method_profile: MethodProfile,
+        lci_model_builder: Callable[[list[BOMItem]], LCIModel] | None = None,
+    ) -> BOMRollup:
+        """Roll-ups for the product and each subassembly, in BOM pre-order.
+
+        ``lci_model_builder`` maps the lines (at quantity 1) to an LCI model; without
+        it the PCF engine maps them itself and memo keys assume a line's mapping
+        depends only on its content.
+        """
+
+        tree = BOMTree.build(bom)
+        method_id = method_profile.id.value
+        lci_model = lci_model_builder([replace(item, quantity=1.0) for item in bom]) if lci_model_builder else None
+        mapped = {entry.bom_item_id: entry for entry in lci_model.entries} if lci_model else None
+        mappings = _mapping_signatures(tree, mapped) if mapped is not None else {}
+        keys: dict[str, tuple] = {}
+        hits: dict[str, tuple[RollupTotals, ...]] = {}
+        pending: list[BOMNode] = []
+        stack = list(reversed(tree.roots))
+        while stack:
+            node = tree[stack.pop()]
+            code = node.item.component_code
+            # Without ``updated_at`` a scenario edit cannot be detected, so nothing is memoized.
+            if node.is_subassembly and code and scenario.updated_at is not None:
+                key = (code, tree.signature(node.item.id), mappings.get(node.item.id), scenario.cache_key, method_id)
+                cached = self._memo_get(key)
+                if cached is not None:
+                    hits[node.item.id] = cached
+                    continue
+                keys[node.item.id] = key
+            pending.append(node)
+            stack.extend(reversed(node.children))
+
+        own = self._line_totals(product, [node.item for node in pending], scenario, method_profile, mapped)
+
+        unit: dict[str, RollupTotals] = {}
+        for item_id, cached in hits.items():
+            for node, totals in zip(_canonical_subassemblies(tree, item_id, mappings), cached):
+                unit[node.item.id] = totals
+        for node in reversed(pending):
+            totals = own[node.item.id]
+            for child in node.children:
+                totals = totals.plus(unit[child], tree[child].item.quantity or 0.0)
+            unit[node.item.id] = totals
+        for item_id, key in keys.items():
+            self._memo_put(key, tuple(unit[node.item.id] for node in _canonical_subassemblies(tree, item_id, mappings)))
+        if hits:
+            metrics.inc("bom_rollup_memo_hits_total", len(hits), description="Subassembly roll-ups reused from the memo")
+        if keys:
+            metrics.inc("bom_rollup_memo_misses_total", len(keys), description="Subassembly roll-ups computed and memoized")
+
+        memoized = set(hits)
+        subassemblies: list[SubassemblyRollup] = []
+        for node in tree.preorder():
+            if node.item.id in memoized:
+                memoized.update(node.children)
+            if not node.is_subassembly:
+                continue
+            totals = unit[node.item.id]
+            lfi, pci = totals.indicators(scenario.utility_factor)
+            subassemblies.append(
+                SubassemblyRollup(
+                    item_id=node.item.id,
+                    parent_bom_item_id=node.item.parent_bom_item_id,
+                    component_code=node.item.component_code,
+                    description=node.item.description,
+                    depth=node.depth,
+                    quantity=node.effective_quantity,
+                    line_count=totals.line_count,
+                    pcf_kg_co2e=totals.pcf_kg_co2e * node.effective_quantity,
+                    mass_kg=totals.mass_kg * node.effective_quantity,
+                    pci=pci,
+                    lfi=lfi,
+                    memoized=node.item.id in memoized,
+                )
+            )
+
+        product_totals = RollupTotals()
+        for root in tree.roots:
+            product_totals = product_totals.plus(unit[root], tree[root].item.quantity or 0.0)
+        lfi, pci = product_totals.indicators(scenario.utility_factor)
+        return BOMRollup(
+            product_id=product.id,
+            scenario_id=scenario.id,
+            method_profile_id=method_id,
+            pcf_kg_co2e=product_totals.pcf_kg_co2e,
+            mass_kg=product_totals.mass_kg,
+            pci=pci,
+            lfi=lfi,
+            lines_evaluated=len(pending),
+            memo_hits=len(hits),
+            subassemblies=subassemblies,
+        )
+
+    def _line_totals(
+        self,
+        product: Product,
+        items: list[BOMItem],
+        scenario: CompiledScenario,
+        method_profile: MethodProfile,
+        mapped: dict[str, LCIEntry] | None,
+    ) -> dict[str, RollupTotals]:
+        """Each line's own contribution at quantity 1, excluding its children."""
+
+        if not items:
+            return {}
+        unit_items = [replace(item, quantity=1.0) for item in items]
+        lci_model = (
+            LCIModel(unit_items, [mapped[item.id] for item in unit_items if item.id in mapped])
+            if mapped is not None
+            else None
+        )
+        pcf = self.pcf_engine.calculate_pcf(
+            product=product,
+            bom_items=unit_items,
+            scenario=scenario.scenario,
+            method_profile=method_profile,
+            lci_model=lci_model,
+        ).breakdown_by_item
+        arrays = pack_bom(unit_items, scenario)
+        flows = dict(zip(arrays.item_ids, self.circularity_engine.calculate_pci_arrays(arrays).per_material_flows))
+        totals: dict[str, RollupTotals] = {}
+        for item in unit_items:
+            line = flows.get(item.id)
+            totals[item.id] = RollupTotals(
+                pcf_kg_co2e=pcf.get(item.id, 0.0),
+                mass_kg=line.mass if line else 0.0,
+                weighted_pci=line.PCI_material * line.mass if line else 0.0,
+                aggregated=tuple(getattr(line, name) for name in _FLOW_ATTRIBUTES) if line else _NO_FLOWS,
+                line_count=1,
+            )
+        return totals
+
+    def invalidate(self, component_codes: Collection[str] | None = None) -> int:
+        """Drop memoized subassemblies with one of ``component_codes`` (all without); returns entries dropped."""
+
+        with self._memo_lock:
+            stale = [key for key in self._memo if component_codes is None or key[0] in component_codes]
+            for key in stale:
+                del self._memo[key]
+            return len(stale)
+
+    def _memo_get(self, key: tuple) -> tuple[RollupTotals, ...] | None:
+        with self._memo_lock:
+            cached = self._memo.get(key)
+            if cached is not None:
+                self._memo.move_to_end(key)
+            return cached
+
+    def _memo_put(self, key: tuple, value: tuple[RollupTotals, ...]) -> None:
+        with self._memo_lock:
+            self._memo[key] = value
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+
+
+def _mapping_signatures(tree: BOMTree, mapped: dict[str, LCIEntry]) -> dict[str, str]:
+    """Hash of each subtree's mapped entries, independent of item ids and BOM order like :meth:`BOMTree.signature`."""
+
+    signatures: dict[str, str] = {}
+    for node in tree.postorder():
+        entry = mapped.get(node.item.id)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(
+            repr((entry.dataset_id, entry.provider, entry.unit, entry.life_cycle_stage) if entry else None).encode()
+        )
+        children = sorted(
+            (tree[child].item.quantity or 0.0, tree.signature(child), signatures[child]) for child in node.children
+        )
+        for child in children:
+            digest.update(repr(child).encode())
+        signatures[node.item.id] = digest.hexdigest()
+    return signatures
+
+
+def _canonical_subassemblies(tree: BOMTree, item_id: str, mappings: dict[str, str]) -> Iterator[BOMNode]:
+    """Subassemblies under ``item_id`` (inclusive) in an order independent of item ids and BOM order."""
+
+    stack = [item_id]
+    while stack:
+        node = tree[stack.pop()]
+        if node.is_subassembly:
+            yield node
+            ordered = sorted(
+                node.children,
+                key=lambda child: (tree[child].item.quantity or 0.0, tree.signature(child), mappings.get(child, "")),
+            )
+            stack.extend(reversed(ordered))
@@ -0,0 +1,156 @@
+"""Parent/child structure of a BOM.
+
+BOM lines reference their parent through ``parent_bom_item_id``; a line's
+``quantity`` is per unit of its parent, so the quantity a product actually contains
+is the product of quantities along the path to the root. :class:`BOMTree` builds
+the child lists in one pass, rejects dangling parents and cycles, and exposes
+pre/post-order traversals that never recurse (BOMs can be arbitrarily deep).
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, fields, replace
+from typing import Iterable, Iterator
+
+from ..models.bom import BOMItem
+
+# Fields that identify where a line sits rather than what it is.
+_POSITION_FIELDS = {"id", "product_id", "parent_bom_item_id", "quantity"}
+_CONTENT_FIELDS = [f.name for f in fields(BOMItem) if f.name not in _POSITION_FIELDS]
+
+
+class BOMStructureError(ValueError):
+    """A BOM whose parent references do not form a forest."""
+
+
+@dataclass(frozen=True)
+class BOMNode:
+    item: BOMItem
+    children: tuple[str, ...]
+    depth: int
+    effective_quantity: float
+
+    @property
+    def is_subassembly(self) -> bool:
+        return bool(self.children)
+
+
+class BOMTree:
+    """Forest of BOM lines keyed by item id, with children in BOM order."""
+
+    def __init__(self, nodes: dict[str, BOMNode], roots: tuple[str, ...], order: tuple[str, ...]):
+        self.nodes = nodes
+        self.roots = roots
+        self._preorder = order
+        self._signatures: dict[str, str] | None = None
+
+    @classmethod
+    def build(cls, items: Iterable[BOMItem]) -> "BOMTree":
+        """Index ``items`` in O(n); raise :class:`BOMStructureError` on bad references."""
+
+        items = list(items)
+        by_id: dict[str, BOMItem] = {}
+        for item in items:
+            if item.id in by_id:
+                raise BOMStructureError(f"Duplicate BOM item id '{item.id}'")
+            by_id[item.id] = item
+        children: dict[str, list[str]] = {item.id: [] for item in items}
+        roots: list[str] = []
+        for item in items:
+            parent = item.parent_bom_item_id
+            if not parent:
+                roots.append(item.id)
+            elif parent not in by_id:
+                raise BOMStructureError(f"BOM item '{item.id}' references unknown parent '{parent}'")
+            else:
+                children[parent].append(item.id)
+
+        # Every line reachable from a root is in the forest; anything left over hangs
+        # off a parent chain that never reaches a root, i.e. a cycle.
+        nodes: dict[str, BOMNode] = {}
+        order: list[str] = []
+        stack = [(item_id, 0, 1.0) for item_id in reversed(roots)]
+        while stack:
+            item_id, depth, parent_quantity = stack.pop()
+            item = by_id[item_id]
+            quantity = parent_quantity * (item.quantity or 0.0)
+            nodes[item_id] = BOMNode(item, tuple(children[item_id]), depth, quantity)
+            order.append(item_id)
+            stack.extend((child, depth + 1, quantity) for child in reversed(children[item_id]))
+        if len(nodes) != len(by_id):
+            raise BOMStructureError(f"BOM contains a parent cycle: {' -> '.join(_find_cycle(by_id, nodes))}")
+        return cls(nodes, tuple(roots), tuple(order))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __getitem__(self, item_id: str) -> BOMNode:
+        return self.nodes[item_id]
+
+    def preorder(self) -> Iterator[BOMNode]:
+        """Parents before children, siblings in BOM order."""
+
+        return (self.nodes[item_id] for item_id in self._preorder)
+
+    def postorder(self) -> Iterator[BOMNode]:
+        """Children before parents."""
+
+        return (self.nodes[item_id] for item_id in reversed(self._preorder))
+
+    def subtree(self, item_id: str) -> Iterator[BOMNode]:
+        """``item_id`` and all its descendants in pre-order."""
+
+        stack = [item_id]
+        while stack:
+            node = self.nodes[stack.pop()]
+            yield node
+            stack.extend(reversed(node.children))
+
+    def flatten(self) -> list[BOMItem]:
+        """Lines in pre-order with ``quantity`` replaced by the propagated quantity."""
+
+        return [replace(node.item, quantity=node.effective_quantity) for node in self.preorder()]
+
+    def signature(self, item_id: str) -> str:
+        """Content hash of one unit of the subtree rooted at ``item_id``.
+
+        It covers every line's content fields and the children's quantities, but not
+        item ids or the root's own quantity, so the same subassembly gets the same
+        signature in every product that contains it.
+        """
+
+        if self._signatures is None:
+            signatures: dict[str, str] = {}
+            for node in self.postorder():
+                digest = hashlib.blake2b(digest_size=16)
+                digest.update(repr(tuple(getattr(node.item, name) for name in _CONTENT_FIELDS)).encode())
+                for child in sorted((self.nodes[c].item.quantity or 0.0, signatures[c]) for c in node.children):
+                    digest.update(repr(child).encode())
+                signatures[node.item.id] = digest.hexdigest()
+            self._signatures = signatures
+        return self._signatures[item_id]
+
+
+def propagate_quantities(items: list[BOMItem]) -> list[BOMItem]:
+    """``items`` in BOM order with ``quantity`` replaced by the quantity per product.
+
+    PCF and PCI calculations take this form, so nested lines count once per unit
+    of every ancestor, as in the roll-up. Flat BOMs are returned unchanged.
+    """
+
+    if not any(item.parent_bom_item_id for item in items):
+        return items
+    tree = BOMTree.build(items)
+    return [replace(item, quantity=tree[item.id].effective_quantity) for item in items]
+
+
+def _find_cycle(by_id: dict[str, BOMItem], reached: dict[str, BOMNode]) -> list[str]:
+    start = next(item_id for item_id in by_id if item_id not in reached)
+    path: list[str] = []
+    seen: dict[str, int] = {}
+    item_id = start
+    while item_id not in seen:
+        seen[item_id] = len(path)
+        path.append(item_id)
+        item_id = by_id[item_id].parent_bom_item_id
+    return path[seen[item_id]:] + [item_id]
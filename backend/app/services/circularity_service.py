@@ -1,34 +1,183 @@
 """Circularity orchestration service."""
 from __future__ import annotations
 
-from dataclasses import asdict
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable, Collection, Mapping, Sequence
 
+from ..core.config import get_settings
+from ..core.metrics import metrics
 from ..engines.circularity_engine_base import CircularityEngine
+from ..engines.circularity_engine_pci_incremental import IncrementalPCI
+from ..engines.circularity_engine_pci_vectorized import pack_bom
 from ..models.bom import BOMItem
-from ..models.pci import PCIResult
+from ..models.pci import PCIResult, pci_result_payload
 from ..models.product import Product
 from ..models.results import ResultSet
-from ..models.scenario import Scenario
+from ..models.scenario import CompiledScenario, Scenario, compile_scenario
+from .pci_goal_seek import GoalSeekResult, GoalVariable, PCIGoalSeek
+from .pci_sensitivity import PCISensitivityResult, pci_sensitivities
+from .pci_sweep import PCISweep, SweepAxis
+from .pci_uncertainty import (
+    DEFAULT_PERCENTILES,
+    ParameterDistribution,
+    PCIMonteCarlo,
+    PCIUncertaintyResult,
+    default_workers,
+)
 
 
 class CircularityService:
     """Coordinates PCI calculations."""
 
-    def __init__(self, engine: CircularityEngine):
+    def __init__(
+        self,
+        engine: CircularityEngine,
+        incremental_entries: int | None = None,
+        monte_carlo_executor: Callable[[], Executor | None] | None = None,
+    ):
         self.engine = engine
+        self.monte_carlo_executor = monte_carlo_executor
+        self.incremental_entries = incremental_entries or get_settings().pci_incremental_cache_entries
+        self._incremental: OrderedDict[tuple[str, str], tuple[IncrementalPCI, threading.Lock]] = OrderedDict()
+        self._incremental_lock = threading.Lock()
 
-    def calculate_pci(self, product: Product, bom: list[BOMItem], scenario: Scenario) -> PCIResult:
+    def _monte_carlo_executor(self) -> Executor | None:
+        """The shared pool for Monte Carlo chunks, or ``None`` to create one per run (or run in-process)."""
+
+        return self.monte_carlo_executor() if self.monte_carlo_executor is not None else None
+
+    def calculate_pci(
+        self, product: Product, bom: list[BOMItem], scenario: Scenario | CompiledScenario
+    ) -> PCIResult:
         return self.engine.calculate_pci(product, bom, scenario)
 
-    def run(self, product: Product, bom: list[BOMItem], scenario: Scenario) -> ResultSet:
+    def calculate_pci_incremental(
+        self, product: Product, bom: list[BOMItem], scenario: Scenario | CompiledScenario
+    ) -> PCIResult:
+        """PCI reusing cached per-item flows from the last call for this product and scenario.
+
+        Only lines whose inputs changed since then are recomputed. Cached state is
+        dropped when the scenario's ``cache_key`` changes and evicted least recently
+        used beyond ``incremental_entries`` products.
+        """
+
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        key = (product.id, compiled.id)
+        with self._incremental_lock:
+            entry = self._incremental.get(key)
+            # Without ``updated_at`` a scenario edit cannot be detected, so nothing is reused.
+            if entry is None or entry[0].scenario.cache_key != compiled.cache_key or compiled.updated_at is None:
+                entry = (IncrementalPCI(compiled), threading.Lock())
+                metrics.inc("pci_incremental_misses_total", description="PCI requests without cached item flows")
+            else:
+                metrics.inc("pci_incremental_hits_total", description="PCI requests reusing cached item flows")
+            self._incremental[key] = entry
+            self._incremental.move_to_end(key)
+            while len(self._incremental) > self.incremental_entries:
+                self._incremental.popitem(last=False)
+        state, lock = entry
+        with lock:
+            return state.refresh(bom)
+
+    def invalidate(self, product_ids: Collection[str], scenario_ids: Collection[str] | None = None) -> int:
+        """Drop cached item flows of ``product_ids`` (optionally only for ``scenario_ids``); returns entries dropped."""
+
+        products = set(product_ids)
+        scenarios = None if scenario_ids is None else set(scenario_ids)
+        with self._incremental_lock:
+            stale = [
+                key for key in self._incremental if key[0] in products and (scenarios is None or key[1] in scenarios)
+            ]
+            for key in stale:
+                del self._incremental[key]
+        return len(stale)
+
+    def run(self, product: Product, bom: list[BOMItem], scenario: Scenario | CompiledScenario) -> ResultSet:
         pci_result = self.calculate_pci(product, bom, scenario)
         return ResultSet(
             id="result-circularity-demo",
             product_id=product.id,
             scenario_id=scenario.id,
-            method_profile_id=scenario.method_profile_id,
+            method_profile_id=_scenario_of(scenario).method_profile_id,
             pcf_total_kg_co2e=0.0,
             pcf_breakdown={},
-            circularity_indicators={"pci_result": asdict(pci_result)},
-            provenance={"engine": "Bracquene2020CircularityEngine"},
+            circularity_indicators={"pci_result": pci_result_payload(pci_result)},
+            provenance={"engine": type(self.engine).__name__},
+            bom_revision=product.bom_revision,
+        )
+
+    def sweep(
+        self,
+        bom: list[BOMItem],
+        scenario: Scenario | CompiledScenario,
+        axes: Sequence[SweepAxis] = (),
+        points: Sequence[Mapping[str, float]] | None = None,
+    ) -> PCISweep:
+        """Prepare a PCI sweep over ``axes`` (Cartesian grid) or explicit ``points``.
+
+        Sweeps only vary scenario and material parameters, so lines with identical
+        inputs are merged first and each grid point costs one evaluation per group.
+        """
+
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        settings = get_settings()
+        return PCISweep(
+            pack_bom(bom, compiled).aggregate().arrays,
+            axes=axes,
+            points=points,
+            max_points=settings.pci_sweep_max_points,
+            chunk_elements=settings.pci_sweep_chunk_elements,
         )
+
+    def sensitivity(
+        self, bom: list[BOMItem], scenario: Scenario | CompiledScenario, relative_step: float = 0.1, top: int = 10
+    ) -> PCISensitivityResult:
+        """Closed-form ∂PCI/∂parameter for all scenario parameters and BOM shares, plus a tornado ranking."""
+
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        return pci_sensitivities(pack_bom(bom, compiled), relative_step=relative_step, top=top)
+
+    def goal_seek(
+        self,
+        bom: list[BOMItem],
+        scenario: Scenario | CompiledScenario,
+        target_pci: float,
+        variables: Sequence[GoalVariable],
+        tolerance: float = 1e-6,
+    ) -> GoalSeekResult:
+        """Smallest bound-normalized change of ``variables`` that brings the product PCI to ``target_pci``."""
+
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        return PCIGoalSeek(pack_bom(bom, compiled), variables, tolerance=tolerance).solve(target_pci)
+
+    def uncertainty(
+        self,
+        bom: list[BOMItem],
+        scenario: Scenario | CompiledScenario,
+        distributions: Sequence[ParameterDistribution],
+        samples: int,
+        seed: int = 0,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    ) -> PCIUncertaintyResult:
+        """Monte Carlo PCI statistics for the product and each material."""
+
+        settings = get_settings()
+        if samples > settings.pci_monte_carlo_max_samples:
+            raise ValueError(f"{samples} samples requested; the limit is {settings.pci_monte_carlo_max_samples}")
+        compiled = scenario if isinstance(scenario, CompiledScenario) else compile_scenario(scenario)
+        monte_carlo = PCIMonteCarlo(
+            pack_bom(bom, compiled),
+            distributions,
+            chunk_elements=settings.pci_monte_carlo_chunk_elements,
+            histogram_bins=settings.pci_monte_carlo_histogram_bins,
+        )
+        workers = settings.pci_monte_carlo_workers or default_workers()
+        return monte_carlo.run(
+            samples, seed=seed, workers=workers, percentiles=percentiles, executor=self._monte_carlo_executor()
+        )
+
+
+def _scenario_of(scenario: Scenario | CompiledScenario) -> Scenario:
+    return scenario.scenario if isinstance(scenario, CompiledScenario) else scenario
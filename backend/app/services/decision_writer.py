@@ -0,0 +1,212 @@
+"""Write-behind persistence for mapping decision rows.
+
+``DecisionWriter`` accepts ready-to-insert ``mapping_decisions`` rows and applies
+one of three durability modes:
+
+* ``sync`` – every row is inserted and committed before :meth:`submit` returns.
+* ``batched`` – rows go through the queue and are committed in group transactions;
+  callers block in :meth:`settle` until their rows are durable.
+* ``async`` – rows go through the queue and callers return immediately; rows still
+  pending when the process dies are lost.
+
+The queue is bounded: producers block in :meth:`submit` while it is full, which is
+the backpressure signal when the database cannot keep up.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..core.config import get_settings
+from ..core.metrics import metrics
+from ..db.base import get_session
+from ..db.models import MappingDecisionModel
+from .dependency_index import decision_edges, upsert_edges
+
+LOGGER = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("sync", "batched", "async")
+
+_STOP = object()
+
+
+class DecisionWriteError(RuntimeError):
+    """Raised to callers waiting on rows whose batch failed to commit."""
+
+
+class DecisionWriter:
+    """Bounded write-behind queue drained by a single background thread."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = get_session,
+        durability: str = "sync",
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown decision durability '{durability}', expected one of {DURABILITY_MODES}")
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._condition = threading.Condition()
+        self._submit_lock = threading.Lock()
+        self._submitted = 0
+        self._committed = 0
+        self._failed: list[tuple[int, int]] = []
+        self._local = threading.local()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_settings(cls) -> "DecisionWriter":
+        settings = get_settings()
+        return cls(
+            durability=settings.mapping_decision_durability,
+            max_queue=settings.mapping_decision_queue_size,
+            batch_size=settings.mapping_decision_batch_size,
+            flush_interval=settings.mapping_decision_flush_interval_ms / 1000,
+        )
+
+    @property
+    def deferred(self) -> bool:
+        """Whether rows go through the background queue rather than the caller's session."""
+
+        return self.durability != "sync"
+
+    @property
+    def pending(self) -> int:
+        """Rows submitted but not yet committed (or failed)."""
+
+        with self._condition:
+            return self._submitted - self._committed
+
+    def submit(self, row: dict) -> int:
+        """Persist ``row`` according to the durability mode and return its sequence number."""
+
+        if self.durability == "sync":
+            with self._condition:
+                self._submitted += 1
+                seq = self._submitted
+            self._write_batch([(seq, row)])
+            self._local.last_seq = seq
+            return seq
+        # Producers are serialized so queue order always matches sequence order; a
+        # producer blocked on a full queue holds back the others (backpressure).
+        with self._submit_lock:
+            self._ensure_thread()
+            with self._condition:
+                self._submitted += 1
+                seq = self._submitted
+            try:
+                self._queue.put_nowait((seq, row))
+            except queue.Full:
+                metrics.inc("mapping_decision_backpressure_total", description="Submits that waited on a full queue")
+                self._queue.put((seq, row))
+        self._report_depth()
+        self._local.last_seq = seq
+        return seq
+
+    def settle(self) -> None:
+        """Block until this thread's rows are durable when running in ``batched`` mode."""
+
+        seq = getattr(self._local, "last_seq", 0)
+        if self.durability == "batched" and seq:
+            self.wait(seq)
+
+    def wait(self, seq: int, timeout: float | None = None) -> None:
+        """Block until row ``seq`` has been committed, raising if its batch failed."""
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._committed >= seq, timeout=timeout):
+                raise TimeoutError(f"Decision {seq} not committed within {timeout}s")
+            if any(lo <= seq <= hi for lo, hi in self._failed):
+                raise DecisionWriteError(f"Decision {seq} could not be written")
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until every row submitted so far has been processed."""
+
+        with self._condition:
+            target = self._submitted
+            self._condition.wait_for(lambda: self._committed >= target, timeout=timeout)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Flush pending rows and stop the background thread.
+
+        A later :meth:`submit` starts a new thread, so closing is safe across repeated
+        application lifespans in one process.
+        """
+
+        with self._submit_lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="decision-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._write_batch(batch)
+            self._report_depth()
+            if stop:
+                return
+
+    def _write_batch(self, batch: list[tuple[int, dict]]) -> None:
+        started = time.perf_counter()
+        failed = False
+        try:
+            with self._session_factory() as session:
+                rows = [row for _, row in batch]
+                session.execute(insert(MappingDecisionModel), rows)
+                upsert_edges(session, decision_edges(rows))
+                session.commit()
+        except Exception:
+            failed = True
+            LOGGER.exception("Failed to write %d mapping decision(s)", len(batch))
+            metrics.inc("mapping_decision_write_errors_total", len(batch), "Decision rows that failed to commit")
+        elapsed = time.perf_counter() - started
+        metrics.inc("mapping_decision_flushes_total", description="Decision write transactions")
+        if not failed:
+            metrics.inc("mapping_decision_rows_written_total", len(batch), "Decision rows committed")
+        metrics.set_gauge("mapping_decision_flush_seconds", elapsed, "Duration of the last decision flush")
+        metrics.inc("mapping_decision_flush_seconds_total", elapsed, "Cumulative decision flush duration")
+        with self._condition:
+            if failed:
+                self._failed.append((batch[0][0], batch[-1][0]))
+                del self._failed[:-100]
+            self._committed = max(self._committed, batch[-1][0])
+            self._condition.notify_all()
+        if failed and self.durability == "sync":
+            raise DecisionWriteError(f"Decision {batch[-1][0]} could not be written")
+
+    def _report_depth(self) -> None:
+        metrics.set_gauge("mapping_decision_queue_depth", self._queue.qsize(), "Decisions waiting to be written")
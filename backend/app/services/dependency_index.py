@@ -0,0 +1,143 @@
+"""Reverse index of what products, BOM items and results depend on.
+
+Edges are written in the same transaction as the rows they describe: mapping
+decisions give ``dataset`` (selected dataset id → BOM item) and ``rule`` (rule
+code → BOM item) edges, stored results give ``scenario`` (scenario id → result
+set) edges. Only the latest decision per item counts, so a new decision replaces
+the item's edges rather than adding to them.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Sequence
+
+from sqlalchemy import delete, desc, func, select
+from sqlalchemy.orm import Session
+
+from ..db.base import get_session
+from ..db.models import DependencyEdgeModel, MappingDecisionModel, ResultSetModel, utcnow
+
+DEPENDENCY_KINDS = ("dataset", "rule", "scenario")
+# Rows per statement, well below SQLite's expression-depth and bound-parameter limits.
+_STATEMENT_ROWS = 500
+
+
+@dataclass(frozen=True)
+class WhereUsed:
+    """Products depending on one ``(kind, key)`` and, per product, the depending subjects."""
+
+    kind: str
+    key: str
+    subjects: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def product_ids(self) -> list[str]:
+        return list(self.subjects)
+
+
+def decision_edges(rows: Iterable[dict]) -> list[dict]:
+    """Edges implied by ``mapping_decisions`` rows; a ``None`` key removes the item's edge of that kind."""
+
+    edges = []
+    for row in rows:
+        subject = {"product_id": row["product_id"], "subject_id": row["bom_item_id"]}
+        edges.append({"kind": "dataset", "key": row.get("selected_dataset_id"), **subject})
+        edges.append({"kind": "rule", "key": row.get("rule_applied"), **subject})
+    return edges
+
+
+def result_edges(rows: Iterable[dict]) -> list[dict]:
+    """``scenario`` edges for ``result_sets`` rows."""
+
+    return [
+        {"kind": "scenario", "key": row["scenario_id"], "product_id": row["product_id"], "subject_id": row["id"]}
+        for row in rows
+    ]
+
+
+def upsert_edges(session: Session, edges: Sequence[dict]) -> None:
+    """Point each edge's subject at its key, in the caller's transaction; the last edge per subject wins."""
+
+    latest = {(edge["kind"], edge["product_id"], edge["subject_id"]): edge for edge in edges}
+    if not latest:
+        return
+    removed: dict[tuple[str, str], list[str]] = {}
+    for (kind, product_id, subject_id), edge in latest.items():
+        if edge["key"] is None:
+            removed.setdefault((kind, product_id), []).append(subject_id)
+    for (kind, product_id), subject_ids in removed.items():
+        for start in range(0, len(subject_ids), _STATEMENT_ROWS):
+            session.execute(
+                delete(DependencyEdgeModel).where(
+                    DependencyEdgeModel.kind == kind,
+                    DependencyEdgeModel.product_id == product_id,
+                    DependencyEdgeModel.subject_id.in_(subject_ids[start : start + _STATEMENT_ROWS]),
+                )
+            )
+    now = utcnow()
+    rows = [{**edge, "updated_at": now} for edge in latest.values() if edge["key"] is not None]
+    if not rows:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    for start in range(0, len(rows), _STATEMENT_ROWS):
+        stmt = dialect_insert(DependencyEdgeModel).values(rows[start : start + _STATEMENT_ROWS])
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["kind", "product_id", "subject_id"],
+                set_={"key": stmt.excluded.key, "updated_at": stmt.excluded.updated_at},
+            )
+        )
+
+
+class DependencyIndex:
+    """Where-used queries over ``dependency_edges``."""
+
+    def __init__(self, session_factory: Callable = get_session):
+        self._session_factory = session_factory
+
+    def where_used(self, kind: str, key: str) -> WhereUsed:
+        if kind not in DEPENDENCY_KINDS:
+            raise ValueError(f"Unknown dependency kind '{kind}', expected one of {DEPENDENCY_KINDS}")
+        stmt = (
+            select(DependencyEdgeModel.product_id, DependencyEdgeModel.subject_id)
+            .where(DependencyEdgeModel.kind == kind, DependencyEdgeModel.key == key)
+            .order_by(DependencyEdgeModel.product_id, DependencyEdgeModel.subject_id)
+        )
+        subjects: dict[str, list[str]] = {}
+        with self._session_factory() as session:
+            for product_id, subject_id in session.execute(stmt):
+                subjects.setdefault(product_id, []).append(subject_id)
+        return WhereUsed(kind=kind, key=key, subjects=subjects)
+
+    def rebuild(self) -> int:
+        """Recreate all edges from the latest decision per BOM item and the stored results; returns the edge count.
+
+        Used once for databases that predate the index.
+        """
+
+        with self._session_factory() as session:
+            session.execute(delete(DependencyEdgeModel))
+            latest = select(
+                MappingDecisionModel.product_id,
+                MappingDecisionModel.bom_item_id,
+                MappingDecisionModel.selected_dataset_id,
+                MappingDecisionModel.rule_applied,
+                func.row_number()
+                .over(partition_by=MappingDecisionModel.bom_item_id, order_by=desc(MappingDecisionModel.created_at))
+                .label("position"),
+            ).subquery()
+            decisions = session.execute(select(latest).where(latest.c.position == 1)).mappings().all()
+            results = session.execute(
+                select(ResultSetModel.id, ResultSetModel.product_id, ResultSetModel.scenario_id)
+            ).mappings().all()
+            edges = [edge for edge in decision_edges(decisions) if edge["key"] is not None] + result_edges(results)
+            upsert_edges(session, edges)
+            session.commit()
+        return len(edges)
+
+    def is_empty(self) -> bool:
+        with self._session_factory() as session:
+            return session.scalar(select(DependencyEdgeModel.id).limit(1)) is None
@@ -0,0 +1,171 @@
+"""Targeted invalidation of cached and stored results after an upstream change.
+
+A changed dataset, mapping rule or scenario is looked up in the
+:class:`~.dependency_index.DependencyIndex`; only the products depending on it
+lose their incremental PCF/PCI state and have their stored results flagged
+stale. Optionally the affected products are re-run by a :class:`RecomputeQueue`.
+
+A changed dataset also reloads the PCF engine's LCI database, which drops every
+factor-derived cache (unit impacts, incremental PCF state, BOM roll-up memo).
+Engines that cannot reload (the precomputed impact store) only pick up new
+factors after a restart, so recomputation is not offered for them.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Collection
+
+from ..core.metrics import metrics
+from .bom_rollup import BOMRollupService
+from .circularity_service import CircularityService
+from .dependency_index import DependencyIndex
+from .pcf_service import PCFService
+from .portfolio_runner import PortfolioJobs, PortfolioSelection
+from .result_repository import ResultRepository
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class InvalidationReport:
+    kind: str
+    key: str
+    product_ids: list[str]
+    cached_entries_dropped: int
+    results_marked_stale: int
+    recompute_queued: bool
+    datasets_reloaded: bool = False
+
+
+class RecomputeQueue:
+    """Re-runs invalidated products as portfolio runs, one at a time on a background thread.
+
+    Products queued while a run is in progress are coalesced into the next run;
+    their scenarios are merged, ``None`` meaning every scenario.
+    """
+
+    def __init__(self, jobs: PortfolioJobs):
+        self.jobs = jobs
+        self.last_job_id: str | None = None
+        self._pending: dict[str, set[str] | None] = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def submit(self, product_ids: Collection[str], scenario_ids: Collection[str] | None = None) -> None:
+        if not product_ids:
+            return
+        with self._condition:
+            for product_id in product_ids:
+                if product_id in self._pending and self._pending[product_id] is None:
+                    continue
+                if scenario_ids is None:
+                    self._pending[product_id] = None
+                else:
+                    self._pending.setdefault(product_id, set()).update(scenario_ids)
+            self._ensure_thread()
+            self._condition.notify_all()
+        metrics.inc("dependency_recompute_products_total", len(product_ids), "Products queued for recomputation")
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until nothing is queued or running; returns ``False`` on timeout."""
+
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._running, timeout=timeout)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="dependency-recompute", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: bool(self._pending))
+                pending, self._pending = self._pending, {}
+                self._running = True
+            try:
+                for selection in _selections(pending):
+                    progress = self.jobs.start(selection, background=False)
+                    self.last_job_id = progress.job_id
+            except Exception:
+                LOGGER.exception("Recomputation of %d product(s) failed", len(pending))
+            finally:
+                with self._condition:
+                    self._running = False
+                    self._condition.notify_all()
+
+
+def _selections(pending: dict[str, set[str] | None]) -> list[PortfolioSelection]:
+    """One portfolio selection per distinct scenario set, in first-queued order."""
+
+    groups: dict[tuple[str, ...] | None, list[str]] = {}
+    for product_id, scenario_ids in pending.items():
+        groups.setdefault(None if scenario_ids is None else tuple(sorted(scenario_ids)), []).append(product_id)
+    return [
+        PortfolioSelection(product_ids=tuple(product_ids), scenario_ids=scenario_ids)
+        for scenario_ids, product_ids in groups.items()
+    ]
+
+
+class InvalidationService:
+    """Applies a dataset, rule or scenario change to exactly the products depending on it."""
+
+    def __init__(
+        self,
+        index: DependencyIndex,
+        result_repository: ResultRepository,
+        pcf_service: PCFService,
+        circularity_service: CircularityService,
+        recompute_queue: RecomputeQueue | None = None,
+        rollup_service: BOMRollupService | None = None,
+    ):
+        self.index = index
+        self.result_repository = result_repository
+        self.pcf_service = pcf_service
+        self.circularity_service = circularity_service
+        self.recompute_queue = recompute_queue
+        self.rollup_service = rollup_service
+
+    def invalidate(self, kind: str, key: str, recompute: bool | None = None) -> InvalidationReport:
+        """Invalidate everything depending on ``(kind, key)``; ``recompute`` defaults to whether a queue is configured."""
+
+        reload = kind == "dataset" and self.pcf_service.reloads_datasets
+        if recompute is None:
+            recompute = self.recompute_queue is not None and (kind != "dataset" or reload)
+        if recompute and self.recompute_queue is None:
+            raise ValueError("Background recomputation is not enabled")
+        if recompute and kind == "dataset" and not reload:
+            raise ValueError("This PCF engine only picks up new dataset factors after a restart; recompute then")
+        product_ids = self.index.where_used(kind, key).product_ids
+        # PCF state is kept per method, not per scenario, so it goes for every kind of change.
+        scenario_ids = [key] if kind == "scenario" else None
+        if reload:
+            dropped = self.pcf_service.reload_datasets()
+            if self.rollup_service is not None:
+                dropped += self.rollup_service.invalidate()
+        else:
+            dropped = self.pcf_service.invalidate(product_ids)
+        if scenario_ids is not None:
+            dropped += self.circularity_service.invalidate(product_ids, scenario_ids)
+        stale = self.result_repository.mark_stale(product_ids, scenario_ids)
+        if recompute:
+            self.recompute_queue.submit(product_ids, scenario_ids)
+        metrics.inc("dependency_invalidations_total", description="Dependency invalidations applied")
+        metrics.inc("dependency_invalidated_products_total", len(product_ids), "Products invalidated by dependency changes")
+        return InvalidationReport(
+            kind=kind,
+            key=key,
+            product_ids=product_ids,
+            cached_entries_dropped=dropped,
+            results_marked_stale=stale,
+            recompute_queued=bool(recompute and product_ids),
+            datasets_reloaded=reload,
+        )
@@ -2,45 +2,114 @@
 from __future__ import annotations
 
 import json
+import threading
+from dataclasses import dataclass, field
 from typing import Sequence
 
-from sqlalchemy import Select, desc, select
+from sqlalchemy import desc, select
 from sqlalchemy.orm import Session
 
 from ..db.base import get_session
-from ..db.models import MappingDecisionModel, MappingRuleModel
+from ..db.models import MappingDecisionModel, MappingRuleModel, utcnow
+from .decision_writer import DecisionWriter
+from .dependency_index import decision_edges, upsert_edges
+
+
+@dataclass(frozen=True)
+class MappingRule:
+    """Detached, read-only copy of a mapping rule row."""
+
+    id: int
+    name: str
+    rule_code: str
+    priority: int
+    material_code: str | None
+    material_family: str | None
+    classification_unspsc_prefix: str | None
+    supplier_id: str | None
+    dataset_id: str
+    provider: str
+    description: str | None
+
+
+@dataclass
+class MappingRuleIndex:
+    """In-memory lookup tables over all mapping rules, each list sorted by priority."""
+
+    by_material_code: dict[str, list[MappingRule]] = field(default_factory=dict)
+    by_family_with_prefix: dict[str, list[MappingRule]] = field(default_factory=dict)
+    by_supplier: dict[str, list[MappingRule]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, rules: Sequence[MappingRule]) -> "MappingRuleIndex":
+        index = cls()
+        for rule in sorted(rules, key=lambda r: (r.priority, r.id)):
+            if rule.material_code:
+                index.by_material_code.setdefault(rule.material_code, []).append(rule)
+            if rule.material_family and rule.classification_unspsc_prefix is not None:
+                index.by_family_with_prefix.setdefault(rule.material_family, []).append(rule)
+            if rule.supplier_id:
+                index.by_supplier.setdefault(rule.supplier_id, []).append(rule)
+        return index
+
+
+_rule_index: MappingRuleIndex | None = None
+_rule_index_lock = threading.Lock()
+
+
+def invalidate_rule_index() -> None:
+    """Drop the process-wide rule index; it is rebuilt on the next lookup."""
+
+    global _rule_index
+    with _rule_index_lock:
+        _rule_index = None
 
 
 class MappingRepository:
-    """Wraps SQLAlchemy persistence for mapping artifacts."""
+    """Wraps SQLAlchemy persistence for mapping artifacts.
 
-    def __init__(self, session_factory=get_session):
+    With a deferred ``decision_writer`` (``batched``/``async`` durability) decisions are
+    handed to the write-behind queue instead of being committed on the caller's
+    session; decision reads flush it first.
+    """
+
+    def __init__(self, session_factory=get_session, decision_writer: DecisionWriter | None = None):
         self._session_factory = session_factory
+        self.decision_writer = decision_writer
 
     def session(self) -> Session:
         return self._session_factory()
 
     # --- Rule lookups ---
-    def _first_rule(self, session: Session, stmt: Select) -> MappingRuleModel | None:
-        return session.scalars(stmt.order_by(MappingRuleModel.priority.asc())).first()
+    def rule_index(self, session: Session | None = None) -> MappingRuleIndex:
+        """Return the process-wide rule index, loading all rules in one query if needed."""
+
+        global _rule_index
+        index = _rule_index
+        if index is not None:
+            return index
+        with _rule_index_lock:
+            if _rule_index is None:
+                if session is None:
+                    with self.session() as own_session:
+                        rules = self.list_rules(own_session)
+                else:
+                    rules = self.list_rules(session)
+                _rule_index = MappingRuleIndex.build([self._to_rule(model) for model in rules])
+            return _rule_index
 
-    def rule_by_material_code(self, session: Session, material_code: str | None) -> MappingRuleModel | None:
+    def rule_by_material_code(self, session: Session, material_code: str | None) -> MappingRule | None:
         if not material_code:
             return None
-        stmt = select(MappingRuleModel).where(MappingRuleModel.material_code == material_code)
-        return self._first_rule(session, stmt)
+        rules = self.rule_index(session).by_material_code.get(material_code)
+        return rules[0] if rules else None
 
     def rule_by_family_unspsc(
         self, session: Session, material_family: str | None, classification_unspsc: str | None
-    ) -> MappingRuleModel | None:
+    ) -> MappingRule | None:
         if not material_family or not classification_unspsc:
             return None
-        stmt = select(MappingRuleModel).where(
-            (MappingRuleModel.material_family == material_family)
-            & (MappingRuleModel.classification_unspsc_prefix.is_not(None))
-        )
-        rules = session.scalars(stmt.order_by(MappingRuleModel.priority.asc())).all()
-        for rule in rules:
+        for rule in self.rule_index(session).by_family_with_prefix.get(material_family, []):
             prefix = rule.classification_unspsc_prefix or ""
             if classification_unspsc.startswith(prefix):
                 return rule
@@ -52,12 +121,10 @@ class MappingRepository:
         supplier_id: str | None,
         material_family: str | None,
         material_code: str | None,
-    ) -> MappingRuleModel | None:
+    ) -> MappingRule | None:
         if not supplier_id:
             return None
-        stmt = select(MappingRuleModel).where(MappingRuleModel.supplier_id == supplier_id)
-        rules = session.scalars(stmt.order_by(MappingRuleModel.priority.asc())).all()
-        for rule in rules:
+        for rule in self.rule_index(session).by_supplier.get(supplier_id, []):
             if rule.material_code and rule.material_code != material_code:
                 continue
             if rule.material_family and rule.material_family != material_family:
@@ -66,11 +133,47 @@ class MappingRepository:
         return None
 
     def list_rules(self, session: Session) -> Sequence[MappingRuleModel]:
-        stmt = select(MappingRuleModel).order_by(MappingRuleModel.priority.asc())
+        stmt = select(MappingRuleModel).order_by(MappingRuleModel.priority.asc(), MappingRuleModel.id.asc())
         return session.scalars(stmt).all()
 
+    def _to_rule(self, model: MappingRuleModel) -> MappingRule:
+        return MappingRule(
+            id=model.id,
+            name=model.name,
+            rule_code=model.rule_code,
+            priority=model.priority,
+            material_code=model.material_code,
+            material_family=model.material_family,
+            classification_unspsc_prefix=model.classification_unspsc_prefix,
+            supplier_id=model.supplier_id,
+            dataset_id=model.dataset_id,
+            provider=model.provider,
+            description=model.description,
+        )
+
     # --- Decisions ---
+    def flush_decisions(self, session: Session | None = None) -> None:
+        """Make queued decisions visible to the next read on ``session``.
+
+        Costs nothing unless decisions are queued. The writer commits on its own
+        connection, so a read snapshot ``session`` already holds is ended first
+        (when it has no pending changes of its own).
+        """
+
+        if self.decision_writer is None or not self.decision_writer.pending:
+            return
+        self.decision_writer.flush()
+        if session is not None and session.in_transaction() and not (session.new or session.dirty or session.deleted):
+            session.commit()
+
+    def settle_decisions(self) -> None:
+        """Wait for this thread's queued decisions if the durability mode requires it."""
+
+        if self.decision_writer is not None:
+            self.decision_writer.settle()
+
     def get_latest_decision(self, session: Session, bom_item_id: str) -> MappingDecisionModel | None:
+        self.flush_decisions(session)
         stmt = (
             select(MappingDecisionModel)
             .where(MappingDecisionModel.bom_item_id == bom_item_id)
@@ -79,6 +182,7 @@ class MappingRepository:
         return session.scalars(stmt).first()
 
     def get_latest_override(self, session: Session, bom_item_id: str) -> MappingDecisionModel | None:
+        self.flush_decisions(session)
         stmt = (
             select(MappingDecisionModel)
             .where((MappingDecisionModel.bom_item_id == bom_item_id) & (MappingDecisionModel.is_override.is_(True)))
@@ -86,6 +190,22 @@ class MappingRepository:
         )
         return session.scalars(stmt).first()
 
+    def latest_overrides(self, session: Session, bom_item_ids: Sequence[str]) -> dict[str, MappingDecisionModel]:
+        """Latest override per BOM item for all ``bom_item_ids`` in one query."""
+
+        if not bom_item_ids:
+            return {}
+        self.flush_decisions(session)
+        stmt = (
+            select(MappingDecisionModel)
+            .where(MappingDecisionModel.bom_item_id.in_(bom_item_ids) & MappingDecisionModel.is_override.is_(True))
+            .order_by(desc(MappingDecisionModel.created_at))
+        )
+        latest: dict[str, MappingDecisionModel] = {}
+        for entry in session.scalars(stmt).all():
+            latest.setdefault(entry.bom_item_id, entry)
+        return latest
+
     def record_decision(
         self,
         session: Session,
@@ -102,11 +222,15 @@ class MappingRepository:
         decision_payload: dict,
         auto_selected: bool,
         is_override: bool = False,
-    ) -> MappingDecisionModel:
-        model = MappingDecisionModel(
+        bom_revision: int | None = None,
+    ) -> MappingDecisionModel | None:
+        """Persist one decision; returns ``None`` when it was queued on the decision writer."""
+
+        values = dict(
             product_id=product_id,
             bom_item_id=bom_item_id,
             scenario_id=scenario_id,
+            bom_revision=bom_revision,
             selected_dataset_id=selected_dataset_id,
             selected_provider=selected_provider,
             confidence_score=confidence_score,
@@ -117,12 +241,20 @@ class MappingRepository:
             auto_selected=auto_selected,
             is_override=is_override,
         )
+        if self.decision_writer is not None and self.decision_writer.deferred:
+            # Stamp the decision time now so ordering does not depend on flush timing.
+            now = utcnow()
+            self.decision_writer.submit({**values, "created_at": now, "updated_at": now})
+            return None
+        model = MappingDecisionModel(**values)
         session.add(model)
+        upsert_edges(session, decision_edges([values]))
         session.commit()
         session.refresh(model)
         return model
 
     def list_history_for_product(self, session: Session, product_id: str) -> list[MappingDecisionModel]:
+        self.flush_decisions(session)
         stmt = (
             select(MappingDecisionModel)
             .where(MappingDecisionModel.product_id == product_id)
@@ -131,6 +263,7 @@ class MappingRepository:
         return list(session.scalars(stmt).all())
 
     def latest_decisions_for_product(self, session: Session, product_id: str) -> list[MappingDecisionModel]:
+        self.flush_decisions(session)
         stmt = (
             select(MappingDecisionModel)
             .where(MappingDecisionModel.product_id == product_id)
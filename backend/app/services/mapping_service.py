@@ -1,6 +1,7 @@
 """LCI mapping orchestration service with deterministic + fuzzy logic."""
 from __future__ import annotations
 
+import copy
 import json
 from dataclasses import dataclass, asdict
 from typing import Iterable, Sequence
@@ -63,11 +64,22 @@ class MappingService:
             soda_client=get_soda_client(),
         )
 
-    def map_bom(self, items: Iterable[BOMItem], scenario: Scenario | None = None) -> list[MappingDecision]:
+    def with_repository(self, repository: MappingRepository) -> "MappingService":
+        """Return a copy sharing providers and clients but persisting through ``repository``."""
+
+        clone = copy.copy(self)
+        clone.repository = repository
+        return clone
+
+    def map_bom(
+        self, items: Iterable[BOMItem], scenario: Scenario | None = None, bom_revision: int | None = None
+    ) -> list[MappingDecision]:
         decisions: list[MappingDecision] = []
+        items = list(items)
         with self.repository.session() as session:
+            overrides = self.repository.latest_overrides(session, [item.id for item in items])
             for item in items:
-                override_model = self.repository.get_latest_override(session, item.id)
+                override_model = overrides.get(item.id)
                 if override_model:
                     decision = self._decision_from_model(override_model)
                     decisions.append(decision)
@@ -121,8 +133,10 @@ class MappingService:
                     comment=None,
                     decision_payload=payload,
                     auto_selected=selected is not None,
+                    bom_revision=bom_revision,
                 )
                 decisions.append(decision)
+        self.repository.settle_decisions()
         return decisions
 
     def record_override(
@@ -135,6 +149,7 @@ class MappingService:
         comment: str | None,
         scenario: Scenario | None = None,
         life_cycle_stage: str | None = None,
+        bom_revision: int | None = None,
     ) -> MappingDecision:
         stage = self._normalize_stage(life_cycle_stage)
         candidate = LCIProcessCandidate(
@@ -155,7 +170,7 @@ class MappingService:
             "candidates": [self._candidate_to_dict(candidate)],
         }
         with self.repository.session() as session:
-            model = self.repository.record_decision(
+            self.repository.record_decision(
                 session,
                 product_id=bom_item.product_id,
                 bom_item_id=bom_item.id,
@@ -169,7 +184,9 @@ class MappingService:
                 decision_payload=payload,
                 auto_selected=False,
                 is_override=True,
+                bom_revision=bom_revision,
             )
+        self.repository.settle_decisions()
         return MappingDecision(
             item_id=bom_item.id,
             selected=candidate,
@@ -318,7 +335,7 @@ class MappingService:
     ) -> tuple[LCIModel, list[MappingDecision]]:
         decisions = self.load_latest_decisions(product.id)
         if len(decisions) < len(bom):
-            decisions = self.map_bom(bom, scenario)
+            decisions = self.map_bom(bom, scenario, bom_revision=product.bom_revision)
         decision_map = {decision.item_id: decision for decision in decisions}
         entries: list[LCIEntry] = []
         for item in bom:
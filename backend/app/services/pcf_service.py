@@ -1,19 +1,53 @@
 """PCF orchestration service."""
 from __future__ import annotations
 
-from ..engines.pcf_engine_base import LCIModel, PCFEngine, PCFResult
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable, Collection, Mapping, Sequence
+
+from ..core.config import get_settings
+from ..core.metrics import metrics
+from ..engines.impact_store import StoredImpactPCFEngine, open_impact_store
+from ..engines.pcf_engine_base import LCIModel, PCFEngine, PCFRequest, PCFResult
+from ..engines.pcf_engine_matrix import IncrementalPCF, MatrixLCAEngine, load_lci_database
 from ..models.bom import BOMItem
 from ..models.method_profile import MethodProfile
 from ..models.product import Product
 from ..models.results import ResultSet
 from ..models.scenario import Scenario
+from .pcf_uncertainty import PCFMonteCarlo, PCFUncertaintyResult, PedigreeScores
+from .pci_uncertainty import DEFAULT_PERCENTILES, default_workers
+
+
+def default_pcf_engine() -> PCFEngine:
+    """The precomputed impact store if ``IMPACT_STORE_PATH`` is set, else the matrix engine over the LCI database."""
+
+    settings = get_settings()
+    if settings.impact_store_path:
+        return StoredImpactPCFEngine(open_impact_store(settings.impact_store_path))
+    return MatrixLCAEngine(load_lci_database(settings.lci_database_path or None))
 
 
 class PCFService:
     """Runs PCF calculations using a configured engine."""
 
-    def __init__(self, engine: PCFEngine):
+    def __init__(
+        self,
+        engine: PCFEngine,
+        incremental_entries: int | None = None,
+        monte_carlo_executor: Callable[[], Executor | None] | None = None,
+    ):
         self.engine = engine
+        self.monte_carlo_executor = monte_carlo_executor
+        self.incremental_entries = incremental_entries or get_settings().pcf_incremental_cache_entries
+        self._incremental: OrderedDict[tuple[str, str], tuple[IncrementalPCF, threading.Lock]] = OrderedDict()
+        self._incremental_lock = threading.Lock()
+
+    def _monte_carlo_executor(self) -> Executor | None:
+        """The shared pool for Monte Carlo chunks, or ``None`` to create one per run (or run in-process)."""
+
+        return self.monte_carlo_executor() if self.monte_carlo_executor is not None else None
 
     def run(
         self,
@@ -30,22 +64,201 @@ class PCFService:
             method_profile=method_profile,
             lci_model=lci_model,
         )
-        result_set = ResultSet(
+        return self._result_set(PCFRequest(product, bom, scenario, method_profile, lci_model), pcf_result)
+
+    def run_incremental(
+        self,
+        product: Product,
+        bom: list[BOMItem],
+        scenario: Scenario,
+        method_profile: MethodProfile,
+        lci_model: LCIModel,
+    ) -> ResultSet:
+        """Like :meth:`run`, but only entries changed since the last run for this product and method are recomputed.
+
+        Mapping overrides swap one item's dataset, and LCA results are linear in
+        the demand, so the previous result moves by the changed items' deltas.
+        Engines without incremental support, or LCI models with several entries
+        per BOM item, are run in full. Cached state is evicted least recently used
+        beyond ``incremental_entries`` products.
+        """
+
+        calculate_incremental = getattr(self.engine, "calculate_pcf_incremental", None)
+        if calculate_incremental is None or len({entry.bom_item_id for entry in lci_model.entries}) != len(lci_model.entries):
+            return self.run(product, bom, scenario, method_profile, lci_model)
+        key = (product.id, method_profile.id.value)
+        with self._incremental_lock:
+            entry = self._incremental.get(key)
+            if entry is None:
+                entry = (IncrementalPCF(method_profile), threading.Lock())
+                metrics.inc("pcf_incremental_misses_total", description="PCF runs without cached item demand")
+            else:
+                metrics.inc("pcf_incremental_hits_total", description="PCF runs reusing cached item demand")
+            self._incremental[key] = entry
+            self._incremental.move_to_end(key)
+            while len(self._incremental) > self.incremental_entries:
+                self._incremental.popitem(last=False)
+        state, lock = entry
+        with lock:
+            pcf_result = calculate_incremental(state, lci_model)
+        return self._result_set(PCFRequest(product, bom, scenario, method_profile, lci_model), pcf_result)
+
+    def invalidate(self, product_ids: Collection[str]) -> int:
+        """Drop cached incremental state of ``product_ids`` so their next run is a full one; returns entries dropped."""
+
+        products = set(product_ids)
+        with self._incremental_lock:
+            stale = [key for key in self._incremental if key[0] in products]
+            for key in stale:
+                del self._incremental[key]
+        return len(stale)
+
+    @property
+    def reloads_datasets(self) -> bool:
+        """Whether :meth:`reload_datasets` can pick up changed dataset factors without a restart."""
+
+        return bool(getattr(self.engine, "reloadable", False))
+
+    def reload_datasets(self) -> int:
+        """Reload the engine's LCI database and drop all incremental state; returns entries dropped.
+
+        A dataset's factors reach every process consuming it through the technosphere,
+        so no incremental state is kept, not only that of products mapped to it.
+        """
+
+        if not self.reloads_datasets:
+            raise ValueError(f"{type(self.engine).__name__} cannot reload datasets; restart to pick up new factors")
+        self.engine.reload()
+        with self._incremental_lock:
+            dropped = len(self._incremental)
+            self._incremental.clear()
+        return dropped
+
+    def run_methods(
+        self,
+        product: Product,
+        bom: list[BOMItem],
+        scenario: Scenario,
+        method_profiles: Sequence[MethodProfile],
+        lci_model: LCIModel | None = None,
+    ) -> list[ResultSet]:
+        """One result set per method profile, from a single engine pass when the engine supports it."""
+
+        calculate_methods = getattr(self.engine, "calculate_pcf_methods", None)
+        if calculate_methods is not None:
+            pcf_results = calculate_methods(product, bom, scenario, method_profiles, lci_model)
+        else:
+            pcf_results = [
+                self.engine.calculate_pcf(
+                    product=product, bom_items=bom, scenario=scenario, method_profile=method_profile, lci_model=lci_model
+                )
+                for method_profile in method_profiles
+            ]
+        return [
+            self._result_set(PCFRequest(product, bom, scenario, method_profile, lci_model), pcf_result)
+            for method_profile, pcf_result in zip(method_profiles, pcf_results)
+        ]
+
+    def run_many(self, requests: Sequence[PCFRequest]) -> list[ResultSet | Exception]:
+        """Run several calculations, batched when the engine supports it.
+
+        Each position holds the result set or the exception raised for that request,
+        so one failing product does not abort the others.
+        """
+
+        calculate_many = getattr(self.engine, "calculate_pcf_many", None)
+        if calculate_many is not None:
+            outcomes = calculate_many(requests)
+        else:
+            outcomes = []
+            for request in requests:
+                try:
+                    outcomes.append(
+                        self.engine.calculate_pcf(
+                            product=request.product,
+                            bom_items=request.bom_items,
+                            scenario=request.scenario,
+                            method_profile=request.method_profile,
+                            lci_model=request.lci_model,
+                        )
+                    )
+                except Exception as exc:
+                    outcomes.append(exc)
+        return [
+            outcome if isinstance(outcome, Exception) else self._result_set(request, outcome)
+            for request, outcome in zip(requests, outcomes)
+        ]
+
+    def uncertainty(
+        self,
+        method_profile: MethodProfile,
+        lci_model: LCIModel,
+        samples: int,
+        seed: int = 0,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        dataset_pedigree: Mapping[str, PedigreeScores] | None = None,
+        item_pedigree: Mapping[str, PedigreeScores] | None = None,
+    ) -> PCFUncertaintyResult:
+        """Monte Carlo PCF statistics in total, per stage and per BOM item.
+
+        Dataset scores from the LCI database apply unless ``dataset_pedigree``
+        overrides them.
+        """
+
+        settings = get_settings()
+        if samples > settings.pcf_monte_carlo_max_samples:
+            raise ValueError(f"{samples} samples requested; the limit is {settings.pcf_monte_carlo_max_samples}")
+        entry_impacts = getattr(self.engine, "entry_impacts", None)
+        if entry_impacts is None:
+            raise ValueError(f"{type(self.engine).__name__} does not support PCF uncertainty")
+        impacts, known = entry_impacts(lci_model.entries, method_profile)
+        scored = {
+            dataset_id: PedigreeScores.from_mapping(scores)
+            for dataset_id, scores in getattr(self.engine, "pedigree", {}).items()
+        }
+        monte_carlo = PCFMonteCarlo(
+            lci_model.entries,
+            impacts,
+            known,
+            dataset_pedigree=scored | dict(dataset_pedigree or {}),
+            item_pedigree=item_pedigree,
+            stages_included=method_profile.life_cycle_stages_included,
+            chunk_elements=settings.pcf_monte_carlo_chunk_elements,
+        )
+        if samples * monte_carlo.columns > settings.pcf_monte_carlo_max_values:
+            raise ValueError(
+                f"{samples} samples × {monte_carlo.columns} totals exceed the limit of "
+                f"{settings.pcf_monte_carlo_max_values} values; request fewer samples"
+            )
+        workers = settings.pcf_monte_carlo_workers or default_workers()
+        return monte_carlo.run(
+            samples, seed=seed, workers=workers, percentiles=percentiles, executor=self._monte_carlo_executor()
+        )
+
+    def _result_set(self, request: PCFRequest, pcf_result: PCFResult) -> ResultSet:
+        product, method_profile = request.product, request.method_profile
+        return ResultSet(
             id="result-pcf-demo",
             product_id=product.id,
-            scenario_id=scenario.id,
+            scenario_id=request.scenario.id,
             method_profile_id=method_profile.id.value,
             pcf_total_kg_co2e=pcf_result.total_kg_co2e,
-            pcf_breakdown={"by_item": pcf_result.breakdown_by_item, "by_stage": pcf_result.breakdown_by_stage},
+            pcf_breakdown={
+                "by_item": pcf_result.breakdown_by_item,
+                "by_stage": pcf_result.breakdown_by_stage,
+                "by_provider": pcf_result.breakdown_by_provider,
+                "by_dataset": pcf_result.breakdown_by_dataset,
+                "top": pcf_result.top_contributions,
+            },
             circularity_indicators={},
             provenance={
-                "engine": "BrightwayPCFEngine",
+                "engine": type(self.engine).__name__,
                 "method_profile": {
                     "id": method_profile.id.value,
                     "name": method_profile.name,
                     "system_boundary": method_profile.system_boundary,
                 },
-                "notes": ["Stub results, replace with real Brightway calculations"],
+                "calculation": pcf_result.provenance,
             },
+            bom_revision=product.bom_revision,
         )
-        return result_set
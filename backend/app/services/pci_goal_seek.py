@@ -0,0 +1,363 @@
+"""Goal-seek: the smallest parameter change that reaches a target product PCI.
+
+Each adjustable input is a :class:`GoalVariable` that shifts one parameter by a
+scalar ``δ`` (every targeted value becomes ``clip(x + δ, lower, upper)``), so a
+variable can act on a scenario parameter, on one material parameter set or BOM
+item, or uniformly on every line. The change is measured in bound-normalized
+units, ``Σ (δ_j / (upper_j − lower_j))²``.
+
+Every step is a 1-D solve along a ray: a vectorized scan (one ``PCIBatch``
+evaluation) finds the bracket nearest the ray's start, then safeguarded Newton
+converges inside it. One variable is a single ray along its own axis. Several
+variables first follow the ray to the minimum-norm point of the linearized
+target surface, then repeatedly turn the ray from the starting design towards
+the minimum-norm point of the local tangent plane while that shortens the
+change. Gradients come from the closed-form
+:func:`~..engines.circularity_engine_pci_sensitivity.pci_gradient`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from typing import Sequence
+
+import numpy as np
+
+from ..engines.circularity_engine_pci_sensitivity import pci_gradient
+from ..engines.circularity_engine_pci_vectorized import (
+    LINE_PARAMETERS,
+    MATERIAL_PARAMETER_FIELDS,
+    SCENARIO_PARAMETERS,
+    PCIArrays,
+    PCIBatch,
+)
+from .pci_uncertainty import SHARE_PARAMETERS
+
+SCAN_POINTS = 33
+# Refinement stops once turning the search ray no longer shortens the change by this fraction.
+REFINE_GAIN = 1e-4
+REFINE_HALVINGS = 6
+
+
+@dataclass(frozen=True)
+class GoalVariable:
+    """One adjustable parameter; ``scope`` is a parameter set key or, for shares, a BOM item id."""
+
+    parameter: str
+    scope: str | None = None
+    lower: float = 0.0
+    upper: float = 1.0
+
+    def __post_init__(self) -> None:
+        if self.parameter not in (*SCENARIO_PARAMETERS, *LINE_PARAMETERS):
+            raise ValueError(f"Unknown PCI parameter '{self.parameter}'")
+        if self.scope and self.parameter in SCENARIO_PARAMETERS:
+            raise ValueError(f"'{self.parameter}' is a scenario-level parameter and cannot be scoped")
+        if not self.lower < self.upper:
+            raise ValueError(f"Variable '{self.label}' needs lower < upper")
+
+    @property
+    def label(self) -> str:
+        return f"{self.parameter}[{self.scope}]" if self.scope else self.parameter
+
+    def mask(self, arrays: PCIArrays) -> np.ndarray:
+        if self.scope is None:
+            return np.ones(len(arrays), dtype=bool)
+        mask = arrays.item_mask(self.scope) if self.parameter in SHARE_PARAMETERS else arrays.material_mask(self.scope)
+        if not mask.any():
+            raise ValueError(f"Variable '{self.label}' does not match any BOM line")
+        return mask
+
+
+@dataclass
+class GoalVariableResult:
+    """Mass-weighted mean of the targeted values before and after, plus the shift applied."""
+
+    label: str
+    initial: float
+    solution: float
+    change: float
+
+
+@dataclass
+class GoalSeekResult:
+    target_pci: float
+    achieved: bool
+    pci_initial: float
+    pci: float
+    iterations: int
+    evaluations: int
+    variables: list[GoalVariableResult] = field(default_factory=list)
+
+
+@dataclass
+class _RaySolution:
+    delta: np.ndarray
+    pci: float
+    slopes: np.ndarray | None
+    iterations: int
+    achieved: bool
+
+
+def _ray_extent(origin: np.ndarray, direction: np.ndarray, low: np.ndarray, high: np.ndarray) -> float:
+    """Largest ``t ≥ 0`` keeping ``origin + t·direction`` inside ``[low, high]``."""
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        limits = np.where(direction > 0, (high - origin) / direction, np.where(direction < 0, (low - origin) / direction, np.inf))
+    return float(max(np.min(limits), 0.0))
+
+
+class PCIGoalSeek:
+    """Solves ``PCI(x + δ) = target`` for the smallest normalized ``δ`` over one packed BOM."""
+
+    def __init__(
+        self,
+        arrays: PCIArrays,
+        variables: Sequence[GoalVariable],
+        tolerance: float = 1e-6,
+        max_iterations: int = 50,
+    ):
+        if not variables:
+            raise ValueError("Goal-seek needs at least one adjustable parameter")
+        if not len(arrays):
+            raise ValueError("Goal-seek needs a BOM with positive mass")
+        self.arrays = arrays
+        self.variables = list(variables)
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.masks = [None if v.parameter in SCENARIO_PARAMETERS else v.mask(arrays) for v in self.variables]
+        covered: dict[str, np.ndarray] = {}
+        for variable, mask in zip(self.variables, self.masks):
+            overlap = covered.get(variable.parameter)
+            if overlap is not None and (mask is None or (overlap & mask).any()):
+                raise ValueError(f"Variables for '{variable.parameter}' target the same values more than once")
+            covered[variable.parameter] = mask if mask is not None else np.ones(len(arrays), dtype=bool)
+        self.base = [self._base_values(v, mask) for v, mask in zip(self.variables, self.masks)]
+        # Shifts beyond these move every targeted value onto a bound and change nothing.
+        self.delta_bounds = np.array(
+            [(v.lower - base.max(), v.upper - base.min()) for v, base in zip(self.variables, self.base)]
+        )
+        self.scale = np.array([v.upper - v.lower for v in self.variables])
+        self.evaluations = 0
+
+    def solve(self, target: float) -> GoalSeekResult:
+        if not 0.0 <= target <= 1.0:
+            raise ValueError("Target PCI must lie in [0, 1]")
+        delta = np.zeros(len(self.variables))
+        pci_initial, slopes = self._evaluate(delta)
+        if abs(pci_initial - target) <= self.tolerance:
+            return self._result(target, delta, pci_initial, pci_initial, 0)
+        if len(self.variables) == 1:
+            ray = self._solve_on_ray(delta, np.ones(1), *self.delta_bounds[0], target)
+            delta, pci, iterations = ray.delta, ray.pci, ray.iterations
+        else:
+            delta, pci, iterations = self._solve_min_norm(target, pci_initial, slopes)
+        return self._result(target, delta, pci_initial, pci, iterations)
+
+    # --- one-dimensional solve: scan for a bracket, then safeguarded Newton ---
+    def _solve_on_ray(
+        self, origin: np.ndarray, direction: np.ndarray, t_low: float, t_high: float, target: float
+    ) -> _RaySolution:
+        """Solve ``PCI(origin + t·direction) = target`` for the root nearest ``t = 0``."""
+
+        grid = np.union1d(np.linspace(t_low, t_high, SCAN_POINTS), [0.0])
+        residual = self._scan(origin + grid[:, None] * direction) - target
+        crossings = np.flatnonzero(np.sign(residual[:-1]) != np.sign(residual[1:]))
+        if not len(crossings):
+            best = int(np.argmin(np.abs(residual)))
+            return _RaySolution(origin + grid[best] * direction, float(residual[best] + target), None, 0, False)
+        left, right = grid[crossings], grid[crossings + 1]
+        distance = np.where((left <= 0) & (right >= 0), 0.0, np.minimum(np.abs(left), np.abs(right)))
+        index = int(crossings[np.argmin(distance)])
+        a, b = grid[index], grid[index + 1]
+        residual_a = residual[index]
+        t = a if abs(a) <= abs(b) else b
+        for iteration in range(1, self.max_iterations + 1):
+            pci, slopes = self._evaluate(origin + t * direction)
+            r = pci - target
+            if abs(r) <= self.tolerance:
+                break
+            if np.sign(r) == np.sign(residual_a):
+                a, residual_a = t, r
+            else:
+                b = t
+            slope = float(slopes @ direction)
+            newton = t - r / slope if slope else np.nan
+            t = newton if min(a, b) < newton < max(a, b) else 0.5 * (a + b)
+        else:
+            pci, slopes = self._evaluate(origin + t * direction)
+        return _RaySolution(origin + t * direction, pci, slopes, iteration, abs(pci - target) <= self.tolerance)
+
+    def _scan(self, deltas: np.ndarray) -> np.ndarray:
+        """Product PCI at every row of ``deltas`` (one shift per variable) with one broadcast evaluation."""
+
+        batch = PCIBatch(self.arrays, len(deltas))
+        for j, (variable, mask, base) in enumerate(zip(self.variables, self.masks, self.base)):
+            shifted = np.clip(base[None, :] + deltas[:, j : j + 1], variable.lower, variable.upper)
+            if mask is None:
+                batch.set(variable.parameter, shifted[:, 0])
+            else:
+                lines = np.empty((len(deltas), len(self.arrays)))
+                lines[:, mask] = shifted
+                batch.set(variable.parameter, lines, mask)
+        self.evaluations += len(deltas)
+        return np.asarray(batch.evaluate()["pci_product"], dtype=float)
+
+    # --- several variables: minimum-norm steps, each followed by a 1-D solve ---
+    def _solve_min_norm(self, target: float, pci: float, slopes: np.ndarray) -> tuple[np.ndarray, float, int]:
+        """Reach the target surface, then turn towards its point closest to the start.
+
+        PCI is only piecewise smooth (the signs of ``R_net``/``C_net`` and every
+        clip add kinks), so plain Newton iterations oscillate. Instead every step
+        is a 1-D solve along a ray: first towards the minimum-norm point of the
+        linearization, then from the start through a blend of the current solution
+        and the minimum-norm point of the tangent plane there, halving the blend
+        until the first crossing of that ray is closer than the current solution.
+        """
+
+        z_low, z_high = self.delta_bounds[:, 0] / self.scale, self.delta_bounds[:, 1] / self.scale
+        z = np.zeros(len(self.variables))
+        iterations = 0
+        feasible = False
+        for _ in range(self.max_iterations):
+            proposal = self._min_norm_step(slopes * self.scale, z, target - pci, z_low, z_high)
+            if proposal is None and not feasible:
+                # Flat start (a clip is active): scan each variable's own axis instead.
+                ray = self._axis_scan(z, z_low, z_high, target)
+                iterations += ray.iterations + 1
+                if np.allclose(ray.delta / self.scale, z):
+                    break
+            elif proposal is None:
+                break
+            elif not feasible:
+                ray = self._ray(z, proposal - z, z_low, z_high, target)
+                iterations += ray.iterations + 1
+                if np.allclose(ray.delta / self.scale, z):
+                    break
+            else:
+                norm = np.linalg.norm(z)
+                step = proposal - z
+                for _ in range(REFINE_HALVINGS):
+                    ray = self._ray(np.zeros_like(z), z + step, z_low, z_high, target)
+                    iterations += ray.iterations + 1
+                    if ray.achieved and np.linalg.norm(ray.delta / self.scale) < norm * (1.0 - REFINE_GAIN):
+                        break
+                    step = 0.5 * step
+                else:
+                    break
+            z, pci = ray.delta / self.scale, ray.pci
+            slopes = ray.slopes if ray.slopes is not None else self._evaluate(ray.delta)[1]
+            feasible = ray.achieved
+        return z * self.scale, pci, iterations
+
+    def _axis_scan(self, z: np.ndarray, z_low: np.ndarray, z_high: np.ndarray, target: float) -> _RaySolution:
+        """Best 1-D solve moving one variable at a time: the closest hit, else the smallest residual."""
+
+        rays = []
+        for j in range(len(z)):
+            for sign in (1.0, -1.0):
+                direction = np.zeros_like(z)
+                direction[j] = sign
+                rays.append(self._ray(z, direction, z_low, z_high, target))
+        return min(rays, key=lambda ray: (not ray.achieved, np.linalg.norm(ray.delta / self.scale) if ray.achieved else abs(ray.pci - target)))
+
+    def _ray(
+        self, origin: np.ndarray, direction: np.ndarray, z_low: np.ndarray, z_high: np.ndarray, target: float
+    ) -> _RaySolution:
+        """:meth:`_solve_on_ray` over the part of a scaled ray that stays inside the bounds."""
+
+        return self._solve_on_ray(origin * self.scale, direction * self.scale, 0.0, _ray_extent(origin, direction, z_low, z_high), target)
+
+    @staticmethod
+    def _min_norm_step(
+        g: np.ndarray, z: np.ndarray, residual: float, z_low: np.ndarray, z_high: np.ndarray
+    ) -> np.ndarray | None:
+        """Point closest to 0 on ``g·(y − z) = residual`` within the box, or ``None`` if ``g`` vanishes.
+
+        Variables whose unconstrained solution leaves the box are fixed at the bound
+        and the rest re-solved, at most once per variable.
+        """
+
+        free = g != 0.0
+        # Variables PCI does not respond to go back to their starting value.
+        y = np.where(free, z, 0.0)
+        if not free.any():
+            return None
+        while free.any():
+            rhs = residual + g @ z - g[~free] @ y[~free]
+            y[free] = g[free] * rhs / (g[free] @ g[free])
+            outside = free & ((y < z_low) | (y > z_high))
+            if not outside.any():
+                break
+            y[outside] = np.clip(y[outside], z_low[outside], z_high[outside])
+            free &= ~outside
+        return y
+
+    # --- evaluation ---
+    def _evaluate(self, delta: np.ndarray) -> tuple[float, np.ndarray]:
+        """Product PCI and dPCI/dδ for every variable."""
+
+        arrays = self._apply(delta)
+        gradient = pci_gradient(arrays)
+        self.evaluations += 1
+        slopes = np.empty(len(self.variables))
+        for j, (variable, mask, base) in enumerate(zip(self.variables, self.masks, self.base)):
+            shifted = base + delta[j]
+            inside = (shifted >= variable.lower) & (shifted <= variable.upper)
+            if mask is None:
+                slopes[j] = gradient.scenario[variable.parameter] if inside[0] else 0.0
+            else:
+                slopes[j] = gradient.line[variable.parameter][mask][inside].sum()
+        return gradient.pci_product, slopes
+
+    def _apply(self, delta: np.ndarray) -> PCIArrays:
+        arrays = self.arrays
+        changes: dict[str, object] = {}
+        parameters = None
+        for j, (variable, mask, base) in enumerate(zip(self.variables, self.masks, self.base)):
+            values = np.clip(base + delta[j], variable.lower, variable.upper)
+            name = variable.parameter
+            if mask is None:
+                changes[name] = float(values[0])
+            elif name in SHARE_PARAMETERS:
+                column = changes.setdefault(name, getattr(arrays, name).copy())
+                column[mask] = values
+            else:
+                if parameters is None:
+                    parameters = arrays.parameters.copy()
+                parameters[mask, MATERIAL_PARAMETER_FIELDS.index(name)] = values
+        if parameters is not None:
+            changes["parameters"] = parameters
+        return replace(arrays, **changes)
+
+    def _base_values(self, variable: GoalVariable, mask: np.ndarray | None) -> np.ndarray:
+        if mask is None:
+            return np.array([float(getattr(self.arrays, variable.parameter))])
+        return self._line_values(variable)[mask]
+
+    def _line_values(self, variable: GoalVariable) -> np.ndarray:
+        if variable.parameter in SHARE_PARAMETERS:
+            return getattr(self.arrays, variable.parameter)
+        return self.arrays.parameters[:, MATERIAL_PARAMETER_FIELDS.index(variable.parameter)]
+
+    def _result(self, target: float, delta: np.ndarray, pci_initial: float, pci: float, iterations: int) -> GoalSeekResult:
+        variables = []
+        for j, (variable, mask, base) in enumerate(zip(self.variables, self.masks, self.base)):
+            weights = self.arrays.mass[mask] if mask is not None else np.ones(1)
+            solution = np.clip(base + delta[j], variable.lower, variable.upper)
+            variables.append(
+                GoalVariableResult(
+                    label=variable.label,
+                    initial=float(np.average(base, weights=weights)),
+                    solution=float(np.average(solution, weights=weights)),
+                    change=float(delta[j]),
+                )
+            )
+        return GoalSeekResult(
+            target_pci=target,
+            achieved=abs(pci - target) <= self.tolerance,
+            pci_initial=pci_initial,
+            pci=pci,
+            iterations=iterations,
+            evaluations=self.evaluations,
+            variables=variables,
+        )
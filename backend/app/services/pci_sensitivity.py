@@ -0,0 +1,99 @@
+"""PCI sensitivities and tornado ranking from the closed-form gradient."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from ..engines.circularity_engine_pci_sensitivity import pci_gradient
+from ..engines.circularity_engine_pci_vectorized import MATERIAL_PARAMETER_FIELDS, SCENARIO_PARAMETERS, PCIArrays
+from .pci_uncertainty import SHARE_PARAMETERS
+
+
+@dataclass(frozen=True)
+class PCISensitivity:
+    """∂PCI/∂parameter at the current value; ``scope`` is a parameter set key or, for shares, a BOM item id."""
+
+    parameter: str
+    scope: str | None
+    value: float
+    derivative: float
+    elasticity: float
+
+    @property
+    def label(self) -> str:
+        return f"{self.parameter}[{self.scope}]" if self.scope else self.parameter
+
+
+@dataclass(frozen=True)
+class TornadoBar:
+    """Linearized product PCI with one parameter moved by ± ``relative_step`` of its value."""
+
+    label: str
+    elasticity: float
+    pci_low: float
+    pci_high: float
+    swing: float
+
+
+@dataclass
+class PCISensitivityResult:
+    pci_product: float
+    relative_step: float
+    sensitivities: list[PCISensitivity] = field(default_factory=list)
+    tornado: list[TornadoBar] = field(default_factory=list)
+
+
+def pci_sensitivities(arrays: PCIArrays, relative_step: float = 0.1, top: int = 10) -> PCISensitivityResult:
+    """Derivatives and elasticities for every scenario parameter, material parameter set and BOM share.
+
+    Material parameters are reported once per parameter set (the derivative sums
+    over the lines using that set). The tornado keeps the ``top`` parameters with
+    the largest PCI swing over ``value × (1 ± relative_step)``.
+    """
+
+    if relative_step <= 0:
+        raise ValueError("relative_step must be positive")
+    gradient = pci_gradient(arrays)
+    pci = gradient.pci_product
+    names: list[str] = list(SCENARIO_PARAMETERS)
+    scopes: list[str | None] = [None] * len(SCENARIO_PARAMETERS)
+    values = [np.array([float(getattr(arrays, name)) for name in SCENARIO_PARAMETERS])]
+    derivatives = [np.array([gradient.scenario[name] for name in SCENARIO_PARAMETERS])]
+    # Several code/family pairs can resolve to the same parameter set, so group lines by set key.
+    keys, key_of_row = np.unique(np.array(arrays.parameter_keys, dtype=object), return_inverse=True)
+    line_key = key_of_row[arrays.parameter_index] if len(arrays) else np.zeros(0, dtype=np.intp)
+    _, first_line = np.unique(line_key, return_index=True)
+    for column, name in enumerate(MATERIAL_PARAMETER_FIELDS):
+        names.extend([name] * len(keys))
+        scopes.extend(keys.tolist())
+        values.append(arrays.parameters[first_line, column])
+        derivatives.append(np.bincount(line_key, weights=gradient.line[name], minlength=len(keys)))
+    for name in SHARE_PARAMETERS:
+        names.extend([name] * len(arrays))
+        scopes.extend(arrays.item_ids)
+        values.append(getattr(arrays, name))
+        derivatives.append(gradient.line[name])
+
+    values, derivatives = np.concatenate(values), np.concatenate(derivatives)
+    elasticities = derivatives * values / pci if pci > 0 else np.zeros_like(values)
+    sensitivities = [
+        PCISensitivity(*row) for row in zip(names, scopes, values.tolist(), derivatives.tolist(), elasticities.tolist())
+    ]
+
+    delta = np.abs(derivatives * values) * relative_step
+    low, high = np.clip(pci - delta, 0.0, 1.0), np.clip(pci + delta, 0.0, 1.0)
+    swing = high - low
+    # Stable sort so ties keep the reporting order.
+    ranked = np.argsort(-swing, kind="stable")[:top]
+    tornado = [
+        TornadoBar(
+            label=sensitivities[index].label,
+            elasticity=float(elasticities[index]),
+            pci_low=float(low[index]),
+            pci_high=float(high[index]),
+            swing=float(swing[index]),
+        )
+        for index in ranked
+    ]
+    return PCISensitivityResult(pci_product=pci, relative_step=relative_step, sensitivities=sensitivities, tornado=tornado)
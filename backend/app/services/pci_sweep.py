@@ -0,0 +1,161 @@
+"""Batched PCI evaluation over scenario parameter grids."""
+from __future__ import annotations
+
+import io
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterator, Mapping, Sequence
+
+import numpy as np
+
+from ..engines.circularity_engine_pci_vectorized import (
+    MATERIAL_PARAMETER_FIELDS as MATERIAL_PARAMETERS,
+    SCENARIO_PARAMETERS,
+    PCIArrays,
+    PCIBatch,
+)
+
+_LABEL = re.compile(r"^(?P<parameter>\w+)(?:\[(?P<material>[^\]]+)\])?$")
+
+
+@dataclass(frozen=True)
+class SweepAxis:
+    """One swept parameter; ``material_key`` limits material parameters to one parameter set."""
+
+    parameter: str
+    values: np.ndarray
+    material_key: str | None = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.parameter}[{self.material_key}]" if self.material_key else self.parameter
+
+
+def parse_label(label: str) -> tuple[str, str | None]:
+    """Split ``parameter`` / ``parameter[material_key]`` and validate the parameter name."""
+
+    match = _LABEL.match(label.strip())
+    if not match:
+        raise ValueError(f"Invalid sweep parameter '{label}'")
+    parameter, material = match.group("parameter"), match.group("material")
+    if parameter in SCENARIO_PARAMETERS:
+        if material:
+            raise ValueError(f"'{parameter}' is a scenario-level parameter and cannot be scoped to a material")
+    elif parameter not in MATERIAL_PARAMETERS:
+        raise ValueError(f"Unknown sweep parameter '{parameter}'")
+    return parameter, material
+
+
+def sweep_axis(label: str, values: np.ndarray, material_key: str | None = None) -> SweepAxis:
+    """Build a validated axis from a label, optionally scoping it to ``material_key``."""
+
+    parameter, scoped = parse_label(f"{label}[{material_key}]" if material_key else label)
+    return SweepAxis(parameter=parameter, values=np.asarray(values, dtype=float), material_key=scoped)
+
+
+def range_values(
+    values: Sequence[float] | None = None,
+    start: float | None = None,
+    stop: float | None = None,
+    steps: int | None = None,
+) -> np.ndarray:
+    """Explicit ``values`` or ``steps`` evenly spaced points from ``start`` to ``stop`` inclusive."""
+
+    if values is not None:
+        if not len(values):
+            raise ValueError("Sweep ranges need at least one value")
+        return np.asarray(values, dtype=float)
+    if start is None or stop is None or not steps:
+        raise ValueError("Sweep ranges need either values or start, stop and steps")
+    return np.linspace(start, stop, steps)
+
+
+class PCISweep:
+    """PCI/LFI for every point of a parameter grid over one packed BOM.
+
+    The grid is either the Cartesian product of ``axes`` or the explicit ``points``
+    (one mapping of label to value per point). Points are evaluated in chunks of at
+    most ``chunk_elements`` grid×line cells, so memory stays bounded however large
+    the grid is.
+    """
+
+    def __init__(
+        self,
+        arrays: PCIArrays,
+        axes: Sequence[SweepAxis] = (),
+        points: Sequence[Mapping[str, float]] | None = None,
+        max_points: int = 1_000_000,
+        chunk_elements: int = 250_000,
+    ):
+        self.arrays = arrays
+        if points is not None:
+            if axes:
+                raise ValueError("Provide either parameter ranges or an explicit grid, not both")
+            axes = self._axes_from_points(points)
+            self._cartesian = False
+        else:
+            if not axes:
+                raise ValueError("A sweep needs at least one parameter range or grid point")
+            self._cartesian = True
+        labels = [axis.label for axis in axes]
+        if len(set(labels)) != len(labels):
+            raise ValueError("Each sweep parameter may only appear once")
+        for axis in axes:
+            if axis.material_key and not arrays.material_mask(axis.material_key).any():
+                raise ValueError(f"No BOM line uses material parameters '{axis.material_key}'")
+        self.axes = list(axes)
+        self.shape = tuple(len(axis.values) for axis in self.axes) if self._cartesian else (len(points),)
+        self.size = math.prod(self.shape)
+        if self.size > max_points:
+            raise ValueError(f"Sweep has {self.size} points; the limit is {max_points}")
+        self.chunk_points = max(1, chunk_elements // max(len(arrays), 1))
+
+    @property
+    def labels(self) -> list[str]:
+        return [axis.label for axis in self.axes]
+
+    def iter_chunks(self) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield ``(point_ids, grid_values, pci, lfi)`` per chunk; grid_values is ``(k, axes)``."""
+
+        for start in range(0, self.size, self.chunk_points):
+            ids = np.arange(start, min(start + self.chunk_points, self.size))
+            columns = self._grid_columns(ids)
+            pci, lfi = self._evaluate(columns)
+            yield ids, np.column_stack(columns), pci, lfi
+
+    def iter_csv(self) -> Iterator[str]:
+        """Stream the grid as CSV: ``point,<labels...>,pci,lfi``."""
+
+        yield ",".join(["point", *self.labels, "pci", "lfi"]) + "\n"
+        fmt = ["%d"] + ["%.10g"] * (len(self.axes) + 2)
+        for ids, values, pci, lfi in self.iter_chunks():
+            buffer = io.StringIO()
+            np.savetxt(buffer, np.column_stack([ids, values, pci, lfi]), fmt=fmt, delimiter=",")
+            yield buffer.getvalue()
+
+    def _grid_columns(self, ids: np.ndarray) -> list[np.ndarray]:
+        if not self._cartesian:
+            return [axis.values[ids] for axis in self.axes]
+        coordinates = np.unravel_index(ids, self.shape)
+        return [axis.values[coordinate] for axis, coordinate in zip(self.axes, coordinates)]
+
+    def _evaluate(self, columns: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        batch = PCIBatch(self.arrays, len(columns[0]))
+        for axis, values in zip(self.axes, columns):
+            mask = self.arrays.material_mask(axis.material_key) if axis.material_key else None
+            batch.set(axis.parameter, values, mask)
+        indicators = batch.evaluate()
+        return indicators["pci_product"], indicators["lfi_product"]
+
+    @staticmethod
+    def _axes_from_points(points: Sequence[Mapping[str, float]]) -> list[SweepAxis]:
+        if not points:
+            raise ValueError("An explicit sweep grid needs at least one point")
+        labels = list(points[0])
+        if not labels:
+            raise ValueError("Sweep grid points must set at least one parameter")
+        for point in points:
+            if set(point) != set(labels):
+                raise ValueError("Every sweep grid point must set the same parameters")
+        return [sweep_axis(label, [point[label] for point in points]) for label in labels]
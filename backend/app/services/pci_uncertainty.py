@@ -0,0 +1,328 @@
+"""Monte Carlo uncertainty propagation for the vectorized PCI engine.
+
+Uncertain inputs are described by :class:`ParameterDistribution`; each one draws a
+single value per sample and applies it to every line it targets. Samples are
+evaluated in chunks through :class:`~..engines.circularity_engine_pci_vectorized.PCIBatch`
+and folded into streaming accumulators (running moments plus a fixed histogram on
+``[0, 1]``), so memory depends on the chunk size and never on the sample count.
+
+Each chunk draws from its own generator spawned from one ``SeedSequence``, and
+partial results are merged in chunk order, so a seed reproduces the same result
+whatever the number of worker processes. Chunks run in-process by default; see
+:func:`run_chunks` for running them on a (shared) process pool.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+
+from ..engines.circularity_engine_pci_vectorized import (
+    LINE_PARAMETERS,
+    SCENARIO_PARAMETERS,
+    PCIArrays,
+    PCIBatch,
+)
+
+DISTRIBUTION_KINDS = ("uniform", "triangular", "normal", "lognormal")
+SHARE_PARAMETERS = ("reused_share", "recycled_content_share")
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+@dataclass(frozen=True)
+class ParameterDistribution:
+    """Distribution of one PCI input.
+
+    ``uniform`` uses ``low``/``high``, ``triangular`` adds ``mode``, ``normal`` uses
+    ``mean``/``std`` and ``lognormal`` uses the ``median`` and geometric standard
+    deviation ``gsd``. ``scope`` narrows material parameters to one parameter set
+    key and BOM shares to one BOM item id; scenario parameters cannot be scoped.
+    """
+
+    parameter: str
+    kind: str
+    low: float | None = None
+    high: float | None = None
+    mode: float | None = None
+    mean: float | None = None
+    std: float | None = None
+    median: float | None = None
+    gsd: float | None = None
+    scope: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.parameter not in (*SCENARIO_PARAMETERS, *LINE_PARAMETERS):
+            raise ValueError(f"Unknown PCI parameter '{self.parameter}'")
+        if self.scope and self.parameter in SCENARIO_PARAMETERS:
+            raise ValueError(f"'{self.parameter}' is a scenario-level parameter and cannot be scoped")
+        if self.kind not in DISTRIBUTION_KINDS:
+            raise ValueError(f"Unknown distribution '{self.kind}', expected one of {DISTRIBUTION_KINDS}")
+        required = {
+            "uniform": ("low", "high"),
+            "triangular": ("low", "mode", "high"),
+            "normal": ("mean", "std"),
+            "lognormal": ("median", "gsd"),
+        }[self.kind]
+        missing = [name for name in required if getattr(self, name) is None]
+        if missing:
+            raise ValueError(f"{self.kind} distribution for '{self.label}' needs {', '.join(missing)}")
+        if self.kind == "uniform" and self.low > self.high:
+            raise ValueError(f"Distribution for '{self.label}' needs low <= high")
+        if self.kind == "triangular" and not self.low <= self.mode <= self.high:
+            raise ValueError(f"Distribution for '{self.label}' needs low <= mode <= high")
+        if self.kind == "normal" and self.std < 0:
+            raise ValueError(f"Distribution for '{self.label}' needs std >= 0")
+        if self.kind == "lognormal" and (self.median <= 0 or self.gsd < 1):
+            raise ValueError(f"Distribution for '{self.label}' needs median > 0 and gsd >= 1")
+
+    @property
+    def label(self) -> str:
+        return f"{self.parameter}[{self.scope}]" if self.scope else self.parameter
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Draw ``size`` values; fractions outside ``[0, 1]`` are clipped by the engine."""
+
+        if self.kind == "uniform":
+            return rng.uniform(self.low, self.high, size)
+        if self.kind == "triangular":
+            if self.low == self.high:
+                return np.full(size, self.low)
+            return rng.triangular(self.low, self.mode, self.high, size)
+        if self.kind == "normal":
+            return rng.normal(self.mean, self.std, size)
+        return rng.lognormal(np.log(self.median), np.log(self.gsd), size)
+
+    def mask(self, arrays: PCIArrays) -> np.ndarray | None:
+        """Lines this distribution applies to, or ``None`` for all of them."""
+
+        if not self.scope:
+            return None
+        mask = arrays.item_mask(self.scope) if self.parameter in SHARE_PARAMETERS else arrays.material_mask(self.scope)
+        if not mask.any():
+            kind = "BOM item" if self.parameter in SHARE_PARAMETERS else "material parameter set"
+            raise ValueError(f"No BOM line matches {kind} '{self.scope}' for '{self.label}'")
+        return mask
+
+
+@dataclass
+class StreamingStats:
+    """Mergeable moments, extrema and a ``[0, 1]`` histogram for ``columns`` series."""
+
+    columns: int
+    bins: int
+    count: int = 0
+    mean: np.ndarray = field(init=False)
+    m2: np.ndarray = field(init=False)
+    minimum: np.ndarray = field(init=False)
+    maximum: np.ndarray = field(init=False)
+    histogram: np.ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.mean = np.zeros(self.columns)
+        self.m2 = np.zeros(self.columns)
+        self.minimum = np.full(self.columns, np.inf)
+        self.maximum = np.full(self.columns, -np.inf)
+        self.histogram = np.zeros((self.columns, self.bins), dtype=np.int64)
+
+    def add(self, values: np.ndarray) -> None:
+        """Fold a ``(k, columns)`` block of samples in."""
+
+        k = values.shape[0]
+        if not k:
+            return
+        block = StreamingStats(self.columns, self.bins)
+        block.count = k
+        block.mean = values.mean(axis=0)
+        block.m2 = ((values - block.mean) ** 2).sum(axis=0)
+        block.minimum = values.min(axis=0)
+        block.maximum = values.max(axis=0)
+        index = np.clip((values * self.bins).astype(np.int64), 0, self.bins - 1)
+        index += np.arange(self.columns) * self.bins
+        block.histogram = np.bincount(index.ravel(), minlength=self.columns * self.bins).reshape(
+            self.columns, self.bins
+        )
+        self.merge(block)
+
+    def merge(self, other: "StreamingStats") -> None:
+        """Combine with another accumulator (Chan et al. parallel variance)."""
+
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta**2 * (self.count * other.count / total)
+        self.count = total
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+        self.histogram += other.histogram
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / self.count) if self.count else np.zeros(self.columns)
+
+    def percentiles(self, percentiles: Sequence[float]) -> np.ndarray:
+        """``(columns, len(percentiles))`` estimates, linear within histogram bins."""
+
+        cumulative = np.cumsum(self.histogram, axis=1)
+        result = np.empty((self.columns, len(percentiles)))
+        for column in range(self.columns):
+            counts, cdf = self.histogram[column], cumulative[column]
+            for position, percentile in enumerate(percentiles):
+                target = percentile / 100 * self.count
+                bin_index = min(int(np.searchsorted(cdf, target)), self.bins - 1)
+                below = cdf[bin_index] - counts[bin_index]
+                fraction = (target - below) / counts[bin_index] if counts[bin_index] else 0.0
+                result[column, position] = (bin_index + fraction) / self.bins
+        return np.clip(result, self.minimum[:, None], self.maximum[:, None])
+
+
+@dataclass(frozen=True)
+class PCIStatistics:
+    mean: float
+    std: float
+    minimum: float
+    maximum: float
+    percentiles: dict[str, float]
+
+
+@dataclass(frozen=True)
+class PCIUncertaintyResult:
+    samples: int
+    seed: int
+    product: PCIStatistics
+    per_material: dict[str, PCIStatistics]
+
+
+class PCIMonteCarlo:
+    """Propagates ``distributions`` through the PCI of one packed BOM.
+
+    Column 0 of every sample is the product PCI; the remaining columns are the
+    mass-weighted PCI of each material key, in order of :attr:`material_keys`.
+    """
+
+    def __init__(
+        self,
+        arrays: PCIArrays,
+        distributions: Sequence[ParameterDistribution],
+        chunk_elements: int = 250_000,
+        histogram_bins: int = 2_000,
+    ):
+        if not distributions:
+            raise ValueError("Monte Carlo needs at least one parameter distribution")
+        labels = [distribution.label for distribution in distributions]
+        if len(set(labels)) != len(labels):
+            raise ValueError("Each uncertain parameter may only appear once")
+        if not len(arrays):
+            raise ValueError("BOM has no lines with positive mass")
+        self.arrays = arrays
+        self.distributions = list(distributions)
+        self.masks = [distribution.mask(arrays) for distribution in self.distributions]
+        self.histogram_bins = histogram_bins
+        self.chunk_samples = max(1, chunk_elements // len(arrays))
+        keys, inverse = np.unique(np.array(arrays.material_keys, dtype=object), return_inverse=True)
+        self.material_keys = [str(key) for key in keys]
+        weights = np.zeros((len(arrays), len(keys)))
+        weights[np.arange(len(arrays)), inverse] = arrays.mass
+        self._material_weights = weights / weights.sum(axis=0)
+
+    def evaluate(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """``(size, 1 + materials)`` PCI samples drawn from ``rng``."""
+
+        batch = PCIBatch(self.arrays, size)
+        for distribution, mask in zip(self.distributions, self.masks):
+            batch.set(distribution.parameter, distribution.sample(rng, size), mask)
+        indicators = batch.evaluate()
+        material = indicators["pci_material"] @ self._material_weights
+        return np.column_stack([indicators["pci_product"], material])
+
+    def run_chunk(self, seed: np.random.SeedSequence, size: int) -> StreamingStats:
+        stats = StreamingStats(1 + len(self.material_keys), self.histogram_bins)
+        stats.add(self.evaluate(np.random.default_rng(seed), size))
+        return stats
+
+    def run(
+        self,
+        samples: int,
+        seed: int = 0,
+        workers: int = 1,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        executor: Executor | None = None,
+    ) -> PCIUncertaintyResult:
+        if samples < 1:
+            raise ValueError("Monte Carlo needs at least one sample")
+        if any(not 0 <= percentile <= 100 for percentile in percentiles):
+            raise ValueError("Percentiles must lie between 0 and 100")
+        sizes = [min(self.chunk_samples, samples - start) for start in range(0, samples, self.chunk_samples)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        stats = StreamingStats(1 + len(self.material_keys), self.histogram_bins)
+        for partial in run_chunks(self, seeds, sizes, workers, executor):
+            stats.merge(partial)
+        return self._result(stats, samples, seed, percentiles)
+
+    def _result(
+        self, stats: StreamingStats, samples: int, seed: int, percentiles: Sequence[float]
+    ) -> PCIUncertaintyResult:
+        quantiles = stats.percentiles(percentiles)
+        std = stats.std
+        summaries = [
+            PCIStatistics(
+                mean=float(stats.mean[column]),
+                std=float(std[column]),
+                minimum=float(stats.minimum[column]),
+                maximum=float(stats.maximum[column]),
+                percentiles={f"p{percentile:g}": float(value) for percentile, value in zip(percentiles, quantiles[column])},
+            )
+            for column in range(stats.columns)
+        ]
+        return PCIUncertaintyResult(
+            samples=samples,
+            seed=seed,
+            product=summaries[0],
+            per_material=dict(zip(self.material_keys, summaries[1:])),
+        )
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def run_chunks(
+    monte_carlo,
+    seeds: Sequence[np.random.SeedSequence],
+    sizes: Sequence[int],
+    workers: int = 1,
+    executor: Executor | None = None,
+) -> list:
+    """``monte_carlo.run_chunk`` for every chunk, in chunk order.
+
+    With ``workers > 1`` the chunks are split into ``workers`` contiguous groups,
+    each submitted to ``executor`` as one task carrying ``monte_carlo``, so a
+    shared pool bounds the processes of concurrent runs. Without an executor a
+    pool is created for this call only, which suits scripts but not requests.
+    """
+
+    workers = min(workers, len(sizes))
+    if workers <= 1:
+        return [monte_carlo.run_chunk(seed, size) for seed, size in zip(seeds, sizes)]
+    bounds = np.linspace(0, len(sizes), workers + 1).astype(int).tolist()
+    groups = [(seeds[lo:hi], sizes[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    if executor is None:
+        # ``spawn`` avoids forking a process that is running server threads.
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return _map_groups(pool, monte_carlo, groups)
+    return _map_groups(executor, monte_carlo, groups)
+
+
+def _map_groups(executor: Executor, monte_carlo, groups: list[tuple[Sequence, Sequence]]) -> list:
+    partials = executor.map(_run_chunk_group, [monte_carlo] * len(groups), *zip(*groups))
+    return [partial for group in partials for partial in group]
+
+
+def _run_chunk_group(monte_carlo, seeds: Sequence[np.random.SeedSequence], sizes: Sequence[int]) -> list:
+    return [monte_carlo.run_chunk(seed, size) for seed, size in zip(seeds, sizes)]
+
@@ -0,0 +1,447 @@
+"""Portfolio-wide PCF/PCI batch runs over product × scenario work units.
+
+The parent process resolves the selection, compiles each scenario once, loads
+products in bulk and builds each product's LCI model once (mapping needs the
+database and is shared by all scenarios of a product). Work units are grouped into
+chunks of whole products and evaluated by a process pool whose workers receive the
+scenarios and method profiles once, through the pool initializer. Each finished
+chunk is written to ``result_sets`` with a single bulk insert.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterator, Sequence
+
+from ..core.config import get_settings
+from ..core.metrics import metrics
+from ..engines.circularity_engine_pci_vectorized import VectorizedBracquene2020CircularityEngine
+from ..engines.pcf_engine_base import LCIModel, PCFRequest
+from ..models.bom import BOMItem
+from ..models.method_profile import MethodProfile
+from ..models.pci import pci_result_payload
+from ..models.product import Product
+from ..models.results import ResultSet
+from ..models.scenario import CompiledScenario, Scenario, compile_scenario
+from .circularity_service import CircularityService
+from .bom_tree import BOMStructureError, propagate_quantities
+from .mapping_service import MappingService
+from .pcf_service import PCFService, default_pcf_engine
+from .product_repository import ProductRepository
+from .result_repository import ResultRepository
+from .scenario_service import ScenarioService
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PortfolioSelection:
+    """Which products and scenarios to run; ``None`` selects everything."""
+
+    product_ids: tuple[str, ...] | None = None
+    product_id_prefix: str | None = None
+    scenario_ids: tuple[str, ...] | None = None
+    pcf_method_id: str | None = None
+    include_pcf: bool = True
+    include_pci: bool = True
+
+    def __post_init__(self) -> None:
+        if not (self.include_pcf or self.include_pci):
+            raise ValueError("A portfolio run needs PCF, PCI, or both")
+        if self.product_ids is not None and self.product_id_prefix:
+            raise ValueError("Select products either by id or by prefix, not both")
+
+
+@dataclass
+class PortfolioProgress:
+    """Live counters for one run; safe to read from other threads via :meth:`report`."""
+
+    job_id: str
+    status: str = "pending"
+    workers: int = 1
+    products: int = 0
+    scenarios: int = 0
+    total_units: int = 0
+    completed_units: int = 0
+    failed_units: int = 0
+    chunks_completed: int = 0
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+    _started: float | None = field(default=None, repr=False)
+    _finished: float | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def start(self, products: int, scenarios: int, workers: int) -> None:
+        with self._lock:
+            self.status = "running"
+            self.products, self.scenarios, self.workers = products, scenarios, workers
+            self.total_units = products * scenarios
+            self.started_at = datetime.now().astimezone()
+            self._started = time.perf_counter()
+
+    def advance(self, units: int, failed: int) -> None:
+        with self._lock:
+            self.completed_units += units
+            self.failed_units += failed
+            self.chunks_completed += 1
+
+    def finish(self, error: str | None = None) -> None:
+        with self._lock:
+            self.status = "failed" if error else "completed"
+            self.error = error
+            self.finished_at = datetime.now().astimezone()
+            self._finished = time.perf_counter()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def report(self) -> dict:
+        """Counters plus elapsed time, throughput (units/s) and a linear ETA."""
+
+        with self._lock:
+            elapsed = 0.0
+            if self._started is not None:
+                elapsed = (self._finished or time.perf_counter()) - self._started
+            throughput = self.completed_units / elapsed if elapsed > 0 else 0.0
+            remaining = self.total_units - self.completed_units
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "workers": self.workers,
+                "products": self.products,
+                "scenarios": self.scenarios,
+                "total_units": self.total_units,
+                "completed_units": self.completed_units,
+                "failed_units": self.failed_units,
+                "chunks_completed": self.chunks_completed,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": elapsed,
+                "units_per_second": throughput,
+                "eta_seconds": remaining / throughput if throughput and not self.done else None,
+                "error": self.error,
+            }
+
+
+@dataclass
+class _ProductWork:
+    product_id: str
+    product: Product | None
+    bom: list[BOMItem]
+    lci_model: LCIModel | None = None
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class _SharedData:
+    """Everything the workers need besides the products; sent once per worker."""
+
+    job_id: str
+    scenarios: tuple[tuple[Scenario, datetime | None], ...]
+    method_profiles: dict[str, MethodProfile]
+    include_pcf: bool
+    include_pci: bool
+
+
+class _UnitEvaluator:
+    """Evaluates chunks of products against every selected scenario."""
+
+    def __init__(self, shared: _SharedData):
+        self.shared = shared
+        self.scenarios = [(scenario, compile_scenario(scenario, updated_at)) for scenario, updated_at in shared.scenarios]
+        self.pcf_service = (
+            PCFService(default_pcf_engine())
+            if shared.include_pcf
+            else None
+        )
+        self.circularity_service = CircularityService(
+            VectorizedBracquene2020CircularityEngine(include_material_flows=False), incremental_entries=1
+        )
+
+    def evaluate(self, chunk: Sequence[_ProductWork]) -> list[dict]:
+        units = [(work, scenario, compiled) for work in chunk for scenario, compiled in self.scenarios]
+        pcf = self._pcf_outcomes(units)
+        return [self._unit(work, scenario, compiled, outcome) for (work, scenario, compiled), outcome in zip(units, pcf)]
+
+    def _pcf_outcomes(
+        self, units: list[tuple[_ProductWork, Scenario, CompiledScenario]]
+    ) -> list[ResultSet | Exception | None]:
+        """PCF for every unit of a chunk in one batch, so the engine solves all demand vectors together."""
+
+        outcomes: list[ResultSet | Exception | None] = [None] * len(units)
+        if self.pcf_service is None:
+            return outcomes
+        pending = [index for index, (work, _, _) in enumerate(units) if work.product is not None and work.bom and not work.error]
+        requests = [
+            PCFRequest(
+                product=units[index][0].product,
+                bom_items=units[index][0].bom,
+                scenario=units[index][1],
+                method_profile=self.shared.method_profiles[units[index][1].id],
+                lci_model=units[index][0].lci_model,
+            )
+            for index in pending
+        ]
+        try:
+            results = self.pcf_service.run_many(requests)
+        except Exception as exc:
+            results = [exc] * len(requests)
+        for index, result in zip(pending, results):
+            outcomes[index] = result
+        return outcomes
+
+    def _unit(
+        self, work: _ProductWork, scenario: Scenario, compiled: CompiledScenario, pcf: ResultSet | Exception | None
+    ) -> dict:
+        method_profile = self.shared.method_profiles[scenario.id]
+        row = {
+            "id": f"{self.shared.job_id}:{work.product_id}:{scenario.id}",
+            "job_id": self.shared.job_id,
+            "product_id": work.product_id,
+            "scenario_id": scenario.id,
+            "method_profile_id": method_profile.id.value,
+            "bom_revision": work.product.bom_revision if work.product else None,
+            "pcf_total_kg_co2e": None,
+            "pci_product": None,
+            "lfi_product": None,
+            "payload": None,
+            "error": None,
+        }
+        if work.product is None or not work.bom:
+            row["error"] = "Product not found" if work.product is None else "BOM not uploaded for product"
+            return row
+        errors: list[str] = []
+        payload: dict = {}
+        # A failing unit is recorded on its row rather than aborting the whole run.
+        if self.pcf_service is not None:
+            if work.error:
+                errors.append(f"pcf: {work.error}")
+            elif isinstance(pcf, Exception):
+                errors.append(f"pcf: {pcf}")
+            elif pcf is not None:
+                row["pcf_total_kg_co2e"] = pcf.pcf_total_kg_co2e
+                payload["pcf_breakdown"] = pcf.pcf_breakdown
+                payload["provenance"] = pcf.provenance
+        if self.shared.include_pci:
+            try:
+                pci_result = self.circularity_service.calculate_pci(work.product, work.bom, compiled)
+                row["pci_product"] = pci_result.pci_product
+                row["lfi_product"] = pci_result.lfi_product
+                payload["circularity_indicators"] = {"pci_result": pci_result_payload(pci_result)}
+            except Exception as exc:
+                errors.append(f"pci: {exc}")
+        row["payload"] = json.dumps(payload, default=str)
+        row["error"] = "; ".join(errors) or None
+        return row
+
+
+_WORKER: _UnitEvaluator | None = None
+
+
+def _init_worker(shared: _SharedData) -> None:
+    global _WORKER
+    _WORKER = _UnitEvaluator(shared)
+
+
+def _evaluate_chunk(chunk: Sequence[_ProductWork]) -> list[dict]:
+    return _WORKER.evaluate(chunk)
+
+
+class PortfolioRunner:
+    """Runs a :class:`PortfolioSelection` and stores one ``result_sets`` row per unit.
+
+    ``chunk_units`` bounds the work units per scheduled chunk (whole products are
+    never split across chunks) and at most ``2 × workers`` chunks are in flight, so
+    the parent never holds more than a few chunks of products and results.
+    """
+
+    def __init__(
+        self,
+        mapping_service: MappingService | None = None,
+        product_repository: ProductRepository | None = None,
+        scenario_service: ScenarioService | None = None,
+        result_repository: ResultRepository | None = None,
+        workers: int = 1,
+        chunk_units: int = 200,
+        product_batch: int = 500,
+    ):
+        self.mapping_service = mapping_service
+        self.product_repository = product_repository or ProductRepository()
+        self.scenario_service = scenario_service or ScenarioService()
+        self.result_repository = result_repository or ResultRepository()
+        self.workers = max(1, workers)
+        self.chunk_units = max(1, chunk_units)
+        self.product_batch = max(1, product_batch)
+
+    @classmethod
+    def from_settings(cls, mapping_service: MappingService | None, workers: int | None = None) -> "PortfolioRunner":
+        settings = get_settings()
+        return cls(
+            mapping_service=mapping_service,
+            workers=workers or settings.portfolio_workers or os.cpu_count() or 1,
+            chunk_units=settings.portfolio_chunk_units,
+            product_batch=settings.portfolio_product_batch,
+        )
+
+    def run(self, selection: PortfolioSelection, progress: PortfolioProgress | None = None) -> PortfolioProgress:
+        progress = progress or PortfolioProgress(job_id=new_job_id())
+        try:
+            shared = self._shared_data(progress.job_id, selection)
+            product_ids = (
+                list(dict.fromkeys(selection.product_ids))
+                if selection.product_ids is not None
+                else self.product_repository.list_product_ids(selection.product_id_prefix)
+            )
+            progress.start(len(product_ids), len(shared.scenarios), self.workers)
+            LOGGER.info(
+                "Portfolio run %s: %d products × %d scenarios on %d worker(s)",
+                progress.job_id,
+                len(product_ids),
+                len(shared.scenarios),
+                self.workers,
+            )
+            self._dispatch(self._chunks(product_ids, selection, len(shared.scenarios)), shared, progress)
+        except Exception as exc:
+            LOGGER.exception("Portfolio run %s failed", progress.job_id)
+            progress.finish(error=str(exc))
+            return progress
+        progress.finish()
+        report = progress.report()
+        LOGGER.info(
+            "Portfolio run %s finished: %d units (%d failed) in %.1fs, %.1f units/s",
+            progress.job_id,
+            report["completed_units"],
+            report["failed_units"],
+            report["elapsed_seconds"],
+            report["units_per_second"],
+        )
+        return progress
+
+    def _shared_data(self, job_id: str, selection: PortfolioSelection) -> _SharedData:
+        scenario_ids = selection.scenario_ids
+        if scenario_ids is None:
+            scenario_ids = tuple(scenario.id for scenario in self.scenario_service.list_scenarios())
+        if not scenario_ids:
+            raise ValueError("No scenarios selected")
+        compiled = [self.scenario_service.get_compiled_scenario(scenario_id) for scenario_id in dict.fromkeys(scenario_ids)]
+        method_profiles = {
+            scenario.id: self.scenario_service.get_method_profile(selection.pcf_method_id or scenario.scenario.pcf_method_id)
+            for scenario in compiled
+        }
+        return _SharedData(
+            job_id=job_id,
+            scenarios=tuple((scenario.scenario, scenario.updated_at) for scenario in compiled),
+            method_profiles=method_profiles,
+            include_pcf=selection.include_pcf,
+            include_pci=selection.include_pci,
+        )
+
+    def _chunks(
+        self, product_ids: list[str], selection: PortfolioSelection, scenario_count: int
+    ) -> Iterator[list[_ProductWork]]:
+        products_per_chunk = max(1, self.chunk_units // scenario_count)
+        for start in range(0, len(product_ids), self.product_batch):
+            batch = product_ids[start : start + self.product_batch]
+            loaded = {product.id: (product, bom) for product, bom in self.product_repository.get_products_with_boms(batch)}
+            work = [self._product_work(product_id, *loaded.get(product_id, (None, [])), selection) for product_id in batch]
+            for offset in range(0, len(work), products_per_chunk):
+                yield work[offset : offset + products_per_chunk]
+
+    def _product_work(
+        self, product_id: str, product: Product | None, bom: list[BOMItem], selection: PortfolioSelection
+    ) -> _ProductWork:
+        try:
+            bom = propagate_quantities(bom)
+        except BOMStructureError as exc:
+            return _ProductWork(product_id=product_id, product=product, bom=bom, error=str(exc))
+        work = _ProductWork(product_id=product_id, product=product, bom=bom)
+        if product is None or not bom or not selection.include_pcf:
+            return work
+        if self.mapping_service is None:
+            work.error = "No mapping service configured"
+            return work
+        try:
+            work.lci_model, _ = self.mapping_service.build_lci_model(product, bom)
+        except ValueError as exc:
+            work.error = str(exc)
+        return work
+
+    def _dispatch(self, chunks: Iterator[list[_ProductWork]], shared: _SharedData, progress: PortfolioProgress) -> None:
+        if self.workers == 1:
+            evaluator = _UnitEvaluator(shared)
+            for chunk in chunks:
+                self._store(evaluator.evaluate(chunk), progress)
+            return
+        # ``spawn`` avoids forking a process that is running server threads.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker, initargs=(shared,)) as pool:
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_evaluate_chunk, chunk))
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._store(future.result(), progress)
+            for future in wait(pending).done:
+                self._store(future.result(), progress)
+
+    def _store(self, rows: list[dict], progress: PortfolioProgress) -> None:
+        started = time.perf_counter()
+        self.result_repository.insert_many(rows)
+        failed = sum(1 for row in rows if row["error"])
+        progress.advance(len(rows), failed)
+        metrics.inc("portfolio_units_total", len(rows), "Portfolio work units stored")
+        metrics.inc("portfolio_units_failed_total", failed, "Portfolio work units stored with an error")
+        metrics.inc("portfolio_store_seconds_total", time.perf_counter() - started, "Time spent bulk-writing portfolio results")
+
+
+class PortfolioJobs:
+    """Background portfolio runs and their progress, keyed by job id.
+
+    Progress lives in memory (the most recent ``max_jobs`` runs); results are in
+    ``result_sets`` and outlive the process.
+    """
+
+    def __init__(self, runner_factory: Callable[[int | None], PortfolioRunner], max_jobs: int = 100):
+        self._runner_factory = runner_factory
+        self._max_jobs = max_jobs
+        self._jobs: dict[str, PortfolioProgress] = {}
+        self._lock = threading.Lock()
+
+    def start(
+        self, selection: PortfolioSelection, workers: int | None = None, background: bool = True
+    ) -> PortfolioProgress:
+        """Register and start a run; with ``background=False`` it runs on the calling thread and returns when done."""
+
+        runner = self._runner_factory(workers)
+        progress = PortfolioProgress(job_id=new_job_id(), workers=runner.workers)
+        with self._lock:
+            self._jobs[progress.job_id] = progress
+            for job_id in list(self._jobs)[: -self._max_jobs]:
+                if self._jobs[job_id].done:
+                    del self._jobs[job_id]
+        if not background:
+            runner.run(selection, progress)
+            return progress
+        thread = threading.Thread(
+            target=runner.run, args=(selection, progress), name=f"portfolio-{progress.job_id[:8]}", daemon=True
+        )
+        thread.start()
+        return progress
+
+    def get(self, job_id: str) -> PortfolioProgress | None:
+        return self._jobs.get(job_id)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
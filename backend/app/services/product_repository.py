@@ -1,14 +1,19 @@
 """Repositories for product and BOM persistence."""
 from __future__ import annotations
 
+import json
 from typing import Callable, Iterable
 
 from sqlalchemy import delete, select
+from sqlalchemy.orm import joinedload
 
+from ..core.config import get_settings
 from ..db.base import get_session
-from ..db.models import BOMItemModel, ProductModel
-from ..models.bom import BOMItem
+from ..db.models import BOMItemModel, BOMRevisionModel, ProductModel
+from ..models.bom import BOMItem, BOMRevision
 from ..models.product import Product
+from .bom_history import BOMDelta, apply_delta, diff_bom, items_from_snapshot, snapshot_payload
+from .bom_tree import BOMTree
 
 
 class ProductRepository:
@@ -39,6 +44,33 @@ class ProductRepository:
             session.refresh(model)
             return self._to_domain_product(model)
 
+    def list_product_revisions(self) -> list[tuple[str, int]]:
+        """Return ``(product_id, revision)`` pairs without loading full rows."""
+
+        with self._session_factory() as session:
+            rows = session.execute(select(ProductModel.id, ProductModel.revision)).all()
+            return [(row.id, row.revision) for row in rows]
+
+    def list_product_ids(self, prefix: str | None = None) -> list[str]:
+        """Return product ids in id order, optionally only those starting with ``prefix``."""
+
+        stmt = select(ProductModel.id).order_by(ProductModel.id)
+        if prefix:
+            stmt = stmt.where(ProductModel.id.startswith(prefix, autoescape=True))
+        with self._session_factory() as session:
+            return list(session.scalars(stmt).all())
+
+    def get_revisions(self, product_id: str) -> tuple[int, int] | None:
+        """Return ``(revision, bom_revision)`` for a product, or ``None`` if unknown."""
+
+        with self._session_factory() as session:
+            row = session.execute(
+                select(ProductModel.revision, ProductModel.bom_revision).where(ProductModel.id == product_id)
+            ).first()
+            if row is None:
+                return None
+            return row.revision, row.bom_revision
+
     def get_product(self, product_id: str) -> Product | None:
         with self._session_factory() as session:
             model = session.get(ProductModel, product_id)
@@ -46,23 +78,148 @@ class ProductRepository:
                 return None
             return self._to_domain_product(model)
 
+    def get_product_with_bom(self, product_id: str) -> tuple[Product, list[BOMItem]] | None:
+        """Load a product and its current BOM in a single joined query."""
+
+        with self._session_factory() as session:
+            model = session.scalars(
+                select(ProductModel).options(joinedload(ProductModel.bom_items)).where(ProductModel.id == product_id)
+            ).unique().first()
+            if not model:
+                return None
+            bom = [self._to_domain_bom(item) for item in model.bom_items]
+            return self._to_domain_product(model), bom
+
+    def get_products_with_boms(self, product_ids: Iterable[str]) -> list[tuple[Product, list[BOMItem]]]:
+        """Bulk variant of :meth:`get_product_with_bom`; unknown ids are skipped, order follows ``product_ids``."""
+
+        product_ids = list(product_ids)
+        with self._session_factory() as session:
+            models = session.scalars(
+                select(ProductModel).options(joinedload(ProductModel.bom_items)).where(ProductModel.id.in_(product_ids))
+            ).unique().all()
+            loaded = {
+                model.id: (self._to_domain_product(model), [self._to_domain_bom(item) for item in model.bom_items])
+                for model in models
+            }
+        return [loaded[product_id] for product_id in product_ids if product_id in loaded]
+
     # BOM operations
     def replace_bom(self, product_id: str, items: Iterable[BOMItem]) -> list[BOMItem]:
+        """Replace the current BOM and record the change as a new revision.
+
+        Raises :class:`BOMStructureError` if parent references are dangling or cyclic.
+        """
+
+        items = list(items)
+        BOMTree.build(items)
         with self._session_factory() as session:
             product = session.get(ProductModel, product_id)
             if not product:
                 raise ValueError("Product not found")
+            previous = [
+                self._to_domain_bom(model)
+                for model in session.scalars(select(BOMItemModel).where(BOMItemModel.product_id == product_id)).all()
+            ]
+            # Databases created before revision history existed have no row to apply deltas to.
+            has_base = (
+                session.scalars(
+                    select(BOMRevisionModel.id).where(
+                        (BOMRevisionModel.product_id == product_id)
+                        & (BOMRevisionModel.revision == (product.bom_revision or 0))
+                    )
+                ).first()
+                is not None
+            )
             session.execute(delete(BOMItemModel).where(BOMItemModel.product_id == product_id))
             for item in items:
                 session.add(self._to_model_bom(item))
+            product.bom_revision = (product.bom_revision or 0) + 1
+            session.add(self._revision_model(product_id, product.bom_revision, previous, items, has_base))
             session.commit()
-        return list(items)
+        return items
 
     def get_bom(self, product_id: str) -> list[BOMItem]:
         with self._session_factory() as session:
             models = session.scalars(select(BOMItemModel).where(BOMItemModel.product_id == product_id)).all()
             return [self._to_domain_bom(model) for model in models]
 
+    # BOM revision history
+    def list_bom_revisions(self, product_id: str) -> list[BOMRevision]:
+        with self._session_factory() as session:
+            stmt = (
+                select(BOMRevisionModel)
+                .where(BOMRevisionModel.product_id == product_id)
+                .order_by(BOMRevisionModel.revision.asc())
+            )
+            return [self._to_domain_revision(model) for model in session.scalars(stmt).all()]
+
+    def get_bom_at_revision(self, product_id: str, revision: int) -> list[BOMItem] | None:
+        """Reconstruct a past BOM from its nearest checkpoint and the deltas after it."""
+
+        with self._session_factory() as session:
+            checkpoint = session.scalars(
+                select(BOMRevisionModel.revision)
+                .where(
+                    (BOMRevisionModel.product_id == product_id)
+                    & (BOMRevisionModel.revision <= revision)
+                    & (BOMRevisionModel.is_checkpoint.is_(True))
+                )
+                .order_by(BOMRevisionModel.revision.desc())
+            ).first()
+            if checkpoint is None:
+                return None
+            rows = session.scalars(
+                select(BOMRevisionModel)
+                .where(
+                    (BOMRevisionModel.product_id == product_id)
+                    & (BOMRevisionModel.revision >= checkpoint)
+                    & (BOMRevisionModel.revision <= revision)
+                )
+                .order_by(BOMRevisionModel.revision.asc())
+            ).all()
+            if not rows or rows[-1].revision != revision:
+                return None
+            items = items_from_snapshot(json.loads(rows[0].payload))
+            for row in rows[1:]:
+                items = apply_delta(items, BOMDelta.from_payload(json.loads(row.payload)))
+            return items
+
+    def _revision_model(
+        self,
+        product_id: str,
+        revision: int,
+        previous: list[BOMItem],
+        current: list[BOMItem],
+        has_base: bool,
+    ) -> BOMRevisionModel:
+        delta = diff_bom(previous, current)
+        interval = max(get_settings().bom_checkpoint_interval, 1)
+        is_checkpoint = not has_base or revision % interval == 0
+        payload = snapshot_payload(current) if is_checkpoint else delta.to_payload()
+        return BOMRevisionModel(
+            product_id=product_id,
+            revision=revision,
+            is_checkpoint=is_checkpoint,
+            payload=json.dumps(payload),
+            item_count=len(current),
+            added_count=len(delta.added),
+            updated_count=len(delta.updated),
+            removed_count=len(delta.removed),
+        )
+
+    def _to_domain_revision(self, model: BOMRevisionModel) -> BOMRevision:
+        return BOMRevision(
+            product_id=model.product_id,
+            revision=model.revision,
+            is_checkpoint=model.is_checkpoint,
+            item_count=model.item_count,
+            added_count=model.added_count,
+            updated_count=model.updated_count,
+            removed_count=model.removed_count,
+            created_at=model.created_at,
+        )
+
     # Conversion helpers
     def _to_domain_product(self, model: ProductModel) -> Product:
         return Product(
@@ -72,6 +229,8 @@ class ProductRepository:
             functional_unit=model.functional_unit,
             lifetime_years=model.lifetime_years,
             use_profile=model.use_profile,
+            revision=model.revision or 1,
+            bom_revision=model.bom_revision or 0,
         )
 
     def _to_domain_bom(self, model: BOMItemModel) -> BOMItem:
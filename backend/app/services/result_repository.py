@@ -0,0 +1,91 @@
+"""Persistence for stored PCF/PCI result rows."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+from sqlalchemy import func, insert, select, update
+
+from ..db.base import get_session
+from ..db.models import ResultSetModel, utcnow
+from .dependency_index import result_edges, upsert_edges
+
+
+@dataclass(frozen=True)
+class StoredResult:
+    """Summary columns of one ``result_sets`` row; ``payload`` is the raw JSON detail."""
+
+    id: str
+    job_id: str | None
+    product_id: str
+    scenario_id: str
+    method_profile_id: str | None
+    bom_revision: int | None
+    pcf_total_kg_co2e: float | None
+    pci_product: float | None
+    lfi_product: float | None
+    error: str | None
+    stale: bool = False
+    payload: str | None = None
+
+
+class ResultRepository:
+    def __init__(self, session_factory: Callable = get_session):
+        self._session_factory = session_factory
+
+    def insert_many(self, rows: Sequence[dict]) -> int:
+        """Insert ready-made ``result_sets`` rows and their scenario edges in one transaction."""
+
+        if not rows:
+            return 0
+        now = utcnow()
+        with self._session_factory() as session:
+            session.execute(insert(ResultSetModel), [{"created_at": now, **row} for row in rows])
+            upsert_edges(session, result_edges(rows))
+            session.commit()
+        return len(rows)
+
+    def mark_stale(self, product_ids: Sequence[str], scenario_ids: Sequence[str] | None = None) -> int:
+        """Flag stored results of ``product_ids`` (optionally only for ``scenario_ids``) as stale; returns rows flagged."""
+
+        if not product_ids:
+            return 0
+        stmt = update(ResultSetModel).where(ResultSetModel.product_id.in_(product_ids), ResultSetModel.stale.is_(False))
+        if scenario_ids is not None:
+            stmt = stmt.where(ResultSetModel.scenario_id.in_(scenario_ids))
+        with self._session_factory() as session:
+            flagged = session.execute(stmt.values(stale=True)).rowcount
+            session.commit()
+        return flagged
+
+    def count_for_job(self, job_id: str) -> int:
+        with self._session_factory() as session:
+            return session.scalar(select(func.count()).select_from(ResultSetModel).where(ResultSetModel.job_id == job_id))
+
+    def list_for_job(
+        self, job_id: str, limit: int = 100, offset: int = 0, include_payload: bool = False
+    ) -> list[StoredResult]:
+        columns = [
+            ResultSetModel.id,
+            ResultSetModel.job_id,
+            ResultSetModel.product_id,
+            ResultSetModel.scenario_id,
+            ResultSetModel.method_profile_id,
+            ResultSetModel.bom_revision,
+            ResultSetModel.pcf_total_kg_co2e,
+            ResultSetModel.pci_product,
+            ResultSetModel.lfi_product,
+            ResultSetModel.error,
+            ResultSetModel.stale,
+        ]
+        if include_payload:
+            columns.append(ResultSetModel.payload)
+        stmt = (
+            select(*columns)
+            .where(ResultSetModel.job_id == job_id)
+            .order_by(ResultSetModel.product_id, ResultSetModel.scenario_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        with self._session_factory() as session:
+            return [StoredResult(*row) for row in session.execute(stmt).all()]
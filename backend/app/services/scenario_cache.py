@@ -0,0 +1,70 @@
+"""In-process cache of compiled scenarios."""
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+
+from ..core.metrics import metrics
+from ..models.scenario import CompiledScenario
+
+
+class ScenarioCache:
+    """Caches :class:`CompiledScenario` objects keyed by scenario id and ``updated_at``.
+
+    An entry whose ``updated_at`` differs from the one asked for is a miss, so a
+    scenario saved elsewhere is recompiled on its next lookup; local writers also
+    drop their entry through :meth:`invalidate`.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, CompiledScenario] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scenario_id: str, updated_at: datetime | None = None) -> CompiledScenario | None:
+        """Return a cached entry; when ``updated_at`` is given it must match as well."""
+
+        entry = self._entries.get(scenario_id)
+        if entry is not None and (updated_at is None or entry.updated_at == updated_at):
+            self._record(hit=True)
+            return entry
+        self._record(hit=False)
+        return None
+
+    def put(self, compiled: CompiledScenario) -> CompiledScenario:
+        with self._lock:
+            self._entries[compiled.id] = compiled
+            metrics.set_gauge("scenario_cache_entries", len(self._entries), "Compiled scenarios held in memory")
+        return compiled
+
+    def invalidate(self, scenario_id: str) -> None:
+        with self._lock:
+            self._entries.pop(scenario_id, None)
+            metrics.set_gauge("scenario_cache_entries", len(self._entries), "Compiled scenarios held in memory")
+        metrics.inc("scenario_cache_invalidations_total", description="Explicit scenario cache invalidations")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            metrics.set_gauge("scenario_cache_entries", 0, "Compiled scenarios held in memory")
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.inc(
+            "scenario_cache_hits_total" if hit else "scenario_cache_misses_total",
+            description="Compiled scenario cache lookups",
+        )
+        metrics.set_gauge("scenario_cache_hit_ratio", self.hit_ratio, "Compiled scenario cache hit ratio")
+
+
+scenario_cache = ScenarioCache()
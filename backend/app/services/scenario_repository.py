@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import json
+from dataclasses import asdict
 from typing import Callable
 
 from sqlalchemy import select
@@ -9,25 +10,85 @@ from sqlalchemy import select
 from ..db.base import get_session
 from ..db.models import ScenarioModel
 from ..models.pci import MaterialCircularityParameters
-from ..models.scenario import Scenario
+from ..models.scenario import CompiledScenario, Scenario, compile_scenario
 from ..models.method_profile import PCFMethodID
+from .scenario_cache import ScenarioCache, scenario_cache
 
 
 class ScenarioRepository:
-    def __init__(self, session_factory: Callable = get_session):
+    def __init__(self, session_factory: Callable = get_session, cache: ScenarioCache | None = None):
         self._session_factory = session_factory
+        self._cache = cache or scenario_cache
 
     def list_scenarios(self) -> list[Scenario]:
         with self._session_factory() as session:
             results = session.scalars(select(ScenarioModel)).all()
             return [self._to_domain(model) for model in results]
 
+    def list_scenario_revisions(self) -> list[tuple[str, int]]:
+        """Return ``(scenario_id, revision)`` pairs without loading full rows."""
+
+        with self._session_factory() as session:
+            rows = session.execute(select(ScenarioModel.id, ScenarioModel.revision)).all()
+            return [(row.id, row.revision) for row in rows]
+
     def get_scenario(self, scenario_id: str) -> Scenario:
+        """Return the (shared, cached) scenario; callers must treat it as read-only."""
+
+        return self.get_compiled_scenario(scenario_id).scenario
+
+    def get_compiled_scenario(self, scenario_id: str) -> CompiledScenario:
+        """Cached compiled scenario, recompiled once the row's ``updated_at`` has moved on.
+
+        Only ``updated_at`` is read on a hit, so saves from other workers are seen
+        on their next lookup.
+        """
+
         with self._session_factory() as session:
-            model = session.get(ScenarioModel, scenario_id)
-            if not model:
+            row = session.execute(
+                select(ScenarioModel.updated_at).where(ScenarioModel.id == scenario_id)
+            ).first()
+            if row is None:
                 raise ValueError(f"Scenario {scenario_id} not found")
-            return self._to_domain(model)
+            cached = self._cache.get(scenario_id, row.updated_at)
+            if cached is not None:
+                return cached
+            model = session.get(ScenarioModel, scenario_id, populate_existing=True)
+            compiled = compile_scenario(self._to_domain(model), updated_at=model.updated_at)
+        return self._cache.put(compiled)
+
+    def save_scenario(self, scenario: Scenario) -> Scenario:
+        """Insert or update a scenario and invalidate its compiled cache entry."""
+
+        with self._session_factory() as session:
+            model = session.get(ScenarioModel, scenario.id)
+            if model is None:
+                model = ScenarioModel(id=scenario.id, revision=0)
+            model.name = scenario.name
+            model.goal_scope = scenario.goal_scope
+            model.system_boundary = scenario.system_boundary
+            model.geography = scenario.geography
+            model.method_profile_id = scenario.method_profile_id
+            model.pcf_method_id = PCFMethodID(scenario.pcf_method_id).value
+            model.energy_mix_profile = scenario.energy_mix_profile
+            model.end_of_life_model = scenario.end_of_life_model
+            model.collection_fraction_for_reuse = scenario.collection_fraction_for_reuse
+            model.collection_fraction_for_recycling = scenario.collection_fraction_for_recycling
+            model.utility_factor = scenario.utility_factor
+            model.design_lifetime_functional_units = scenario.design_lifetime_functional_units
+            model.actual_used_functional_units = scenario.actual_used_functional_units
+            model.material_parameters = json.dumps(
+                {key: asdict(value) for key, value in scenario.material_parameters.items()}
+            )
+            model.revision = (model.revision or 0) + 1
+            session.add(model)
+            session.commit()
+            scenario.revision = model.revision
+        self._cache.invalidate(scenario.id)
+        return scenario
+
+    def invalidate(self, scenario_id: str) -> None:
+        self._cache.invalidate(scenario_id)
 
     def _to_domain(self, model: ScenarioModel) -> Scenario:
         params_dict = json.loads(model.material_parameters or "{}")
@@ -51,4 +112,5 @@ class ScenarioRepository:
             design_lifetime_functional_units=model.design_lifetime_functional_units,
             actual_used_functional_units=model.actual_used_functional_units,
             material_parameters=material_params,
+            revision=model.revision or 1,
         )
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from ..models.method_profile import MethodProfile, PCF_METHOD_PROFILES, PCFMethodID
-from ..models.scenario import Scenario
+from ..models.scenario import CompiledScenario, Scenario
 from .scenario_repository import ScenarioRepository
 
 
@@ -18,9 +18,19 @@ class ScenarioService:
     def list_scenarios(self) -> list[Scenario]:
         return self.repository.list_scenarios()
 
+    def list_scenario_revisions(self) -> list[tuple[str, int]]:
+        return self.repository.list_scenario_revisions()
+
     def get_method_profile(self, method_id: str | PCFMethodID) -> MethodProfile:
         method_key = PCFMethodID(method_id)
         return PCF_METHOD_PROFILES[method_key]
 
     def get_scenario(self, scenario_id: str) -> Scenario:
         return self.repository.get_scenario(scenario_id)
+
+    def get_compiled_scenario(self, scenario_id: str) -> CompiledScenario:
+        return self.repository.get_compiled_scenario(scenario_id)
+
+    def save_scenario(self, scenario: Scenario) -> Scenario:
+        return self.repository.save_scenario(scenario)
+
@@ -0,0 +1,130 @@
+"""Compare the scalar and NumPy-vectorized Bracquené 2020 PCI engines.
+
+    python -m backend.benchmarks.bench_pci --lines 100000
+
+Reports the best of ``--repeat`` runs for the scalar engine, the vectorized engine
+with per-line flows, and the vectorized engine without them. Exits with status 1
+if the default vectorized path (with per-line flows, as the API uses it) is less
+than ``--min-speedup`` times faster than the scalar engine or if the results
+disagree.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sys
+import time
+from dataclasses import asdict
+
+from backend.app.engines.circularity_engine_pci_bracquene2020 import Bracquene2020CircularityEngine
+from backend.app.engines.circularity_engine_pci_vectorized import VectorizedBracquene2020CircularityEngine
+from backend.app.models.bom import BOMItem
+from backend.app.models.method_profile import PCFMethodID
+from backend.app.models.pci import MaterialCircularityParameters
+from backend.app.models.product import Product
+from backend.app.models.scenario import Scenario, compile_scenario
+
+
+def synthetic_case(lines: int, materials: int = 25, seed: int = 7):
+    rng = random.Random(seed)
+    keys = [f"MAT-{index:03d}" for index in range(materials)]
+    parameters = {
+        key: MaterialCircularityParameters(
+            material_key=key,
+            efficiency_feedstock_production=rng.uniform(0.5, 1.0),
+            efficiency_component_production=rng.uniform(0.5, 1.0),
+            recovered_fraction_feedstock_losses=rng.random(),
+            recovered_fraction_component_losses=rng.random(),
+            efficiency_material_separation_eol=rng.random(),
+            efficiency_recycled_feedstock_production=rng.random(),
+        )
+        for key in keys
+    }
+    scenario = Scenario(
+        id="bench",
+        name="Benchmark",
+        goal_scope="",
+        system_boundary="",
+        geography="",
+        method_profile_id="iso-basic",
+        pcf_method_id=PCFMethodID.PACT_V3,
+        energy_mix_profile="",
+        end_of_life_model="",
+        collection_fraction_for_reuse=0.3,
+        collection_fraction_for_recycling=0.5,
+        utility_factor=1.1,
+        material_parameters=parameters,
+    )
+    bom = [
+        BOMItem(
+            id=f"line-{index}",
+            product_id="bench",
+            parent_bom_item_id=None,
+            description="",
+            quantity=rng.choice([1, 1, 2, 4]),
+            unit="ea",
+            mass_kg=rng.uniform(0.01, 5.0),
+            material_family=rng.choice(keys),
+            material_code=None,
+            classification_unspsc=None,
+            supplier_id=None,
+            reused_share=rng.random() * 0.5,
+            recycled_content_share=rng.random(),
+        )
+        for index in range(lines)
+    ]
+    product = Product(id="bench", name="Benchmark", version="1", functional_unit="1 unit")
+    return product, bom, compile_scenario(scenario)
+
+
+def _best(fn, repeat: int) -> tuple[float, object]:
+    best, result = math.inf, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    args = parser.parse_args()
+
+    product, bom, scenario = synthetic_case(args.lines)
+    engines = {
+        "scalar": Bracquene2020CircularityEngine(),
+        "vectorized": VectorizedBracquene2020CircularityEngine(),
+        "vectorized (indicators only)": VectorizedBracquene2020CircularityEngine(include_material_flows=False),
+    }
+    timings, results = {}, {}
+    for name, engine in engines.items():
+        timings[name], results[name] = _best(lambda: engine.calculate_pci(product, bom, scenario), args.repeat)
+
+    reference = results["scalar"]
+    agree = all(
+        math.isclose(result.pci_product, reference.pci_product, rel_tol=1e-12, abs_tol=1e-12)
+        and math.isclose(result.lfi_product, reference.lfi_product, rel_tol=1e-12, abs_tol=1e-12)
+        for result in results.values()
+    )
+    flows, expected_flows = results["vectorized"].per_material_flows, reference.per_material_flows
+    agree = agree and len(flows) == len(expected_flows)
+    for line in range(0, len(expected_flows), max(1, len(expected_flows) // 100)):
+        expected, actual = asdict(expected_flows[line]), asdict(flows[line])
+        agree = agree and actual["material_key"] == expected["material_key"] and all(
+            math.isclose(actual[name], value, rel_tol=1e-12, abs_tol=1e-12)
+            for name, value in expected.items()
+            if name != "material_key"
+        )
+    for name, seconds in timings.items():
+        print(f"{name:>30}: {seconds:.4f}s  ({timings['scalar'] / seconds:5.1f}x)")
+    print(f"{'results agree':>30}: {agree}")
+    speedup = timings["scalar"] / timings["vectorized"]
+    return 0 if agree and speedup >= args.min_speedup else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Measure import time and lifespan boot time of the API against a budget.
+
+Each measurement runs in a fresh interpreter so module caches do not hide the cost.
+Third-party frameworks are imported first and reported separately; the ``import``
+budget applies to the application's own modules on top of them. Exits with status 1
+when the median of any budgeted measurement exceeds its budget.
+
+    python -m backend.benchmarks.bench_startup --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+IMPORT_SNIPPET = """
+import json, time
+started = time.perf_counter()
+import fastapi, httpx, pydantic, rapidfuzz, sqlalchemy.orm  # noqa: F401,E401
+frameworks = time.perf_counter()
+import backend.app.main  # noqa: F401
+print(json.dumps({"frameworks": frameworks - started, "import": time.perf_counter() - frameworks}))
+"""
+
+BOOT_SNIPPET = """
+import json, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+from backend.app.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    booted = time.perf_counter()
+    client.get("/health")
+    first = time.perf_counter()
+print(json.dumps({"import": imported - started, "boot": booted - imported, "first_request": first - booted}))
+"""
+
+
+def _run(snippet: str, database_url: str) -> dict[str, float]:
+    env = {**os.environ, "DATABASE_URL": database_url, "STARTUP_WARMUP": "false"}
+    completed = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--import-budget", type=float, default=0.5, help="Seconds allowed to import backend.app.main after frameworks"
+    )
+    parser.add_argument("--boot-budget", type=float, default=1.0, help="Seconds allowed for lifespan startup")
+    args = parser.parse_args()
+
+    samples: dict[str, list[float]] = {"frameworks": [], "import": [], "boot": [], "first_request": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            imported = _run(IMPORT_SNIPPET, f"sqlite:///{tmp}/import-{run}.db")
+            samples["frameworks"].append(imported["frameworks"])
+            samples["import"].append(imported["import"])
+            boot = _run(BOOT_SNIPPET, f"sqlite:///{tmp}/boot-{run}.db")
+            samples["boot"].append(boot["boot"])
+            samples["first_request"].append(boot["first_request"])
+
+    budgets = {"import": args.import_budget, "boot": args.boot_budget}
+    failed = False
+    for name, values in samples.items():
+        median = statistics.median(values)
+        budget = budgets.get(name)
+        status = "" if budget is None else ("ok" if median <= budget else "OVER BUDGET")
+        limit = f" (budget {budget:.3f}s)" if budget is not None else ""
+        print(f"{name:>14}: median {median:.3f}s  min {min(values):.3f}s  max {max(values):.3f}s{limit} {status}")
+        failed |= budget is not None and median > budget
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
+import json
 import os
+import threading
+import time
 from pathlib import Path
 
 TEST_DB = Path(__file__).resolve().parent / "test_api.db"
@@ -6,13 +9,40 @@ if TEST_DB.exists():
     TEST_DB.unlink()
 os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
 
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
+from backend.app.api.dependencies import (
+    get_circularity_service,
+    get_pcf_service,
+    get_portfolio_jobs,
+    get_portfolio_runner,
+)
+from backend.app.db.base import get_engine, get_session
+from backend.app.db.models import ProductModel
+from backend.app.db.unit_of_work import UnitOfWork
+from backend.app.engines.pcf_engine_base import LCIEntry
+from backend.app.engines.pcf_engine_matrix import SEED_LCI_DATABASE, LCIDatabase, MatrixLCAEngine, load_lci_database
 from backend.app.main import app
+from backend.app.models.method_profile import PCF_METHOD_PROFILES, PCFMethodID
+from backend.app.services.bom_rollup import BOMRollupService
+from backend.app.services.dependency_index import DependencyIndex
+from backend.app.services.invalidation_service import InvalidationService, RecomputeQueue
+from backend.app.services.pcf_service import PCFService
+from backend.app.services.portfolio_runner import PortfolioSelection
+from backend.app.services.product_repository import ProductRepository
+from backend.app.services.result_repository import ResultRepository
 
 client = TestClient(app)
 
 
+@pytest.fixture(scope="module", autouse=True)
+def _run_lifespan():
+    with client:
+        yield
+
+
 def test_health_endpoint():
     response = client.get("/health")
     assert response.status_code == 200
@@ -65,6 +95,34 @@ def test_product_bom_and_pcf_flow():
     assert "pcf_total_kg_co2e" in body
     assert body["pcf_total_kg_co2e"] > 0
 
+    methods = ["PACT_V3", "ISO14067_GENERIC", "PEF_GENERIC", "CATENAX_PCF"]
+    multi = client.post("/pcf/run", json={"product_id": "prod-1", "pcf_method_ids": methods})
+    assert multi.status_code == 200
+    assert [result["method_profile_id"] for result in multi.json()] == methods
+    assert multi.json()[0]["pcf_total_kg_co2e"] == pytest.approx(body["pcf_total_kg_co2e"])
+    conflicting = client.post("/pcf/run", json={"product_id": "prod-1", "pcf_method_id": "PACT_V3", "pcf_method_ids": methods})
+    assert conflicting.status_code == 400
+
+    override = {"product_id": "prod-1", "bom_item_id": "item-1", "dataset_id": "prob:steel-machined", "provider": "probas"}
+    assert client.post("/mapping/override", json=override).status_code == 200
+    rerun = client.post("/pcf/run", json={"product_id": "prod-1", "pcf_method_id": "PACT_V3"}).json()
+    assert rerun["provenance"]["calculation"]["incremental"] == {"items_recomputed": 1, "items_removed": 0}
+    assert rerun["pcf_breakdown"]["by_dataset"] == {"prob:steel-machined": pytest.approx(rerun["pcf_total_kg_co2e"])}
+
+    dqr = {"reliability": 2, "completeness": 1, "temporal": 2, "geographical": 3, "technological": 2, "scale": "dqr"}
+    uncertainty = client.post(
+        "/pcf/uncertainty",
+        json={"product_id": "prod-1", "pcf_method_id": "PACT_V3", "samples": 500, "item_pedigree": {"item-1": dqr}},
+    )
+    assert uncertainty.status_code == 200
+    spread = uncertainty.json()
+    assert spread["total"]["deterministic"] == pytest.approx(rerun["pcf_total_kg_co2e"])
+    assert spread["per_item"]["item-1"]["percentiles"]["p5"] < spread["per_item"]["item-1"]["percentiles"]["p95"]
+    assert set(spread["per_stage"]) == {"raw_materials"}
+    dqr["temporal"] = 4
+    bad = client.post("/pcf/uncertainty", json={"product_id": "prod-1", "item_pedigree": {"item-1": dqr}})
+    assert bad.status_code == 400
+
     history = client.get("/mapping/history/prod-1")
     assert history.status_code == 200
     assert len(history.json()) >= 1
@@ -73,3 +131,425 @@ def test_product_bom_and_pcf_flow():
     assert pci.status_code == 200
     pci_body = pci.json()
     assert "pci_product" in pci_body
+
+
+def test_conditional_get_returns_304_for_unchanged_resources():
+    client.post("/products", json={"id": "prod-etag", "name": "Lamp", "version": "1", "functional_unit": "1 lamp"})
+    first = client.get("/bom/prod-etag")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = client.get("/bom/prod-etag", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    bom_payload = [
+        {
+            "id": "lamp-1",
+            "product_id": "prod-etag",
+            "description": "Steel stand",
+            "quantity": 1,
+            "mass_kg": 0.8,
+            "material_family": "Steel",
+            "material_code": "STL-FASTENER",
+        }
+    ]
+    assert client.post("/bom/upload", json=bom_payload).status_code == 200
+    changed = client.get("/bom/prod-etag", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+    methods = client.get("/pcf/methods")
+    assert "max-age" in methods.headers["cache-control"]
+    assert client.get("/pcf/methods", headers={"If-None-Match": methods.headers["etag"]}).status_code == 304
+
+
+def test_bom_revisions_are_reconstructable():
+    client.post("/products", json={"id": "prod-rev", "name": "Shelf", "version": "1", "functional_unit": "1 shelf"})
+    base_item = {
+        "id": "shelf-1",
+        "product_id": "prod-rev",
+        "description": "Steel board",
+        "quantity": 1,
+        "mass_kg": 2.0,
+        "material_family": "Steel",
+        "material_code": "STL-FASTENER",
+    }
+    first = client.post("/bom/upload", json=[base_item]).json()
+    second = client.post("/bom/upload", json=[{**base_item, "mass_kg": 2.5}]).json()
+    assert second["bom_revision"] == first["bom_revision"] + 1
+
+    revisions = client.get("/bom/prod-rev/revisions").json()
+    assert [entry["is_checkpoint"] for entry in revisions] == [True, False]
+    assert revisions[1]["updated_count"] == 1
+
+    old = client.get(f"/bom/prod-rev/revisions/{first['bom_revision']}").json()
+    assert old["items"][0]["mass_kg"] == 2.0
+
+    reordered = [{**base_item, "id": "shelf-2", "description": "Bracket"}, {**base_item, "mass_kg": 2.5}]
+    third = client.post("/bom/upload", json=reordered).json()
+    restored = client.get(f"/bom/prod-rev/revisions/{third['bom_revision']}").json()
+    assert [item["id"] for item in restored["items"]] == ["shelf-2", "shelf-1"]
+
+    pci = client.get("/circularity/pci/prod-rev", params={"bom_revision": first["bom_revision"]})
+    assert pci.status_code == 200
+    assert pci.json()["mass_total"] == 2.0
+
+
+def test_bom_rollup_propagates_quantities_and_rejects_cycles():
+    client.post("/products", json={"id": "prod-tree", "name": "Fan", "version": "1", "functional_unit": "1 fan"})
+    base = {"product_id": "prod-tree", "unit": "ea", "material_family": "Steel", "material_code": "STL-FASTENER"}
+    bom = [
+        {**base, "id": "fan-body", "description": "Steel body", "quantity": 1, "mass_kg": 1.0},
+        {**base, "id": "fan-blade", "parent_bom_item_id": "fan-body", "description": "Blade set", "quantity": 3, "mass_kg": 0.2, "component_code": "BLADE-3"},
+        {**base, "id": "fan-rivet", "parent_bom_item_id": "fan-blade", "description": "Rivet", "quantity": 4, "mass_kg": 0.01},
+    ]
+    cyclic = [{**bom[0], "parent_bom_item_id": "fan-rivet"}, *bom[1:]]
+    response = client.post("/bom/upload", json=cyclic)
+    assert response.status_code == 400
+    assert "cycle" in response.json()["detail"]
+
+    assert client.post("/bom/upload", json=bom).status_code == 200
+    response = client.get("/bom/prod-tree/rollup")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["mass_kg"] == pytest.approx(1.0 + 3 * 0.2 + 12 * 0.01)
+    assert [sub["item_id"] for sub in data["subassemblies"]] == ["fan-body", "fan-blade"]
+    assert data["subassemblies"][1]["mass_kg"] == pytest.approx(3 * (0.2 + 4 * 0.01))
+
+    # Flat PCF/PCI runs and portfolio runs propagate parent quantities like the roll-up.
+    pci = client.get("/circularity/pci/prod-tree").json()
+    assert pci["mass_total"] == pytest.approx(data["mass_kg"])
+    assert pci["pci_product"] == pytest.approx(data["pci"])
+    pcf = client.post("/pcf/run", json={"product_id": "prod-tree"}).json()
+    assert pcf["pcf_total_kg_co2e"] == pytest.approx(data["pcf_kg_co2e"])
+    progress = get_portfolio_runner(workers=1).run(PortfolioSelection(product_ids=("prod-tree",), scenario_ids=("default",)))
+    (row,) = ResultRepository().list_for_job(progress.job_id)
+    assert row.pcf_total_kg_co2e == pytest.approx(data["pcf_kg_co2e"])
+    assert row.pci_product == pytest.approx(data["pci"])
+    assert client.get("/bom/prod-tree/rollup").json()["memo_hits"] == 1
+
+    override = {"product_id": "prod-tree", "bom_item_id": "fan-rivet", "dataset_id": "prob:aluminium-extrusion", "provider": "probas"}
+    assert client.post("/mapping/override", json=override).status_code == 200
+    rerun = client.get("/bom/prod-tree/rollup").json()
+    assert rerun["memo_hits"] == 0
+    assert rerun["pcf_kg_co2e"] != pytest.approx(data["pcf_kg_co2e"])
+    assert client.get("/bom/prod-tree/rollup").json()["pcf_kg_co2e"] == pytest.approx(rerun["pcf_kg_co2e"])
+
+
+def test_pcf_run_uses_one_connection_checkout():
+    client.post("/products", json={"id": "prod-uow", "name": "Lamp", "version": "1", "functional_unit": "1 lamp"})
+    item = {
+        "id": "uow-item-1",
+        "product_id": "prod-uow",
+        "description": "Steel base",
+        "quantity": 1,
+        "unit": "ea",
+        "mass_kg": 0.8,
+        "material_family": "Steel",
+        "material_code": "STEEL-S235",
+    }
+    assert client.post("/bom/upload", json=[item]).status_code == 200
+
+    checkouts = []
+
+    def listener(*args):
+        # Checkouts by the background decision writer are not part of the request.
+        if threading.current_thread().name != "decision-writer":
+            checkouts.append(1)
+
+    event.listen(get_engine(), "checkout", listener)
+    try:
+        response = client.post("/pcf/run", json={"product_id": "prod-uow"})
+    finally:
+        event.remove(get_engine(), "checkout", listener)
+    assert response.status_code == 200
+    assert len(checkouts) == 1
+
+
+def test_unit_of_work_reads_from_one_snapshot():
+    client.post("/products", json={"id": "prod-snap", "name": "Lamp", "version": "1", "functional_unit": "1"})
+    with UnitOfWork() as uow:
+        repository = ProductRepository(session_factory=uow.session_factory)
+        assert repository.get_revisions("prod-snap") == (1, 0)
+        with get_session() as session:
+            session.get(ProductModel, "prod-snap").revision = 2
+            session.commit()
+        assert repository.get_revisions("prod-snap") == (1, 0)
+    assert ProductRepository().get_revisions("prod-snap") == (2, 0)
+
+
+def _upload_desk(product_id: str) -> str:
+    """A product with one steel frame line; returns the line's id."""
+
+    client.post("/products", json={"id": product_id, "name": "Desk", "version": "1", "functional_unit": "1"})
+    item = {
+        "id": f"{product_id}-item-1",
+        "product_id": product_id,
+        "description": "Steel frame",
+        "quantity": 2,
+        "unit": "ea",
+        "mass_kg": 3.0,
+        "material_family": "Steel",
+    }
+    assert client.post("/bom/upload", json=[item]).status_code == 200
+    return item["id"]
+
+
+def test_pci_sweep_streams_csv():
+    _upload_desk("prod-sweep")
+
+    response = client.post(
+        "/circularity/sweep",
+        json={
+            "product_id": "prod-sweep",
+            "ranges": [
+                {"parameter": "collection_fraction_for_reuse", "start": 0.0, "stop": 0.4, "steps": 3},
+                {"parameter": "utility_factor", "values": [1.0, 2.0]},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "point,collection_fraction_for_reuse,utility_factor,pci,lfi"
+    assert len(lines) == 1 + 6
+
+    bad = client.post("/circularity/sweep", json={"product_id": "prod-sweep", "grid": [{"bogus": 1.0}]})
+    assert bad.status_code == 400
+
+
+def test_pci_sensitivity_ranks_parameters():
+    item_id = _upload_desk("prod-sensitivity")
+
+    response = client.get("/circularity/sensitivity/prod-sensitivity", params={"top": 3})
+    assert response.status_code == 200
+    data = response.json()
+    labels = {entry["label"] for entry in data["sensitivities"]}
+    assert {"utility_factor", f"reused_share[{item_id}]"} <= labels
+    assert len(data["tornado"]) == 3
+    assert client.get("/circularity/sensitivity/prod-missing").status_code == 404
+
+
+def test_pci_goal_seek_reaches_target():
+    item_id = _upload_desk("prod-goal-seek")
+
+    response = client.post(
+        "/circularity/goal-seek",
+        json={
+            "product_id": "prod-goal-seek",
+            "target_pci": 0.5,
+            "variables": [{"parameter": "recycled_content_share", "scope": item_id}, {"parameter": "collection_fraction_for_reuse"}],
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["achieved"] and abs(data["pci"] - 0.5) <= 1e-6
+    assert [entry["label"] for entry in data["variables"]] == [f"recycled_content_share[{item_id}]", "collection_fraction_for_reuse"]
+    bad = client.post("/circularity/goal-seek", json={"product_id": "prod-goal-seek", "target_pci": 0.5, "variables": [{"parameter": "bogus"}]})
+    assert bad.status_code == 400
+
+
+def test_pci_uncertainty_returns_statistics():
+    client.post("/products", json={"id": "prod-mc", "name": "Shelf", "version": "1", "functional_unit": "1"})
+    item = {
+        "id": "mc-item-1",
+        "product_id": "prod-mc",
+        "description": "Steel shelf",
+        "quantity": 1,
+        "unit": "ea",
+        "mass_kg": 5.0,
+        "material_family": "Steel",
+    }
+    assert client.post("/bom/upload", json=[item]).status_code == 200
+
+    response = client.post(
+        "/circularity/uncertainty",
+        json={
+            "product_id": "prod-mc",
+            "samples": 2000,
+            "seed": 3,
+            "percentiles": [5, 95],
+            "distributions": [
+                {"parameter": "collection_fraction_for_recycling", "kind": "uniform", "low": 0.2, "high": 0.8},
+                {"parameter": "reused_share", "kind": "triangular", "low": 0.0, "mode": 0.1, "high": 0.3, "scope": "mc-item-1"},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["samples"] == 2000
+    product = body["product"]
+    assert 0.0 <= product["percentiles"]["p5"] <= product["mean"] <= product["percentiles"]["p95"] <= 1.0
+    assert product["std"] > 0
+    assert set(body["per_material"]) == {"Steel"}
+
+    bad = client.post(
+        "/circularity/uncertainty",
+        json={"product_id": "prod-mc", "distributions": [{"parameter": "utility_factor", "kind": "normal"}]},
+    )
+    assert bad.status_code == 400
+
+
+def _seed_portfolio(prefix: str, count: int) -> None:
+    for index in range(count):
+        product_id = f"{prefix}{index}"
+        client.post("/products", json={"id": product_id, "name": "Chair", "version": "1", "functional_unit": "1"})
+        item = {
+            "id": f"{product_id}-frame",
+            "product_id": product_id,
+            "description": "Aluminum frame",
+            "quantity": 1,
+            "unit": "ea",
+            "mass_kg": 1.0 + index,
+            "material_family": "Aluminum",
+            "material_code": "AL-6061",
+            "classification_unspsc": "56112105",
+        }
+        assert client.post("/bom/upload", json=[item]).status_code == 200
+
+
+def test_portfolio_run_job_reports_progress_and_stores_results():
+    _seed_portfolio("pf-api-", 3)
+    response = client.post(
+        "/portfolio/runs",
+        json={"product_id_prefix": "pf-api-", "scenario_ids": ["default"], "workers": 1},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(200):
+        progress = client.get(f"/portfolio/runs/{job_id}").json()
+        if progress["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    assert progress["status"] == "completed", progress
+    assert progress["total_units"] == progress["completed_units"] == 3
+    assert progress["failed_units"] == 0
+    assert progress["units_per_second"] > 0
+
+    results = client.get(f"/portfolio/runs/{job_id}/results", params={"details": True}).json()
+    assert results["total"] == 3
+    assert [row["product_id"] for row in results["results"]] == ["pf-api-0", "pf-api-1", "pf-api-2"]
+    first = results["results"][0]
+    assert first["pcf_total_kg_co2e"] > 0
+    assert 0.0 <= first["pci_product"] <= 1.0
+    assert "pcf_breakdown" in first["details"]
+
+    assert client.get("/portfolio/runs/unknown").status_code == 404
+    bad = client.post("/portfolio/runs", json={"include_pcf": False, "include_pci": False})
+    assert bad.status_code == 400
+
+
+def test_portfolio_runner_process_pool_matches_inline_run():
+    _seed_portfolio("pf-pool-", 4)
+    selection = PortfolioSelection(product_ids=("pf-pool-0", "pf-pool-1", "pf-pool-2", "pf-pool-3", "pf-missing"))
+    inline = get_portfolio_runner(workers=1)
+    pooled = get_portfolio_runner(workers=2)
+    pooled.chunk_units = inline.chunk_units = 3
+
+    inline_progress = inline.run(selection)
+    pooled_progress = pooled.run(selection)
+    assert pooled_progress.status == inline_progress.status == "completed"
+    scenarios = inline_progress.scenarios
+    assert pooled_progress.completed_units == inline_progress.completed_units == 5 * scenarios
+    assert pooled_progress.failed_units == inline_progress.failed_units == scenarios
+
+    repository = ResultRepository()
+
+    def summary(job_id):
+        return [
+            (row.product_id, row.scenario_id, row.pcf_total_kg_co2e, row.pci_product, row.error)
+            for row in repository.list_for_job(job_id, limit=1000)
+        ]
+
+    assert summary(pooled_progress.job_id) == summary(inline_progress.job_id)
+    assert {row[4] for row in summary(inline_progress.job_id) if row[0] == "pf-missing"} == {"Product not found"}
+
+
+def test_where_used_drives_targeted_invalidation_and_recompute():
+    _seed_portfolio("dep-", 2)
+    for product_id in ("dep-0", "dep-1"):
+        assert client.get(f"/mapping/review/{product_id}").status_code == 200
+    dataset_id = client.get("/mapping/review/dep-0").json()[0]["selected"]["dataset_id"]
+    used = client.get("/dependencies/where-used", params={"kind": "dataset", "key": dataset_id}).json()
+    assert {"dep-0", "dep-1"} <= set(used["product_ids"])
+    assert used["subjects"]["dep-0"] == ["dep-0-frame"]
+
+    override = {"product_id": "dep-1", "bom_item_id": "dep-1-frame", "dataset_id": "prob:steel-machined", "provider": "probas"}
+    assert client.post("/mapping/override", json=override).status_code == 200
+    used = client.get("/dependencies/where-used", params={"kind": "dataset", "key": dataset_id}).json()
+    assert "dep-0" in used["product_ids"] and "dep-1" not in used["product_ids"]
+    rule = client.get("/dependencies/where-used", params={"kind": "rule", "key": "override"}).json()
+    assert rule["subjects"]["dep-1"] == ["dep-1-frame"]
+
+    progress = get_portfolio_runner(workers=1).run(PortfolioSelection(product_ids=("dep-0", "dep-1"), scenario_ids=("default",)))
+    assert progress.status == "completed"
+    used = client.get("/dependencies/where-used", params={"kind": "scenario", "key": "default"}).json()
+    assert used["subjects"]["dep-0"] == [f"{progress.job_id}:dep-0:default"]
+
+    assert client.post("/mapping/override", json=override).status_code == 200
+    results = client.get(f"/portfolio/runs/{progress.job_id}/results").json()["results"]
+    assert {row["product_id"]: row["stale"] for row in results} == {"dep-0": False, "dep-1": True}
+
+    report = client.post("/dependencies/invalidate", json={"kind": "dataset", "key": dataset_id})
+    assert report.status_code == 200
+    assert "dep-0" in report.json()["product_ids"] and report.json()["results_marked_stale"] >= 1
+    assert report.json()["recompute_queued"] is False
+    results = client.get(f"/portfolio/runs/{progress.job_id}/results").json()["results"]
+    assert all(row["stale"] for row in results)
+    assert client.post("/dependencies/invalidate", json={"kind": "dataset", "key": dataset_id, "recompute": True}).status_code == 400
+    assert client.get("/dependencies/where-used", params={"kind": "supplier", "key": "x"}).status_code == 422
+
+    queue = RecomputeQueue(get_portfolio_jobs())
+    service = InvalidationService(
+        DependencyIndex(), ResultRepository(), get_pcf_service(), get_circularity_service(), recompute_queue=queue
+    )
+    report = service.invalidate("dataset", "prob:steel-machined")
+    assert "dep-1" in report.product_ids and report.recompute_queued
+    assert queue.wait_idle(timeout=30)
+    rerun = client.get(f"/portfolio/runs/{queue.last_job_id}/results").json()["results"]
+    assert set(report.product_ids) == {row["product_id"] for row in rerun}
+    assert not any(row["stale"] or row["error"] for row in rerun)
+
+
+def test_dataset_invalidation_reloads_lci_factors(tmp_path):
+    data = json.loads(SEED_LCI_DATABASE.read_text(encoding="utf-8"))
+    path = tmp_path / "lci.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    method = PCF_METHOD_PROFILES[PCFMethodID.PACT_V3]
+    entries = [
+        LCIEntry(dataset_id, dataset_id, "local", 1.0, "kg", 1.0, "raw_materials", None)
+        for dataset_id in ("steel:primary", "prob:steel-machined")
+    ]
+    pcf_service = PCFService(MatrixLCAEngine(load_lci_database(path)))
+    before = pcf_service.engine.entry_impacts(entries, method)[0]
+    service = InvalidationService(
+        DependencyIndex(),
+        ResultRepository(),
+        pcf_service,
+        get_circularity_service(),
+        rollup_service=BOMRollupService(pcf_service.engine),
+    )
+
+    steel = next(process for process in data["processes"] if process["id"] == "steel:primary")
+    steel["biosphere"]["co2_fossil"] *= 2
+    path.write_text(json.dumps(data), encoding="utf-8")
+    report = service.invalidate("dataset", "steel:primary")
+    assert report.datasets_reloaded
+    after = pcf_service.engine.entry_impacts(entries, method)[0]
+    # Datasets consuming steel upstream change as well.
+    assert after[0] > before[0] and after[1] > before[1]
+    assert load_lci_database(path) is pcf_service.engine.database
+
+    # Without a file to reload from, new factors need a restart and recompute is not offered.
+    in_memory = InvalidationService(
+        DependencyIndex(),
+        ResultRepository(),
+        PCFService(MatrixLCAEngine(LCIDatabase.from_dict(data))),
+        get_circularity_service(),
+        recompute_queue=RecomputeQueue(get_portfolio_jobs()),
+    )
+    report = in_memory.invalidate("dataset", "steel:primary")
+    assert not report.datasets_reloaded and not report.recompute_queued
+    with pytest.raises(ValueError, match="restart"):
+        in_memory.invalidate("dataset", "steel:primary", recompute=True)
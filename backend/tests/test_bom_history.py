@@ -0,0 +1,61 @@
+from dataclasses import replace
+
+from backend.app.models.bom import BOMItem
+from backend.app.services.bom_history import BOMDelta, apply_delta, diff_bom, items_from_snapshot, snapshot_payload
+
+
+def _item(item_id: str, mass: float) -> BOMItem:
+    return BOMItem(
+        id=item_id,
+        product_id="prod-hist",
+        parent_bom_item_id=None,
+        description=f"Part {item_id}",
+        quantity=1.0,
+        unit="ea",
+        mass_kg=mass,
+        material_family="Steel",
+        material_code="STL-FASTENER",
+        classification_unspsc=None,
+        supplier_id=None,
+    )
+
+
+def test_delta_only_stores_changed_fields():
+    before = [_item("a", 1.0), _item("b", 2.0), _item("c", 3.0)]
+    after = [replace(before[0], mass_kg=1.5), before[2], _item("d", 4.0)]
+
+    delta = diff_bom(before, after)
+
+    assert delta.updated == [{"mass_kg": 1.5, "id": "a"}]
+    assert delta.removed == ["b"]
+    assert [entry["id"] for entry in delta.added] == ["d"]
+    assert delta.moves == []
+    assert apply_delta(before, delta) == after
+
+
+def test_delta_restores_upload_order():
+    before = [_item("a", 1.0), _item("b", 2.0), _item("c", 3.0)]
+    after = [_item("d", 4.0), before[2], replace(before[0], mass_kg=1.5)]
+
+    delta = BOMDelta.from_payload(diff_bom(before, after).to_payload())
+
+    assert [item.id for item in apply_delta(before, delta)] == ["d", "c", "a"]
+    assert apply_delta(before, delta) == after
+
+
+def test_reorder_stores_only_moved_items():
+    before = [_item(f"i{index}", 1.0) for index in range(200)]
+    after = [before[150], *before[:150], *before[151:199], _item("new", 2.0), before[199]]
+
+    delta = diff_bom(before, after)
+
+    assert delta.moves == [("i150", 0), ("new", 199)]
+    assert apply_delta(before, BOMDelta.from_payload(delta.to_payload())) == after
+    assert "moves" not in diff_bom(before, before).to_payload()
+    reversed_order = list(reversed(before))
+    assert apply_delta(before, diff_bom(before, reversed_order)) == reversed_order
+
+
+def test_snapshot_roundtrip():
+    items = [_item("a", 1.0), _item("b", 2.0)]
+    assert items_from_snapshot(snapshot_payload(items)) == items
@@ -0,0 +1,195 @@
+import math
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+from backend.app.engines.circularity_engine_pci_bracquene2020 import Bracquene2020CircularityEngine
+from backend.app.engines.pcf_engine_base import LCIEntry, LCIModel, PCFResult
+from backend.app.models.bom import BOMItem
+from backend.app.models.method_profile import PCF_METHOD_PROFILES, PCFMethodID
+from backend.app.models.pci import MaterialCircularityParameters
+from backend.app.models.product import Product
+from backend.app.models.scenario import Scenario, compile_scenario
+from backend.app.services.bom_rollup import BOMRollupService
+from backend.app.services.bom_tree import BOMStructureError, BOMTree
+
+
+class _CountingPCFEngine:
+    """PCF = 2 kg CO2e per kg of line mass; records how many lines it was asked for."""
+
+    def __init__(self):
+        self.lines = 0
+
+    def calculate_pcf(self, product, bom_items, scenario, method_profile, lci_model=None):
+        self.lines += len(bom_items)
+        breakdown = {item.id: 2.0 * item.mass_kg * item.quantity for item in bom_items}
+        total = sum(breakdown.values())
+        return PCFResult(total_kg_co2e=total, breakdown_by_item=breakdown, breakdown_by_stage={"total": total})
+
+
+class _MappedPCFEngine:
+    """PCF per kg of line mass by mapped dataset."""
+
+    factors = {"ds:Steel": 2.0, "ds:Aluminum": 8.0, "ds:Polymer": 3.0}
+
+    def calculate_pcf(self, product, bom_items, scenario, method_profile, lci_model=None):
+        breakdown = {entry.bom_item_id: self.factors[entry.dataset_id] * entry.mass_kg * entry.quantity for entry in lci_model.entries}
+        total = sum(breakdown.values())
+        return PCFResult(total_kg_co2e=total, breakdown_by_item=breakdown, breakdown_by_stage={"total": total})
+
+
+def _item(item_id: str, parent: str | None, quantity: float, mass: float, material: str = "Steel", code: str | None = None):
+    return BOMItem(
+        id=item_id,
+        product_id="prod",
+        parent_bom_item_id=parent,
+        description=f"{material} {item_id.rsplit('-', 1)[-1]}",
+        quantity=quantity,
+        unit="ea",
+        mass_kg=mass,
+        material_family=material,
+        material_code=material,
+        classification_unspsc="000000",
+        supplier_id=None,
+        component_code=code,
+        recycled_content_share=0.2 if material == "Steel" else 0.0,
+    )
+
+
+def _scenario():
+    params = {
+        material: MaterialCircularityParameters(
+            material_key=material,
+            efficiency_feedstock_production=0.85,
+            efficiency_component_production=0.9,
+            recovered_fraction_feedstock_losses=0.6,
+            recovered_fraction_component_losses=0.5,
+            efficiency_material_separation_eol=0.8,
+            efficiency_recycled_feedstock_production=0.85,
+        )
+        for material in ("Steel", "Aluminum", "Polymer")
+    }
+    scenario = Scenario(
+        id="scen",
+        name="Test",
+        goal_scope="",
+        system_boundary="",
+        geography="",
+        method_profile_id="iso-basic",
+        pcf_method_id=PCFMethodID.PACT_V3,
+        energy_mix_profile="",
+        end_of_life_model="",
+        collection_fraction_for_reuse=0.1,
+        collection_fraction_for_recycling=0.6,
+        utility_factor=1.0,
+        material_parameters=params,
+    )
+    return compile_scenario(scenario, datetime(2025, 1, 1))
+
+
+def _motor(prefix: str, parent: str, quantity: float) -> list[BOMItem]:
+    return [
+        _item(f"{prefix}-motor", parent, quantity, 0.3, "Steel", code="MOTOR-1"),
+        _item(f"{prefix}-rotor", f"{prefix}-motor", 1, 0.4, "Steel"),
+        _item(f"{prefix}-magnet", f"{prefix}-rotor", 4, 0.05, "Aluminum"),
+        _item(f"{prefix}-cover", f"{prefix}-motor", 2, 0.1, "Polymer"),
+    ]
+
+
+def test_tree_propagates_quantities_and_rejects_bad_structure():
+    bom = [_item("frame", None, 2, 1.0), *_motor("m", "frame", 3), _item("foot", None, 4, 0.2, "Polymer")]
+    tree = BOMTree.build(bom)
+
+    assert tree.roots == ("frame", "foot")
+    assert tree["m-magnet"].effective_quantity == 2 * 3 * 1 * 4
+    assert tree["m-magnet"].depth == 3
+    assert [node.item.id for node in tree.postorder()][-1] == "frame"
+    assert {item.id: item.quantity for item in tree.flatten()}["m-cover"] == 12
+
+    # The same subassembly under other ids and sibling order has the same signature.
+    other = BOMTree.build([_item("base", None, 1, 1.0), *reversed(_motor("x", "base", 7))])
+    assert other.signature("x-motor") == tree.signature("m-motor")
+    assert other.signature("base") != tree.signature("frame")
+
+    with pytest.raises(BOMStructureError, match="unknown parent"):
+        BOMTree.build([_item("a", "missing", 1, 1.0)])
+    with pytest.raises(BOMStructureError, match="a -> b -> a|b -> a -> b"):
+        BOMTree.build([_item("root", None, 1, 1.0), _item("a", "b", 1, 1.0), _item("b", "a", 1, 1.0)])
+    with pytest.raises(BOMStructureError, match="Duplicate"):
+        BOMTree.build([_item("a", None, 1, 1.0), _item("a", None, 1, 1.0)])
+
+
+def test_rollup_matches_flat_engines_and_reuses_shared_subassemblies():
+    scenario = _scenario()
+    method = PCF_METHOD_PROFILES[PCFMethodID.PACT_V3]
+    engine = _CountingPCFEngine()
+    service = BOMRollupService(engine)
+
+    bom_a = [_item("frame", None, 2, 1.0, code="FRAME-A"), *_motor("m", "frame", 3), _item("foot", None, 4, 0.2, "Polymer")]
+    first = service.rollup(Product(id="prod-a", name="A", version="1", functional_unit="1 unit"), bom_a, scenario, method)
+
+    flat = BOMTree.build(bom_a).flatten()
+    expected = Bracquene2020CircularityEngine().calculate_pci(None, flat, scenario)
+    assert math.isclose(first.pcf_kg_co2e, sum(2.0 * item.mass_kg * item.quantity for item in flat), rel_tol=1e-12)
+    assert math.isclose(first.mass_kg, expected.mass_total, rel_tol=1e-12)
+    assert math.isclose(first.pci, expected.pci_product, rel_tol=1e-12)
+    assert math.isclose(first.lfi, expected.lfi_product, rel_tol=1e-12)
+    assert [sub.item_id for sub in first.subassemblies] == ["frame", "m-motor", "m-rotor"]
+    motor = first.subassemblies[1]
+    motor_flat = [item for item in flat if item.id.startswith("m-")]
+    assert motor.quantity == 6
+    assert math.isclose(motor.mass_kg, sum(item.mass_kg * item.quantity for item in motor_flat), rel_tol=1e-12)
+    assert first.memo_hits == 0 and first.lines_evaluated == len(bom_a)
+
+    # A second product sharing the motor skips its subtree entirely.
+    engine.lines = 0
+    bom_b = [_item("base", None, 1, 2.0, "Aluminum"), *reversed(_motor("x", "base", 1))]
+    second = service.rollup(Product(id="prod-b", name="B", version="1", functional_unit="1 unit"), bom_b, scenario, method)
+    assert second.memo_hits == 1
+    assert engine.lines == 1
+    by_id = {sub.item_id: sub for sub in second.subassemblies}
+    assert by_id["x-motor"].memoized and by_id["x-rotor"].memoized and not by_id["base"].memoized
+    assert math.isclose(by_id["x-motor"].pcf_kg_co2e, motor.pcf_kg_co2e / 6, rel_tol=1e-12)
+    assert math.isclose(by_id["x-rotor"].mass_kg, first.subassemblies[2].mass_kg / 6, rel_tol=1e-12)
+    flat_b = BOMTree.build(bom_b).flatten()
+    expected_b = Bracquene2020CircularityEngine().calculate_pci(None, flat_b, scenario)
+    assert math.isclose(second.pci, expected_b.pci_product, rel_tol=1e-12)
+
+    # Changing a line inside the subassembly changes its signature, so nothing stale is reused.
+    bom_c = [replace(item, mass_kg=0.5) if item.id == "x-rotor" else item for item in bom_b]
+    third = service.rollup(Product(id="prod-b", name="B", version="1", functional_unit="1 unit"), bom_c, scenario, method)
+    assert third.memo_hits == 0
+    assert third.mass_kg > second.mass_kg
+
+
+def test_rollup_memo_is_keyed_on_the_mapping():
+    scenario = _scenario()
+    method = PCF_METHOD_PROFILES[PCFMethodID.PACT_V3]
+    engine = _MappedPCFEngine()
+    service = BOMRollupService(engine)
+    product = Product(id="prod-m", name="M", version="1", functional_unit="1 unit")
+    bom = [_item("base", None, 1, 2.0, "Aluminum"), *_motor("x", "base", 2)]
+    datasets = {item.id: f"ds:{item.material_family}" for item in bom}
+
+    def builder(items):
+        entries = [
+            LCIEntry(item.id, datasets[item.id], "test", item.quantity, item.unit, item.mass_kg, "raw_materials", None)
+            for item in items
+        ]
+        return LCIModel(items, entries)
+
+    first = service.rollup(product, bom, scenario, method, lci_model_builder=builder)
+    assert service.rollup(product, bom, scenario, method, lci_model_builder=builder).memo_hits == 1
+
+    # An override inside the motor changes the memo key, so the motor is evaluated again.
+    datasets["x-magnet"] = "ds:Steel"
+    overridden = service.rollup(product, bom, scenario, method, lci_model_builder=builder)
+    assert overridden.memo_hits == 0
+    assert overridden.pcf_kg_co2e < first.pcf_kg_co2e
+    assert service.rollup(product, bom, scenario, method, lci_model_builder=builder).memo_hits == 1
+
+    assert service.invalidate(["MOTOR-1"]) == 2
+    assert service.rollup(product, bom, scenario, method, lci_model_builder=builder).memo_hits == 0
+    assert service.invalidate(["FRAME-A"]) == 0
+    assert service.invalidate() == 1
@@ -1,12 +1,34 @@
 import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from datetime import datetime
+
+import numpy as np
+import pytest
 
 from backend.app.engines.circularity_engine_pci_bracquene2020 import Bracquene2020CircularityEngine
+from backend.app.engines.circularity_engine_pci_incremental import IncrementalPCI
+from backend.app.engines.circularity_engine_pci_vectorized import (
+    PCIBatch,
+    VectorizedBracquene2020CircularityEngine,
+    flow_terms_arrays,
+    pack_bom,
+)
 from backend.app.models.bom import BOMItem
-from backend.app.models.pci import MaterialCircularityParameters
+from backend.app.models.pci import (
+    MaterialCircularityParameters,
+    PCIMaterialFlowColumns,
+    PCIMaterialInputs,
+    pci_result_payload,
+)
 from backend.app.models.product import Product
-from backend.app.models.scenario import Scenario
+from backend.app.models.scenario import Scenario, compile_scenario
 from backend.app.models.method_profile import PCFMethodID
 from backend.app.services.circularity_service import CircularityService
+from backend.app.services.pci_goal_seek import GoalVariable
+from backend.app.services.pci_sweep import sweep_axis
+from backend.app.services.pci_uncertainty import ParameterDistribution, PCIMonteCarlo
 
 
 def _make_bom_item(material: str, mass: float, reused: float = 0.0, recycled: float = 0.0) -> BOMItem:
@@ -93,3 +115,350 @@ def test_mass_weighted_pci_matches_material_flows():
     result = service.calculate_pci(product, bom, scenario)
     weighted = sum(flow.mass * flow.PCI_material for flow in result.per_material_flows) / result.mass_total
     assert math.isclose(result.pci_product, weighted, rel_tol=1e-6)
+
+
+def test_compiled_scenario_matches_plain_scenario():
+    service = CircularityService(Bracquene2020CircularityEngine())
+    params = {"Steel": _base_param("Steel"), "Polymer": _base_param("Polymer")}
+    scenario = _make_scenario(0.2, 1.4, 1.0, params)
+    compiled = compile_scenario(scenario)
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    bom = [_make_bom_item("Steel", 2.0, recycled=0.3), _make_bom_item("Unknown", 1.0)]
+
+    assert compiled.collection_fraction_for_recycling == 1.0
+    assert compiled.resolve("Unknown", None) is compiled.material_parameters["Steel"]
+    assert service.calculate_pci(product, bom, compiled) == service.calculate_pci(product, bom, scenario)
+
+
+def test_vectorized_engine_matches_scalar_engine():
+    rng = random.Random(3)
+    materials = ["Steel", "Aluminum", "PP"]
+    params = {key: _base_param(key) for key in materials}
+    params["PP"].efficiency_component_production = 0.0
+    scenario = compile_scenario(_make_scenario(0.2, 0.7, 1.3, params))
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    bom = []
+    for index in range(200):
+        item = _make_bom_item(rng.choice(materials), rng.choice([0.0, rng.uniform(0.01, 10.0)]), rng.random(), rng.random())
+        item.id = f"item-{index}"
+        item.quantity = rng.choice([None, 1, 3])
+        bom.append(item)
+
+    scalar = Bracquene2020CircularityEngine().calculate_pci(product, bom, scenario)
+    vectorized = VectorizedBracquene2020CircularityEngine().calculate_pci(product, bom, scenario)
+
+    for name in ("pci_product", "lfi_product", "mass_total", "utility_factor"):
+        assert math.isclose(getattr(vectorized, name), getattr(scalar, name), rel_tol=1e-12, abs_tol=1e-12)
+    assert len(vectorized.per_material_flows) == len(scalar.per_material_flows)
+    for expected, actual in zip(scalar.per_material_flows, vectorized.per_material_flows):
+        assert actual.material_key == expected.material_key
+        for name, value in asdict(expected).items():
+            if name != "material_key":
+                assert math.isclose(getattr(actual, name), value, rel_tol=1e-12, abs_tol=1e-12), name
+
+    # Flows stay column-wise until read; the payload matches asdict of the built rows.
+    assert isinstance(vectorized.per_material_flows, PCIMaterialFlowColumns)
+    assert vectorized.per_material_flows[-1] == list(vectorized.per_material_flows)[-1]
+    payload = pci_result_payload(vectorized)
+    assert payload["per_material_flows"] == [asdict(flow) for flow in vectorized.per_material_flows]
+    assert payload["pci_product"] == vectorized.pci_product
+
+
+def test_aggregated_engine_evaluates_each_input_group_once():
+    rng = random.Random(5)
+    params = {key: _base_param(key) for key in ("Steel", "Aluminum", "PP")}
+    scenario = compile_scenario(_make_scenario(0.2, 0.7, 1.3, params))
+    designs = [("Steel", 0.0, 0.3), ("Steel", 0.5, 0.3), ("Aluminum", 0.1, 0.8), ("PP", 0.0, 0.0)]
+    bom = []
+    for index in range(400):
+        material, reused, recycled = designs[index % len(designs)]
+        bom.append(replace(_make_bom_item(material, rng.uniform(0.01, 5.0), reused, recycled), id=f"item-{index}"))
+    arrays = pack_bom(bom, scenario)
+
+    groups = arrays.aggregate()
+    assert len(groups) == len(designs)
+    assert groups.arrays.mass.sum() == pytest.approx(arrays.mass.sum(), rel=1e-12)
+
+    per_line = VectorizedBracquene2020CircularityEngine().calculate_pci_arrays(arrays)
+    aggregated = VectorizedBracquene2020CircularityEngine(aggregate=True).calculate_pci_arrays(arrays)
+    for name in ("pci_product", "lfi_product", "mass_total"):
+        assert math.isclose(getattr(aggregated, name), getattr(per_line, name), rel_tol=1e-12), name
+    # Flows are split back onto the BOM lines in proportion to mass.
+    assert len(aggregated.per_material_flows) == len(bom)
+    for expected, actual in zip(per_line.per_material_flows, aggregated.per_material_flows):
+        for name, value in asdict(expected).items():
+            if name != "material_key":
+                assert math.isclose(getattr(actual, name), value, rel_tol=1e-12, abs_tol=1e-12), name
+
+    by_group = VectorizedBracquene2020CircularityEngine(aggregate=True, expand_items=False).calculate_pci_arrays(arrays)
+    steel = [flow for flow in by_group.per_material_flows if flow.material_key == "Steel"]
+    assert len(steel) == 2
+    assert sum(flow.mass for flow in steel) == pytest.approx(sum(item.mass_kg for item in bom if item.material_family == "Steel"))
+
+
+def test_flow_terms_arrays_broadcast_over_parameter_grid():
+    engine = Bracquene2020CircularityEngine()
+    reuse = np.linspace(0.0, 1.0, 5)[:, None]
+    recycling = np.linspace(0.0, 1.0, 4)[None, :]
+    terms = flow_terms_arrays(2.0, 0.3, 0.6, 0.85, 0.9, 0.6, 0.6, 0.8, 0.85, reuse, recycling)
+
+    assert terms["V"].shape == (5, 4)
+    for i, c_u in enumerate(reuse[:, 0]):
+        for j, c_r in enumerate(recycling[0]):
+            expected = engine._flow_terms(
+                PCIMaterialInputs("Steel", 2.0, 0.3, 0.6, 0.85, 0.9, 0.6, 0.6, 0.8, 0.85, float(c_u), float(c_r))
+            )
+            for name, value in expected.items():
+                assert math.isclose(terms[name][i, j], value, rel_tol=1e-12, abs_tol=1e-12), name
+
+
+def test_pci_sweep_matches_engine_at_each_grid_point():
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum")}
+    base = _make_scenario(0.2, 0.5, 1.0, params)
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    bom = [_make_bom_item("Steel", 4.0, 0.1, 0.3), _make_bom_item("Aluminum", 1.5, 0.0, 0.6)]
+    service = CircularityService(Bracquene2020CircularityEngine())
+
+    sweep = service.sweep(
+        bom,
+        base,
+        axes=[
+            sweep_axis("collection_fraction_for_recycling", [0.0, 0.5, 0.9]),
+            sweep_axis("utility_factor", [1.0, 1.5]),
+            sweep_axis("efficiency_material_separation_eol", [0.5, 0.95], material_key="Aluminum"),
+        ],
+    )
+    assert sweep.size == 12
+    rows = [row for ids, values, pci, lfi in sweep.iter_chunks() for row in zip(values.tolist(), pci, lfi)]
+    assert len(rows) == 12
+    for (recycling, utility, separation), pci, lfi in rows:
+        scenario_params = {key: replace(value) for key, value in params.items()}
+        scenario_params["Aluminum"].efficiency_material_separation_eol = separation
+        expected = service.calculate_pci(product, bom, _make_scenario(0.2, recycling, utility, scenario_params))
+        assert math.isclose(pci, expected.pci_product, rel_tol=1e-12, abs_tol=1e-12)
+        assert math.isclose(lfi, expected.lfi_product, rel_tol=1e-12, abs_tol=1e-12)
+
+
+def test_pci_sweep_validates_parameters():
+    scenario = _make_scenario(0.0, 0.0, 1.0, {"Steel": _base_param("Steel")})
+    service = CircularityService(Bracquene2020CircularityEngine())
+    bom = [_make_bom_item("Steel", 1.0)]
+    with pytest.raises(ValueError):
+        sweep_axis("utility_factor", [1.0], material_key="Steel")
+    with pytest.raises(ValueError):
+        service.sweep(bom, scenario, points=[{"not_a_parameter": 1.0}])
+    with pytest.raises(ValueError):
+        service.sweep(bom, scenario, axes=[sweep_axis("efficiency_component_production", [0.5], "Copper")])
+
+
+def test_closed_form_sensitivities_match_finite_differences():
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum"), "Polymer": _base_param("Polymer")}
+    params["Aluminum"] = replace(params["Aluminum"], efficiency_component_production=0.7, recovered_fraction_component_losses=0.3)
+    rng = random.Random(3)
+    bom = []
+    for index in range(9):
+        item = _make_bom_item(["Steel", "Aluminum", "Polymer"][index % 3], rng.uniform(0.2, 3.0), rng.uniform(0.05, 0.5), rng.uniform(0.05, 0.9))
+        bom.append(replace(item, id=f"item-{index}"))
+    service = CircularityService(Bracquene2020CircularityEngine())
+
+    for reuse, recycling, utility in [(0.1, 0.6, 1.0), (0.3, 0.3, 2.0), (0.05, 0.9, 0.8)]:
+        compiled = compile_scenario(_make_scenario(reuse, recycling, utility, params))
+        arrays = pack_bom(bom, compiled)
+        result = service.sensitivity(bom, compiled, top=5)
+        assert result.pci_product == pytest.approx(service.calculate_pci(None, bom, compiled).pci_product, rel=1e-12)
+        assert len(result.sensitivities) == 3 + 6 * 3 + 2 * len(bom)
+        step = 1e-6
+        for entry in result.sensitivities:
+            batch = PCIBatch(arrays, 2)
+            if entry.parameter in ("reused_share", "recycled_content_share"):
+                mask = arrays.item_mask(entry.scope)
+            else:
+                mask = arrays.material_mask(entry.scope) if entry.scope else None
+            batch.set(entry.parameter, [entry.value - step, entry.value + step], mask)
+            low, high = batch.evaluate()["pci_product"]
+            assert entry.derivative == pytest.approx((high - low) / (2 * step), abs=1e-6), entry.label
+        swings = [bar.swing for bar in result.tornado]
+        assert len(swings) == 5 and swings == sorted(swings, reverse=True)
+
+
+def test_goal_seek_reaches_target_with_minimal_change():
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum"), "Polymer": _base_param("Polymer")}
+    rng = random.Random(2)
+    bom = []
+    for index in range(60):
+        item = _make_bom_item(["Steel", "Aluminum", "Polymer"][index % 3], rng.uniform(0.1, 3.0), rng.uniform(0.0, 0.3), rng.uniform(0.0, 0.5))
+        bom.append(replace(item, id=f"item-{index}"))
+    compiled = compile_scenario(_make_scenario(0.1, 0.5, 1.0, params))
+    service = CircularityService(Bracquene2020CircularityEngine())
+
+    single = service.goal_seek(bom, compiled, 0.4, [GoalVariable("recycled_content_share")])
+    assert single.achieved and single.pci == pytest.approx(0.4, abs=1e-6)
+    # The solution is the smallest uniform increase: check it against the scalar engine.
+    shift = single.variables[0].change
+    assert shift > 0
+    shifted = [replace(item, recycled_content_share=min(item.recycled_content_share + shift, 1.0)) for item in bom]
+    assert service.calculate_pci(None, shifted, compiled).pci_product == pytest.approx(0.4, abs=1e-6)
+
+    variables = [GoalVariable("recycled_content_share"), GoalVariable("collection_fraction_for_reuse", upper=0.5)]
+    pair = service.goal_seek(bom, compiled, 0.45, variables)
+    assert pair.achieved and pair.pci == pytest.approx(0.45, abs=1e-6)
+    # No point on a coarse grid of the target surface is closer to the starting design.
+    norm = math.hypot(pair.variables[0].change, pair.variables[1].change / 0.5)
+    arrays = pack_bom(bom, compiled)
+    reuse_shifts = np.linspace(0.0, 0.4, 81)
+    for recycled_shift in np.linspace(0.0, 0.5, 51):
+        batch = PCIBatch(arrays, len(reuse_shifts))
+        batch.set("recycled_content_share", np.clip(arrays.recycled_content_share + recycled_shift, 0.0, 1.0)[None, :].repeat(len(reuse_shifts), 0))
+        batch.set("collection_fraction_for_reuse", 0.1 + reuse_shifts)
+        reached = batch.evaluate()["pci_product"] >= 0.45
+        if reached.any():
+            assert math.hypot(recycled_shift, reuse_shifts[reached][0] / 0.5) >= norm - 1e-2
+
+    unreachable = service.goal_seek(bom, compiled, 0.9, [GoalVariable("recycled_content_share", scope="item-3")])
+    assert not unreachable.achieved and unreachable.pci < 0.9
+    with pytest.raises(ValueError, match="more than once"):
+        service.goal_seek(bom, compiled, 0.5, [GoalVariable("reused_share"), GoalVariable("reused_share", scope="item-1")])
+
+
+def test_monte_carlo_with_point_distributions_matches_engine():
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum")}
+    scenario = _make_scenario(0.2, 0.5, 1.0, params)
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    bom = [_make_bom_item("Steel", 4.0, 0.1, 0.3), _make_bom_item("Aluminum", 1.5, 0.0, 0.6)]
+    service = CircularityService(Bracquene2020CircularityEngine())
+
+    result = service.uncertainty(
+        bom,
+        scenario,
+        [ParameterDistribution("collection_fraction_for_recycling", "uniform", low=0.5, high=0.5)],
+        samples=100,
+    )
+    expected = service.calculate_pci(product, bom, scenario)
+    assert result.samples == 100
+    assert math.isclose(result.product.mean, expected.pci_product, rel_tol=1e-12)
+    assert result.product.std == pytest.approx(0.0, abs=1e-12)
+    assert all(math.isclose(value, expected.pci_product, rel_tol=1e-12) for value in result.product.percentiles.values())
+    for flow in expected.per_material_flows:
+        assert math.isclose(result.per_material[flow.material_key].mean, flow.PCI_material, rel_tol=1e-12)
+
+
+def test_monte_carlo_streaming_statistics_match_raw_samples():
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum")}
+    compiled = compile_scenario(_make_scenario(0.2, 0.5, 1.0, params))
+    bom = [_make_bom_item("Steel", 4.0, 0.1, 0.3), _make_bom_item("Aluminum", 1.5, 0.0, 0.6)]
+    distributions = [
+        ParameterDistribution("collection_fraction_for_recycling", "triangular", low=0.2, mode=0.5, high=0.9),
+        ParameterDistribution("efficiency_material_separation_eol", "normal", mean=0.8, std=0.05, scope="Aluminum"),
+        ParameterDistribution("recycled_content_share", "uniform", low=0.1, high=0.5, scope="item-Steel"),
+        ParameterDistribution("utility_factor", "lognormal", median=1.0, gsd=1.2),
+    ]
+    monte_carlo = PCIMonteCarlo(pack_bom(bom, compiled), distributions, chunk_elements=2_000, histogram_bins=1_000)
+    result = monte_carlo.run(5_000, seed=7, percentiles=[5, 50, 95])
+
+    sizes = [1_000] * 5
+    seeds = np.random.SeedSequence(7).spawn(len(sizes))
+    raw = np.vstack([monte_carlo.evaluate(np.random.default_rng(seed), size) for seed, size in zip(seeds, sizes)])
+    assert math.isclose(result.product.mean, raw[:, 0].mean(), rel_tol=1e-12)
+    assert math.isclose(result.product.std, raw[:, 0].std(), rel_tol=1e-9)
+    assert result.product.minimum == raw[:, 0].min()
+    for key, value in zip([5, 50, 95], np.percentile(raw[:, 0], [5, 50, 95])):
+        assert abs(result.product.percentiles[f"p{key}"] - value) <= 1e-3
+    for column, key in enumerate(monte_carlo.material_keys, start=1):
+        assert math.isclose(result.per_material[key].mean, raw[:, column].mean(), rel_tol=1e-12)
+
+    parallel = monte_carlo.run(5_000, seed=7, workers=2, percentiles=[5, 50, 95])
+    assert parallel == result
+    # A shared executor gets one task per worker group and gives the same result.
+    with ThreadPoolExecutor(3) as shared:
+        assert monte_carlo.run(5_000, seed=7, workers=3, percentiles=[5, 50, 95], executor=shared) == result
+
+
+def test_monte_carlo_validates_distributions():
+    compiled = compile_scenario(_make_scenario(0.0, 0.0, 1.0, {"Steel": _base_param("Steel")}))
+    arrays = pack_bom([_make_bom_item("Steel", 1.0)], compiled)
+    with pytest.raises(ValueError):
+        ParameterDistribution("utility_factor", "normal", mean=1.0)
+    with pytest.raises(ValueError):
+        ParameterDistribution("utility_factor", "beta", low=0.0, high=1.0)
+    with pytest.raises(ValueError):
+        ParameterDistribution("utility_factor", "uniform", low=1.0, high=2.0, scope="Steel")
+    with pytest.raises(ValueError):
+        PCIMonteCarlo(arrays, [ParameterDistribution("reused_share", "uniform", low=0.0, high=1.0, scope="item-Copper")])
+
+
+def _assert_same_pci(actual, expected):
+    assert math.isclose(actual.pci_product, expected.pci_product, rel_tol=1e-9, abs_tol=1e-12)
+    assert math.isclose(actual.lfi_product, expected.lfi_product, rel_tol=1e-9, abs_tol=1e-12)
+    assert math.isclose(actual.mass_total, expected.mass_total, rel_tol=1e-12)
+    assert [flow.material_key for flow in actual.per_material_flows] == [
+        flow.material_key for flow in expected.per_material_flows
+    ]
+
+
+def test_incremental_pci_recomputes_only_changed_items(monkeypatch):
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum"), "Copper": _base_param("Copper")}
+    scenario = _make_scenario(0.2, 0.5, 1.2, params)
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    bom = [
+        _make_bom_item("Steel", 4.0, 0.1, 0.3),
+        _make_bom_item("Aluminum", 1.5, 0.0, 0.6),
+        _make_bom_item("Copper", 0.5, 0.2, 0.1),
+    ]
+    engine = Bracquene2020CircularityEngine()
+    incremental = IncrementalPCI(scenario, engine=engine)
+    _assert_same_pci(incremental.refresh(bom), engine.calculate_pci(product, bom, scenario))
+
+    calls = []
+    original = engine._compute_material_flows
+    monkeypatch.setattr(engine, "_compute_material_flows", lambda *args: calls.append(args) or original(*args))
+    changed = replace(bom[1], recycled_content_share=0.9)
+    result = incremental.update([changed])
+    assert len(calls) == 1
+    assert incremental.update([changed]).pci_product == result.pci_product
+    assert len(calls) == 1
+    _assert_same_pci(result, engine.calculate_pci(product, [bom[0], changed, bom[2]], scenario))
+
+    result = incremental.update(removed=[bom[0].id])
+    _assert_same_pci(result, engine.calculate_pci(product, [changed, bom[2]], scenario))
+    result = incremental.update([replace(bom[2], mass_kg=0.0)])
+    _assert_same_pci(result, engine.calculate_pci(product, [changed], scenario))
+    assert len(incremental) == 1
+
+
+def test_incremental_pci_stays_exact_over_many_updates():
+    params = {"Steel": _base_param("Steel"), "Aluminum": _base_param("Aluminum")}
+    scenario = _make_scenario(0.1, 0.6, 1.0, params)
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    rng = random.Random(3)
+    bom = [
+        replace(_make_bom_item(rng.choice(["Steel", "Aluminum"]), rng.uniform(0.1, 10.0)), id=f"line-{i}")
+        for i in range(400)
+    ]
+    engine = Bracquene2020CircularityEngine()
+    incremental = IncrementalPCI(scenario, engine=engine)
+    _assert_same_pci(incremental.refresh(bom), engine.calculate_pci(product, bom, scenario))
+    for _ in range(2_000):
+        index = rng.randrange(len(bom))
+        bom[index] = replace(bom[index], recycled_content_share=rng.random(), reused_share=rng.random() * 0.3)
+        result = incremental.update([bom[index]], include_material_flows=False)
+    _assert_same_pci(incremental.refresh(bom), engine.calculate_pci(product, bom, scenario))
+    assert result.per_material_flows == []
+
+
+def test_service_reuses_incremental_state_per_scenario_version():
+    params = {"Steel": _base_param("Steel")}
+    scenario = compile_scenario(_make_scenario(0.2, 0.5, 1.0, params), updated_at=datetime(2024, 1, 1))
+    product = Product(id="prod-test", name="Test", version="1", functional_unit="1")
+    bom = [_make_bom_item("Steel", 2.0, 0.0, 0.2)]
+    service = CircularityService(Bracquene2020CircularityEngine())
+
+    first = service.calculate_pci_incremental(product, bom, scenario)
+    state = service._incremental[(product.id, scenario.id)][0]
+    second = service.calculate_pci_incremental(product, [replace(bom[0], recycled_content_share=0.8)], scenario)
+    assert service._incremental[(product.id, scenario.id)][0] is state
+    assert second.pci_product > first.pci_product
+
+    edited = compile_scenario(_make_scenario(0.2, 0.9, 1.0, params), updated_at=datetime(2024, 2, 1))
+    result = service.calculate_pci_incremental(product, bom, edited)
+    assert service._incremental[(product.id, scenario.id)][0] is not state
+    _assert_same_pci(result, service.calculate_pci(product, bom, edited))
@@ -1,17 +1,35 @@
 import os
 from pathlib import Path
 
+from sqlalchemy import delete, update
+
 TEST_DB = Path(__file__).resolve().parent / "test_mapping.db"
 if TEST_DB.exists():
     TEST_DB.unlink()
 os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
 
-from backend.app.db.init_db import init_db  # noqa: E402
+from backend.app.db.base import get_session  # noqa: E402
+from backend.app.db.unit_of_work import UnitOfWork  # noqa: E402
+from backend.app.db.init_db import init_db, seed_mapping_rules, seed_scenarios  # noqa: E402
+from backend.app.core.config import get_settings  # noqa: E402
+from backend.app.core.metrics import metrics  # noqa: E402
+from backend.app.db.models import (  # noqa: E402
+    MappingDecisionModel,
+    ProductModel,
+    MappingRuleModel,
+    ScenarioModel,
+    SeedMetadataModel,
+)
 from backend.app.models.bom import BOMItem  # noqa: E402
+from backend.app.models.product import Product  # noqa: E402
 from backend.app.models.scenario import Scenario  # noqa: E402
 from backend.app.models.method_profile import PCFMethodID  # noqa: E402
+from backend.app.services.decision_writer import DecisionWriter  # noqa: E402
+from backend.app.services.dependency_index import DependencyIndex  # noqa: E402
 from backend.app.services.mapping_repository import MappingRepository  # noqa: E402
 from backend.app.services.mapping_service import MappingService  # noqa: E402
+from backend.app.services.product_repository import ProductRepository  # noqa: E402
+from backend.app.services.scenario_repository import ScenarioRepository  # noqa: E402
 
 
 def _make_item(material_code: str) -> BOMItem:
@@ -50,3 +68,140 @@ def test_mapping_service_uses_material_code_rule():
     decisions = service.map_bom([_make_item("ALU-6000")], scenario)
     assert decisions[0].selected is not None
     assert decisions[0].selected.dataset_id == "prob:aluminium-extrusion"
+
+
+def test_seeding_is_skipped_when_checksum_unchanged():
+    init_db()
+    with get_session() as session:
+        rule_count = session.query(MappingRuleModel).count()
+
+    assert seed_mapping_rules() is False
+    assert seed_scenarios() is False
+    with get_session() as session:
+        assert session.query(MappingRuleModel).count() == rule_count
+
+
+def test_changed_seed_keeps_edited_scenarios_and_restores_missing_rows():
+    init_db()
+    repository = ScenarioRepository()
+    edited = repository.get_scenario("default")
+    edited.utility_factor = 1.75
+    repository.save_scenario(edited)
+    with get_session() as session:
+        session.execute(update(SeedMetadataModel).values(checksum="outdated"))
+        session.commit()
+
+    assert seed_scenarios() is True
+    assert repository.get_scenario("default").utility_factor == 1.75
+
+    with get_session() as session:
+        session.execute(delete(ScenarioModel).where(ScenarioModel.id == "default"))
+        session.execute(update(SeedMetadataModel).values(checksum="outdated"))
+        session.commit()
+    assert seed_scenarios() is True
+    assert seed_mapping_rules() is True
+    assert repository.get_scenario("default").utility_factor != 1.75
+
+
+def _items(count: int, product_id: str) -> list[BOMItem]:
+    return [
+        BOMItem(**{**_make_item("ALU-6000").__dict__, "id": f"{product_id}-{index}", "product_id": product_id})
+        for index in range(count)
+    ]
+
+
+def test_batched_decision_writer_commits_before_returning():
+    init_db()
+    writer = DecisionWriter(durability="batched", batch_size=50, flush_interval=0.01)
+    repository = MappingRepository(decision_writer=writer)
+    service = MappingService(providers=[], repository=repository, min_candidate=0.6, min_auto=0.85)
+
+    decisions = service.map_bom(_items(20, "prod-batched"))
+
+    assert len(decisions) == 20
+    assert writer.pending == 0
+    with get_session() as session:
+        stored = session.query(MappingDecisionModel).filter_by(product_id="prod-batched").count()
+    assert stored == 20
+    assert metrics.value("mapping_decision_queue_depth") == 0
+    assert metrics.value("mapping_decision_flushes_total") >= 1
+    writer.close()
+
+
+def test_async_decision_writer_flushes_before_reads_and_on_close():
+    init_db()
+    writer = DecisionWriter(durability="async", max_queue=4, batch_size=3, flush_interval=0.01)
+    repository = MappingRepository(decision_writer=writer)
+    service = MappingService(providers=[], repository=repository, min_candidate=0.6, min_auto=0.85)
+
+    service.map_bom(_items(10, "prod-async"))
+    override = service.record_override(
+        bom_item=_items(1, "prod-async")[0], dataset_id="manual:x", provider="manual", user_id="u", comment=None
+    )
+
+    latest = {decision.item_id: decision for decision in service.load_latest_decisions("prod-async")}
+    assert len(latest) == 10
+    assert latest[override.item_id].override_applied
+    writer.close()
+    assert writer.pending == 0
+
+
+def test_decision_reads_see_rows_queued_after_the_request_snapshot():
+    init_db()
+    writer = DecisionWriter(durability="async", batch_size=100, flush_interval=0.5)
+    service = MappingService(
+        providers=[], repository=MappingRepository(decision_writer=writer), min_candidate=0.6, min_auto=0.85
+    )
+    with UnitOfWork() as uow:
+        request_repository = MappingRepository(session_factory=uow.session_factory, decision_writer=writer)
+        assert request_repository.latest_decisions_for_product(uow.session, "prod-snapshot") == []
+
+        service.map_bom(_items(5, "prod-snapshot"))
+        assert writer.pending == 5
+
+        assert len(request_repository.latest_decisions_for_product(uow.session, "prod-snapshot")) == 5
+    writer.close()
+
+
+def test_full_decision_batch_replaces_dependency_edges():
+    init_db()
+    batch_size = get_settings().mapping_decision_batch_size
+    writer = DecisionWriter(batch_size=batch_size)
+    rows = [
+        {"product_id": "prod-edges", "bom_item_id": f"edge-{index}", "selected_dataset_id": "prob:steel-machined", "rule_applied": "r"}
+        for index in range(batch_size)
+    ]
+    writer._write_batch(list(enumerate(rows, start=1)))
+    index = DependencyIndex()
+    assert len(index.where_used("dataset", "prob:steel-machined").subjects["prod-edges"]) == batch_size
+
+    unmapped = [{**row, "selected_dataset_id": None, "rule_applied": None} for row in rows]
+    writer._write_batch(list(enumerate(unmapped, start=batch_size + 1)))
+    assert "prod-edges" not in index.where_used("dataset", "prob:steel-machined").subjects
+    assert "prod-edges" not in index.where_used("rule", "r").subjects
+    writer.close()
+
+
+def test_request_reads_then_writes_after_a_concurrent_commit():
+    init_db()
+    ProductRepository().create_product(Product(id="prod-busy", name="Lamp", version="1", functional_unit="1 lamp"))
+    with UnitOfWork() as uow:
+        products = ProductRepository(session_factory=uow.session_factory)
+        assert products.get_product("prod-busy").name == "Lamp"
+        # Another connection commits after the request's snapshot was taken.
+        with get_session() as other:
+            other.execute(update(ProductModel).where(ProductModel.id == "prod-busy").values(name="Desk lamp"))
+            other.commit()
+
+        products.replace_bom("prod-busy", _items(2, "prod-busy"))
+        assert products.get_product("prod-busy").name == "Desk lamp"
+
+        service = MappingService(
+            providers=[], repository=MappingRepository(session_factory=uow.session_factory), min_candidate=0.6, min_auto=0.85
+        )
+        assert service.load_latest_decisions("prod-busy") == []
+        with get_session() as other:
+            other.execute(update(ProductModel).where(ProductModel.id == "prod-busy").values(name="Lamp"))
+            other.commit()
+        assert len(service.map_bom(_items(2, "prod-busy"))) == 2
+    assert len(ProductRepository().get_bom("prod-busy")) == 2
@@ -8,6 +8,8 @@ os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
 
 from backend.app.db.init_db import init_db  # noqa: E402
 from backend.app.models.method_profile import PCF_METHOD_PROFILES, PCFMethodID  # noqa: E402
+from backend.app.services.scenario_cache import ScenarioCache  # noqa: E402
+from backend.app.services.scenario_repository import ScenarioRepository  # noqa: E402
 from backend.app.services.scenario_service import ScenarioService  # noqa: E402
 
 init_db()
@@ -24,3 +26,36 @@ def test_default_scenario_uses_pact_method():
     service = ScenarioService()
     scenario = service.get_scenario("default")
     assert scenario.pcf_method_id == PCFMethodID.PACT_V3
+
+
+def test_compiled_scenario_cache_hits_and_invalidation():
+    cache = ScenarioCache()
+    repository = ScenarioRepository(cache=cache)
+    first = repository.get_compiled_scenario("default")
+    second = repository.get_compiled_scenario("default")
+    assert first is second
+    assert cache.hits == 1 and cache.misses == 1
+
+    repository.save_scenario(first.scenario)
+    refreshed = repository.get_compiled_scenario("default")
+    assert refreshed is not first
+    assert cache.misses == 2
+
+
+def test_compiled_scenario_cache_sees_saves_from_other_workers():
+    repository = ScenarioRepository(cache=ScenarioCache())
+    other_worker = ScenarioRepository(cache=ScenarioCache())
+    before = repository.get_compiled_scenario("default")
+
+    edited = other_worker.get_scenario("default")
+    original_factor = edited.utility_factor
+    edited.utility_factor = original_factor + 0.25
+    other_worker.save_scenario(edited)
+    try:
+        after = repository.get_compiled_scenario("default")
+        assert after is not before
+        assert after.updated_at != before.updated_at
+        assert after.scenario.utility_factor == original_factor + 0.25
+    finally:
+        edited.utility_factor = original_factor
+        other_worker.save_scenario(edited)
@@ -1,9 +1,21 @@
-from backend.app.engines.pcf_engine_base import PCFResult
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from scipy.sparse.linalg import spsolve
+
+from backend.app.engines.pcf_engine_base import LCIEntry, LCIModel, PCFRequest, PCFResult
+from backend.app.core.metrics import metrics
+from backend.app.engines.impact_store import ImpactStore, StoredImpactPCFEngine, build_impact_store
+from backend.app.engines.lca_factorization import factorization_cache
+from backend.app.engines.pcf_engine_matrix import LCIDatabase, MatrixLCAEngine, load_lci_database, reference_amounts
+from backend.app.engines.units import UnitConversionError, conversion_factor, normalize_unit, to_reference_amounts
 from backend.app.models.bom import BOMItem
 from backend.app.models.method_profile import PCF_METHOD_PROFILES, PCFMethodID
 from backend.app.models.product import Product
 from backend.app.models.scenario import Scenario
 from backend.app.services.pcf_service import PCFService
+from backend.app.services.pcf_uncertainty import PCFMonteCarlo, PedigreeScores
 
 
 class _FakeEngine:
@@ -78,3 +90,339 @@ def test_pcf_service_handles_other_methods():
     service.run(product, bom, scenario, method_profile)
 
     assert engine.last_method_id == PCFMethodID.ISO14067_GENERIC
+
+
+def _entry(item_id: str, dataset_id: str, mass_kg: float, quantity: float = 1.0, unit: str = "ea", stage: str = "raw_materials"):
+    return LCIEntry(
+        bom_item_id=item_id,
+        dataset_id=dataset_id,
+        provider="test",
+        quantity=quantity,
+        unit=unit,
+        mass_kg=mass_kg,
+        life_cycle_stage=stage,
+        brightway_reference=None,
+    )
+
+
+def test_matrix_engine_solves_seed_database():
+    database = load_lci_database()
+    engine = MatrixLCAEngine(database)
+    product = Product(id="prod", name="Prod", version="1", functional_unit="1")
+    scenario = _make_scenario(PCFMethodID.PACT_V3)
+    entries = [
+        _entry("frame", "prob:aluminium-extrusion", 1.2),
+        _entry("bolts", "prob:steel-fastener", 0.01, quantity=8),
+        _entry("bracket", "prob:steel-fastener", 0.3, stage="own_operations"),
+        _entry("board", "boavizta:pcba-generic", 0.05),
+    ]
+    model = LCIModel(bom_items=[], entries=entries)
+
+    result = engine.calculate_pcf(product, [], scenario, PCF_METHOD_PROFILES[PCFMethodID.PACT_V3], lci_model=model)
+
+    A = database.technosphere.toarray()
+    B = database.biosphere.toarray()
+    demand = np.zeros(len(database))
+    for entry in entries:
+        demand[database.index[entry.dataset_id]] += entry.mass_kg * entry.quantity
+    expected = database.characterization_factors("IPCC_AR6_GWP100") @ B @ np.linalg.solve(A, demand)
+    assert result.total_kg_co2e == pytest.approx(expected, rel=1e-12)
+    assert sum(result.breakdown_by_item.values()) == pytest.approx(expected, rel=1e-12)
+    assert result.breakdown_by_item["bolts"] == pytest.approx(result.breakdown_by_item["bracket"] * 0.08 / 0.3, rel=1e-12)
+    assert set(result.breakdown_by_stage) == {"raw_materials", "own_operations"}
+    assert result.provenance["datasets_solved"] == 3
+    assert "unmatched_datasets" not in result.provenance
+
+    # PEF characterizes with EF3.0, which weighs methane and N2O higher than AR6.
+    pef = engine.calculate_pcf(product, [], scenario, PCF_METHOD_PROFILES[PCFMethodID.PEF_GENERIC], lci_model=model)
+    assert pef.total_kg_co2e > result.total_kg_co2e
+
+    fallback = engine.calculate_pcf(
+        product, [], scenario, PCF_METHOD_PROFILES[PCFMethodID.PACT_V3], lci_model=LCIModel([], [_entry("x", "unknown", 2.0)])
+    )
+    assert fallback.total_kg_co2e == pytest.approx(3.0)
+    assert fallback.provenance["unmatched_datasets"] == ["unknown"]
+    with pytest.raises(UnitConversionError, match="'ea' \\(count\\) cannot be converted to 'kWh'"):
+        engine.calculate_pcf(
+            product, [], scenario, PCF_METHOD_PROFILES[PCFMethodID.PACT_V3], lci_model=LCIModel([], [_entry("x", "elec:grid-eu", 1.0)])
+        )
+
+
+def test_units_convert_to_dataset_reference_units():
+    assert normalize_unit(" m² ") == "m2" and normalize_unit("PCS") == "ea"
+    assert normalize_unit("Mg") == "t" and normalize_unit("mg") == "mg"
+    assert conversion_factor("kWh", "MJ") == pytest.approx(3.6)
+    assert conversion_factor("cm2", "m2") == pytest.approx(1e-4)
+    with pytest.raises(UnitConversionError, match="needs a mass per unit"):
+        conversion_factor("pcs", "kg")
+
+    database = load_lci_database()
+    entries = [
+        _entry("housing", "prob:abs-injection", 0.25, quantity=4),  # pieces with a mass per piece
+        _entry("sheet", "steel:primary", None, quantity=1500, unit="g"),
+        _entry("heat", "elec:grid-eu", None, quantity=36, unit="MJ"),
+        _entry("freight", "transport:lorry", None, quantity=250, unit="kg*km"),
+        _entry("roll", "unknown", None, quantity=3, unit="roll"),  # costed per kg; no mass, so nothing
+    ]
+    rows = np.array([database.index.get(entry.dataset_id, -1) for entry in entries])
+    amounts = reference_amounts(entries, rows, database.process_units.__getitem__)
+    assert amounts.tolist() == pytest.approx([1.0, 1.5, 10.0, 0.25, 0.0])
+
+    with pytest.raises(UnitConversionError, match="BOM item foil \\(dataset 'elec:grid-eu'\\): 'm2' \\(area\\)"):
+        reference_amounts([_entry("foil", "elec:grid-eu", None, unit="m2")], rows[2:3], database.process_units.__getitem__)
+
+    units = ["g", "kg", "t", "lb", "oz"] * 20_000
+    quantities = np.arange(len(units), dtype=float)
+    converted = to_reference_amounts(quantities, np.full(len(units), np.nan), units, ["kg"] * len(units))
+    assert converted == pytest.approx(quantities * np.array([conversion_factor(unit, "kg") for unit in units]))
+
+
+def test_breakdowns_follow_method_stage_boundary():
+    engine = MatrixLCAEngine(load_lci_database(), top_contributions=2)
+    product = Product(id="prod", name="Prod", version="1", functional_unit="1")
+    scenario = _make_scenario(PCFMethodID.PACT_V3)
+    entries = [
+        _entry("frame", "prob:aluminium-extrusion", 1.2),
+        _entry("bolts", "prob:steel-fastener", 0.01, quantity=8),
+        _entry("bracket", "prob:steel-fastener", 0.3, stage="own_operations"),
+        _entry("charging", "elec:grid-eu", 0.0, quantity=500, unit="kWh", stage="use_phase"),
+    ]
+    entries[2].provider = "supplier"
+    model = LCIModel([], entries)
+
+    gate = engine.calculate_pcf(product, [], scenario, PCF_METHOD_PROFILES[PCFMethodID.PACT_V3], lci_model=model)
+    grave = engine.calculate_pcf(product, [], scenario, PCF_METHOD_PROFILES[PCFMethodID.ISO14067_GENERIC], lci_model=model)
+    use_phase = grave.breakdown_by_stage["use_phase"]
+    # PACT is cradle-to-gate: the use-phase electricity is neither solved for nor reported.
+    assert grave.total_kg_co2e == pytest.approx(gate.total_kg_co2e + use_phase, rel=1e-12)
+    assert gate.provenance["excluded_by_stage"] == {"use_phase": pytest.approx(use_phase, rel=1e-12)}
+    assert "charging" not in gate.breakdown_by_item and "elec:grid-eu" not in gate.breakdown_by_dataset
+    assert gate.provenance["datasets_solved"] == 2
+    for breakdown in (gate.breakdown_by_stage, gate.breakdown_by_provider, gate.breakdown_by_dataset, gate.breakdown_by_item):
+        assert sum(breakdown.values()) == pytest.approx(gate.total_kg_co2e, rel=1e-12)
+    assert set(gate.breakdown_by_provider) == {"test", "supplier"}
+    assert gate.breakdown_by_dataset["prob:steel-fastener"] == pytest.approx(
+        gate.breakdown_by_item["bolts"] + gate.breakdown_by_item["bracket"], rel=1e-12
+    )
+
+    top_items = gate.top_contributions["item"]
+    assert [row["key"] for row in top_items] == ["frame", "bracket"]
+    assert top_items[0]["share"] == pytest.approx(gate.breakdown_by_item["frame"] / gate.total_kg_co2e)
+    assert [row["key"] for row in grave.top_contributions["stage"]] == ["use_phase", "raw_materials"]
+
+
+def test_multi_method_run_solves_inventory_once(monkeypatch):
+    database = load_lci_database()
+    engine = MatrixLCAEngine(database)
+    product = Product(id="prod", name="Prod", version="1", functional_unit="1")
+    scenario = _make_scenario(PCFMethodID.PACT_V3)
+    model = LCIModel(
+        [],
+        [
+            _entry("frame", "prob:aluminium-extrusion", 1.2),
+            _entry("foam", "prob:polyurethane-flexible", 0.4, stage="end_of_life"),
+            _entry("charging", "elec:grid-eu", 0.0, quantity=500, unit="kWh", stage="use_phase"),
+            _entry("x", "unknown", 2.0),
+        ],
+    )
+    method_ids = [PCFMethodID.PACT_V3, PCFMethodID.ISO14067_GENERIC, PCFMethodID.PEF_GENERIC, PCFMethodID.CATENAX_PCF]
+    profiles = [PCF_METHOD_PROFILES[method_id] for method_id in method_ids]
+    expected = [engine.calculate_pcf(product, [], scenario, profile, lci_model=model) for profile in profiles]
+
+    solves = []
+    inventory = database.inventory
+    monkeypatch.setattr(database, "inventory", lambda demand: solves.append(demand.shape) or inventory(demand))
+    results = PCFService(engine).run_methods(product, [], scenario, profiles, lci_model=model)
+
+    assert solves == [(len(database), 3)]  # one block solve, one column per stage
+    assert [result.method_profile_id for result in results] == [method_id.value for method_id in method_ids]
+    for result, single in zip(results, expected):
+        assert result.pcf_total_kg_co2e == pytest.approx(single.total_kg_co2e, rel=1e-12)
+        assert result.pcf_breakdown["by_stage"] == pytest.approx(single.breakdown_by_stage, rel=1e-12)
+        assert result.provenance["calculation"]["inventory"] == pytest.approx(single.provenance["inventory"], rel=1e-12)
+    assert "use_phase" not in results[0].pcf_breakdown["by_stage"]
+    assert results[2].pcf_total_kg_co2e > results[1].pcf_total_kg_co2e  # EF3.0 vs AR6 on the same boundary
+
+
+def test_incremental_run_applies_only_changed_items(monkeypatch):
+    database = load_lci_database()
+    engine = MatrixLCAEngine(database)
+    service = PCFService(engine)
+    product = Product(id="prod-inc", name="Prod", version="1", functional_unit="1")
+    scenario = _make_scenario(PCFMethodID.PACT_V3)
+    method = PCF_METHOD_PROFILES[PCFMethodID.PACT_V3]
+    entries = [
+        _entry("frame", "prob:aluminium-extrusion", 1.2),
+        _entry("bolts", "prob:steel-fastener", 0.01, quantity=8),
+        _entry("board", "boavizta:pcba-generic", 0.05),
+        _entry("cover", "unknown", 0.5),
+    ]
+    first = service.run_incremental(product, [], scenario, method, LCIModel([], list(entries)))
+    assert first.provenance["calculation"]["incremental"]["items_recomputed"] == 4
+
+    solves = []
+    inventory = database.inventory
+    monkeypatch.setattr(database, "inventory", lambda demand: solves.append(np.count_nonzero(demand)) or inventory(demand))
+    models = [
+        [_entry("frame", "prob:steel-machined", 1.2), *entries[1:]],  # override one item
+        [_entry("frame", "prob:steel-machined", 1.2), *entries[1:3]],  # drop the unmatched item
+        [_entry("frame", "prob:steel-machined", 1.2), entries[1], _entry("board", "boavizta:pcba-generic", 0.05, stage="use_phase")],
+    ]
+    incremental_solves = []
+    for entries_now in models:
+        model = LCIModel([], entries_now)
+        result = service.run_incremental(product, [], scenario, method, model)
+        incremental_solves.extend(solves)
+        expected = engine.calculate_pcf(product, [], scenario, method, lci_model=model)
+        solves.clear()
+        assert result.pcf_total_kg_co2e == pytest.approx(expected.total_kg_co2e, rel=1e-12)
+        assert result.pcf_breakdown["by_item"] == pytest.approx(expected.breakdown_by_item, rel=1e-12)
+        assert result.provenance["calculation"]["inventory"] == pytest.approx(expected.provenance["inventory"], rel=1e-9)
+        assert result.provenance["calculation"]["datasets_solved"] == expected.provenance["datasets_solved"]
+    # Each update solved only its delta: frame swaps two datasets, dropping "cover" solves nothing, board leaves the boundary.
+    assert incremental_solves == [2, 1]
+    assert models[2][2].bom_item_id not in result.pcf_breakdown["by_item"]
+    assert result.provenance["calculation"]["incremental"] == {"items_recomputed": 1, "items_removed": 0}
+    # More updates than entries trigger a full re-solve.
+    service.run_incremental(product, [], scenario, method, LCIModel([], models[0]))
+    assert solves == [3]
+
+
+def test_impact_store_matches_matrix_engine(tmp_path):
+    database = load_lci_database()
+    path = tmp_path / "impacts.bin"
+    assert build_impact_store(database, path) == list(PCFMethodID)
+    store = ImpactStore(path)
+    assert len(store) == len(database)
+    assert all(store.row(process_id) == row for process_id, row in database.index.items())
+    assert store.row("unknown") == -1 and "unknown" not in store
+    assert store.unit(database.index["elec:grid-eu"]) == "kWh"
+    with pytest.raises(ValueError):
+        store.impacts(PCFMethodID.PACT_V3)[0] = 0.0
+
+    product = Product(id="prod", name="Prod", version="1", functional_unit="1")
+    scenario = _make_scenario(PCFMethodID.PEF_GENERIC)
+    model = LCIModel([], [_entry("frame", "prob:aluminium-extrusion", 1.2), _entry("x", "unknown", 2.0, stage="own_operations")])
+    model.entries.append(_entry("power", "elec:grid-eu", 0.0, quantity=40, unit="kWh"))
+    for method_id in (PCFMethodID.PACT_V3, PCFMethodID.PEF_GENERIC):
+        method = PCF_METHOD_PROFILES[method_id]
+        expected = MatrixLCAEngine(database).calculate_pcf(product, [], scenario, method, lci_model=model)
+        stored = StoredImpactPCFEngine(store).calculate_pcf(product, [], scenario, method, lci_model=model)
+        assert stored.total_kg_co2e == pytest.approx(expected.total_kg_co2e, rel=1e-12)
+        assert stored.breakdown_by_item == pytest.approx(expected.breakdown_by_item, rel=1e-12)
+        assert stored.breakdown_by_stage == pytest.approx(expected.breakdown_by_stage, rel=1e-12)
+        assert stored.provenance["unmatched_datasets"] == ["unknown"]
+    store.close()
+
+    data = bytearray(path.read_bytes())
+    data[8] = 99  # format version
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="format 99"):
+        ImpactStore(path)
+
+
+def test_factorization_is_cached_and_reused_for_batches():
+    rng = np.random.default_rng(4)
+    size = 2500
+    processes = [
+        {
+            "id": f"p{index}",
+            "unit": "kWh" if index == 1 else "kg",
+            "technosphere": {f"p{supplier}": float(rng.uniform(0.0, 0.15)) for supplier in rng.choice(size, 5) if supplier != index},
+            "biosphere": {"co2_fossil": float(rng.uniform(0.0, 2.0))},
+        }
+        for index in range(size)
+    ]
+    data = {
+        "name": "synthetic",
+        "biosphere": {"co2_fossil": "CO2"},
+        "characterization": {"IPCC_AR6_GWP100": {"co2_fossil": 1.0}},
+        "processes": processes,
+    }
+    factorization_cache.clear()
+    factorized = metrics.value("lca_factorizations_total")
+    database = LCIDatabase.from_dict(data)
+    demand = np.zeros((size, 3))
+    demand[rng.choice(size, 50), 0] = 1.0
+    demand[rng.choice(size, 50), 1] = 2.0
+    demand[:, 2] = demand[:, 0] + demand[:, 1]
+
+    supply = database.supply(demand)
+    assert np.allclose(supply, spsolve(database.technosphere, demand), rtol=1e-9, atol=1e-12)
+    assert np.allclose(supply[:, 2], supply[:, 0] + supply[:, 1])
+    assert database.unit_impacts("IPCC_AR6_GWP100") @ demand[:, 0] == pytest.approx(database.inventory(demand[:, 0])[0], rel=1e-9)
+    # A second load of the same database reuses the factors; the adjoint used the same ones.
+    LCIDatabase.from_dict(data).supply(demand[:, 0])
+    assert metrics.value("lca_factorizations_total") == factorized + 1
+
+    engine = MatrixLCAEngine(database)
+    product = Product(id="prod", name="Prod", version="1", functional_unit="1")
+    scenario = _make_scenario(PCFMethodID.PACT_V3)
+    method = PCF_METHOD_PROFILES[PCFMethodID.PACT_V3]
+    models = [LCIModel([], [_entry(f"i{k}", f"p{k * 7}", 0.5 + k, unit="kg"), _entry("x", "p3", 1.0)]) for k in range(20)]
+    models.append(LCIModel([], [_entry("bad", "p1", 1.0, unit="kg")]))
+    batch = engine.calculate_pcf_many([PCFRequest(product, [], scenario, method, model) for model in models])
+    assert isinstance(batch[-1], ValueError)
+    for model, result in zip(models[:-1], batch):
+        single = engine.calculate_pcf(product, [], scenario, method, lci_model=model)
+        assert result.total_kg_co2e == pytest.approx(single.total_kg_co2e, rel=1e-12)
+        assert sum(result.breakdown_by_item.values()) == pytest.approx(result.total_kg_co2e, rel=1e-9)
+    assert metrics.value("lca_factorizations_total") == factorized + 1
+
+
+def test_pcf_monte_carlo_from_pedigree_scores():
+    assert PedigreeScores().sigma() == pytest.approx(np.sqrt(0.0006))
+    assert PedigreeScores.from_mapping({"temporal": 2, "technological": 3}, scale="dqr") == PedigreeScores(temporal=3, technological=5)
+    with pytest.raises(ValueError, match="must be 1..5"):
+        PedigreeScores(reliability=6)
+
+    engine = MatrixLCAEngine(load_lci_database())
+    method_profile = PCF_METHOD_PROFILES[PCFMethodID.PACT_V3]
+    entries = [
+        _entry("frame", "prob:aluminium-extrusion", 1.2),
+        _entry("bolts", "prob:steel-fastener", 0.01, quantity=8),
+        _entry("bracket", "prob:steel-fastener", 0.3, stage="own_operations"),
+        _entry("board", "unknown-pcba", 0.2),
+        _entry("charging", "elec:grid-eu", 0.0, quantity=500, unit="kWh", stage="use_phase"),
+    ]
+    impacts, known = engine.entry_impacts(entries, method_profile)
+    deterministic = engine.calculate_pcf(None, [], None, method_profile, lci_model=LCIModel([], entries))
+    monte_carlo = PCFMonteCarlo(
+        entries,
+        impacts,
+        known,
+        dataset_pedigree={"prob:steel-fastener": PedigreeScores(2, 2, 2, 2, 2)},
+        item_pedigree={"frame": PedigreeScores(technological=5)},
+        stages_included=method_profile.life_cycle_stages_included,
+        chunk_elements=4_000,
+    )
+    assert monte_carlo.stages == ["raw_materials", "own_operations"] and "charging" not in monte_carlo.items
+
+    result = monte_carlo.run(20_000, seed=3, workers=1, percentiles=[5, 50, 95])
+    assert result.total.deterministic == pytest.approx(deterministic.total_kg_co2e, rel=1e-9)
+    assert result.per_item["bolts"].deterministic == pytest.approx(deterministic.breakdown_by_item["bolts"], rel=1e-9)
+    assert result.unscored_datasets == ["prob:aluminium-extrusion", "unknown-pcba"]
+    # One item's marginal is lognormal with the dataset and item variances combined.
+    frame = result.per_item["frame"]
+    sigma = np.hypot(PedigreeScores(3, 3, 3, 3, 3).sigma(), PedigreeScores(technological=5).sigma())
+    assert frame.percentiles["p50"] == pytest.approx(frame.deterministic, rel=0.02)
+    assert frame.percentiles["p95"] == pytest.approx(frame.deterministic * np.exp(1.6449 * sigma), rel=0.03)
+    # Lines sharing a dataset draw one factor, so the stage spread is not averaged away.
+    bolts, bracket = result.per_item["bolts"], result.per_item["bracket"]
+    assert result.per_stage["own_operations"].std == pytest.approx(bracket.std)
+    assert result.total.percentiles["p5"] < result.total.percentiles["p50"] < result.total.percentiles["p95"]
+    assert sum(stage.mean for stage in result.per_stage.values()) == pytest.approx(result.total.mean, rel=1e-9)
+    assert bolts.std / bolts.mean == pytest.approx(bracket.std / bracket.mean, rel=0.1)
+
+    assert monte_carlo.run(2_000, seed=3, workers=2, percentiles=[5, 50, 95]) == monte_carlo.run(
+        2_000, seed=3, workers=1, percentiles=[5, 50, 95]
+    )
+    with ThreadPoolExecutor(2) as shared:
+        assert PCFService(engine, monte_carlo_executor=lambda: shared).uncertainty(
+            method_profile, LCIModel([], entries), 1_000, seed=1
+        ) == PCFService(engine).uncertainty(method_profile, LCIModel([], entries), 1_000, seed=1)
+    service = PCFService(engine)
+    scored = service.uncertainty(method_profile, LCIModel([], entries), 1_000, seed=1)
+    assert "prob:aluminium-extrusion" in scored.unscored_datasets
+    with pytest.raises(ValueError, match="limit"):
+        service.uncertainty(method_profile, LCIModel([], entries), 10_000_000)
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _run(snippet: str, database_path: Path) -> subprocess.CompletedProcess:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database_path}", "STARTUP_WARMUP": "false"}
+    return subprocess.run(
+        [sys.executable, "-c", snippet], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def test_importing_app_has_no_side_effects(tmp_path):
+    database_path = tmp_path / "import.db"
+    _run(
+        "import backend.app.db.init_db as init_module\n"
+        "calls = []\n"
+        "for name in ('init_db', 'ensure_schema_upgrades', 'seed_mapping_rules', 'seed_scenarios'):\n"
+        "    setattr(init_module, name, lambda *args, _name=name, **kwargs: calls.append(_name))\n"
+        "import backend.app.main\n"
+        "from backend.app.db.base import get_engine\n"
+        "assert calls == [], calls\n"
+        "assert get_engine.cache_info().currsize == 0\n"
+        "import sys\n"
+        "assert 'scipy' not in sys.modules\n",
+        database_path,
+    )
+    assert not list(tmp_path.glob("import.db*"))
+
+
+def test_lifespan_initializes_database(tmp_path):
+    database_path = tmp_path / "boot.db"
+    _run(
+        "from fastapi.testclient import TestClient\n"
+        "from backend.app.main import app\n"
+        "with TestClient(app) as client:\n"
+        "    assert client.get('/health').status_code == 200\n",
+        database_path,
+    )
+    assert database_path.exists()